@@ -1,19 +1,54 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import Future
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import uvicorn
+import asyncio
+import json
+import math
+import threading
 import time
-from typing import Dict, Optional
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 import os
 
-from main import run_pesquisador  # Importando a função principal
+from main import obter_memoria, preaquecer, preaquecer_em_background, run_pesquisador, run_pesquisador_async, run_pesquisador_json  # Importando a função principal (a crewai é carregada sob demanda)
+from limites import obter_limitador_llm, obter_limite_pesquisas
+from configuracao import FLUXO_PADRAO, FLUXOS_DISPONIVEIS, MODELO_LLM
+from cache import estatisticas_cache_completions, normalizar_tema, obter_cache_artigos  # Caches de artigos e respostas do LLM
+from compactacao import estatisticas_compactacao
+from rastreamento import aguardar_handlers, executar_rastreado, iniciar_trace, obter_metricas, para_otlp, span, trace_ativo
 from models import PesquisaOutput  # Importando os modelos
+from api.scheduler import DURACAO_PADRAO, AgendadorPesquisas, FilaCheia
+from api.estimativa import etapa_atual, obter_estimador
+from api.job_store import criar_job_store_from_env, status_final
+from api.notificacoes import EntregadorWebhooks, NotificadorConclusao
+
+# Agendador com número fixo de workers e fila limitada para as pesquisas
+agendador = AgendadorPesquisas.from_env(inicializador=preaquecer)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Carrega a crewai em background: /health e /status respondem enquanto isso
+    if os.getenv("API_PREAQUECER", "1") not in ("0", "false", "False"):
+        if agendador.modo == "processo":
+            # A crew roda nos processos worker: eles são criados já e se aquecem sozinhos
+            agendador.iniciar()
+        else:
+            preaquecer_em_background()
+    yield
+    # Libera os workers ao desligar o servidor
+    agendador.encerrar(aguardar=False)
+    job_store.encerrar_assinatura()
 
 # Criação da aplicação FastAPI
 app = FastAPI(
     title="Agente Wiki API",
     description="API para pesquisar e gerar artigos usando agentes de IA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuração CORS para permitir requisições de outros domínios
@@ -28,116 +63,716 @@ app.add_middleware(
 # Classes de modelo para as requisições
 class PesquisaRequest(BaseModel):
     tema: str
+    prioridade: int = 0  # Valores maiores são executados antes
+    usar_cache: bool = True  # False força uma nova geração (sem cache de artigos e de respostas do LLM)
+    fluxo: str = FLUXO_PADRAO  # um de configuracao.FLUXOS_DISPONIVEIS
+    callback_url: Optional[str] = None  # recebe o resultado por POST (webhook) ao concluir
     
 class PesquisaStatusResponse(BaseModel):
     id: str
     status: str
-    eta: Optional[int] = None
+    eta: Optional[int] = None  # segundos estimados até a conclusão
+    etapa: Optional[str] = None  # "fila", "crew.montagem", "tarefa:<nome>"...
+    posicao_fila: Optional[int] = None  # jobs que executam antes deste (0 = é o próximo)
+
+class PesquisaLoteRequest(BaseModel):
+    temas: List[str]
+    prioridade: int = 0
+    usar_cache: bool = True
+    fluxo: str = FLUXO_PADRAO
+
+class LoteStatusResponse(BaseModel):
+    id: str
+    status: str
+    total: int
+    concluidos: int
+    erros: int
+    pendentes: int
+
+# Tempo máximo (segundos) em que uma execução fica reservada para agrupar pesquisas idênticas
+SINGLE_FLIGHT_TTL = int(os.getenv("API_SINGLE_FLIGHT_TTL", "900"))
+
+# Armazenamento das tarefas e resultados (memória, SQLite ou Redis, conforme JOB_STORE_URL)
+# Com SQLite ou Redis, qualquer worker do uvicorn consegue responder /status e /resultado.
+# Tarefas nunca finalizadas expiram após SINGLE_FLIGHT_TTL + JOB_TTL_SEGUNDOS
+job_store = criar_job_store_from_env(ttl_execucao_segundos=SINGLE_FLIGHT_TTL)
+
+# Long-polling do /status: espera máxima aceita em `wait` e intervalo em que o
+# armazenamento é conferido de novo (conclusões em outros workers sem pub/sub)
+LONG_POLL_MAX = float(os.getenv("API_LONG_POLL_MAX", "60"))
+LONG_POLL_INTERVALO = float(os.getenv("API_LONG_POLL_INTERVALO", "1"))
 
-# Armazenamento em memória para tarefas em background
-# Em um ambiente de produção, use Redis ou um banco de dados
-tarefas_em_andamento: Dict[str, Dict] = {}
-resultados_pesquisas: Dict[str, PesquisaOutput] = {}
+# Esperas do long-polling deste worker e entregas dos webhooks
+notificador = NotificadorConclusao()
+entregador_webhooks = EntregadorWebhooks()
+_assinatura_lock = threading.Lock()
+_assinatura_iniciada = False
+
+def chave_execucao(tema: str, fluxo: str = FLUXO_PADRAO) -> str:
+    """Pesquisas simultâneas com a mesma chave compartilham uma única execução da crew."""
+    return f"{fluxo}:{normalizar_tema(tema)}"
+
+def validar_fluxo(fluxo: str):
+    if fluxo not in FLUXOS_DISPONIVEIS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Fluxo desconhecido: {fluxo}. Opções: {', '.join(FLUXOS_DISPONIVEIS)}"
+        )
+
+def validar_callback(callback_url: Optional[str]):
+    if callback_url is None:
+        return
+    partes = urlsplit(callback_url)
+    if partes.scheme not in ("http", "https") or not partes.netloc:
+        raise HTTPException(status_code=400, detail="callback_url deve ser uma URL http(s)")
+
+def iniciar_assinatura():
+    """Passa a receber pelo JobStore (pub/sub do Redis) as conclusões dos outros workers."""
+    global _assinatura_iniciada
+    with _assinatura_lock:
+        if not _assinatura_iniciada:
+            job_store.assinar_conclusoes(notificador.notificar)
+            _assinatura_iniciada = True
+
+def finalizar_tarefa(task_id: str, status: str, resultado: Optional[PesquisaOutput] = None,
+                     resultado_json: Optional[str] = None):
+    """
+    Grava o status final da tarefa e avisa quem aguarda a conclusão: os long-polls
+    deste worker, os dos outros workers (pub/sub) e o webhook da pesquisa, se houver.
+    """
+    job_store.finalizar(task_id, status, resultado, resultado_json)
+    notificador.notificar(task_id)
+    job_store.publicar_conclusao(task_id)
+    
+    tarefa = job_store.obter(task_id)
+    if tarefa and tarefa.get("callback_url"):
+        payload = {
+            "id": task_id,
+            "status": status,
+            "resultado": resultado.model_dump() if resultado is not None else None
+        }
+        entrega = entregador_webhooks.agendar(tarefa["callback_url"], payload)
+        entrega.add_done_callback(lambda futuro: registrar_entrega(task_id, futuro))
 
-# Função para executar pesquisa em background
-def executar_pesquisa_background(task_id: str, tema: str):
+def registrar_entrega(task_id: str, entrega: Future):
+    """Guarda na tarefa o resultado da entrega do webhook (diagnóstico), inclusive se ela falhou."""
+    erro = entrega.exception()
+    if erro is not None:
+        situacao = {"entregue": False, "tentativas": None, "erro": f"{type(erro).__name__}: {erro}"[:300]}
+    else:
+        situacao = entrega.result()
+    job_store.atualizar(task_id, webhook=situacao)
+
+def marcar_processando(task_id: str) -> float:
+    """Marca a tarefa como "processando" e retorna quando ela foi criada."""
+    tarefa = job_store.obter(task_id)
+    job_store.atualizar(task_id, status="processando", tempo_inicio=time.time())
+    return tarefa["tempo_inicio"] if tarefa else time.time()
+
+def registrar_trace(task_id: str, fluxo: str, trace) -> None:
+    """Guarda o trace da tarefa e alimenta as métricas e o estimador de ETA."""
+    # O trace fica no armazenamento (fora dos dados da tarefa, lidos a cada /status):
+    # /status/{task_id}/trace funciona em qualquer worker
+    aguardar_handlers()
+    job_store.guardar_trace(task_id, trace.exportar())
+    obter_metricas().observar_trace(trace)
+    obter_estimador().observar(fluxo, MODELO_LLM, trace)
+
+@contextmanager
+def rastrear_execucao(task_id: str, tema: str, fluxo: str):
+    """
+    Trace da execução de um job (desde a criação da tarefa, incluindo a espera
+    na fila): marca a tarefa como "processando" e, ao final, guarda o trace da
+    tarefa e alimenta as métricas e o estimador de ETA. Produz (trace, raiz).
+    """
+    criada = marcar_processando(task_id)
+    with iniciar_trace(task_id, trace_id=task_id.rsplit("_", 1)[-1]) as trace:
+        try:
+            with span("pesquisa", alvo=fluxo, tema=tema) as raiz:
+                # A raiz começa na criação da tarefa: inclui a espera na fila
+                raiz.inicio = criada
+                trace.registrar("fila", criada, time.time(), raiz.span_id)
+                yield trace, raiz
+        finally:
+            registrar_trace(task_id, fluxo, trace)
+
+@asynccontextmanager
+async def rastrear_execucao_async(task_id: str, tema: str, fluxo: str):
+    """
+    rastrear_execucao para os jobs do modo async: o armazenamento e a espera pelos
+    handlers da crewai rodam em threads, sem bloquear o event loop compartilhado.
+    """
+    criada = await asyncio.to_thread(marcar_processando, task_id)
+    with iniciar_trace(task_id, trace_id=task_id.rsplit("_", 1)[-1]) as trace:
+        try:
+            with span("pesquisa", alvo=fluxo, tema=tema) as raiz:
+                raiz.inicio = criada
+                trace.registrar("fila", criada, time.time(), raiz.span_id)
+                yield trace, raiz
+        finally:
+            await asyncio.to_thread(registrar_trace, task_id, fluxo, trace)
+
+def concluir_execucao(task_id: str, chave: str, status: str, resultado: Optional[PesquisaOutput],
+                      resultado_json: Optional[str] = None):
+    try:
+        # Armazena o resultado e atualiza o status final
+        finalizar_tarefa(task_id, status, resultado, resultado_json)
+    finally:
+        # Libera a chave e entrega o mesmo resultado às tarefas agrupadas
+        job_store.liberar_execucao(chave, task_id)
+        entregar_seguidores(task_id, status, resultado, resultado_json)
+
+def entregar_seguidores(lider_id: str, status: str, resultado: Optional[PesquisaOutput],
+                        resultado_json: Optional[str] = None):
+    """
+    Finaliza as tarefas agrupadas à execução com o status e o resultado dela.
+    retirar_seguidores é atômico: cada seguidor é finalizado por quem o retirar.
+    """
+    for seguidor_id in job_store.retirar_seguidores(lider_id):
+        finalizar_tarefa(seguidor_id, status, resultado, resultado_json)
+
+# Função executada pelos workers do agendador
+def executar_pesquisa_background(task_id: str, tema: str, chave: str, usar_cache: bool = True,
+                                  fluxo: str = FLUXO_PADRAO):
+    status, resultado, resultado_json = "concluído", None, None
     try:
-        # Atualiza status para em processamento
-        tarefas_em_andamento[task_id]["status"] = "processando"
-        
-        # Executa a pesquisa
-        resultado = run_pesquisador(tema)
-        
-        # Armazena o resultado
-        resultados_pesquisas[task_id] = resultado
-        
-        # Atualiza status para completo
-        tarefas_em_andamento[task_id]["status"] = "concluído"
+        with rastrear_execucao(task_id, tema, fluxo) as (trace, raiz):
+            # Executa a pesquisa (na própria thread ou em um processo, conforme o modo);
+            # no modo processo os spans voltam junto com o resultado, que chega já em
+            # JSON (gerado uma vez no processo da crew e guardado como veio)
+            em_processo = agendador.modo == "processo"
+            resultado, spans = agendador.executar(
+                executar_rastreado, trace.trace_id, raiz.span_id,
+                run_pesquisador_json if em_processo else run_pesquisador, tema, usar_cache,
+                fluxo=fluxo,
+            )
+            if em_processo:
+                resultado_json, resultado = resultado, PesquisaOutput.model_validate_json(resultado)
+            if spans:
+                trace.incorporar(spans)
     except Exception as e:
         # Em caso de erro, atualiza o status
-        tarefas_em_andamento[task_id]["status"] = f"erro: {str(e)}"
+        status, resultado, resultado_json = f"erro: {str(e)}", None, None
+    concluir_execucao(task_id, chave, status, resultado, resultado_json)
+
+# Job do modo async do agendador: a crew roda como corrotina no event loop dele
+async def executar_pesquisa_async(task_id: str, tema: str, chave: str, usar_cache: bool = True,
+                                  fluxo: str = FLUXO_PADRAO):
+    status, resultado = "concluído", None
+    try:
+        async with rastrear_execucao_async(task_id, tema, fluxo):
+            resultado = await run_pesquisador_async(tema, usar_cache, fluxo=fluxo)
+    except Exception as e:
+        status, resultado = f"erro: {str(e)}", None
+    # O loop é compartilhado por todos os jobs: o armazenamento roda em uma thread
+    await asyncio.to_thread(concluir_execucao, task_id, chave, status, resultado)
+
+
+def obter_tarefa(task_id: str) -> Optional[dict]:
+    """
+    Retorna os dados da tarefa. Tarefas agrupadas refletem o status da execução
+    que estão aguardando (funciona entre workers quando o JobStore é compartilhado).
+    """
+    tarefa = job_store.obter(task_id)
+    if tarefa is None or "lider" not in tarefa or status_final(tarefa["status"]):
+        return tarefa
+    
+    lider = job_store.obter(tarefa["lider"])
+    if lider is None:
+        finalizar_tarefa(task_id, "erro: execução original não encontrada")
+    elif status_final(lider["status"]):
+        finalizar_tarefa(task_id, lider["status"], job_store.obter_resultado(tarefa["lider"]))
+    else:
+        tarefa.update(status=lider["status"], tempo_inicio=lider["tempo_inicio"])
+        return tarefa
+    return job_store.obter(task_id)
+
+def obter_tarefas(task_ids: List[str]) -> Dict[str, Optional[dict]]:
+    """
+    obter_tarefa de várias tarefas com uma única leitura do armazenamento; só as
+    agrupadas ainda em andamento consultam a execução que aguardam.
+    """
+    tarefas = job_store.obter_varios(task_ids)
+    for task_id, tarefa in tarefas.items():
+        if tarefa is not None and "lider" in tarefa and not status_final(tarefa["status"]):
+            tarefas[task_id] = obter_tarefa(task_id)
+    return tarefas
+
+def estimar_andamento(task_id: str, tarefa: dict) -> Tuple[Optional[int], Optional[str], Optional[int]]:
+    """
+    (ETA em segundos, etapa atual, posição na fila) de uma tarefa não finalizada,
+    a partir das durações recentes do fluxo e da posição da execução na fila.
+    """
+    execucao_id = tarefa.get("lider", task_id)
+    fluxo = tarefa.get("fluxo", FLUXO_PADRAO)
+    estimador = obter_estimador()
+    duracao = (estimador.duracao_estimada(fluxo, MODELO_LLM)
+               or agendador.metricas()["duracao_media_segundos"] or DURACAO_PADRAO)
+    
+    if tarefa["status"] == "pendente":
+        posicao = agendador.posicao(execucao_id)
+        # Fora da fila deste processo (item de lote ainda não enfileirado ou outro
+        # worker do uvicorn): assume o fim da fila
+        espera = agendador.estimar_espera(posicao if posicao is not None else agendador.metricas()["fila"])
+        return math.ceil(espera + duracao), "fila", posicao
+    
+    if tarefa["status"] == "processando":
+        # A etapa só é conhecida no processo que executa a crew no modo thread
+        trace = trace_ativo(execucao_id)
+        etapa, inicio_etapa = (etapa_atual(trace) if trace is not None else None) or (None, None)
+        decorrido = time.time() - tarefa["tempo_inicio"]
+        restante = estimador.restante(fluxo, MODELO_LLM, decorrido, etapa, inicio_etapa)
+        if restante is None:
+            restante = max(0.0, duracao - decorrido)
+        # Ainda em execução: nunca estima conclusão imediata
+        return max(1, math.ceil(restante)), etapa, None
+    
+    return None, None, None
+
+def criar_tarefa(tema: str, **extras) -> str:
+    """Registra uma nova tarefa pendente e retorna o seu ID."""
+    task_id = f"task_{uuid.uuid4().hex}"
+    job_store.criar(task_id, {
+        "status": "pendente", 
+        "tema": tema,
+        "tempo_inicio": time.time(),
+        **extras
+    })
+    return task_id
+
+def criar_tarefas(temas: List[str], **extras) -> List[str]:
+    """criar_tarefa para vários temas, gravados de uma vez no armazenamento."""
+    agora = time.time()
+    tarefas = {
+        f"task_{uuid.uuid4().hex}": {"status": "pendente", "tema": tema, "tempo_inicio": agora, **extras}
+        for tema in temas
+    }
+    job_store.criar_varios(tarefas)
+    return list(tarefas)
+
+def abandonar_execucao(chave: str, task_id: str, status: str):
+    """
+    Desfaz a reivindicação de `chave` (se ainda for de `task_id`) e finaliza a tarefa
+    com `status`. Com o armazenamento indisponível, a chave expira em SINGLE_FLIGHT_TTL.
+    """
+    try:
+        job_store.liberar_execucao(chave, task_id)
+    except Exception:
+        pass
+    try:
+        # Finalizada, a tarefa entrega o erro às que chegarem agrupadas a ela
+        finalizar_tarefa(task_id, status)
+    except Exception:
+        pass
+
+def iniciar_execucao(task_id: str, tema: str, prioridade: int = 0, usar_cache: bool = True,
+                     fluxo: str = FLUXO_PADRAO):
+    """
+    Enfileira a pesquisa da tarefa no agendador ou, se já existe uma execução
+    idêntica em andamento, agrupa a tarefa a ela.
+    Lança FilaCheia (sem deixar a execução reservada) se a fila estiver cheia.
+    """
+    chave = chave_execucao(tema, fluxo)
+    if not usar_cache:
+        # Não aproveita execuções em andamento, que podem estar usando o cache
+        chave = f"{chave}:sem-cache"
+    try:
+        lider_id = job_store.reivindicar_execucao(chave, task_id, SINGLE_FLIGHT_TTL)
+    except Exception as e:
+        # Resultado incerto (resposta perdida): a chave pode ter ficado com esta tarefa,
+        # que nunca vai executar, e as pesquisas idênticas a aguardariam até o TTL
+        abandonar_execucao(chave, task_id, f"erro: {str(e)}")
+        raise
+    if lider_id is not None:
+        job_store.atualizar(task_id, lider=lider_id)
+        job_store.adicionar_seguidor(lider_id, task_id)
+        job_store.incrementar_contador("requisicoes_agrupadas")
+        # O líder finaliza antes de retirar os seguidores: se ele terminou entre a
+        # reivindicação e a inscrição, a tarefa pode ter ficado de fora da entrega
+        lider = job_store.obter(lider_id)
+        if lider is None:
+            entregar_seguidores(lider_id, "erro: execução original não encontrada", None)
+        elif status_final(lider["status"]):
+            entregar_seguidores(lider_id, lider["status"], job_store.obter_resultado(lider_id))
+        return
+    
+    # No modo async a crew roda como corrotina: sem uma thread ocupada por pesquisa
+    job = executar_pesquisa_async if agendador.modo == "async" else executar_pesquisa_background
+    try:
+        agendador.submeter(
+            job, task_id, tema, chave, usar_cache, fluxo,
+            prioridade=prioridade, identificador=task_id
+        )
+    except FilaCheia:
+        job_store.liberar_execucao(chave, task_id)
+        raise
+
+def registrar_pesquisa(request: PesquisaRequest) -> Tuple[str, Optional[int], Optional[str], Optional[int]]:
+    """
+    Registra a tarefa como pendente e a enfileira no agendador. Retorna o ID e o
+    andamento estimado (ETA, etapa, posição na fila). Lança FilaCheia sem deixar
+    a tarefa registrada.
+    """
+    extras = {"callback_url": request.callback_url} if request.callback_url else {}
+    task_id = criar_tarefa(request.tema, fluxo=request.fluxo, **extras)
+    try:
+        iniciar_execucao(task_id, request.tema, request.prioridade, request.usar_cache, request.fluxo)
+    except FilaCheia:
+        job_store.remover(task_id)
+        raise
+    return (task_id, *estimar_andamento(task_id, obter_tarefa(task_id)))
 
 @app.post("/pesquisar", response_model=PesquisaStatusResponse)
-async def iniciar_pesquisa(request: PesquisaRequest, background_tasks: BackgroundTasks):
+async def iniciar_pesquisa(request: PesquisaRequest):
     """
     Inicia uma pesquisa em background sobre o tema fornecido.
     Retorna um ID para consultar o status e resultado posteriormente.
+    Responde 503 com Retry-After quando a fila de pesquisas está cheia.
     """
     if not request.tema:
         raise HTTPException(status_code=400, detail="Tema não pode estar em branco")
+    validar_fluxo(request.fluxo)
+    validar_callback(request.callback_url)
     
-    # Gera um ID único para a tarefa (em produção, use UUID)
-    task_id = f"task_{int(time.time())}"
-    
-    # Registra a tarefa como pendente
-    tarefas_em_andamento[task_id] = {
-        "status": "pendente", 
-        "tema": request.tema,
-        "tempo_inicio": time.time()
-    }
-    
-    # Inicia a tarefa em background
-    background_tasks.add_task(executar_pesquisa_background, task_id, request.tema)
+    # O armazenamento (SQLite, Redis) faz E/S bloqueante: roda fora do event loop
+    try:
+        task_id, eta, etapa, posicao = await asyncio.to_thread(registrar_pesquisa, request)
+    except FilaCheia as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de pesquisas cheia, tente novamente mais tarde",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
     return PesquisaStatusResponse(
         id=task_id,
         status="pendente",
-        eta=60  # Estimativa de 60 segundos para conclusão
+        eta=eta,
+        etapa=etapa,
+        posicao_fila=posicao
+    )
+
+def alimentar_lote(itens: List[str], temas: List[str], request: PesquisaLoteRequest):
+    """
+    Enfileira os itens do lote respeitando o limite global de pesquisas por minuto.
+    Quando a fila do agendador está cheia, aguarda o Retry-After em vez de rejeitar o item.
+    Um item que falha ao ser enfileirado é finalizado com erro; os demais seguem.
+    """
+    limite = obter_limite_pesquisas()
+    for task_id, tema in zip(itens, temas):
+        try:
+            limite.adquirir()
+            while True:
+                try:
+                    iniciar_execucao(task_id, tema, request.prioridade, request.usar_cache, request.fluxo)
+                    break
+                except FilaCheia as e:
+                    time.sleep(e.retry_after)
+        except Exception as e:
+            try:
+                finalizar_tarefa(task_id, f"erro: {str(e)}")
+            except Exception:
+                # Armazenamento indisponível: segue para os próximos itens
+                pass
+
+def resumir_lote(lote_id: str) -> Optional[LoteStatusResponse]:
+    """Agrega o status dos itens do lote."""
+    lote = job_store.obter(lote_id)
+    if lote is None or "itens" not in lote:
+        return None
+    
+    concluidos = erros = 0
+    for tarefa in obter_tarefas(lote["itens"]).values():
+        status = tarefa["status"] if tarefa else "erro: tarefa expirada"
+        if status == "concluído":
+            concluidos += 1
+        elif status_final(status):
+            erros += 1
+    
+    total = len(lote["itens"])
+    pendentes = total - concluidos - erros
+    return LoteStatusResponse(
+        id=lote_id,
+        status="processando" if pendentes else "concluído",
+        total=total,
+        concluidos=concluidos,
+        erros=erros,
+        pendentes=pendentes
+    )
+
+def registrar_lote(temas: List[str], fluxo: str) -> Tuple[str, List[str]]:
+    """Registra as tarefas dos itens (todas em uma escrita) e o lote. Retorna (lote_id, itens)."""
+    lote_id = f"lote_{uuid.uuid4().hex}"
+    itens = criar_tarefas(temas, lote=lote_id, fluxo=fluxo)
+    job_store.criar(lote_id, {"status": "processando", "itens": itens, "tempo_inicio": time.time()})
+    return lote_id, itens
+
+@app.post("/pesquisar/lote", response_model=LoteStatusResponse)
+async def iniciar_lote(request: PesquisaLoteRequest):
+    """
+    Inicia a pesquisa de uma lista de temas. Cada tema vira uma tarefa comum
+    (consultável em /status e /resultado) e o lote agrega o progresso de todas.
+    Os resultados podem ser baixados em JSONL em /lote/{lote_id}/resultados.
+    """
+    temas = [tema for tema in request.temas if tema and tema.strip()]
+    if not temas:
+        raise HTTPException(status_code=400, detail="Informe ao menos um tema")
+    validar_fluxo(request.fluxo)
+    
+    # O armazenamento (SQLite, Redis) faz E/S bloqueante: roda fora do event loop
+    lote_id, itens = await asyncio.to_thread(registrar_lote, temas, request.fluxo)
+    
+    # Os itens entram no agendador aos poucos, conforme o limite e o espaço na fila
+    threading.Thread(
+        target=alimentar_lote, args=(itens, temas, request),
+        name=f"alimentar-{lote_id}", daemon=True
+    ).start()
+    
+    return await asyncio.to_thread(resumir_lote, lote_id)
+
+@app.get("/lote/{lote_id}", response_model=LoteStatusResponse)
+def verificar_lote(lote_id: str):
+    """
+    Progresso agregado de um lote de pesquisas.
+    """
+    resumo = resumir_lote(lote_id)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    return resumo
+
+def coletar_finalizados(pendentes: dict) -> List[dict]:
+    """Linhas JSONL dos itens pendentes ({índice: task_id}) que já foram finalizados."""
+    linhas = []
+    tarefas = obter_tarefas(list(pendentes.values()))
+    for indice, task_id in pendentes.items():
+        tarefa = tarefas[task_id]
+        status = tarefa["status"] if tarefa else "erro: tarefa expirada"
+        if not status_final(status):
+            continue
+        resultado = job_store.obter_resultado(task_id) if status == "concluído" else None
+        linhas.append({
+            "indice": indice,
+            "task_id": task_id,
+            "tema": tarefa["tema"] if tarefa else None,
+            "status": status,
+            "resultado": resultado.model_dump() if resultado is not None else None
+        })
+    return linhas
+
+@app.get("/lote/{lote_id}/resultados")
+async def baixar_resultados_lote(lote_id: str, intervalo: float = 0.5):
+    """
+    Transmite os resultados do lote em JSONL, uma linha por tema, na ordem em que terminam.
+    A resposta é encerrada quando todos os itens estiverem finalizados.
+    """
+    lote = await asyncio.to_thread(job_store.obter, lote_id)
+    if lote is None or "itens" not in lote:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    
+    async def gerar():
+        pendentes = dict(enumerate(lote["itens"]))
+        while pendentes:
+            # A varredura consulta o JobStore (e as execuções das agrupadas): roda fora do loop do uvicorn
+            for linha in await asyncio.to_thread(coletar_finalizados, pendentes):
+                del pendentes[linha["indice"]]
+                yield json.dumps(linha, ensure_ascii=False) + "\n"
+            if pendentes:
+                await asyncio.sleep(intervalo)
+    
+    return StreamingResponse(
+        gerar(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{lote_id}.jsonl"'}
+    )
+
+def formatar_sse(evento: dict) -> str:
+    """Serializa um evento no formato Server-Sent Events."""
+    dados = {
+        campo: valor.model_dump() if isinstance(valor, BaseModel) else valor
+        for campo, valor in evento.items()
+    }
+    return f"event: {evento['tipo']}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+def executar_pesquisa_stream(tema: str, usar_cache: bool, fluxo: str, publicar):
+    # Os eventos são repassados por callback, por isso roda sempre no worker (nunca em outro processo)
+    try:
+        resultado = run_pesquisador(tema, usar_cache, ao_evento=publicar, fluxo=fluxo)
+        publicar({"tipo": "resultado", "resultado": resultado})
+    except Exception as e:
+        publicar({"tipo": "erro", "mensagem": str(e)})
+    finally:
+        publicar(None)
+
+@app.post("/pesquisar/stream")
+async def pesquisar_stream(request: PesquisaRequest):
+    """
+    Executa uma pesquisa transmitindo o progresso via Server-Sent Events:
+    etapas da crew, buscas na Wikipedia e os tokens do artigo conforme são gerados.
+    O último evento ("resultado") traz o mesmo conteúdo de /resultado/{task_id}.
+
+    Diferente de /pesquisar, a pesquisa não vira uma tarefa no JobStore nem é
+    agrupada a pesquisas idênticas em andamento, e a crew roda sempre no processo
+    da API (também no modo processo): os eventos são repassados por callback.
+    """
+    if not request.tema:
+        raise HTTPException(status_code=400, detail="Tema não pode estar em branco")
+    validar_fluxo(request.fluxo)
+    
+    loop = asyncio.get_running_loop()
+    eventos: asyncio.Queue = asyncio.Queue()
+    
+    def publicar(evento: Optional[dict]):
+        try:
+            loop.call_soon_threadsafe(eventos.put_nowait, evento)
+        except RuntimeError:
+            # O loop foi encerrado (servidor desligando)
+            pass
+    
+    try:
+        agendador.submeter(
+            executar_pesquisa_stream, request.tema, request.usar_cache, request.fluxo, publicar,
+            prioridade=request.prioridade
+        )
+    except FilaCheia as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de pesquisas cheia, tente novamente mais tarde",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def gerar():
+        while True:
+            evento = await eventos.get()
+            if evento is None:
+                return
+            yield formatar_sse(evento)
+    
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+async def aguardar_conclusao(task_id: str, espera: float) -> Optional[dict]:
+    """
+    Long-polling: retorna a tarefa assim que ela for finalizada ou após `espera` segundos.
+    Sem pub/sub entre os workers (SQLite), o armazenamento é conferido de novo a
+    cada LONG_POLL_INTERVALO.
+    """
+    iniciar_assinatura()
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + espera
+    # Inscreve antes de consultar: uma conclusão entre a consulta e a espera não se perde
+    evento = notificador.inscrever(task_id)
+    try:
+        while True:
+            tarefa = await asyncio.to_thread(obter_tarefa, task_id)
+            restante = limite - loop.time()
+            if tarefa is None or status_final(tarefa["status"]) or restante <= 0:
+                return tarefa
+            try:
+                await asyncio.wait_for(evento.wait(), min(restante, LONG_POLL_INTERVALO))
+            except asyncio.TimeoutError:
+                pass
+            evento.clear()
+    finally:
+        notificador.cancelar(task_id, evento)
+
 @app.get("/status/{task_id}", response_model=PesquisaStatusResponse)
-async def verificar_status(task_id: str):
+async def verificar_status(task_id: str, wait: float = 0):
     """
-    Verifica o status de uma pesquisa em andamento.
+    Verifica o status de uma pesquisa em andamento, com a etapa atual, a posição
+    na fila e o ETA, que o cliente pode usar para espaçar as consultas.
+    Com `wait` (segundos, até API_LONG_POLL_MAX), a resposta aguarda a conclusão
+    da pesquisa e é enviada assim que ela terminar, sem consultas repetidas.
     """
-    if task_id not in tarefas_em_andamento:
+    espera = min(max(wait, 0.0), LONG_POLL_MAX)
+    # O JobStore (SQLite/Redis) é síncrono: as consultas rodam fora do loop do uvicorn
+    if espera > 0:
+        tarefa = await aguardar_conclusao(task_id, espera)
+    else:
+        tarefa = await asyncio.to_thread(obter_tarefa, task_id)
+    if tarefa is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
     
-    status = tarefas_em_andamento[task_id]["status"]
-    
-    # Calcula ETA se ainda estiver processando
-    eta = None
-    if status == "processando":
-        tempo_decorrido = time.time() - tarefas_em_andamento[task_id]["tempo_inicio"]
-        if tempo_decorrido < 60:
-            eta = 60 - int(tempo_decorrido)
+    # ETA pelas durações recentes de cada etapa do fluxo e pela posição na fila
+    eta, etapa, posicao = await asyncio.to_thread(estimar_andamento, task_id, tarefa)
     
     return PesquisaStatusResponse(
         id=task_id,
-        status=status,
-        eta=eta
+        status=tarefa["status"],
+        eta=eta,
+        etapa=etapa,
+        posicao_fila=posicao
     )
 
+@app.get("/status/{task_id}/trace")
+def obter_trace(task_id: str, formato: str = "json"):
+    """
+    Spans da execução da pesquisa: espera na fila, montagem da crew, tarefas,
+    chamadas ao LLM (com tokens), ferramentas e requisições HTTP.
+    `formato=otlp` devolve o JSON do OpenTelemetry (OTLP), pronto para um coletor.
+    """
+    if formato not in ("json", "otlp"):
+        raise HTTPException(status_code=400, detail="Formato inválido. Opções: json, otlp")
+    tarefa = job_store.obter(task_id)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+
+    # Tarefas agrupadas a uma execução idêntica mostram o trace dela
+    origem_id = tarefa.get("lider", task_id)
+    exportado = job_store.obter_trace(origem_id)
+    if exportado is None:
+        # Ainda em execução: disponível apenas no worker que está executando
+        ativo = trace_ativo(origem_id)
+        exportado = ativo.exportar() if ativo is not None else None
+    if exportado is None:
+        raise HTTPException(status_code=404, detail="Trace não disponível")
+
+    if formato == "otlp":
+        return para_otlp(exportado)
+    return {"task_id": task_id, "status": tarefa["status"], **exportado}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """
+    Métricas no formato do Prometheus: histogramas de latência por etapa
+    (fila, montagem, tarefas, LLM, ferramentas, HTTP), p50/p95/p99 e tokens do LLM.
+    """
+    estado = agendador.metricas()
+    texto = obter_metricas().exportar_prometheus({
+        "pesquisa_fila_tamanho": estado["fila"],
+        "pesquisa_em_execucao": estado["em_execucao"],
+    })
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/resultado/{task_id}", response_model=PesquisaOutput)
-async def obter_resultado(task_id: str):
+def obter_resultado(task_id: str):
     """
     Obtém o resultado de uma pesquisa concluída.
     """
-    if task_id not in tarefas_em_andamento:
+    tarefa = obter_tarefa(task_id)
+    if tarefa is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
     
-    if tarefas_em_andamento[task_id]["status"] != "concluído":
+    if tarefa["status"] != "concluído":
         raise HTTPException(status_code=400, detail="Pesquisa ainda não concluída")
     
-    if task_id not in resultados_pesquisas:
+    resultado = job_store.obter_resultado(task_id)
+    if resultado is None:
         raise HTTPException(status_code=404, detail="Resultado não encontrado")
     
-    return resultados_pesquisas[task_id]
+    return resultado
 
 @app.delete("/resultado/{task_id}")
-async def remover_resultado(task_id: str):
+def remover_resultado(task_id: str):
     """
     Remove um resultado de pesquisa do servidor para liberar memória.
     """
-    if task_id not in tarefas_em_andamento:
+    # Remove a tarefa e o resultado do armazenamento
+    if not job_store.remover(task_id):
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
     
-    # Remove os dados da memória
-    if task_id in resultados_pesquisas:
-        del resultados_pesquisas[task_id]
-    
-    del tarefas_em_andamento[task_id]
-    
     return {"message": "Dados removidos com sucesso"}
 
 # Endpoint raiz para verificar se a API está funcionando
@@ -150,22 +785,38 @@ async def root():
 
 # Verificação de saúde da API
 @app.get("/health")
-async def health_check():
+def health_check():
     """
     Endpoint para verificação de saúde da API.
+    Síncrono (roda no threadpool do FastAPI): consulta o JobStore e os caches em disco.
     """
     # Verifica se a chave GROQ está configurada
     groq_key_status = "configurada" if os.getenv("GROQ_API_KEY") else "não configurada"
+    contagem = job_store.contar()
+    memoria = obter_memoria()
     
     return {
         "status": "healthy",
         "groq_api": groq_key_status,
-        "tarefas_ativas": len(tarefas_em_andamento),
-        "resultados_armazenados": len(resultados_pesquisas)
+        "tarefas_ativas": contagem["tarefas"],
+        "resultados_armazenados": contagem["resultados"],
+        "requisicoes_agrupadas": job_store.obter_contador("requisicoes_agrupadas"),
+        "long_polls_aguardando": notificador.aguardando(),
+        "webhooks": entregador_webhooks.estatisticas(),
+        "cache_artigos": obter_cache_artigos().estatisticas(),
+        "cache_completions": estatisticas_cache_completions(),
+        "agendador": agendador.metricas(),
+        "limite_pesquisas": obter_limite_pesquisas().estatisticas(),
+        "limite_llm": obter_limitador_llm().estatisticas(),
+        "memoria_semantica": memoria.estatisticas() if memoria is not None else None,
+        "compactacao_contexto": estatisticas_compactacao(),
+        "latencias": obter_metricas().resumo(),
     }
 
 # Bloco para executar diretamente o servidor se este arquivo for executado
 if __name__ == "__main__":
+    import uvicorn
+
     # Iniciar o servidor Uvicorn quando o script for executado diretamente
     # O parâmetro reload=True permite recarregar automaticamente o servidor quando os arquivos são alterados
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
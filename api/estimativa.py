@@ -0,0 +1,124 @@
+"""
+Estimativa do tempo restante das pesquisas (o ETA do /status).
+
+As durações recentes de cada etapa (montagem da crew, entradas, cada tarefa) são
+guardadas por fluxo e modelo a partir dos traces concluídos. Uma pesquisa em
+execução tem o ETA calculado pela etapa em que está: o que falta da etapa atual
+mais a mediana das etapas seguintes. Uma pesquisa na fila soma a espera estimada
+pela sua posição.
+"""
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from rastreamento import Span, Trace
+
+# Execuções recentes consideradas em cada etapa (janela móvel)
+JANELA_AMOSTRAS = 50
+
+Chave = Tuple[str, str]  # (fluxo, modelo)
+
+
+def _nome_etapa(span: Span) -> str:
+    return f"tarefa:{span.atributos.get('alvo', '')}" if span.nome == "tarefa" else span.nome
+
+
+def etapas_do_trace(trace: Trace) -> List[Span]:
+    """
+    Etapas de uma pesquisa em ordem: os filhos da raiz ("pesquisa"), exceto a
+    fila, com o kickoff da crew substituído pelas suas tarefas.
+    """
+    spans = sorted(trace.spans(), key=lambda span: span.inicio)
+    raiz = next((span for span in spans if span.nome == "pesquisa" and span.pai_id is None), None)
+    if raiz is None:
+        return []
+    etapas = []
+    for span in spans:
+        if span.pai_id != raiz.span_id or span.nome == "fila":
+            continue
+        tarefas = [filho for filho in spans if filho.pai_id == span.span_id and filho.nome == "tarefa"]
+        etapas.extend(tarefas or [span])
+    return etapas
+
+
+def etapa_atual(trace: Trace) -> Optional[Tuple[str, float]]:
+    """(nome, início) da etapa em andamento de um trace ativo, se houver."""
+    abertas = [span for span in etapas_do_trace(trace) if span.fim is None]
+    if not abertas:
+        return None
+    atual = abertas[-1]
+    return _nome_etapa(atual), atual.inicio
+
+
+class EstimadorEta:
+    """
+    Durações recentes por (fluxo, modelo): de cada etapa e da execução inteira
+    (sem a fila). Só entram execuções que rodaram a crew: respostas do cache
+    terminam em milissegundos e distorceriam a estimativa.
+    """
+
+    def __init__(self, janela: int = JANELA_AMOSTRAS):
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._etapas: Dict[Chave, Dict[str, Deque[float]]] = {}
+        self._ordem: Dict[Chave, List[str]] = {}
+        self._totais: Dict[Chave, Deque[float]] = {}
+
+    def observar(self, fluxo: str, modelo: str, trace: Trace) -> bool:
+        """Registra as durações de um trace concluído. Retorna False se ele foi ignorado."""
+        spans = trace.spans()
+        raiz = next((span for span in spans if span.nome == "pesquisa" and span.pai_id is None), None)
+        fila = next((span for span in spans if span.nome == "fila"), None)
+        etapas = etapas_do_trace(trace)
+        if raiz is None or raiz.fim is None or raiz.status != "ok" or \
+                not any(span.nome in ("crew.kickoff", "tarefa") for span in etapas):
+            return False
+
+        chave = (fluxo, modelo)
+        inicio = fila.fim if fila is not None and fila.fim is not None else raiz.inicio
+        with self._lock:
+            duracoes = self._etapas.setdefault(chave, {})
+            for span in etapas:
+                if span.duracao is not None:
+                    duracoes.setdefault(_nome_etapa(span), deque(maxlen=self.janela)).append(span.duracao)
+            self._ordem[chave] = [_nome_etapa(span) for span in etapas]
+            self._totais.setdefault(chave, deque(maxlen=self.janela)).append(max(0.0, raiz.fim - inicio))
+        return True
+
+    def duracao_estimada(self, fluxo: str, modelo: str) -> Optional[float]:
+        """Mediana da duração de uma execução completa (sem a fila), se houver histórico."""
+        with self._lock:
+            totais = self._totais.get((fluxo, modelo))
+            return statistics.median(totais) if totais else None
+
+    def restante(self, fluxo: str, modelo: str, decorrido: float,
+                 etapa: Optional[str] = None, inicio_etapa: Optional[float] = None) -> Optional[float]:
+        """
+        Segundos restantes de uma execução iniciada há `decorrido` segundos. Com a
+        etapa atual conhecida, soma o que falta dela às medianas das seguintes;
+        sem ela, usa a mediana da execução inteira. None sem histórico.
+        """
+        chave = (fluxo, modelo)
+        with self._lock:
+            totais = self._totais.get(chave)
+            if not totais:
+                return None
+            ordem = self._ordem.get(chave, [])
+            duracoes = self._etapas.get(chave, {})
+            if etapa in ordem and etapa in duracoes:
+                atual = statistics.median(duracoes[etapa])
+                no_estagio = time.time() - inicio_etapa if inicio_etapa is not None else 0.0
+                seguintes = ordem[ordem.index(etapa) + 1:]
+                return max(0.0, atual - no_estagio) + sum(
+                    statistics.median(duracoes[nome]) for nome in seguintes if duracoes.get(nome)
+                )
+            return max(0.0, statistics.median(totais) - decorrido)
+
+
+_estimador = EstimadorEta()
+
+
+def obter_estimador() -> EstimadorEta:
+    return _estimador
@@ -0,0 +1,883 @@
+import json
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+import heapq
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from models import PesquisaOutput
+
+
+def status_final(status: str) -> bool:
+    """Indica se a tarefa terminou (concluída ou com erro)."""
+    return status == "concluído" or status.startswith("erro")
+
+
+class JobStore(ABC):
+    """
+    Armazenamento do estado das tarefas e dos resultados das pesquisas.
+
+    Tarefas finalizadas (concluídas ou com erro) expiram `ttl_segundos` após
+    a finalização, junto com o resultado. As que nunca são finalizadas (processo
+    morto no meio da execução, lotes) expiram `ttl_pendente_segundos` após a
+    criação (padrão: `ttl_segundos`).
+    """
+
+    def __init__(self, ttl_segundos: int = 3600, ttl_pendente_segundos: Optional[int] = None):
+        self.ttl_segundos = ttl_segundos
+        self.ttl_pendente_segundos = ttl_pendente_segundos or ttl_segundos
+
+    @abstractmethod
+    def criar(self, task_id: str, dados: Dict[str, Any]) -> None:
+        """Registra uma nova tarefa."""
+
+    @abstractmethod
+    def atualizar(self, task_id: str, **campos: Any) -> None:
+        """Atualiza campos de uma tarefa existente."""
+
+    @abstractmethod
+    def obter(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna os dados da tarefa ou None se não existir/estiver expirada."""
+
+    def criar_varios(self, tarefas: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Registra várias tarefas ({task_id: dados}). Os backends persistentes
+        gravam todas em uma única transação.
+        """
+        for task_id, dados in tarefas.items():
+            self.criar(task_id, dados)
+
+    def obter_varios(self, task_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """obter() de cada tarefa; os backends persistentes fazem uma única consulta."""
+        return {task_id: self.obter(task_id) for task_id in task_ids}
+
+    @abstractmethod
+    def finalizar(self, task_id: str, status: str, resultado: Optional[PesquisaOutput] = None,
+                  resultado_json: Optional[str] = None) -> None:
+        """
+        Define o status final, armazena o resultado e reinicia a contagem do TTL.
+        `resultado_json`, se informado, é o resultado já serializado (evita gerar o JSON de novo).
+        """
+
+    @abstractmethod
+    def obter_resultado(self, task_id: str) -> Optional[PesquisaOutput]:
+        """Retorna o resultado de uma tarefa concluída."""
+
+    @abstractmethod
+    def guardar_trace(self, task_id: str, trace: Dict[str, Any]) -> None:
+        """
+        Armazena o trace exportado da execução. Fica fora dos dados da tarefa
+        (que /status lê a cada consulta) e expira junto com ela.
+        """
+
+    @abstractmethod
+    def obter_trace(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o trace armazenado da tarefa."""
+
+    @abstractmethod
+    def remover(self, task_id: str) -> bool:
+        """Remove a tarefa, o resultado e o trace. Retorna False se a tarefa não existir."""
+
+    @abstractmethod
+    def contar(self) -> Dict[str, int]:
+        """Retorna a quantidade de tarefas e de resultados armazenados."""
+
+    # Coordenação de execuções idênticas (single-flight)
+
+    @abstractmethod
+    def reivindicar_execucao(self, chave: str, task_id: str, ttl_segundos: int) -> Optional[str]:
+        """
+        Registra `task_id` como responsável pela execução de `chave`, de forma atômica.
+        Retorna None se conseguiu, ou o task_id da execução que já está em andamento.
+        """
+
+    @abstractmethod
+    def liberar_execucao(self, chave: str, task_id: str) -> None:
+        """Libera `chave` se ela ainda pertencer a `task_id`."""
+
+    @abstractmethod
+    def adicionar_seguidor(self, lider_id: str, task_id: str) -> None:
+        """Registra uma tarefa que aguarda o resultado de outra."""
+
+    @abstractmethod
+    def retirar_seguidores(self, lider_id: str) -> List[str]:
+        """Retorna e remove as tarefas que aguardam `lider_id`."""
+
+    @abstractmethod
+    def incrementar_contador(self, nome: str) -> int:
+        """Incrementa um contador compartilhado e retorna o novo valor."""
+
+    @abstractmethod
+    def obter_contador(self, nome: str) -> int:
+        """Retorna o valor atual de um contador compartilhado."""
+
+    # Avisos de conclusão entre os workers (long-polling do /status)
+
+    def publicar_conclusao(self, task_id: str) -> None:
+        """
+        Avisa os outros processos que `task_id` terminou. Sem pub/sub no backend
+        (memória, SQLite), não faz nada: os outros workers consultam o armazenamento.
+        """
+
+    def assinar_conclusoes(self, ao_concluir: Callable[[str], None]) -> bool:
+        """
+        Chama `ao_concluir(task_id)` (em outra thread) para as conclusões publicadas
+        por qualquer processo. Retorna False se o backend não tem pub/sub.
+        """
+        return False
+
+    def encerrar_assinatura(self) -> None:
+        """Encerra a assinatura iniciada por assinar_conclusoes, se houver."""
+
+
+class MemoriaJobStore(JobStore):
+    """
+    Backend em memória (apenas um processo). As expirações ficam em um heap
+    ordenado por horário; vale apenas a mais recente de cada tarefa (em `_prazos`).
+    """
+
+    def __init__(self, ttl_segundos: int = 3600, ttl_pendente_segundos: Optional[int] = None):
+        super().__init__(ttl_segundos, ttl_pendente_segundos)
+        self._tarefas: Dict[str, Dict[str, Any]] = {}
+        self._resultados: Dict[str, PesquisaOutput] = {}
+        self._traces: Dict[str, Dict[str, Any]] = {}
+        self._expiracoes: List[Tuple[float, str]] = []
+        self._prazos: Dict[str, float] = {}
+        self._execucoes: Dict[str, Tuple[str, float]] = {}
+        self._seguidores: Dict[str, List[str]] = {}
+        self._contadores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _expirar(self) -> None:
+        # Deve ser chamado com o lock adquirido
+        agora = time.time()
+        while self._expiracoes and self._expiracoes[0][0] <= agora:
+            _, task_id = heapq.heappop(self._expiracoes)
+            if self._prazos.get(task_id, agora + 1) <= agora:
+                del self._prazos[task_id]
+                self._tarefas.pop(task_id, None)
+                self._resultados.pop(task_id, None)
+                self._traces.pop(task_id, None)
+                self._seguidores.pop(task_id, None)
+
+    def criar(self, task_id: str, dados: Dict[str, Any]) -> None:
+        self.criar_varios({task_id: dados})
+
+    def criar_varios(self, tarefas: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            self._expirar()
+            expira_em = time.time() + self.ttl_pendente_segundos
+            for task_id, dados in tarefas.items():
+                self._tarefas[task_id] = dict(dados)
+                self._prazos[task_id] = expira_em
+                heapq.heappush(self._expiracoes, (expira_em, task_id))
+
+    def atualizar(self, task_id: str, **campos: Any) -> None:
+        with self._lock:
+            if task_id in self._tarefas:
+                self._tarefas[task_id].update(campos)
+
+    def obter(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expirar()
+            tarefa = self._tarefas.get(task_id)
+            return dict(tarefa) if tarefa is not None else None
+
+    def obter_varios(self, task_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        with self._lock:
+            self._expirar()
+            return {
+                task_id: dict(self._tarefas[task_id]) if task_id in self._tarefas else None
+                for task_id in task_ids
+            }
+
+    def finalizar(self, task_id: str, status: str, resultado: Optional[PesquisaOutput] = None,
+                  resultado_json: Optional[str] = None) -> None:
+        with self._lock:
+            if task_id not in self._tarefas:
+                return
+            expira_em = time.time() + self.ttl_segundos
+            self._tarefas[task_id].update(status=status, expira_em=expira_em)
+            if resultado is not None:
+                self._resultados[task_id] = resultado
+            self._prazos[task_id] = expira_em
+            heapq.heappush(self._expiracoes, (expira_em, task_id))
+
+    def obter_resultado(self, task_id: str) -> Optional[PesquisaOutput]:
+        with self._lock:
+            self._expirar()
+            return self._resultados.get(task_id)
+
+    def guardar_trace(self, task_id: str, trace: Dict[str, Any]) -> None:
+        with self._lock:
+            if task_id in self._tarefas:
+                self._traces[task_id] = trace
+
+    def obter_trace(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expirar()
+            return self._traces.get(task_id)
+
+    def remover(self, task_id: str) -> bool:
+        with self._lock:
+            self._resultados.pop(task_id, None)
+            self._traces.pop(task_id, None)
+            self._seguidores.pop(task_id, None)
+            self._prazos.pop(task_id, None)
+            return self._tarefas.pop(task_id, None) is not None
+
+    def contar(self) -> Dict[str, int]:
+        with self._lock:
+            self._expirar()
+            return {"tarefas": len(self._tarefas), "resultados": len(self._resultados)}
+
+    def reivindicar_execucao(self, chave: str, task_id: str, ttl_segundos: int) -> Optional[str]:
+        with self._lock:
+            atual = self._execucoes.get(chave)
+            if atual is not None and atual[1] > time.time():
+                return atual[0]
+            self._execucoes[chave] = (task_id, time.time() + ttl_segundos)
+            return None
+
+    def liberar_execucao(self, chave: str, task_id: str) -> None:
+        with self._lock:
+            atual = self._execucoes.get(chave)
+            if atual is not None and atual[0] == task_id:
+                del self._execucoes[chave]
+
+    def adicionar_seguidor(self, lider_id: str, task_id: str) -> None:
+        with self._lock:
+            self._seguidores.setdefault(lider_id, []).append(task_id)
+
+    def retirar_seguidores(self, lider_id: str) -> List[str]:
+        with self._lock:
+            return self._seguidores.pop(lider_id, [])
+
+    def incrementar_contador(self, nome: str) -> int:
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + 1
+            return self._contadores[nome]
+
+    def obter_contador(self, nome: str) -> int:
+        with self._lock:
+            return self._contadores.get(nome, 0)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Backend SQLite em modo WAL, compartilhável entre vários workers do uvicorn
+    na mesma máquina. Cada thread usa sua própria conexão.
+    """
+
+    # Tarefas por consulta em obter_varios
+    BLOCO_CONSULTA = 500
+
+    def __init__(self, caminho: str, ttl_segundos: int = 3600, ttl_pendente_segundos: Optional[int] = None):
+        super().__init__(ttl_segundos, ttl_pendente_segundos)
+        self.caminho = caminho
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conexao = self._conexao()
+        conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                task_id TEXT PRIMARY KEY,
+                dados TEXT NOT NULL,
+                resultado TEXT,
+                expira_em REAL
+            )
+            """
+        )
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_jobs_expira ON jobs (expira_em)")
+        # Bancos criados antes da coluna do trace
+        colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(jobs)")}
+        if "trace" not in colunas:
+            conexao.execute("ALTER TABLE jobs ADD COLUMN trace TEXT")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS execucoes (chave TEXT PRIMARY KEY, task_id TEXT NOT NULL, expira_em REAL NOT NULL)"
+        )
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS seguidores (lider_id TEXT NOT NULL, task_id TEXT NOT NULL)"
+        )
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_seguidores_lider ON seguidores (lider_id)")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS contadores (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)"
+        )
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def criar(self, task_id: str, dados: Dict[str, Any]) -> None:
+        conexao = self._conexao()
+        # Aproveita a escrita para remover tarefas expiradas (usa o índice de expira_em)
+        conexao.execute("DELETE FROM jobs WHERE expira_em <= ?", (time.time(),))
+        conexao.execute(
+            "INSERT OR REPLACE INTO jobs (task_id, dados, expira_em) VALUES (?, ?, ?)",
+            (task_id, json.dumps(dados, ensure_ascii=False), time.time() + self.ttl_pendente_segundos),
+        )
+
+    def criar_varios(self, tarefas: Dict[str, Dict[str, Any]]) -> None:
+        conexao = self._conexao()
+        expira_em = time.time() + self.ttl_pendente_segundos
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            conexao.execute("DELETE FROM jobs WHERE expira_em <= ?", (time.time(),))
+            conexao.executemany(
+                "INSERT OR REPLACE INTO jobs (task_id, dados, expira_em) VALUES (?, ?, ?)",
+                [(task_id, json.dumps(dados, ensure_ascii=False), expira_em) for task_id, dados in tarefas.items()],
+            )
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def atualizar(self, task_id: str, **campos: Any) -> None:
+        self._atualizar(task_id, campos)
+
+    def _atualizar(self, task_id: str, campos: Dict[str, Any], colunas: Optional[Dict[str, Any]] = None) -> None:
+        # Leitura e escrita na mesma transação para não perder atualizações concorrentes
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute("SELECT dados FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+            if linha is not None:
+                dados = json.loads(linha[0])
+                dados.update(campos)
+                colunas = dict(colunas or {}, dados=json.dumps(dados, ensure_ascii=False))
+                atribuicoes = ", ".join(f"{coluna} = ?" for coluna in colunas)
+                conexao.execute(
+                    f"UPDATE jobs SET {atribuicoes} WHERE task_id = ?",
+                    (*colunas.values(), task_id),
+                )
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def obter(self, task_id: str) -> Optional[Dict[str, Any]]:
+        linha = self._conexao().execute(
+            "SELECT dados FROM jobs WHERE task_id = ? AND (expira_em IS NULL OR expira_em > ?)",
+            (task_id, time.time()),
+        ).fetchone()
+        return json.loads(linha[0]) if linha is not None else None
+
+    def obter_varios(self, task_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        tarefas: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(task_ids)
+        conexao = self._conexao()
+        agora = time.time()
+        # Blocos abaixo do limite de parâmetros por consulta do SQLite
+        for inicio in range(0, len(task_ids), self.BLOCO_CONSULTA):
+            bloco = task_ids[inicio:inicio + self.BLOCO_CONSULTA]
+            linhas = conexao.execute(
+                f"SELECT task_id, dados FROM jobs WHERE task_id IN ({', '.join('?' * len(bloco))}) "
+                "AND (expira_em IS NULL OR expira_em > ?)",
+                (*bloco, agora),
+            )
+            for task_id, dados in linhas:
+                tarefas[task_id] = json.loads(dados)
+        return tarefas
+
+    def finalizar(self, task_id: str, status: str, resultado: Optional[PesquisaOutput] = None,
+                  resultado_json: Optional[str] = None) -> None:
+        expira_em = time.time() + self.ttl_segundos
+        self._atualizar(
+            task_id,
+            {"status": status, "expira_em": expira_em},
+            colunas={
+                "resultado": (resultado_json or resultado.model_dump_json()) if resultado is not None else None,
+                "expira_em": expira_em,
+            },
+        )
+
+    def obter_resultado(self, task_id: str) -> Optional[PesquisaOutput]:
+        linha = self._conexao().execute(
+            "SELECT resultado FROM jobs WHERE task_id = ? AND (expira_em IS NULL OR expira_em > ?)",
+            (task_id, time.time()),
+        ).fetchone()
+        if linha is None or linha[0] is None:
+            return None
+        return PesquisaOutput.model_validate_json(linha[0])
+
+    def guardar_trace(self, task_id: str, trace: Dict[str, Any]) -> None:
+        self._conexao().execute(
+            "UPDATE jobs SET trace = ? WHERE task_id = ?", (json.dumps(trace, ensure_ascii=False), task_id)
+        )
+
+    def obter_trace(self, task_id: str) -> Optional[Dict[str, Any]]:
+        linha = self._conexao().execute(
+            "SELECT trace FROM jobs WHERE task_id = ? AND (expira_em IS NULL OR expira_em > ?)",
+            (task_id, time.time()),
+        ).fetchone()
+        return json.loads(linha[0]) if linha is not None and linha[0] is not None else None
+
+    def remover(self, task_id: str) -> bool:
+        conexao = self._conexao()
+        conexao.execute("DELETE FROM seguidores WHERE lider_id = ?", (task_id,))
+        cursor = conexao.execute("DELETE FROM jobs WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def contar(self) -> Dict[str, int]:
+        tarefas, resultados = self._conexao().execute(
+            "SELECT COUNT(*), COUNT(resultado) FROM jobs WHERE expira_em IS NULL OR expira_em > ?",
+            (time.time(),),
+        ).fetchone()
+        return {"tarefas": tarefas, "resultados": resultados}
+
+    def reivindicar_execucao(self, chave: str, task_id: str, ttl_segundos: int) -> Optional[str]:
+        conexao = self._conexao()
+        agora = time.time()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute(
+                "SELECT task_id FROM execucoes WHERE chave = ? AND expira_em > ?", (chave, agora)
+            ).fetchone()
+            if linha is None:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO execucoes (chave, task_id, expira_em) VALUES (?, ?, ?)",
+                    (chave, task_id, agora + ttl_segundos),
+                )
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        return linha[0] if linha is not None else None
+
+    def liberar_execucao(self, chave: str, task_id: str) -> None:
+        self._conexao().execute(
+            "DELETE FROM execucoes WHERE chave = ? AND task_id = ?", (chave, task_id)
+        )
+
+    def adicionar_seguidor(self, lider_id: str, task_id: str) -> None:
+        self._conexao().execute(
+            "INSERT INTO seguidores (lider_id, task_id) VALUES (?, ?)", (lider_id, task_id)
+        )
+
+    def retirar_seguidores(self, lider_id: str) -> List[str]:
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linhas = conexao.execute(
+                "SELECT task_id FROM seguidores WHERE lider_id = ?", (lider_id,)
+            ).fetchall()
+            conexao.execute("DELETE FROM seguidores WHERE lider_id = ?", (lider_id,))
+            conexao.execute("COMMIT")
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+        return [linha[0] for linha in linhas]
+
+    def incrementar_contador(self, nome: str) -> int:
+        conexao = self._conexao()
+        conexao.execute(
+            "INSERT INTO contadores (nome, valor) VALUES (?, 1) "
+            "ON CONFLICT(nome) DO UPDATE SET valor = valor + 1",
+            (nome,),
+        )
+        return self.obter_contador(nome)
+
+    def obter_contador(self, nome: str) -> int:
+        linha = self._conexao().execute(
+            "SELECT valor FROM contadores WHERE nome = ?", (nome,)
+        ).fetchone()
+        return linha[0] if linha is not None else 0
+
+
+class ErroRESP(Exception):
+    """Erro retornado pelo servidor Redis."""
+
+
+class ClienteRESP:
+    """
+    Cliente mínimo do protocolo Redis (RESP2), suficiente para o JobStore.
+    Usa uma conexão por thread.
+    """
+
+    # Comandos que podem ser reenviados quando a resposta se perde: reenviar um
+    # INCR, RPUSH ou SET NX já executado aplicaria a escrita duas vezes
+    IDEMPOTENTES = frozenset({"AUTH", "SELECT", "PING", "GET", "EXISTS", "HGETALL", "LRANGE", "SCAN",
+                              "HSET", "EXPIRE"})
+
+    def __init__(self, host: str = "localhost", porta: int = 6379, db: int = 0,
+                 senha: Optional[str] = None, timeout: float = 5.0):
+        self.host = host
+        self.porta = porta
+        self.db = db
+        self.senha = senha
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conectar(self):
+        sock = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+        arquivo = sock.makefile("rb")
+        self._local.conexao = (sock, arquivo)
+        if self.senha:
+            self.executar("AUTH", self.senha)
+        if self.db:
+            self.executar("SELECT", self.db)
+        return self._local.conexao
+
+    def _conexao_atual(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            # Conexão ociosa com dados para ler foi fechada pelo servidor (timeout, restart)
+            legivel, _, _ = select.select([conexao[0]], [], [], 0)
+            if legivel:
+                self._descartar_conexao()
+                conexao = None
+        return conexao or self._conectar()
+
+    def _descartar_conexao(self) -> None:
+        conexao = getattr(self._local, "conexao", None)
+        self._local.conexao = None
+        if conexao is not None:
+            conexao[1].close()
+            conexao[0].close()
+
+    def executar(self, *args: Any) -> Any:
+        """
+        Executa um comando. Se a conexão falhar, reenvia uma vez em uma conexão nova
+        quando o comando não chegou a ser enviado por completo ou é idempotente.
+        """
+        reenviar = str(args[0]).upper() in self.IDEMPOTENTES
+        for tentativa in range(2):
+            sock, arquivo = self._conexao_atual()
+            enviado = False
+            try:
+                sock.sendall(self._codificar(args))
+                enviado = True
+                return self._ler_resposta(arquivo)
+            except (ConnectionError, OSError):
+                self._descartar_conexao()
+                if tentativa or (enviado and not reenviar):
+                    raise
+
+    def transacao(self, *comandos: Tuple[Any, ...], observar: Optional[Tuple[str, str]] = None) -> Optional[List[Any]]:
+        """
+        Executa os comandos atomicamente (MULTI/EXEC) e retorna a resposta de cada um.
+        Com `observar` = (chave, valor), só executa se a chave tiver esse valor até o
+        EXEC (WATCH); caso contrário retorna None. Como nada é aplicado antes do EXEC,
+        só reenvia se a conexão falhar antes de o EXEC ser enviado.
+        """
+        bloco = [("MULTI",), *comandos, ("EXEC",)]
+        for tentativa in range(2):
+            conexao = self._conexao_atual()
+            enviado = False
+            try:
+                if observar is not None:
+                    chave, valor = observar
+                    self._enviar(conexao, ("WATCH", chave))
+                    if self._enviar(conexao, ("GET", chave)) != valor:
+                        self._enviar(conexao, ("UNWATCH",))
+                        return None
+                conexao[0].sendall(b"".join(self._codificar(args) for args in bloco))
+                enviado = True
+                return [self._ler_resposta(conexao[1]) for _ in bloco][-1]
+            except ErroRESP:
+                # Respostas do bloco podem ter ficado sem ler
+                self._descartar_conexao()
+                raise
+            except (ConnectionError, OSError):
+                self._descartar_conexao()
+                if tentativa or enviado:
+                    raise
+
+    def assinar(self, canal: str, ao_receber: Callable[[str], None], parar: threading.Event) -> None:
+        """
+        Assina `canal` em uma conexão dedicada e chama `ao_receber(mensagem)` até
+        `parar` ser sinalizado. Reconecta (com espera crescente) se a conexão cair.
+        """
+        espera = 0.5
+        while not parar.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+            except OSError:
+                parar.wait(espera)
+                espera = min(espera * 2, 30)
+                continue
+            arquivo = sock.makefile("rb")
+            try:
+                conexao = (sock, arquivo)
+                if self.senha:
+                    self._enviar(conexao, ("AUTH", self.senha))
+                self._enviar(conexao, ("SUBSCRIBE", canal))
+                espera = 0.5
+                # Timeout curto na leitura para conferir `parar` periodicamente
+                sock.settimeout(1.0)
+                while not parar.is_set():
+                    try:
+                        mensagem = self._ler_resposta(arquivo)
+                    except socket.timeout:
+                        continue
+                    if isinstance(mensagem, list) and len(mensagem) == 3 and mensagem[0] == "message":
+                        ao_receber(mensagem[2])
+            except (ConnectionError, OSError, ErroRESP):
+                parar.wait(espera)
+                espera = min(espera * 2, 30)
+            finally:
+                arquivo.close()
+                sock.close()
+
+    def _enviar(self, conexao, args) -> Any:
+        sock, arquivo = conexao
+        sock.sendall(self._codificar(args))
+        return self._ler_resposta(arquivo)
+
+    @staticmethod
+    def _codificar(args) -> bytes:
+        partes = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            dado = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            partes.append(b"$%d\r\n%s\r\n" % (len(dado), dado))
+        return b"".join(partes)
+
+    def _ler_resposta(self, arquivo) -> Any:
+        linha = arquivo.readline()
+        if not linha:
+            raise ConnectionError("Conexão com o Redis encerrada")
+        tipo, conteudo = linha[:1], linha[1:-2]
+        if tipo == b"+":
+            return conteudo.decode("utf-8")
+        if tipo == b"-":
+            raise ErroRESP(conteudo.decode("utf-8"))
+        if tipo == b":":
+            return int(conteudo)
+        if tipo == b"$":
+            tamanho = int(conteudo)
+            if tamanho == -1:
+                return None
+            dado = arquivo.read(tamanho + 2)[:-2]
+            return dado.decode("utf-8")
+        if tipo == b"*":
+            tamanho = int(conteudo)
+            if tamanho == -1:
+                return None
+            return [self._ler_resposta(arquivo) for _ in range(tamanho)]
+        raise ErroRESP(f"Resposta RESP inválida: {linha!r}")
+
+
+class RedisJobStore(JobStore):
+    """
+    Backend Redis: cada tarefa é um hash (campos em JSON) e o resultado uma string.
+    O TTL é aplicado pelo próprio Redis com EXPIRE.
+    """
+
+    PREFIXO = "pesquisa"
+
+    def __init__(self, cliente: ClienteRESP, ttl_segundos: int = 3600, ttl_pendente_segundos: Optional[int] = None):
+        super().__init__(ttl_segundos, ttl_pendente_segundos)
+        self.cliente = cliente
+
+    def _chave_tarefa(self, task_id: str) -> str:
+        return f"{self.PREFIXO}:job:{task_id}"
+
+    def _chave_resultado(self, task_id: str) -> str:
+        return f"{self.PREFIXO}:resultado:{task_id}"
+
+    def _chave_seguidores(self, task_id: str) -> str:
+        return f"{self.PREFIXO}:seguidores:{task_id}"
+
+    def _chave_trace(self, task_id: str) -> str:
+        return f"{self.PREFIXO}:trace:{task_id}"
+
+    def criar(self, task_id: str, dados: Dict[str, Any]) -> None:
+        self.criar_varios({task_id: dados})
+
+    def criar_varios(self, tarefas: Dict[str, Dict[str, Any]]) -> None:
+        comandos = []
+        for task_id, dados in tarefas.items():
+            chave = self._chave_tarefa(task_id)
+            comandos.extend([
+                ("DEL", chave, self._chave_resultado(task_id), self._chave_trace(task_id)),
+                ("HSET", chave, *self._campos(dados)),
+                ("EXPIRE", chave, self.ttl_pendente_segundos),
+            ])
+        if comandos:
+            self.cliente.transacao(*comandos)
+
+    def atualizar(self, task_id: str, **campos: Any) -> None:
+        chave = self._chave_tarefa(task_id)
+        # HSET em uma chave inexistente criaria a tarefa, por isso confere antes
+        if self.cliente.executar("EXISTS", chave):
+            self._hset(chave, campos)
+
+    def _hset(self, chave: str, campos: Dict[str, Any]) -> None:
+        args = self._campos(campos)
+        if args:
+            self.cliente.executar("HSET", chave, *args)
+
+    @staticmethod
+    def _campos(campos: Dict[str, Any]) -> List[Any]:
+        args: List[Any] = []
+        for campo, valor in campos.items():
+            args.extend([campo, json.dumps(valor, ensure_ascii=False)])
+        return args
+
+    def obter(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._tarefa(self.cliente.executar("HGETALL", self._chave_tarefa(task_id)))
+
+    def obter_varios(self, task_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not task_ids:
+            return {}
+        # Um único MULTI/EXEC (uma ida e volta) com o HGETALL de cada tarefa
+        respostas = self.cliente.transacao(*[("HGETALL", self._chave_tarefa(task_id)) for task_id in task_ids])
+        return {task_id: self._tarefa(valores) for task_id, valores in zip(task_ids, respostas)}
+
+    @staticmethod
+    def _tarefa(valores: List[str]) -> Optional[Dict[str, Any]]:
+        if not valores:
+            return None
+        return {valores[i]: json.loads(valores[i + 1]) for i in range(0, len(valores), 2)}
+
+    def finalizar(self, task_id: str, status: str, resultado: Optional[PesquisaOutput] = None,
+                  resultado_json: Optional[str] = None) -> None:
+        chave = self._chave_tarefa(task_id)
+        if not self.cliente.executar("EXISTS", chave):
+            return
+        expira_em = time.time() + self.ttl_segundos
+        if resultado is not None:
+            self.cliente.executar(
+                "SET", self._chave_resultado(task_id), resultado_json or resultado.model_dump_json(),
+                "EX", self.ttl_segundos
+            )
+        self._hset(chave, {"status": status, "expira_em": expira_em})
+        self.cliente.executar("EXPIRE", chave, self.ttl_segundos)
+
+    def obter_resultado(self, task_id: str) -> Optional[PesquisaOutput]:
+        payload = self.cliente.executar("GET", self._chave_resultado(task_id))
+        return PesquisaOutput.model_validate_json(payload) if payload is not None else None
+
+    def guardar_trace(self, task_id: str, trace: Dict[str, Any]) -> None:
+        if self.cliente.executar("EXISTS", self._chave_tarefa(task_id)):
+            self.cliente.executar(
+                "SET", self._chave_trace(task_id), json.dumps(trace, ensure_ascii=False), "EX", self.ttl_segundos
+            )
+
+    def obter_trace(self, task_id: str) -> Optional[Dict[str, Any]]:
+        payload = self.cliente.executar("GET", self._chave_trace(task_id))
+        return json.loads(payload) if payload is not None else None
+
+    def remover(self, task_id: str) -> bool:
+        removidas = self.cliente.executar("DEL", self._chave_tarefa(task_id), self._chave_resultado(task_id))
+        self.cliente.executar("DEL", self._chave_seguidores(task_id), self._chave_trace(task_id))
+        return removidas > 0
+
+    def contar(self) -> Dict[str, int]:
+        return {
+            "tarefas": self._contar_chaves(f"{self.PREFIXO}:job:*"),
+            "resultados": self._contar_chaves(f"{self.PREFIXO}:resultado:*"),
+        }
+
+    def _contar_chaves(self, padrao: str) -> int:
+        total, cursor = 0, "0"
+        while True:
+            cursor, chaves = self.cliente.executar("SCAN", cursor, "MATCH", padrao, "COUNT", 1000)
+            total += len(chaves)
+            if cursor == "0":
+                return total
+
+    def reivindicar_execucao(self, chave: str, task_id: str, ttl_segundos: int) -> Optional[str]:
+        chave_redis = f"{self.PREFIXO}:execucao:{chave}"
+        falhas = 0
+        while True:
+            try:
+                if self.cliente.executar("SET", chave_redis, task_id, "NX", "EX", ttl_segundos) == "OK":
+                    return None
+            except (ConnectionError, OSError):
+                # O SET NX não é reenviado: se a resposta se perdeu, a leitura abaixo mostra
+                # se ele foi aplicado. Se ela também falhar, o erro segue para quem chamou
+                falhas += 1
+                if falhas > 1:
+                    raise
+            atual = self.cliente.executar("GET", chave_redis)
+            if atual == task_id:
+                return None
+            # Se a chave expirou entre o SET e o GET (ou o SET não chegou), tenta novamente
+            if atual is not None:
+                return atual
+
+    def liberar_execucao(self, chave: str, task_id: str) -> None:
+        # Não remove a chave se ela expirou e foi reivindicada por outra execução no meio
+        chave_redis = f"{self.PREFIXO}:execucao:{chave}"
+        self.cliente.transacao(("DEL", chave_redis), observar=(chave_redis, task_id))
+
+    def adicionar_seguidor(self, lider_id: str, task_id: str) -> None:
+        chave = self._chave_seguidores(lider_id)
+        self.cliente.transacao(("RPUSH", chave, task_id), ("EXPIRE", chave, self.ttl_segundos))
+
+    def retirar_seguidores(self, lider_id: str) -> List[str]:
+        # Um seguidor adicionado entre a leitura e a remoção seria perdido
+        chave = self._chave_seguidores(lider_id)
+        seguidores, _ = self.cliente.transacao(("LRANGE", chave, 0, -1), ("DEL", chave))
+        return seguidores or []
+
+    def incrementar_contador(self, nome: str) -> int:
+        return self.cliente.executar("INCR", f"{self.PREFIXO}:contador:{nome}")
+
+    def obter_contador(self, nome: str) -> int:
+        valor = self.cliente.executar("GET", f"{self.PREFIXO}:contador:{nome}")
+        return int(valor) if valor is not None else 0
+
+    def publicar_conclusao(self, task_id: str) -> None:
+        self.cliente.executar("PUBLISH", f"{self.PREFIXO}:concluidas", task_id)
+
+    def assinar_conclusoes(self, ao_concluir: Callable[[str], None]) -> bool:
+        self._parar_assinatura = threading.Event()
+        threading.Thread(
+            target=self.cliente.assinar, args=(f"{self.PREFIXO}:concluidas", ao_concluir, self._parar_assinatura),
+            name="job-store-assinatura", daemon=True
+        ).start()
+        return True
+
+    def encerrar_assinatura(self) -> None:
+        parar = getattr(self, "_parar_assinatura", None)
+        if parar is not None:
+            parar.set()
+
+
+def criar_job_store(url: str, ttl_segundos: int = 3600, ttl_pendente_segundos: Optional[int] = None) -> JobStore:
+    """
+    Cria o backend a partir de uma URL:
+    - memoria://
+    - sqlite:///jobs.sqlite3 (relativo) ou sqlite:////tmp/jobs.sqlite3 (absoluto)
+    - redis://[:senha@]host:porta/db
+    """
+    destino = urlparse(url)
+    if destino.scheme in ("", "memoria"):
+        return MemoriaJobStore(ttl_segundos, ttl_pendente_segundos)
+    if destino.scheme == "sqlite":
+        # Mesma convenção do SQLAlchemy: a barra após o host vazio não faz parte do caminho
+        return SQLiteJobStore(destino.path[1:] or "jobs.sqlite3", ttl_segundos, ttl_pendente_segundos)
+    if destino.scheme == "redis":
+        cliente = ClienteRESP(
+            host=destino.hostname or "localhost",
+            porta=destino.port or 6379,
+            db=int(destino.path.lstrip("/") or 0),
+            senha=destino.password,
+        )
+        return RedisJobStore(cliente, ttl_segundos, ttl_pendente_segundos)
+    raise ValueError(f"Backend de JobStore não suportado: {url}")
+
+
+def criar_job_store_from_env(ttl_execucao_segundos: int = 0) -> JobStore:
+    """
+    Cria o backend configurado em JOB_STORE_URL (padrão: memória) com TTL JOB_TTL_SEGUNDOS.
+    Tarefas não finalizadas expiram após `ttl_execucao_segundos` + JOB_TTL_SEGUNDOS.
+    """
+    ttl_segundos = int(os.getenv("JOB_TTL_SEGUNDOS", "3600"))
+    return criar_job_store(
+        os.getenv("JOB_STORE_URL", "memoria://"),
+        ttl_segundos=ttl_segundos,
+        ttl_pendente_segundos=ttl_execucao_segundos + ttl_segundos,
+    )
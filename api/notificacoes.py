@@ -0,0 +1,125 @@
+"""
+Avisos de conclusão das pesquisas: long-polling do /status e webhooks.
+
+- NotificadorConclusao: um asyncio.Event por requisição que aguarda a tarefa
+  (`/status/{task_id}?wait=30`), acordado por quem finaliza a tarefa, de qualquer
+  thread. Com vários workers do uvicorn e JobStore Redis, as conclusões dos
+  outros processos chegam pelo pub/sub do Redis.
+- EntregadorWebhooks: POST do resultado para o `callback_url` da pesquisa, com
+  novas tentativas e espera exponencial, em threads próprias.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from tools.http_client import obter_sessao
+
+logger = logging.getLogger(__name__)
+
+# Tentativas de entrega de cada webhook e espera antes da segunda (dobra a cada falha)
+WEBHOOK_TENTATIVAS = int(os.getenv("API_WEBHOOK_TENTATIVAS", "5"))
+WEBHOOK_ESPERA_INICIAL = float(os.getenv("API_WEBHOOK_ESPERA", "1"))
+WEBHOOK_TIMEOUT = float(os.getenv("API_WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_ESPERA_MAXIMA = 60.0
+
+
+class NotificadorConclusao:
+    """
+    Eventos de espera por tarefa. `inscrever` deve ser chamado antes de conferir
+    o status no armazenamento, para que uma conclusão nesse intervalo não se perca.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._esperas: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    def inscrever(self, task_id: str) -> asyncio.Event:
+        evento = asyncio.Event()
+        with self._lock:
+            self._esperas.setdefault(task_id, []).append((asyncio.get_running_loop(), evento))
+        return evento
+
+    def cancelar(self, task_id: str, evento: asyncio.Event) -> None:
+        with self._lock:
+            esperas = [item for item in self._esperas.get(task_id, []) if item[1] is not evento]
+            if esperas:
+                self._esperas[task_id] = esperas
+            else:
+                self._esperas.pop(task_id, None)
+
+    def notificar(self, task_id: str) -> None:
+        """Acorda as esperas de `task_id`. Pode ser chamado de qualquer thread."""
+        with self._lock:
+            esperas = list(self._esperas.get(task_id, []))
+        for loop, evento in esperas:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:
+                # O loop foi encerrado (servidor desligando)
+                pass
+
+    def aguardando(self) -> int:
+        with self._lock:
+            return sum(len(esperas) for esperas in self._esperas.values())
+
+
+class EntregadorWebhooks:
+    """
+    Entrega os resultados por POST (JSON) ao `callback_url` das pesquisas.
+    Erros de rede, 408, 429 e 5xx geram novas tentativas (respeitando Retry-After);
+    outras respostas 4xx encerram a entrega.
+    """
+
+    def __init__(self, tentativas: int = WEBHOOK_TENTATIVAS, espera_inicial: float = WEBHOOK_ESPERA_INICIAL,
+                 timeout: float = WEBHOOK_TIMEOUT, max_workers: int = 4):
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="webhook")
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {"entregues": 0, "falhas": 0, "tentativas": 0}
+
+    def agendar(self, url: str, payload: Dict[str, Any]) -> "Future[Dict[str, Any]]":
+        return self._executor.submit(self.entregar, url, payload)
+
+    def entregar(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Tenta entregar o payload. Retorna {"entregue", "tentativas", "erro"}."""
+        corpo = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        cabecalhos = {"Content-Type": "application/json", "X-Pesquisa-Id": str(payload.get("id", ""))}
+        erro: Optional[str] = None
+        tentativa = 0
+        for tentativa in range(1, self.tentativas + 1):
+            espera = self.espera_inicial * 2 ** (tentativa - 1)
+            try:
+                resposta = obter_sessao().post(url, data=corpo, headers=cabecalhos, timeout=self.timeout)
+                if resposta.status_code < 300:
+                    return self._registrar(True, tentativa, None)
+                erro = f"HTTP {resposta.status_code}"
+                if resposta.status_code < 500 and resposta.status_code not in (408, 429):
+                    break
+                retry_after = resposta.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    espera = float(retry_after)
+            except requests.RequestException as e:
+                erro = f"{type(e).__name__}: {e}"[:300]
+            if tentativa < self.tentativas:
+                time.sleep(min(espera, WEBHOOK_ESPERA_MAXIMA))
+        logger.warning("Webhook não entregue para %s após %d tentativa(s): %s", url, tentativa, erro)
+        return self._registrar(False, tentativa, erro)
+
+    def _registrar(self, entregue: bool, tentativas: int, erro: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            self.contadores["entregues" if entregue else "falhas"] += 1
+            self.contadores["tentativas"] += tentativas
+        return {"entregue": entregue, "tentativas": tentativas, "erro": erro}
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.contadores)
@@ -0,0 +1,265 @@
+"""
+Pool de processos pré-aquecidos, usado pelo modo "processo" do agendador.
+
+Cada worker é um processo de longa duração que executa `inicializador` (importar
+a crewai e montar a crew) uma única vez, ao ser criado, e recebe os jobs por um
+Pipe próprio. Em relação ao ProcessPoolExecutor:
+- cada job tem tempo limite: o processo travado é encerrado (kill) e substituído
+- depois de `max_jobs` jobs o processo é reciclado, o que limita o crescimento
+  de memória das execuções da crewai
+- os processos substitutos se aquecem em background; os jobs só vão para
+  processos prontos
+Os jobs e os resultados atravessam o Pipe como um único bloco de bytes (pickle
+feito uma vez de cada lado).
+"""
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Tempo para um processo sair sozinho ao ser reciclado ou encerrado (segundos)
+ESPERA_SAIDA = 5.0
+
+# Espera antes de recriar um processo que morreu no pré-aquecimento: dobra a cada
+# falha seguida (um inicializador que sempre derruba o processo não gera um laço de spawns)
+ESPERA_REINICIO = 1.0
+ESPERA_REINICIO_MAX = 60.0
+
+# Mensagens de controle do Pipe (jobs são sempre pickles, nunca vazios)
+_PRONTO = b"pronto"
+_SAIR = b""
+
+
+class TempoEsgotado(TimeoutError):
+    """O job excedeu o tempo limite; o processo que o executava foi encerrado."""
+
+
+class ProcessoEncerrado(RuntimeError):
+    """O processo worker terminou (ou foi morto) durante o job."""
+
+
+def _executar_worker(conexao: Connection, inicializador: Optional[Callable[[], Any]]) -> None:
+    """Laço do processo filho: aquece, avisa que está pronto e executa os jobs recebidos."""
+    if inicializador is not None:
+        try:
+            inicializador()
+        except Exception:
+            # Os jobs ainda podem funcionar (com o custo de inicialização no primeiro)
+            logger.exception("Falha ao pré-aquecer o processo worker")
+    conexao.send_bytes(_PRONTO)
+    while True:
+        try:
+            mensagem = conexao.recv_bytes()
+        except EOFError:
+            return
+        if mensagem == _SAIR:
+            return
+        funcao, args, kwargs = pickle.loads(mensagem)
+        try:
+            resposta = (True, funcao(*args, **kwargs))
+        except Exception as e:
+            resposta = (False, e)
+        try:
+            dados = pickle.dumps(resposta, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            erro = RuntimeError(f"Resultado do job não serializável: {type(e).__name__}: {e}")
+            dados = pickle.dumps((False, erro), protocol=pickle.HIGHEST_PROTOCOL)
+        conexao.send_bytes(dados)
+
+
+class _Worker:
+    def __init__(self, processo: multiprocessing.process.BaseProcess, conexao: Connection):
+        self.processo = processo
+        self.conexao = conexao
+        self.jobs = 0
+
+
+class PoolProcessos:
+    """
+    `num_processos` processos worker pré-aquecidos. executar() bloqueia a thread
+    chamadora até haver um processo livre e o job terminar.
+
+    `timeout` (segundos, None = sem limite) vale para cada job; `max_jobs`
+    (0 = sem limite) é quantos jobs um processo executa antes de ser reciclado.
+    Os processos usam o método "spawn": o processo da API tem threads (uvicorn,
+    workers) e um fork herdaria locks em estado indefinido.
+    """
+
+    def __init__(self, num_processos: int, inicializador: Optional[Callable[[], Any]] = None,
+                 timeout: Optional[float] = None, max_jobs: int = 0, metodo_inicio: str = "spawn"):
+        self.num_processos = num_processos
+        self.inicializador = inicializador
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self._contexto = multiprocessing.get_context(metodo_inicio)
+        self._livres: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: Set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._encerrado = False
+        self._parar = threading.Event()
+        self._falhas_aquecimento = 0
+        self.contadores: Dict[str, int] = {"jobs": 0, "tempo_esgotado": 0, "processos_perdidos": 0, "reciclados": 0}
+        for _ in range(num_processos):
+            self._criar_worker()
+
+    @classmethod
+    def from_env(cls, num_processos: int, inicializador: Optional[Callable[[], Any]] = None) -> "PoolProcessos":
+        """
+        Tempo limite de cada pesquisa em API_TIMEOUT_PESQUISA (segundos, padrão 600;
+        0 desativa) e reciclagem em API_MAX_JOBS_PROCESSO (padrão 50; 0 desativa).
+        """
+        timeout = float(os.getenv("API_TIMEOUT_PESQUISA", "600"))
+        return cls(
+            num_processos,
+            inicializador=inicializador,
+            timeout=timeout if timeout > 0 else None,
+            max_jobs=int(os.getenv("API_MAX_JOBS_PROCESSO", "50")),
+        )
+
+    def executar(self, funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Executa `funcao(*args, **kwargs)` em um processo livre e retorna o resultado
+        (ou relança a exceção do job). `funcao`, os argumentos e o resultado precisam
+        ser serializáveis (pickle). Lança TempoEsgotado ou ProcessoEncerrado quando o
+        processo não entrega o resultado.
+        """
+        mensagem = pickle.dumps((funcao, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        worker = self._enviar(mensagem)
+        try:
+            concluido = worker.conexao.poll(self.timeout)
+            dados = worker.conexao.recv_bytes() if concluido else None
+        except (EOFError, OSError):
+            self._substituir(worker, forcar=True, motivo="processos_perdidos")
+            raise ProcessoEncerrado(
+                f"Processo worker terminou durante a pesquisa (código de saída {worker.processo.exitcode})"
+            )
+        if dados is None:
+            self._substituir(worker, forcar=True, motivo="tempo_esgotado")
+            raise TempoEsgotado(f"Pesquisa excedeu o tempo limite de {self.timeout:g}s; processo encerrado")
+
+        worker.jobs += 1
+        with self._lock:
+            self.contadores["jobs"] += 1
+        if self.max_jobs and worker.jobs >= self.max_jobs:
+            # A saída do processo (até ESPERA_SAIDA) e a criação do substituto não
+            # atrasam a entrega do resultado
+            threading.Thread(target=self._substituir, args=(worker, False, "reciclados"),
+                             name="pesquisa-processo-reciclagem", daemon=True).start()
+        else:
+            self._livres.put(worker)
+
+        sucesso, valor = pickle.loads(dados)
+        if not sucesso:
+            raise valor
+        return valor
+
+    def _enviar(self, mensagem: bytes) -> _Worker:
+        """
+        Envia o job a um processo livre. Um processo que morreu enquanto estava livre
+        é substituído e o job vai para o próximo: ele ainda não tinha começado.
+        """
+        tentativas = 2
+        while True:
+            worker = self._livres.get()
+            if not worker.processo.is_alive():
+                self._substituir(worker, forcar=True, motivo="processos_perdidos")
+                continue
+            try:
+                worker.conexao.send_bytes(mensagem)
+                return worker
+            except OSError:
+                # Morreu entre a verificação e o envio
+                self._substituir(worker, forcar=True, motivo="processos_perdidos")
+                tentativas -= 1
+                if not tentativas:
+                    raise ProcessoEncerrado(
+                        f"Processo worker terminou antes de receber a pesquisa (código de saída {worker.processo.exitcode})"
+                    )
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "processos": len(self._workers),
+                "livres": self._livres.qsize(),
+                "timeout_segundos": self.timeout,
+                "max_jobs": self.max_jobs,
+                **self.contadores,
+            }
+
+    def pids(self) -> Set[int]:
+        with self._lock:
+            return {worker.processo.pid for worker in self._workers}
+
+    def encerrar(self, aguardar: bool = True) -> None:
+        """
+        Encerra os processos. Com `aguardar`, cada processo livre sai sozinho (até
+        ESPERA_SAIDA segundos); os demais são mortos.
+        """
+        with self._lock:
+            self._encerrado = True
+            workers, self._workers = self._workers, set()
+        self._parar.set()
+        for worker in workers:
+            self._finalizar_processo(worker, forcar=not aguardar)
+
+    def _criar_worker(self) -> None:
+        conexao, conexao_filho = self._contexto.Pipe()
+        processo = self._contexto.Process(
+            target=_executar_worker, args=(conexao_filho, self.inicializador),
+            name="pesquisa-processo", daemon=True,
+        )
+        processo.start()
+        conexao_filho.close()
+        worker = _Worker(processo, conexao)
+        with self._lock:
+            self._workers.add(worker)
+        # O aquecimento leva segundos: o processo entra na fila de livres quando avisar que está pronto
+        threading.Thread(target=self._aguardar_pronto, args=(worker,), name="pesquisa-processo-aquecimento",
+                         daemon=True).start()
+
+    def _aguardar_pronto(self, worker: _Worker) -> None:
+        try:
+            worker.conexao.recv_bytes()
+        except (EOFError, OSError):
+            with self._lock:
+                encerrado = self._encerrado
+                self._falhas_aquecimento += 1
+                espera = min(ESPERA_REINICIO_MAX, ESPERA_REINICIO * 2 ** (self._falhas_aquecimento - 1))
+            if not encerrado:
+                logger.error("Processo worker terminou durante o pré-aquecimento (código de saída %s); "
+                             "novo processo em %.0fs", worker.processo.exitcode, espera)
+                self._substituir(worker, forcar=True, motivo="processos_perdidos", espera=espera)
+            return
+        with self._lock:
+            self._falhas_aquecimento = 0
+        self._livres.put(worker)
+
+    def _substituir(self, worker: _Worker, forcar: bool, motivo: str, espera: float = 0.0) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+            self.contadores[motivo] += 1
+        self._finalizar_processo(worker, forcar)
+        if espera:
+            self._parar.wait(espera)
+        with self._lock:
+            encerrado = self._encerrado
+        if not encerrado:
+            self._criar_worker()
+
+    def _finalizar_processo(self, worker: _Worker, forcar: bool) -> None:
+        if not forcar:
+            try:
+                worker.conexao.send_bytes(_SAIR)
+            except OSError:
+                pass
+            worker.processo.join(ESPERA_SAIDA)
+        if worker.processo.is_alive():
+            worker.processo.kill()
+            worker.processo.join()
+        worker.conexao.close()
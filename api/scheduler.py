@@ -0,0 +1,318 @@
+import asyncio
+import inspect
+import itertools
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from api.pool_processos import PoolProcessos
+
+logger = logging.getLogger(__name__)
+
+# Duração assumida para um job enquanto nenhum terminou (segundos)
+DURACAO_PADRAO = 30.0
+
+
+class FilaCheia(Exception):
+    """
+    Lançada quando a fila de pesquisas atingiu o limite configurado.
+    `retry_after` sugere em quantos segundos o cliente deve tentar novamente.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Fila de pesquisas cheia")
+        self.retry_after = retry_after
+
+
+class AgendadorPesquisas:
+    """
+    Executa as pesquisas em um número fixo de workers, com fila limitada e prioridade.
+
+    Modos de execução:
+    - "thread": a crew roda em uma das threads worker
+    - "processo": a thread worker delega a execução a um PoolProcessos (processos
+      pré-aquecidos com `inicializador`, com tempo limite e reciclagem), isolando
+      a crew do processo da API
+    - "async": os jobs são corrotinas em um único event loop (em uma thread própria);
+      `num_workers` é o número de jobs simultâneos. Funções síncronas submetidas
+      nesse modo rodam no executor padrão do loop
+    """
+
+    def __init__(self, num_workers: int = 2, max_fila: int = 100, modo: str = "thread",
+                 inicializador: Optional[Callable[[], Any]] = None):
+        if modo not in ("thread", "processo", "async"):
+            raise ValueError(f"Modo de execução inválido: {modo}")
+        self.num_workers = num_workers
+        self.max_fila = max_fila
+        self.modo = modo
+        self.inicializador = inicializador
+        self._fila: "queue.PriorityQueue" = queue.PriorityQueue(maxsize=max_fila)
+        self._sequencia = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._pool_processos: Optional[PoolProcessos] = None
+        self._lock = threading.Lock()
+        self._em_execucao = 0
+        self._concluidas = 0
+        self._rejeitadas = 0
+        self._duracao_media: Optional[float] = None
+        # Chave de ordenação dos jobs com identificador ainda na fila
+        self._na_fila: Dict[str, tuple] = {}
+        # Modo async: loop dos jobs e aviso de novos itens na fila
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._novos_itens: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_env(cls, inicializador: Optional[Callable[[], Any]] = None) -> "AgendadorPesquisas":
+        """
+        Cria o agendador a partir de API_WORKERS, API_FILA_MAX e API_MODO_EXECUCAO.
+        No modo async, API_WORKERS (jobs simultâneos) tem padrão 64. `inicializador`
+        roda uma vez em cada processo do modo processo (ver PoolProcessos.from_env).
+        """
+        modo = os.getenv("API_MODO_EXECUCAO", "thread")
+        return cls(
+            num_workers=int(os.getenv("API_WORKERS", "64" if modo == "async" else "2")),
+            max_fila=int(os.getenv("API_FILA_MAX", "100")),
+            modo=modo,
+            inicializador=inicializador,
+        )
+
+    def iniciar(self) -> None:
+        """
+        Inicia as threads worker (chamado automaticamente na primeira submissão).
+        No modo processo, também cria os processos, que se aquecem em background.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            if self.modo == "async":
+                iniciado = threading.Event()
+                thread = threading.Thread(
+                    target=asyncio.run, args=(self._loop_async(iniciado),), name="pesquisa-loop", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+                iniciado.wait()
+                return
+            if self.modo == "processo":
+                self._pool_processos = PoolProcessos.from_env(self.num_workers, self.inicializador)
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._loop_worker, name=f"pesquisa-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submeter(self, funcao: Callable[..., Any], *args: Any, prioridade: int = 0,
+                 identificador: Optional[str] = None) -> None:
+        """
+        Enfileira `funcao(*args)`. Valores maiores de `prioridade` executam antes.
+        Com `identificador`, a posição do job na fila pode ser consultada em posicao().
+        Lança FilaCheia se a fila estiver no limite.
+        """
+        self.iniciar()
+        ordem = (-prioridade, next(self._sequencia))
+        if identificador is not None:
+            with self._lock:
+                self._na_fila[identificador] = ordem
+        try:
+            self._fila.put_nowait((*ordem, funcao, args, identificador))
+        except queue.Full:
+            with self._lock:
+                self._na_fila.pop(identificador, None)
+                self._rejeitadas += 1
+            raise FilaCheia(self.estimar_retry_after())
+        self._avisar_loop()
+
+    def posicao(self, identificador: str) -> Optional[int]:
+        """
+        Quantos jobs serão executados antes do job `identificador` (0 = é o próximo).
+        None se ele não está na fila deste processo.
+        """
+        with self._lock:
+            ordem = self._na_fila.get(identificador)
+        if ordem is None:
+            return None
+        with self._fila.mutex:
+            return sum(1 for item in self._fila.queue if item[:2] < ordem)
+
+    def estimar_espera(self, posicao: int) -> float:
+        """
+        Segundos até o job na `posicao` da fila começar a executar, pela duração
+        média dos jobs: cada rodada de `num_workers` jobs libera as vagas seguintes.
+        """
+        with self._lock:
+            livres = max(0, self.num_workers - self._em_execucao)
+            duracao = self._duracao_media or DURACAO_PADRAO
+        if posicao < livres:
+            return 0.0
+        # Os jobs em execução estão, em média, na metade
+        return ((posicao - livres) // self.num_workers + 0.5) * duracao
+
+    def executar(self, funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Executa a parte pesada do job de acordo com o modo configurado.
+        No modo "processo" `funcao`, seus argumentos e o resultado precisam ser
+        serializáveis (pickle); um job que passa do tempo limite lança TempoEsgotado.
+        """
+        if self._pool_processos is not None:
+            return self._pool_processos.executar(funcao, *args, **kwargs)
+        return funcao(*args, **kwargs)
+
+    def estimar_retry_after(self) -> int:
+        """
+        Estima quando haverá espaço na fila, com base na duração média dos jobs.
+        """
+        duracao = self._duracao_media or DURACAO_PADRAO
+        return max(1, math.ceil(duracao * max(1, self._fila.qsize()) / self.num_workers))
+
+    def metricas(self) -> Dict[str, Any]:
+        pool = self._pool_processos
+        with self._lock:
+            metricas = {
+                "modo": self.modo,
+                "workers": self.num_workers,
+                "fila": self._fila.qsize(),
+                "max_fila": self.max_fila,
+                "em_execucao": self._em_execucao,
+                "concluidas": self._concluidas,
+                "rejeitadas": self._rejeitadas,
+                "duracao_media_segundos": round(self._duracao_media, 3) if self._duracao_media else None,
+            }
+        if pool is not None:
+            metricas["processos"] = pool.estatisticas()
+        return metricas
+
+    def encerrar(self, aguardar: bool = True) -> None:
+        """
+        Sinaliza o fim das threads worker e libera o pool de processos.
+        Jobs ainda na fila são executados antes do encerramento quando `aguardar` é
+        True; caso contrário são descartados (nunca bloqueia com a fila cheia).
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        # Sentinelas com a menor prioridade possível: só são consumidas depois dos jobs
+        if aguardar:
+            for _ in threads:
+                # Com a fila cheia, os workers abrem espaço conforme executam os jobs
+                self._fila.put(self._sentinela())
+        else:
+            pendentes = len(threads)
+            while pendentes:
+                try:
+                    self._fila.put_nowait(self._sentinela())
+                    pendentes -= 1
+                except queue.Full:
+                    # Descarta os jobs (e devolve as sentinelas já enfileiradas, removidas junto)
+                    pendentes += self._descartar_fila()
+        self._avisar_loop()
+        if aguardar:
+            for thread in threads:
+                thread.join()
+        if self._pool_processos is not None:
+            self._pool_processos.encerrar(aguardar=aguardar)
+            self._pool_processos = None
+
+    def _sentinela(self) -> tuple:
+        return (math.inf, next(self._sequencia), None, (), None)
+
+    def _descartar_fila(self) -> int:
+        """Esvazia a fila sem executar os jobs. Retorna quantas sentinelas foram removidas."""
+        sentinelas = 0
+        while True:
+            try:
+                _, _, funcao, _, identificador = self._fila.get_nowait()
+            except queue.Empty:
+                return sentinelas
+            self._fila.task_done()
+            if funcao is None:
+                sentinelas += 1
+                continue
+            with self._lock:
+                self._na_fila.pop(identificador, None)
+
+    def _iniciar_job(self, identificador: Optional[str]) -> float:
+        with self._lock:
+            self._na_fila.pop(identificador, None)
+            self._em_execucao += 1
+        return time.monotonic()
+
+    def _finalizar_job(self, inicio: float) -> None:
+        duracao = time.monotonic() - inicio
+        with self._lock:
+            self._em_execucao -= 1
+            self._concluidas += 1
+            # Média móvel exponencial da duração dos jobs
+            if self._duracao_media is None:
+                self._duracao_media = duracao
+            else:
+                self._duracao_media = 0.8 * self._duracao_media + 0.2 * duracao
+        self._fila.task_done()
+
+    def _loop_worker(self) -> None:
+        while True:
+            _, _, funcao, args, identificador = self._fila.get()
+            if funcao is None:
+                self._fila.task_done()
+                return
+            inicio = self._iniciar_job(identificador)
+            try:
+                funcao(*args)
+            except Exception:
+                logger.exception("Falha não tratada em job de pesquisa")
+            finally:
+                self._finalizar_job(inicio)
+
+    def _avisar_loop(self) -> None:
+        loop, novos_itens = self._loop, self._novos_itens
+        if loop is not None and novos_itens is not None:
+            try:
+                loop.call_soon_threadsafe(novos_itens.set)
+            except RuntimeError:
+                # O loop já terminou
+                pass
+
+    async def _loop_async(self, iniciado: threading.Event) -> None:
+        """
+        Retira os jobs da fila (na ordem de prioridade) conforme há vagas entre os
+        `num_workers` simultâneos e executa cada um como uma task do loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._novos_itens = asyncio.Event()
+        iniciado.set()
+        vagas = asyncio.Semaphore(self.num_workers)
+        tarefas = set()
+        while True:
+            await vagas.acquire()
+            try:
+                _, _, funcao, args, identificador = self._fila.get_nowait()
+            except queue.Empty:
+                vagas.release()
+                await self._novos_itens.wait()
+                self._novos_itens.clear()
+                continue
+            if funcao is None:
+                self._fila.task_done()
+                break
+            tarefa = asyncio.create_task(self._executar_job_async(funcao, args, identificador))
+            tarefas.add(tarefa)
+            tarefa.add_done_callback(tarefas.discard)
+            tarefa.add_done_callback(lambda _: vagas.release())
+        if tarefas:
+            await asyncio.wait(tarefas)
+
+    async def _executar_job_async(self, funcao: Callable[..., Any], args: tuple,
+                                  identificador: Optional[str]) -> None:
+        inicio = self._iniciar_job(identificador)
+        try:
+            if inspect.iscoroutinefunction(funcao):
+                await funcao(*args)
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, funcao, *args)
+        except Exception:
+            logger.exception("Falha não tratada em job de pesquisa")
+        finally:
+            self._finalizar_job(inicio)
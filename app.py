@@ -1,28 +1,71 @@
 import streamlit as st
-from main import run_pesquisador
-
-st.title("Agente de IA capaz de utilizar wikipedia para escrever artigos")
-st.write(
-    "Esse é um projeto de pesquisa automatizada que utiliza API da wikipedia para trazer dados relevantes e importantes sobre determinado tema."
-)
-
-pergunta_usuario = st.text_area("Digite sobre um tema do seu interesse:")
-
-if st.button("Pesquisar"):
-    if not pergunta_usuario:
-        st.warning("Por favor, digite um tema para busca no wikipedia.")
-    else:
-        st.write("Pesquisando na wikipedia...")
-        # Chama a função de pesquisa
-        resultado = run_pesquisador(pergunta_usuario)
-        
-        # Exibe os resultados formatados
-        st.subheader(f"Tema: {resultado.tema}")
+from main import preaquecer_em_background, run_pesquisador_stream
+
+@st.cache_resource
+def preaquecer_crew():
+    # Carrega a crewai uma vez por servidor, sem bloquear a primeira renderização
+    return preaquecer_em_background()
+
+# Mensagens exibidas conforme a crew avança
+DESCRICAO_EVENTOS = {
+    "wikipedia_inicio": lambda ev: f"Buscando \"{ev['termo']}\" na wikipedia...",
+    "wikipedia_fim": lambda ev: f"Wikipedia: \"{ev['termo']}\" " + ("encontrado" if ev["encontrado"] else "não encontrado"),
+    "tarefa_inicio": lambda ev: f"{ev['agente']} iniciou a tarefa {ev['tarefa']}",
+    "tarefa_fim": lambda ev: f"{ev['agente']} concluiu a tarefa {ev['tarefa']}",
+    "cache": lambda ev: "Artigo encontrado no cache",
+}
+
+def main():
+    # Apenas quando o Streamlit executa o script: importar o módulo não carrega a crewai
+    preaquecer_crew()
+
+    st.title("Agente de IA capaz de utilizar wikipedia para escrever artigos")
+    st.write(
+        "Esse é um projeto de pesquisa automatizada que utiliza API da wikipedia para trazer dados relevantes e importantes sobre determinado tema."
+    )
+
+    pergunta_usuario = st.text_area("Digite sobre um tema do seu interesse:")
+
+    if st.button("Pesquisar"):
+        if not pergunta_usuario:
+            st.warning("Por favor, digite um tema para busca no wikipedia.")
+        else:
+            progresso = st.status("Pesquisando na wikipedia...", expanded=False)
+            artigo = st.empty()
+            texto_artigo = ""
+            resultado = None
+
+            # Mostra o progresso e o artigo sendo escrito enquanto a crew executa
+            for evento in run_pesquisador_stream(pergunta_usuario):
+                if evento["tipo"] == "token":
+                    texto_artigo += evento["conteudo"]
+                    artigo.markdown(texto_artigo)
+                elif evento["tipo"] == "resultado":
+                    resultado = evento["resultado"]
+                elif evento["tipo"] in DESCRICAO_EVENTOS:
+                    mensagem = DESCRICAO_EVENTOS[evento["tipo"]](evento)
+                    progresso.write(mensagem)
+                    progresso.update(label=mensagem)
+
+            artigo.empty()
+            if resultado is None:
+                # A execução terminou sem entregar o resultado (falha fora da crew)
+                progresso.update(label="Falha na pesquisa", state="error")
+                st.error("A pesquisa terminou sem resultado. Tente novamente.")
+                return
+            progresso.update(label="Pesquisa concluída", state="complete")
+
+            # Exibe os resultados formatados
+            st.subheader(f"Tema: {resultado.tema}")
         
-        if resultado.resultados:
-            st.write("### Resultados:")
-            for res in resultado.resultados:
-                st.write(f"**{res.topico}:** {res.descricao}")
+            if resultado.resultados:
+                st.write("### Resultados:")
+                for res in resultado.resultados:
+                    st.write(f"**{res.topico}:** {res.descricao}")
         
-        st.write("### Resumo:")
-        st.write(resultado.resumo)
\ No newline at end of file
+            st.write("### Resumo:")
+            st.write(resultado.resumo)
+
+
+if __name__ == "__main__":
+    main()
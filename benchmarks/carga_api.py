@@ -0,0 +1,463 @@
+"""
+Teste de carga da API: N clientes simultâneos fazem submissão -> consultas de status -> resultado.
+
+    python -m benchmarks.carga_api --clientes 8 --pesquisas 40 --latencia 0.2 --saida carga.json
+    python -m benchmarks.carga_api --clientes 8 --pesquisas 40 --comparar carga.json --tolerancia 0.2
+
+A API (api.api:app) sobe em um uvicorn local e tudo o que ela consulta também é
+local: o LLM é um endpoint determinístico (tests/fake_llm.py) com latência e taxa
+de tokens configuráveis, e a Wikipedia e a busca na web são stubs HTTP. Nenhuma
+chave ou rede é necessária e as medições são reproduzíveis.
+
+O relatório traz vazão, p50/p95/p99 de cada etapa do cliente, taxa de erros e o
+crescimento de memória do processo da API (no modo processo do agendador, sem os
+processos filhos). `--saida` grava o resultado em JSON (com o commit atual) e
+`--comparar` mostra a diferença para um resultado anterior; com `--tolerancia`,
+o comando termina com código 1 se a vazão cair ou o p95 subir além dela, para
+uso em CI.
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+TEMA = "Tema de carga {}"
+_RE_TEMA = re.compile(r"Tema de carga \d+")
+
+# Métricas comparadas com --comparar: (caminho no relatório, maior é melhor)
+METRICAS_COMPARADAS = [
+    ("vazao_pesquisas_s", True),
+    ("latencias_ms.ponta_a_ponta.p50", False),
+    ("latencias_ms.ponta_a_ponta.p95", False),
+    ("latencias_ms.ponta_a_ponta.p99", False),
+    ("latencias_ms.status.p95", False),
+    ("taxa_erros", False),
+    ("memoria_mb.crescimento", False),
+]
+
+
+def gerar_artigo(palavras: int) -> str:
+    return " ".join(f"palavra{i % 50}" for i in range(palavras)) + "."
+
+
+def criar_respondedor(palavras_artigo: int, tokens_por_segundo: float):
+    """
+    Simula os agentes: quem tem ferramenta a aciona uma vez e depois responde;
+    o redator devolve o artigo. A geração leva tokens / `tokens_por_segundo`.
+    """
+    artigo = gerar_artigo(palavras_artigo)
+
+    def responder(corpo: dict) -> str:
+        mensagens = corpo["messages"]
+        conversa = " ".join(m.get("content") or "" for m in mensagens)
+        encontrado = _RE_TEMA.search(conversa)
+        tema = encontrado.group(0) if encontrado else "Python"
+        sistema = mensagens[0].get("content") or ""
+        ferramenta = next((nome for nome in ("wikipedia_resumo_tool", "web_search") if nome in sistema), None)
+        if ferramenta is None:
+            resposta = artigo
+        elif not any("Observation:" in (m.get("content") or "") for m in mensagens[1:]):
+            argumento = {"term": tema} if ferramenta == "wikipedia_resumo_tool" else {"query": tema}
+            resposta = (f"Thought: Preciso pesquisar o tema\nAction: {ferramenta}\n"
+                        f"Action Input: {json.dumps(argumento, ensure_ascii=False)}")
+        else:
+            resposta = f"Thought: Tenho as informações necessárias\nFinal Answer: Resumo sobre {tema}."
+        if tokens_por_segundo > 0:
+            # ~4 caracteres por token, como em tokens.estimar_tokens_texto
+            time.sleep(len(resposta) / 4 / tokens_por_segundo)
+        return resposta
+
+    return responder
+
+
+class _BuscaGenerica(BaseHTTPRequestHandler):
+    """Busca JSON no formato do SearxNG com cinco resultados para qualquer consulta."""
+
+    def do_GET(self):
+        consulta = self.path.split("q=", 1)[-1].split("&", 1)[0]
+        resultados = [
+            {"title": f"Resultado {i}", "url": f"https://exemplo{i}.org/{consulta}",
+             "content": f"Trecho {i} encontrado na web sobre o tema pesquisado."}
+            for i in range(5)
+        ]
+        corpo = json.dumps({"results": resultados}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def _servir(handler) -> ThreadingHTTPServer:
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+@contextlib.contextmanager
+def ambiente_simulado(latencia: float, tokens_por_segundo: float, palavras_artigo: int) -> Iterator[Any]:
+    """
+    Aponta o LLM, a Wikipedia e a busca na web para servidores locais e restaura
+    a configuração original ao sair. Produz o FakeLLM (para contar as chamadas).
+    """
+    import crew
+    from tests.fake_llm import FakeLLM
+    from tests.test_wiki_resumo import StubWikipedia
+    from tools import web_search_ddg, wiki_resumo
+
+    llm = FakeLLM(resposta=criar_respondedor(palavras_artigo, tokens_por_segundo), atraso=latencia)
+    wikipedia = _servir(StubWikipedia)
+    busca = _servir(_BuscaGenerica)
+    originais = (crew._llm, wiki_resumo.WIKIPEDIA_API_URL, web_search_ddg.BUSCA_WEB_URL)
+    crew._llm = crew.LLMLimitado(model="groq/fake", api_key="benchmark", base_url=llm.base_url)
+    wiki_resumo.WIKIPEDIA_API_URL = f"http://127.0.0.1:{wikipedia.server_port}/w/api.php"
+    web_search_ddg.BUSCA_WEB_URL = f"http://127.0.0.1:{busca.server_port}/search"
+    # Os processos worker do modo processo não veem as atribuições acima: recebem os
+    # mesmos endereços pelo ambiente (o LiteLLM usa GROQ_API_BASE)
+    ambiente = {"GROQ_API_BASE": llm.base_url, "WIKIPEDIA_API_URL": wiki_resumo.WIKIPEDIA_API_URL,
+                "BUSCA_WEB_URL": web_search_ddg.BUSCA_WEB_URL}
+    ambiente_original = {chave: os.environ.get(chave) for chave in ambiente}
+    os.environ.update(ambiente)
+    try:
+        yield llm
+    finally:
+        crew._llm, wiki_resumo.WIKIPEDIA_API_URL, web_search_ddg.BUSCA_WEB_URL = originais
+        for chave, valor in ambiente_original.items():
+            if valor is None:
+                os.environ.pop(chave, None)
+            else:
+                os.environ[chave] = valor
+        for servidor in (llm, wikipedia, busca):
+            servidor.shutdown()
+            servidor.server_close()
+
+
+@contextlib.contextmanager
+def servidor_api() -> Iterator[str]:
+    """Sobe api.api:app em um uvicorn local, em uma thread, e produz a URL base."""
+    import uvicorn
+    from api.api import app
+
+    soquete = socket.socket()
+    soquete.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(app, log_level="warning", lifespan="off")
+    servidor = uvicorn.Server(config)
+    thread = threading.Thread(target=servidor.run, kwargs={"sockets": [soquete]}, daemon=True)
+    thread.start()
+    while not servidor.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{soquete.getsockname()[1]}"
+    finally:
+        servidor.should_exit = True
+        thread.join(10)
+        soquete.close()
+
+
+def memoria_rss_mb() -> float:
+    """RSS atual do processo (Linux); em outros sistemas, o pico (ru_maxrss)."""
+    try:
+        with open("/proc/self/statm") as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class MonitorMemoria:
+    """Amostra o RSS e o número de threads periodicamente para registrar os picos durante a carga."""
+
+    def __init__(self, intervalo: float = 0.05):
+        self.intervalo = intervalo
+        self.pico = memoria_rss_mb()
+        self.pico_threads = threading.active_count()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, memoria_rss_mb())
+            self.pico_threads = max(self.pico_threads, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._parar.set()
+        self._thread.join()
+
+
+def percentis(valores: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 (nearest-rank), média e máximo, em milissegundos."""
+    if not valores:
+        return {"contagem": 0, "media": None, "p50": None, "p95": None, "p99": None, "max": None}
+    ordenados = sorted(valores)
+
+    def percentil(q: float) -> float:
+        return round(ordenados[max(0, min(len(ordenados) - 1, int(q * len(ordenados) + 0.999999) - 1))], 1)
+
+    return {
+        "contagem": len(ordenados),
+        "media": round(statistics.mean(ordenados), 1),
+        "p50": percentil(0.5),
+        "p95": percentil(0.95),
+        "p99": percentil(0.99),
+        "max": round(ordenados[-1], 1),
+    }
+
+
+async def _cliente(http, proximo: Iterator[int], fluxo: str, usar_cache: bool, intervalo: float,
+                   timeout: float, amostras: Dict[str, List[float]], erros: Dict[str, int],
+                   consultas: List[int], long_poll: float = 0.0) -> None:
+    for indice in proximo:
+        inicio = time.perf_counter()
+        try:
+            resposta = await http.post("/pesquisar", json={"tema": TEMA.format(indice), "fluxo": fluxo,
+                                                           "usar_cache": usar_cache})
+            amostras["submissao"].append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code != 200:
+                erros[f"http_{resposta.status_code}"] = erros.get(f"http_{resposta.status_code}", 0) + 1
+                continue
+            task_id = resposta.json()["id"]
+
+            polls = 0
+            while True:
+                if time.perf_counter() - inicio > timeout:
+                    erros["timeout"] = erros.get("timeout", 0) + 1
+                    break
+                if long_poll:
+                    # A API segura a resposta até a conclusão (ou até `long_poll` segundos)
+                    params = {"wait": long_poll}
+                else:
+                    params = {}
+                    await asyncio.sleep(intervalo)
+                antes = time.perf_counter()
+                status = (await http.get(f"/status/{task_id}", params=params)).json()["status"]
+                amostras["status"].append((time.perf_counter() - antes) * 1000)
+                polls += 1
+                if status == "concluído":
+                    antes = time.perf_counter()
+                    resultado = await http.get(f"/resultado/{task_id}")
+                    amostras["resultado"].append((time.perf_counter() - antes) * 1000)
+                    if resultado.status_code == 200:
+                        amostras["ponta_a_ponta"].append((time.perf_counter() - inicio) * 1000)
+                    else:
+                        erros[f"http_{resultado.status_code}"] = erros.get(f"http_{resultado.status_code}", 0) + 1
+                    break
+                if status.startswith("erro"):
+                    erros["pesquisa"] = erros.get("pesquisa", 0) + 1
+                    break
+            consultas.append(polls)
+        except Exception as e:
+            erros[type(e).__name__] = erros.get(type(e).__name__, 0) + 1
+
+
+async def _gerar_carga(url: str, clientes: int, pesquisas: int, inicio_indice: int, fluxo: str,
+                       usar_cache: bool, intervalo: float, timeout: float, long_poll: float = 0.0) -> Dict[str, Any]:
+    import httpx
+
+    amostras: Dict[str, List[float]] = {"submissao": [], "status": [], "resultado": [], "ponta_a_ponta": []}
+    erros: Dict[str, int] = {}
+    consultas: List[int] = []
+    # Iterador compartilhado: cada cliente pega a próxima pesquisa ao terminar a anterior
+    proximo = iter(range(inicio_indice, inicio_indice + pesquisas))
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as http:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            _cliente(http, proximo, fluxo, usar_cache, intervalo, timeout, amostras, erros, consultas, long_poll)
+            for _ in range(clientes)
+        ))
+        duracao = time.perf_counter() - inicio
+    return {"duracao": duracao, "amostras": amostras, "erros": erros, "consultas": consultas}
+
+
+def _commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar_carga(clientes: int = 4, pesquisas: int = 20, fluxo: str = "wikipedia_artigo",
+                   latencia: float = 0.1, tokens_por_segundo: float = 0.0, palavras_artigo: int = 300,
+                   intervalo: float = 0.05, timeout: float = 120.0, usar_cache: bool = False,
+                   aquecimento: int = 1, long_poll: float = 0.0) -> Dict[str, Any]:
+    """
+    Executa a carga e retorna o relatório. As primeiras `aquecimento` pesquisas
+    (importação da crewai, conexões) não entram nas medições. Com `long_poll`,
+    os clientes usam `/status?wait=` em vez de consultar a cada `intervalo`.
+    """
+    # Sem chave real e sem limite de requisições ao LLM
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["LLM_RPM"] = "0"
+
+    from api import api
+
+    with ambiente_simulado(latencia, tokens_por_segundo, palavras_artigo) as llm, servidor_api() as url, \
+            contextlib.redirect_stdout(io.StringIO()):
+        # Os agentes imprimem o progresso no terminal
+        if aquecimento:
+            asyncio.run(_gerar_carga(url, 1, aquecimento, 0, fluxo, usar_cache, intervalo, timeout, long_poll))
+        gc.collect()
+        memoria_inicio = memoria_rss_mb()
+        chamadas_antes = len(llm.requisicoes)
+        with MonitorMemoria() as monitor:
+            bruto = asyncio.run(_gerar_carga(url, clientes, pesquisas, aquecimento, fluxo, usar_cache,
+                                             intervalo, timeout, long_poll))
+        gc.collect()
+        memoria_fim = memoria_rss_mb()
+        chamadas_llm = len(llm.requisicoes) - chamadas_antes
+
+    concluidas = len(bruto["amostras"]["ponta_a_ponta"])
+    total_erros = sum(bruto["erros"].values())
+    return {
+        "commit": _commit_atual(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parametros": {
+            "clientes": clientes, "pesquisas": pesquisas, "fluxo": fluxo, "latencia_llm": latencia,
+            "tokens_por_segundo": tokens_por_segundo, "palavras_artigo": palavras_artigo,
+            "intervalo_status": intervalo, "long_poll": long_poll, "usar_cache": usar_cache,
+            "workers": api.agendador.num_workers, "modo": api.agendador.modo,
+        },
+        "duracao_s": round(bruto["duracao"], 3),
+        "concluidas": concluidas,
+        "vazao_pesquisas_s": round(concluidas / bruto["duracao"], 3) if bruto["duracao"] else 0.0,
+        "erros": bruto["erros"],
+        "taxa_erros": round(total_erros / pesquisas, 4) if pesquisas else 0.0,
+        "latencias_ms": {nome: percentis(valores) for nome, valores in bruto["amostras"].items()},
+        "consultas_status_por_pesquisa": round(statistics.mean(bruto["consultas"]), 2) if bruto["consultas"] else 0,
+        "chamadas_llm_por_pesquisa": round(chamadas_llm / concluidas, 2) if concluidas else 0,
+        "memoria_mb": {
+            "inicio": round(memoria_inicio, 1),
+            "fim": round(memoria_fim, 1),
+            "pico": round(max(monitor.pico, memoria_fim), 1),
+            "crescimento": round(memoria_fim - memoria_inicio, 1),
+        },
+        "threads_pico": monitor.pico_threads,
+    }
+
+
+def _valor(relatorio: Dict[str, Any], caminho: str) -> Optional[float]:
+    for parte in caminho.split("."):
+        if not isinstance(relatorio, dict):
+            return None
+        relatorio = relatorio.get(parte)
+    return relatorio if isinstance(relatorio, (int, float)) else None
+
+
+def comparar(atual: Dict[str, Any], anterior: Dict[str, Any], tolerancia: Optional[float] = None) -> List[str]:
+    """
+    Linhas com a variação de cada métrica entre dois relatórios. Com `tolerancia`,
+    as métricas de vazão e p95 que pioraram além dela são marcadas como regressão.
+    """
+    linhas = [f"comparação com {anterior.get('commit') or '?'} ({anterior.get('data', '?')})"]
+    for caminho, maior_melhor in METRICAS_COMPARADAS:
+        novo, antigo = _valor(atual, caminho), _valor(anterior, caminho)
+        if novo is None or antigo is None:
+            continue
+        variacao = (novo - antigo) / antigo if antigo else 0.0
+        piora = -variacao if maior_melhor else variacao
+        regressao = (tolerancia is not None and piora > tolerancia
+                     and (caminho == "vazao_pesquisas_s" or caminho.endswith(".p95")))
+        linhas.append(f"{caminho:>34}: {antigo:g} -> {novo:g} ({variacao:+.1%})"
+                      + ("  REGRESSÃO" if regressao else ""))
+    return linhas
+
+
+def imprimir(relatorio: Dict[str, Any]) -> None:
+    p = relatorio["parametros"]
+    print(f"{relatorio['concluidas']}/{p['pesquisas']} pesquisas ({p['fluxo']}) com {p['clientes']} clientes "
+          f"e {p['workers']} workers ({p['modo']}) em {relatorio['duracao_s']:.2f}s: "
+          f"{relatorio['vazao_pesquisas_s']:.2f} pesquisas/s")
+    for nome, latencias in relatorio["latencias_ms"].items():
+        if latencias["contagem"]:
+            print(f"{nome:>14}: p50 {latencias['p50']:.1f} ms | p95 {latencias['p95']:.1f} ms | "
+                  f"p99 {latencias['p99']:.1f} ms | max {latencias['max']:.1f} ms ({latencias['contagem']})")
+    print(f"erros: {relatorio['taxa_erros']:.1%} {relatorio['erros'] or ''}")
+    print(f"consultas de status por pesquisa: {relatorio['consultas_status_por_pesquisa']} | "
+          f"chamadas ao LLM por pesquisa: {relatorio['chamadas_llm_por_pesquisa']}")
+    memoria = relatorio["memoria_mb"]
+    print(f"memória: {memoria['inicio']:.1f} -> {memoria['fim']:.1f} MB "
+          f"(crescimento {memoria['crescimento']:+.1f} MB, pico {memoria['pico']:.1f} MB) | "
+          f"pico de threads: {relatorio.get('threads_pico', '?')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=4, help="clientes simultâneos")
+    parser.add_argument("--pesquisas", type=int, default=20, help="total de pesquisas")
+    parser.add_argument("--fluxo", default="wikipedia_artigo")
+    parser.add_argument("--workers", type=int, help="API_WORKERS da API (padrão: o do ambiente)")
+    parser.add_argument("--modo", choices=("thread", "processo", "async"),
+                        help="API_MODO_EXECUCAO da API (padrão: o do ambiente)")
+    parser.add_argument("--latencia", type=float, default=0.1, help="segundos até cada resposta do LLM")
+    parser.add_argument("--tokens-por-segundo", type=float, default=0.0, help="taxa de geração do LLM (0 = instantânea)")
+    parser.add_argument("--palavras-artigo", type=int, default=300)
+    parser.add_argument("--intervalo", type=float, default=0.05, help="segundos entre consultas de status")
+    parser.add_argument("--long-poll", type=float, default=0.0,
+                        help="consulta o status com ?wait= (segundos) em vez de a cada --intervalo")
+    parser.add_argument("--timeout", type=float, default=120.0, help="tempo máximo de cada pesquisa")
+    parser.add_argument("--com-cache", action="store_true", help="permite os caches de artigos e do LLM")
+    parser.add_argument("--aquecimento", type=int, default=1, help="pesquisas descartadas antes da medição")
+    parser.add_argument("--saida", help="grava o relatório em JSON neste arquivo")
+    parser.add_argument("--comparar", help="relatório JSON anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, help="piora relativa aceita na vazão e no p95 (ex.: 0.2)")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    if args.workers:
+        # Lido pelo agendador na importação da API
+        os.environ["API_WORKERS"] = str(args.workers)
+    if args.modo:
+        os.environ["API_MODO_EXECUCAO"] = args.modo
+    warnings.filterwarnings("ignore")
+
+    relatorio = executar_carga(
+        clientes=args.clientes, pesquisas=args.pesquisas, fluxo=args.fluxo, latencia=args.latencia,
+        tokens_por_segundo=args.tokens_por_segundo, palavras_artigo=args.palavras_artigo,
+        intervalo=args.intervalo, timeout=args.timeout, usar_cache=args.com_cache, aquecimento=args.aquecimento,
+        long_poll=args.long_poll,
+    )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    else:
+        imprimir(relatorio)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        linhas = comparar(relatorio, anterior, args.tolerancia)
+        print("\n".join(linhas))
+        if any(linha.endswith("REGRESSÃO") for linha in linhas):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
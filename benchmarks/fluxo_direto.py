@@ -0,0 +1,108 @@
+"""
+Chamadas ao LLM e latência por artigo nos fluxos wikipedia_artigo e wikipedia_direto.
+
+    python -m benchmarks.fluxo_direto --repeticoes 5 --atraso 0.5
+
+O LLM é um endpoint local (tests/fake_llm.py) que responde como o agente faria:
+o pesquisador aciona a ferramenta da Wikipedia e depois entrega a resposta final;
+o redator devolve o artigo. `--atraso` simula o tempo de geração de cada resposta.
+O extrato da Wikipedia é colocado no cache antes das medições, então nenhum dos
+fluxos acessa a rede e a diferença vem apenas das chamadas ao LLM.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+import warnings
+
+TEMA = "Python"
+EXTRATO = "\n".join(
+    f"Parágrafo {i} sobre a linguagem de programação Python e sua história." for i in range(12)
+)
+ARTIGO = "Artigo de 300 palavras sobre Python."
+
+
+def responder(corpo: dict) -> str:
+    """Simula o agente: decide usar a ferramenta, lê a observação e responde."""
+    mensagens = corpo["messages"]
+    if "wikipedia_resumo_tool" not in mensagens[0]["content"]:
+        return ARTIGO
+    if not any("Observation:" in m.get("content", "") for m in mensagens[1:]):
+        return (
+            "Thought: Preciso buscar o tema na Wikipedia\n"
+            "Action: wikipedia_resumo_tool\n"
+            f'Action Input: {{"term": "{TEMA}", "max_chars": 1500}}'
+        )
+    return "Thought: Tenho as informações necessárias\nFinal Answer: Resumo do extrato sobre Python."
+
+
+def medir_fluxo(fluxo: str, servidor, repeticoes: int) -> dict:
+    from main import run_pesquisador
+
+    duracoes, chamadas, caracteres = [], [], []
+    for _ in range(repeticoes):
+        antes = len(servidor.requisicoes)
+        inicio = time.perf_counter()
+        # Os agentes imprimem o progresso no terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = run_pesquisador(TEMA, usar_cache=False, fluxo=fluxo)
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+        requisicoes = servidor.requisicoes[antes:]
+        chamadas.append(len(requisicoes))
+        caracteres.append(sum(len(m.get("content") or "") for r in requisicoes for m in r["messages"]))
+        if resultado.resumo != ARTIGO:
+            raise RuntimeError(f"{fluxo}: resultado inesperado: {resultado.resumo[:200]}")
+    return {
+        "chamadas_llm": statistics.mean(chamadas),
+        "caracteres_prompt": round(statistics.mean(caracteres)),
+        "media_ms": round(statistics.mean(duracoes), 1),
+        "p50_ms": round(statistics.median(duracoes), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--atraso", type=float, default=0.3, help="segundos por resposta do LLM")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    # Sem chave real, sem limites de requisição e sem caches de artigo/completions
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["LLM_RPM"] = "0"
+    warnings.filterwarnings("ignore")
+
+    import crew
+    from tests.fake_llm import FakeLLM
+    from tools.wiki_resumo import EntradaExtrato, cache_extratos, normalizar_titulo
+
+    cache_extratos.salvar(("pt", normalizar_titulo(TEMA)), EntradaExtrato(EXTRATO, None, None, float("inf")))
+    servidor = FakeLLM(resposta=responder, atraso=args.atraso)
+    crew._llm = crew.LLMLimitado(model="groq/fake", api_key="benchmark", base_url=servidor.base_url)
+    try:
+        medir_fluxo("wikipedia_direto", servidor, 1)  # aquecimento
+        resultado = {
+            fluxo: medir_fluxo(fluxo, servidor, args.repeticoes)
+            for fluxo in ("wikipedia_artigo", "wikipedia_direto")
+        }
+    finally:
+        servidor.fechar()
+    resultado["reducao_latencia"] = round(
+        1 - resultado["wikipedia_direto"]["media_ms"] / resultado["wikipedia_artigo"]["media_ms"], 3
+    )
+
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    for fluxo in ("wikipedia_artigo", "wikipedia_direto"):
+        r = resultado[fluxo]
+        print(f"{fluxo:>16}: {r['chamadas_llm']:.1f} chamadas ao LLM | {r['caracteres_prompt']} caracteres de prompt"
+              f" | média {r['media_ms']:.0f} ms | p50 {r['p50_ms']:.0f} ms")
+    print(f"redução de latência: {resultado['reducao_latencia']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
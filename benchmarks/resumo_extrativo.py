@@ -0,0 +1,108 @@
+"""
+Tempo e qualidade do resumo extrativo em textos longos.
+
+    python -m benchmarks.resumo_extrativo --paragrafos 1000 10000 20000
+
+Gera um texto sintético em que ~5% dos parágrafos tratam do tema e os demais
+de assuntos vizinhos, e compara a seleção antiga (parágrafos em intervalos
+fixos) com o resumo por relevância: tempo, tokens do resultado e fração das
+sentenças escolhidas que falam do tema.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from tokens import estimar_tokens_texto
+from tools.text_processor import dividir_sentencas, resumo_extrativo
+
+TEMA = "Revolução Francesa"
+SENTENCAS_TEMA = [
+    "A Revolução Francesa derrubou a monarquia absolutista em 1789.",
+    "Os revolucionários franceses proclamaram a república e os direitos do cidadão.",
+    "A queda da Bastilha marcou o início da Revolução Francesa.",
+    "O Terror foi a fase mais violenta da revolução na França.",
+]
+PALAVRAS = (
+    "comércio porto rio montanha clima agricultura indústria ferrovia música teatro "
+    "pintura ciência universidade igreja mercado exército fronteira tratado moeda imposto"
+).split()
+
+
+def selecao_antiga(texto: str, num_points: int = 5) -> str:
+    """Seleção usada antes: primeiro parágrafo, alguns em intervalos fixos e o último."""
+    paragrafos = [p for p in texto.split("\n") if p.strip()]
+    if len(paragrafos) <= num_points:
+        return "\n\n".join(paragrafos)
+    escolhidos = [paragrafos[0]]
+    passo = max(1, (len(paragrafos) - 2) // (num_points - 2))
+    for i in range(1, len(paragrafos) - 1, passo):
+        if len(escolhidos) < num_points - 1:
+            escolhidos.append(paragrafos[i])
+    if paragrafos[-1] not in escolhidos:
+        escolhidos.append(paragrafos[-1])
+    return "\n\n".join(escolhidos)
+
+
+def gerar_texto(paragrafos: int, aleatorio: random.Random) -> str:
+    linhas = []
+    for _ in range(paragrafos):
+        if aleatorio.random() < 0.05:
+            linhas.append(" ".join(aleatorio.sample(SENTENCAS_TEMA, 2)))
+            continue
+        sentencas = []
+        for _ in range(3):
+            palavras = [aleatorio.choice(PALAVRAS) for _ in range(14)]
+            sentencas.append(" ".join(palavras).capitalize() + ".")
+        linhas.append(" ".join(sentencas))
+    return "\n".join(linhas)
+
+
+def avaliar(funcao, texto: str, repeticoes: int) -> dict:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resumo = funcao(texto)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    sentencas = [s for _, s in dividir_sentencas(resumo)]
+    no_tema = sum(1 for s in sentencas if s in SENTENCAS_TEMA)
+    return {
+        "ms": round(statistics.median(tempos), 1),
+        "tokens": estimar_tokens_texto(resumo),
+        "sentencas_no_tema": round(no_tema / max(1, len(sentencas)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragrafos", type=int, nargs="+", default=[1000, 10000, 20000])
+    parser.add_argument("--token-budget", type=int, default=400)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    aleatorio = random.Random(42)
+    resultados = []
+    for quantidade in args.paragrafos:
+        texto = gerar_texto(quantidade, aleatorio)
+        resultados.append({
+            "paragrafos": quantidade,
+            "tokens_texto": estimar_tokens_texto(texto),
+            "antigo": avaliar(selecao_antiga, texto, args.repeticoes),
+            "extrativo": avaliar(lambda t: resumo_extrativo(t, TEMA, args.token_budget), texto, args.repeticoes),
+        })
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    for r in resultados:
+        print(f"{r['paragrafos']} parágrafos ({r['tokens_texto']} tokens)")
+        for nome in ("antigo", "extrativo"):
+            m = r[nome]
+            print(f"  {nome:>9}: {m['ms']:8.1f} ms | {m['tokens']:5d} tokens"
+                  f" | {m['sentencas_no_tema']:.0%} das sentenças sobre o tema")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Microbenchmark do custo de montar a crew antes de cada kickoff.
+
+    python -m benchmarks.setup_crew --repeticoes 200
+
+"antes": PesquisaCrew().crew() relendo os YAML a cada pesquisa (comportamento original)
+"depois": criar_crew(), com a configuração interpretada uma vez e apenas o fluxo usado montado
+"""
+import argparse
+import json
+import statistics
+import time
+import warnings
+
+from crew import PesquisaCrew, _configs, criar_crew
+
+
+def medir(funcao, repeticoes: int) -> dict:
+    funcao()  # aquecimento
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    amostras.sort()
+    return {
+        "media_ms": round(statistics.mean(amostras), 3),
+        "p50_ms": round(amostras[len(amostras) // 2], 3),
+        "p95_ms": round(amostras[int(len(amostras) * 0.95) - 1], 3),
+    }
+
+
+def montar_sem_cache():
+    _configs.clear()
+    return PesquisaCrew().crew()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    # O crewai avisa que callbacks não são serializáveis a cada Task criada
+    warnings.filterwarnings("ignore")
+    resultado = {
+        "antes": medir(montar_sem_cache, args.repeticoes),
+        "depois": medir(criar_crew, args.repeticoes),
+    }
+    resultado["reducao"] = round(1 - resultado["depois"]["media_ms"] / resultado["antes"]["media_ms"], 3)
+
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    for nome in ("antes", "depois"):
+        r = resultado[nome]
+        print(f"{nome:>7}: média {r['media_ms']:.2f} ms | p50 {r['p50_ms']:.2f} ms | p95 {r['p95_ms']:.2f} ms")
+    print(f"redução: {resultado['reducao']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
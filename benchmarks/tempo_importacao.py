@@ -0,0 +1,81 @@
+"""
+Mede o tempo de importação (a frio, em um processo novo) dos módulos de entrada
+usando `python -X importtime`.
+
+    python -m benchmarks.tempo_importacao api.api main crew --top 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict
+
+DIRETORIO_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pacotes da pilha de agentes que não devem ser carregados na importação da API
+PACOTES_PESADOS = ("crewai", "litellm", "langchain_community", "langchain_core")
+
+
+def medir_importacao(modulo: str) -> Dict[str, int]:
+    """
+    Importa `modulo` em um interpretador novo e retorna o tempo cumulativo
+    (microssegundos) de cada módulo carregado, segundo `-X importtime`.
+    """
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=DIRETORIO_BASE,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {modulo}:\n{processo.stderr[-2000:]}")
+
+    tempos = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, cumulativo, nome = linha.split("|")
+        tempos[nome.strip()] = int(cumulativo)
+    return tempos
+
+
+def pacotes_pesados(tempos: Dict[str, int]) -> list:
+    return sorted({nome.split(".")[0] for nome in tempos if nome.split(".")[0] in PACOTES_PESADOS})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modulos", nargs="*", default=["api.api", "main", "crew"])
+    parser.add_argument("--top", type=int, default=5, help="módulos mais lentos exibidos por entrada")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    resultado = {}
+    for modulo in args.modulos:
+        tempos = medir_importacao(modulo)
+        mais_lentos = sorted(
+            ((nome, us) for nome, us in tempos.items() if nome != modulo and "." not in nome),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        resultado[modulo] = {
+            "total_ms": round(tempos.get(modulo, 0) / 1000, 1),
+            "modulos_carregados": len(tempos),
+            "pacotes_pesados": pacotes_pesados(tempos),
+            "mais_lentos_ms": {nome: round(us / 1000, 1) for nome, us in mais_lentos},
+        }
+
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    for modulo, dados in resultado.items():
+        print(f"{modulo}: {dados['total_ms']} ms ({dados['modulos_carregados']} módulos)")
+        for nome, ms in dados["mais_lentos_ms"].items():
+            print(f"    {nome:<30} {ms:>9.1f} ms")
+        if dados["pacotes_pesados"]:
+            print(f"    pacotes pesados: {', '.join(dados['pacotes_pesados'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Construção e latência de consulta do índice offline da Wikipedia.
+
+    python -m benchmarks.wiki_offline --paginas 200000 --consultas 20000
+
+Gera um dump sintético em JSON Lines com `--paginas` artigos (introduções de
+~600 caracteres), constrói o índice e mede consultas de títulos existentes,
+redirecionamentos e títulos ausentes (que no uso real seguem para a API).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+from tools.wiki_offline import IndiceOffline, construir_indice
+
+PARAGRAFO = (
+    "é um artigo sintético usado para medir o índice offline. Ele tem o tamanho de uma "
+    "introdução típica da Wikipedia, com algumas frases sobre história, geografia e cultura. "
+)
+
+
+def gerar_dump(caminho: str, paginas: int) -> None:
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for i in range(paginas):
+            arquivo.write(json.dumps({"title": f"Artigo {i}", "extract": f"Artigo {i} {PARAGRAFO * 3}"}) + "\n")
+            if i % 10 == 0:
+                arquivo.write(json.dumps({"title": f"Atalho {i}", "redirect": f"Artigo {i}"}) + "\n")
+
+
+def medir(indice: IndiceOffline, titulos) -> dict:
+    amostras = []
+    for titulo in titulos:
+        inicio = time.perf_counter()
+        indice.obter(titulo)
+        amostras.append((time.perf_counter() - inicio) * 1e6)
+    amostras.sort()
+    return {
+        "media_us": round(statistics.mean(amostras), 2),
+        "p50_us": round(amostras[len(amostras) // 2], 2),
+        "p99_us": round(amostras[int(len(amostras) * 0.99) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=200000)
+    parser.add_argument("--consultas", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    aleatorio = random.Random(42)
+    with tempfile.TemporaryDirectory() as diretorio:
+        dump = os.path.join(diretorio, "dump.jsonl")
+        gerar_dump(dump, args.paginas)
+        memoria_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        inicio = time.perf_counter()
+        contagem = construir_indice(dump, os.path.join(diretorio, "indice"))
+        construcao = time.perf_counter() - inicio
+
+        indice = IndiceOffline(os.path.join(diretorio, "indice"))
+        existentes = [f"artigo {aleatorio.randrange(args.paginas)}" for _ in range(args.consultas)]
+        redirecionamentos = [f"Atalho {aleatorio.randrange(0, args.paginas, 10)}" for _ in range(args.consultas)]
+        ausentes = [f"Inexistente {i}" for i in range(args.consultas)]
+        resultado = {
+            "paginas": contagem["artigos"] + contagem["redirecionamentos"],
+            "tamanho_mb": round(contagem["bytes"] / 1024 / 1024, 1),
+            "tamanho_dump_mb": round(os.path.getsize(dump) / 1024 / 1024, 1),
+            "construcao_s": round(construcao, 2),
+            # ru_maxrss em KB no Linux: aumento do pico de memória durante a construção
+            "memoria_construcao_mb": round(
+                (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memoria_antes) / 1024, 1
+            ),
+            "existentes": medir(indice, existentes),
+            "redirecionamentos": medir(indice, redirecionamentos),
+            "ausentes": medir(indice, ausentes),
+        }
+        indice.fechar()
+
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return
+    print(f"{resultado['paginas']} páginas | dump {resultado['tamanho_dump_mb']} MB -> índice {resultado['tamanho_mb']} MB"
+          f" | construção {resultado['construcao_s']} s (+{resultado['memoria_construcao_mb']} MB de pico)")
+    for nome in ("existentes", "redirecionamentos", "ausentes"):
+        r = resultado[nome]
+        print(f"{nome:>17}: média {r['media_us']:.1f} µs | p50 {r['p50_us']:.1f} µs | p99 {r['p99_us']:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
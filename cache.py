@@ -0,0 +1,398 @@
+import contextvars
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from models import PesquisaOutput
+
+# Diretório raiz do projeto (usado para localizar config/ e o banco do cache)
+DIRETORIO_BASE = Path(__file__).resolve().parent
+
+
+def normalizar_tema(tema: str) -> str:
+    """
+    Normaliza o tema para que variações triviais ("  Brasil ", "brasil.")
+    compartilhem a mesma entrada de cache.
+    """
+    texto = unicodedata.normalize("NFKC", tema).casefold()
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.strip(" .,;:!?\"'")
+
+
+def hash_configuracao(*caminhos: Path) -> str:
+    """
+    Calcula um hash do conteúdo dos arquivos de configuração (agents.yaml e tasks.yaml).
+    Alterar um prompt invalida automaticamente as entradas antigas do cache.
+    """
+    digest = hashlib.sha256()
+    for caminho in caminhos:
+        try:
+            digest.update(Path(caminho).read_bytes())
+        except OSError:
+            digest.update(str(caminho).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def chave_cache(tema: str, fluxo: str, modelo: str, hash_config: str) -> str:
+    """
+    Monta a chave do cache a partir do tema normalizado, fluxo da crew, modelo e configuração.
+    """
+    bruto = json.dumps(
+        [normalizar_tema(tema), fluxo, modelo, hash_config],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class CacheArtigos:
+    """
+    Cache de resultados da crew em dois níveis:
+    - memória: LRU limitado a `max_memoria` entradas
+    - disco: SQLite limitado a `max_disco` entradas (opcional)
+
+    Todas as entradas expiram após `ttl_segundos`.
+    """
+
+    def __init__(
+        self,
+        caminho_db: Optional[str] = None,
+        ttl_segundos: int = 86400,
+        max_memoria: int = 256,
+        max_disco: int = 5000,
+    ):
+        self.ttl_segundos = ttl_segundos
+        self.max_memoria = max_memoria
+        self.max_disco = max_disco
+        self._memoria: "OrderedDict[str, Tuple[float, PesquisaOutput]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, int] = {
+            "hits_memoria": 0,
+            "hits_disco": 0,
+            "misses": 0,
+            "gravacoes": 0,
+            "expiracoes": 0,
+            "evicoes": 0,
+        }
+
+        self._conexao: Optional[sqlite3.Connection] = None
+        if caminho_db:
+            Path(caminho_db).parent.mkdir(parents=True, exist_ok=True)
+            self._conexao = sqlite3.connect(caminho_db, check_same_thread=False)
+            self._conexao.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artigos (
+                    chave TEXT PRIMARY KEY,
+                    tema TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    expira_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+                """
+            )
+            self._conexao.execute(
+                "CREATE INDEX IF NOT EXISTS idx_artigos_acessado ON artigos (acessado_em)"
+            )
+            self._conexao.commit()
+
+    @classmethod
+    def from_env(cls) -> "CacheArtigos":
+        """
+        Cria o cache a partir das variáveis de ambiente.
+        CACHE_ARTIGOS_DB vazio desativa o nível em disco.
+        """
+        caminho_padrao = str(DIRETORIO_BASE / ".cache" / "artigos.sqlite3")
+        return cls(
+            caminho_db=os.getenv("CACHE_ARTIGOS_DB", caminho_padrao) or None,
+            ttl_segundos=int(os.getenv("CACHE_ARTIGOS_TTL", "86400")),
+            max_memoria=int(os.getenv("CACHE_ARTIGOS_MAX_MEMORIA", "256")),
+            max_disco=int(os.getenv("CACHE_ARTIGOS_MAX_DISCO", "5000")),
+        )
+
+    def obter(self, chave: str) -> Optional[PesquisaOutput]:
+        """
+        Retorna uma cópia do resultado armazenado ou None se não existir/estiver expirado.
+        """
+        agora = time.time()
+        with self._lock:
+            entrada = self._memoria.get(chave)
+            if entrada is not None:
+                expira_em, output = entrada
+                if expira_em > agora:
+                    self._memoria.move_to_end(chave)
+                    self._contadores["hits_memoria"] += 1
+                    return output.model_copy(deep=True)
+                del self._memoria[chave]
+                self._contadores["expiracoes"] += 1
+
+            if self._conexao is not None:
+                linha = self._conexao.execute(
+                    "SELECT payload, expira_em FROM artigos WHERE chave = ?", (chave,)
+                ).fetchone()
+                if linha is not None:
+                    payload, expira_em = linha
+                    if expira_em > agora:
+                        output = PesquisaOutput.model_validate_json(payload)
+                        self._conexao.execute(
+                            "UPDATE artigos SET acessado_em = ? WHERE chave = ?", (agora, chave)
+                        )
+                        self._conexao.commit()
+                        # Promove a entrada para o nível em memória
+                        self._guardar_memoria(chave, expira_em, output)
+                        self._contadores["hits_disco"] += 1
+                        return output.model_copy(deep=True)
+                    self._conexao.execute("DELETE FROM artigos WHERE chave = ?", (chave,))
+                    self._conexao.commit()
+                    self._contadores["expiracoes"] += 1
+
+            self._contadores["misses"] += 1
+            return None
+
+    def salvar(self, chave: str, tema: str, output: PesquisaOutput) -> None:
+        """
+        Armazena o resultado nos dois níveis do cache.
+        """
+        agora = time.time()
+        expira_em = agora + self.ttl_segundos
+        with self._lock:
+            self._guardar_memoria(chave, expira_em, output.model_copy(deep=True))
+            self._contadores["gravacoes"] += 1
+
+            if self._conexao is not None:
+                self._conexao.execute(
+                    "INSERT OR REPLACE INTO artigos (chave, tema, payload, expira_em, acessado_em) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (chave, tema, output.model_dump_json(), expira_em, agora),
+                )
+                # Remove entradas expiradas e, se necessário, as menos acessadas
+                self._conexao.execute("DELETE FROM artigos WHERE expira_em <= ?", (agora,))
+                total = self._conexao.execute("SELECT COUNT(*) FROM artigos").fetchone()[0]
+                excesso = total - self.max_disco
+                if excesso > 0:
+                    self._conexao.execute(
+                        "DELETE FROM artigos WHERE chave IN ("
+                        "SELECT chave FROM artigos ORDER BY acessado_em ASC LIMIT ?)",
+                        (excesso,),
+                    )
+                    self._contadores["evicoes"] += excesso
+                self._conexao.commit()
+
+    def limpar(self) -> None:
+        """
+        Remove todas as entradas do cache (memória e disco).
+        """
+        with self._lock:
+            self._memoria.clear()
+            if self._conexao is not None:
+                self._conexao.execute("DELETE FROM artigos")
+                self._conexao.commit()
+
+    def estatisticas(self) -> Dict[str, int]:
+        """
+        Retorna os contadores de hit/miss e o tamanho atual de cada nível.
+        """
+        with self._lock:
+            stats = dict(self._contadores)
+            stats["entradas_memoria"] = len(self._memoria)
+            if self._conexao is not None:
+                stats["entradas_disco"] = self._conexao.execute(
+                    "SELECT COUNT(*) FROM artigos"
+                ).fetchone()[0]
+            return stats
+
+    def _guardar_memoria(self, chave: str, expira_em: float, output: PesquisaOutput) -> None:
+        # Deve ser chamado com o lock adquirido
+        self._memoria[chave] = (expira_em, output)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+            self._contadores["evicoes"] += 1
+
+
+_cache_artigos: Optional[CacheArtigos] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache_artigos() -> CacheArtigos:
+    """
+    Retorna a instância compartilhada do cache, criando-a na primeira chamada.
+    """
+    global _cache_artigos
+    if _cache_artigos is None:
+        with _cache_lock:
+            if _cache_artigos is None:
+                _cache_artigos = CacheArtigos.from_env()
+    return _cache_artigos
+
+
+def chave_completion(modelo: str, temperatura: Optional[float], mensagens: Any, extras: Any = None) -> str:
+    """
+    Chave do cache de respostas do LLM: hash do modelo, temperatura e da lista completa de mensagens.
+    `extras` inclui o que mais muda a resposta (ex.: nomes das ferramentas disponíveis).
+    """
+    if isinstance(mensagens, str):
+        mensagens = [{"role": "user", "content": mensagens}]
+    bruto = json.dumps(
+        [modelo, temperatura, mensagens, extras],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class CacheCompletions:
+    """
+    Cache em disco (SQLite) das respostas do LLM, limitado a `max_bytes`
+    (as respostas menos acessadas são removidas primeiro) e com expiração após `ttl_segundos`.
+    """
+
+    def __init__(self, caminho_db: str, max_bytes: int = 64 * 1024 * 1024, ttl_segundos: int = 7 * 86400):
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "gravacoes": 0,
+            "evicoes": 0,
+        }
+        Path(caminho_db).parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(caminho_db, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                chave TEXT PRIMARY KEY,
+                resposta TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                expira_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+            """
+        )
+        self._conexao.execute(
+            "CREATE INDEX IF NOT EXISTS idx_completions_acessado ON completions (acessado_em)"
+        )
+        self._conexao.commit()
+
+    @classmethod
+    def from_env(cls) -> "CacheCompletions":
+        """
+        Cria o cache a partir de CACHE_COMPLETIONS_DB, CACHE_COMPLETIONS_MAX_MB e CACHE_COMPLETIONS_TTL.
+        """
+        caminho_padrao = str(DIRETORIO_BASE / ".cache" / "completions.sqlite3")
+        return cls(
+            caminho_db=os.getenv("CACHE_COMPLETIONS_DB") or caminho_padrao,
+            max_bytes=int(float(os.getenv("CACHE_COMPLETIONS_MAX_MB", "64")) * 1024 * 1024),
+            ttl_segundos=int(os.getenv("CACHE_COMPLETIONS_TTL", str(7 * 86400))),
+        )
+
+    def obter(self, chave: str) -> Optional[str]:
+        agora = time.time()
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT resposta FROM completions WHERE chave = ? AND expira_em > ?", (chave, agora)
+            ).fetchone()
+            if linha is None:
+                self._contadores["misses"] += 1
+                return None
+            self._conexao.execute(
+                "UPDATE completions SET acessado_em = ? WHERE chave = ?", (agora, chave)
+            )
+            self._conexao.commit()
+            self._contadores["hits"] += 1
+            return linha[0]
+
+    def salvar(self, chave: str, resposta: str) -> None:
+        agora = time.time()
+        tamanho = len(resposta.encode("utf-8"))
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO completions (chave, resposta, tamanho, expira_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chave, resposta, tamanho, agora + self.ttl_segundos, agora),
+            )
+            self._contadores["gravacoes"] += 1
+            self._conexao.execute("DELETE FROM completions WHERE expira_em <= ?", (agora,))
+            total = self._conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM completions").fetchone()[0]
+            # Remove as menos acessadas até caber no limite
+            if total > self.max_bytes:
+                liberar = total - self.max_bytes
+                removidas = []
+                for chave_antiga, tamanho_antigo in self._conexao.execute(
+                    "SELECT chave, tamanho FROM completions ORDER BY acessado_em ASC"
+                ):
+                    if liberar <= 0:
+                        break
+                    removidas.append((chave_antiga,))
+                    liberar -= tamanho_antigo
+                self._conexao.executemany("DELETE FROM completions WHERE chave = ?", removidas)
+                self._contadores["evicoes"] += len(removidas)
+            self._conexao.commit()
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._conexao.execute("DELETE FROM completions")
+            self._conexao.commit()
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._contadores)
+            entradas, tamanho = self._conexao.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM completions"
+            ).fetchone()
+            stats["entradas"] = entradas
+            stats["bytes"] = tamanho
+            return stats
+
+
+# Desativa o cache de respostas do LLM na execução atual (ex.: pesquisa com usar_cache=False)
+_completions_desativado: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "completions_desativado", default=False
+)
+
+
+@contextmanager
+def sem_cache_completions() -> Iterator[None]:
+    """Chamadas ao LLM dentro do bloco ignoram o cache de respostas."""
+    token = _completions_desativado.set(True)
+    try:
+        yield
+    finally:
+        _completions_desativado.reset(token)
+
+
+_cache_completions: Optional[CacheCompletions] = None
+
+
+def obter_cache_completions() -> Optional[CacheCompletions]:
+    """
+    Retorna o cache de respostas do LLM, ou None se estiver desativado
+    (CACHE_COMPLETIONS_HABILITADO=0 ou dentro de sem_cache_completions()).
+    """
+    global _cache_completions
+    if _completions_desativado.get():
+        return None
+    if os.getenv("CACHE_COMPLETIONS_HABILITADO", "1") in ("0", "false", "False"):
+        return None
+    if _cache_completions is None:
+        with _cache_lock:
+            if _cache_completions is None:
+                _cache_completions = CacheCompletions.from_env()
+    return _cache_completions
+
+
+def estatisticas_cache_completions() -> Optional[Dict[str, int]]:
+    """Estatísticas do cache de respostas, se ele já foi criado."""
+    return _cache_completions.estatisticas() if _cache_completions is not None else None
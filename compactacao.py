@@ -0,0 +1,139 @@
+"""
+Compactação do contexto passado de uma tarefa da crew para a seguinte.
+
+A saída de uma tarefa (por exemplo, o resumo do pesquisador da Wikipedia) vai
+inteira para o prompt da próxima. Tarefas com `token_budget_contexto` em
+config/tasks.yaml recebem um guardrail que remove trechos repetidos e, se a saída
+ainda passar do orçamento, a condensa com o resumo extrativo até caber nele.
+O limite é garantido: por último, o texto é cortado no orçamento de tokens.
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from eventos import emitir
+from tokens import contar_tokens, termos, truncar_tokens
+
+# Tentativas de ajustar o orçamento do resumo extrativo (estimado por caracteres)
+# até o resultado caber no orçamento medido pelo tokenizador
+MAX_TENTATIVAS = 4
+
+
+class EstatisticasCompactacao:
+    """Contadores do processo: saídas medidas, compactadas e tokens de prompt economizados."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.execucoes = 0
+        self.compactadas = 0
+        self.tokens_antes = 0
+        self.tokens_depois = 0
+
+    def registrar(self, antes: int, depois: int) -> None:
+        with self._lock:
+            self.execucoes += 1
+            self.compactadas += int(depois < antes)
+            self.tokens_antes += antes
+            self.tokens_depois += depois
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "execucoes": self.execucoes,
+                "compactadas": self.compactadas,
+                "tokens_antes": self.tokens_antes,
+                "tokens_depois": self.tokens_depois,
+                "tokens_economizados": self.tokens_antes - self.tokens_depois,
+            }
+
+
+_estatisticas = EstatisticasCompactacao()
+
+# Tema da pesquisa em execução: guia a escolha das sentenças no resumo extrativo
+_tema_atual: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tema_compactacao", default=None)
+
+
+def estatisticas_compactacao() -> Dict[str, int]:
+    return _estatisticas.estatisticas()
+
+
+@contextmanager
+def tema_da_pesquisa(tema: str) -> Iterator[None]:
+    """As saídas compactadas dentro do bloco priorizam as sentenças sobre `tema`."""
+    token = _tema_atual.set(tema)
+    try:
+        yield
+    finally:
+        _tema_atual.reset(token)
+
+
+def remover_repeticoes(texto: str) -> str:
+    """Remove sentenças repetidas (mesmos termos, ignorando caixa, acentos e pontuação)."""
+    # tools.text_processor importa a crewai: carregado só quando há o que compactar
+    from tools.text_processor import dividir_sentencas
+
+    vistas = set()
+    paragrafos: Dict[int, list] = {}
+    for paragrafo, sentenca in dividir_sentencas(texto):
+        assinatura = tuple(termos(sentenca)) or sentenca
+        if assinatura in vistas:
+            continue
+        vistas.add(assinatura)
+        paragrafos.setdefault(paragrafo, []).append(sentenca)
+    return "\n\n".join(" ".join(sentencas) for sentencas in paragrafos.values())
+
+
+def compactar(texto: str, consulta: str, token_budget: int) -> Tuple[str, int, int]:
+    """
+    Compacta `texto` para no máximo `token_budget` tokens, priorizando as sentenças
+    relevantes para `consulta`. Retorna (texto, tokens antes, tokens depois).
+    Um texto que já cabe no orçamento volta inalterado.
+    """
+    antes = contar_tokens(texto)
+    if antes <= token_budget:
+        return texto, antes, antes
+
+    from tools.text_processor import resumo_extrativo
+
+    sem_repeticoes = remover_repeticoes(texto)
+    compactado = sem_repeticoes
+    atual = contar_tokens(compactado)
+    orcamento = token_budget
+    for _ in range(MAX_TENTATIVAS):
+        if atual <= token_budget:
+            break
+        compactado = resumo_extrativo(sem_repeticoes, consulta, orcamento)
+        atual = contar_tokens(compactado)
+        # O resumo mede tokens por caracteres: reduz o orçamento na proporção do excesso
+        orcamento = max(1, int(orcamento * token_budget / max(atual, 1) * 0.95))
+    if atual > token_budget:
+        compactado = truncar_tokens(compactado, token_budget)
+        atual = contar_tokens(compactado)
+    return compactado, antes, atual
+
+
+class CompactadorContexto:
+    """
+    Guardrail da crewai (o método `validar`): recebe a saída da tarefa e devolve
+    (True, texto compactado), que substitui a saída bruta passada como contexto às
+    tarefas seguintes. A crewai lê o código-fonte do guardrail para os eventos, então
+    ele precisa ser uma função ou método, e não um objeto chamável.
+    """
+
+    def __init__(self, token_budget: int, tarefa: str = ""):
+        self.token_budget = int(token_budget)
+        self.tarefa = tarefa
+
+    def validar(self, saida: Any) -> Tuple[bool, Any]:
+        texto = getattr(saida, "raw", None)
+        if not isinstance(texto, str) or not texto:
+            return True, saida
+        # O tema da pesquisa, e não a instrução da tarefa inteira, é a consulta do
+        # resumo extrativo. Fora de uma pesquisa, usa a descrição já interpolada
+        consulta = _tema_atual.get() or getattr(saida, "description", "") or ""
+        compactado, antes, depois = compactar(texto, consulta, self.token_budget)
+        _estatisticas.registrar(antes, depois)
+        emitir("compactacao", tarefa=self.tarefa, tokens_antes=antes, tokens_depois=depois,
+               tokens_economizados=antes - depois, token_budget=self.token_budget)
+        return True, compactado
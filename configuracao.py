@@ -0,0 +1,23 @@
+# Parâmetros compartilhados que não dependem da crewai: podem ser importados
+# pela API e pela interface sem carregar a pilha de agentes
+import os
+
+# Modelo usado por todos os agentes (também faz parte da chave do cache de artigos)
+MODELO_LLM = "groq/meta-llama/llama-4-scout-17b-16e-instruct"
+
+# Fluxo executado por padrão em cada pesquisa
+FLUXO_PADRAO = "wikipedia_artigo"
+
+# Fluxos que podem ser escolhidos por pesquisa
+# - wikipedia_artigo: agente pesquisador na Wikipedia + redator
+# - pesquisa_ddg: pesquisador no DuckDuckGo + sintetizador
+# - multifonte: Wikipedia e DuckDuckGo consultados em paralelo, um único redator
+# - wikipedia_direto: extrato da Wikipedia buscado sem agente, apenas o redator chama o LLM
+FLUXOS_DISPONIVEIS = ("wikipedia_artigo", "pesquisa_ddg", "multifonte", "wikipedia_direto")
+
+def memoria_semantica_habilitada() -> bool:
+    """
+    Reaproveitamento de temas quase iguais (semantico.py). Verificado antes de
+    importar o módulo, que carrega a NumPy.
+    """
+    return os.getenv("SEMANTICO_HABILITADO", "0") not in ("0", "false", "False")
@@ -1,22 +1,149 @@
 from crewai import Agent, Crew, Process, Task, LLM
+from crewai.agents.crew_agent_executor import CrewAgentExecutor
 from crewai.project import CrewBase, agent, crew, task
 from crewai.tools import tool
+import asyncio
+import copy
 import os
+import threading
+import warnings
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import yaml
 from dotenv import load_dotenv
+from cache import chave_completion, obter_cache_completions
+from compactacao import CompactadorContexto
+from configuracao import FLUXO_PADRAO, FLUXOS_DISPONIVEIS, MODELO_LLM
+from eventos import emitir
+from limites import estimar_tokens, obter_limitador_llm
 from models import PesquisaOutput, PesquisaResultado
-from tools.wiki_resumo import wikipedia_resumo
+from rastreamento import span, span_da_tarefa
+from tools.wiki_resumo import extrato_condensado, extrato_condensado_async, wikipedia_resumo
 from tools.web_search_ddg import search_web
 from tools.text_processor import extract_key_points
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Configurar LLM com a API key do Groq - reduzi temperature para diminuir verbosidade
-llm = LLM(
-    model="groq/meta-llama/llama-4-scout-17b-16e-instruct", 
-    temperature=0.1,  # Temperatura mais baixa para respostas mais diretas
-    api_key=os.getenv("GROQ_API_KEY")
-)
+class LLMLimitado(LLM):
+    """
+    LLM (via LiteLLM) usado pelos agentes. As chamadas:
+    - consultam antes o cache de respostas (modelo + temperatura + mensagens)
+    - passam pelo limitador compartilhado: limites de requisições/tokens por
+      minuto, concorrência adaptativa e novas tentativas com jitter em 429
+    """
+
+    def _chave_cache(self, messages, tools, response_model):
+        if response_model is not None:
+            # Respostas estruturadas não são texto simples: não entram no cache
+            return None
+        ferramentas = sorted(
+            (ferramenta.get("function", ferramenta).get("name", "") for ferramenta in tools or []
+             if isinstance(ferramenta, dict)),
+        )
+        return chave_completion(self.model, self.temperature, messages,
+                                {"ferramentas": ferramentas, "stop": self.stop_sequences})
+
+    def _resposta_em_cache(self, cache, chave, from_agent):
+        if cache is None or chave is None:
+            return None
+        resposta = cache.obter(chave)
+        if resposta is not None:
+            # Mantém o streaming de tokens consistente quando a resposta vem do cache
+            papel = getattr(from_agent, "role", None)
+            emitir("token", conteudo=resposta, agente=papel.strip() if papel else None)
+        return resposta
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        with span("llm", pai=span_da_tarefa(from_task), alvo=self.model) as atual:
+            cache = obter_cache_completions()
+            chave = self._chave_cache(messages, tools, response_model)
+            resposta = self._resposta_em_cache(cache, chave, from_agent)
+            if resposta is not None:
+                _marcar_cache(atual)
+                return resposta
+
+            resposta = obter_limitador_llm().executar(
+                lambda: super(LLMLimitado, self).call(
+                    messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                    from_task=from_task, from_agent=from_agent, response_model=response_model,
+                ),
+                estimar_tokens(messages, self.max_tokens),
+            )
+            if cache is not None and chave is not None and isinstance(resposta, str) and resposta:
+                cache.salvar(chave, resposta)
+            return resposta
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        with span("llm", pai=span_da_tarefa(from_task), alvo=self.model) as atual:
+            # O cache de respostas é SQLite (leitura, gravação e remoção das antigas):
+            # roda em threads para não bloquear o event loop das outras pesquisas
+            cache = await asyncio.to_thread(obter_cache_completions)
+            chave = self._chave_cache(messages, tools, response_model)
+            resposta = None
+            if cache is not None and chave is not None:
+                resposta = await asyncio.to_thread(self._resposta_em_cache, cache, chave, from_agent)
+            if resposta is not None:
+                _marcar_cache(atual)
+                return resposta
+
+            resposta = await obter_limitador_llm().executar_async(
+                lambda: super(LLMLimitado, self).acall(
+                    messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                    from_task=from_task, from_agent=from_agent, response_model=response_model,
+                ),
+                estimar_tokens(messages, self.max_tokens),
+            )
+            if cache is not None and chave is not None and isinstance(resposta, str) and resposta:
+                await asyncio.to_thread(cache.salvar, chave, resposta)
+            return resposta
+
+def _marcar_cache(atual):
+    # Resposta do cache de completions: sem requisição ao Groq e sem tokens gastos
+    if atual is not None:
+        atual.atributos["cache"] = True
+
+_llm = None
+_llm_lock = threading.Lock()
+
+def obter_llm() -> LLMLimitado:
+    """
+    LLM compartilhado por todos os agentes, criado no primeiro uso
+    (e não na importação do módulo).
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                # Configurar LLM com a API key do Groq - reduzi temperature para diminuir verbosidade
+                _llm = LLMLimitado(
+                    model=MODELO_LLM, 
+                    temperature=0.1,  # Temperatura mais baixa para respostas mais diretas
+                    api_key=os.getenv("GROQ_API_KEY")
+                )
+    return _llm
+
+_configs: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_configs_lock = threading.Lock()
+
+def carregar_config(caminho: Path) -> Dict[str, Any]:
+    """
+    Lê um YAML de configuração uma única vez (relendo apenas se o arquivo mudar).
+    Retorna uma cópia, pois o CrewBase altera o dicionário ao montar agentes e tarefas.
+    """
+    caminho = str(caminho)
+    info = os.stat(caminho)
+    versao = (info.st_mtime_ns, info.st_size)
+    with _configs_lock:
+        em_cache = _configs.get(caminho)
+        if em_cache is None or em_cache[0] != versao:
+            with open(caminho, encoding="utf-8") as arquivo:
+                conteudo = yaml.safe_load(arquivo)
+            em_cache = (versao, conteudo if isinstance(conteudo, dict) else {})
+            _configs[caminho] = em_cache
+    return copy.deepcopy(em_cache[1])
 
 @CrewBase
 class PesquisaCrew:
@@ -29,7 +156,7 @@ class PesquisaCrew:
             config=self.agents_config["pesquisador"],
             verbose=True,
             tools=[search_web],
-            llm=llm,
+            llm=obter_llm(),
         )
     
     @agent
@@ -38,7 +165,7 @@ class PesquisaCrew:
             config=self.agents_config["sintetizador"],
             verbose=True,
             tools=[],
-            llm=llm,
+            llm=obter_llm(),
         )
     
     @agent 
@@ -47,7 +174,7 @@ class PesquisaCrew:
             config=self.agents_config["wikipedia_pesquisador"],
             verbose=True, 
             tools=[wikipedia_resumo, extract_key_points],
-            llm=llm,
+            llm=obter_llm(),
         )
         
     @agent
@@ -56,32 +183,43 @@ class PesquisaCrew:
             config=self.agents_config["redator_artigo"],
             verbose=True,  
             tools=[],
-            llm=llm,
+            llm=obter_llm(),
         )
     
+    def _criar_tarefa(self, nome: str) -> Task:
+        """
+        Tarefa a partir de config/tasks.yaml. Com `token_budget_contexto`, a saída
+        passa pelo compactador antes de virar contexto das tarefas seguintes.
+        """
+        config = dict(self.tasks_config[nome])
+        token_budget = config.pop("token_budget_contexto", None)
+        if token_budget:
+            return Task(config=config, guardrail=CompactadorContexto(token_budget, nome).validar)
+        return Task(config=config)
+
     @task
     def realizar_pesquisa(self) -> Task:
-        return Task(
-            config=self.tasks_config["realizar_pesquisa"],
-        )
+        return self._criar_tarefa("realizar_pesquisa")
     
     @task
     def sintetizar_informacoes(self) -> Task:
-        return Task(
-            config=self.tasks_config["sintetizar_informacoes"],
-        )
+        return self._criar_tarefa("sintetizar_informacoes")
     
     @task
     def pesquisa_wikipedia_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["pesquisa_wikipedia_task"],
-        )
+        return self._criar_tarefa("pesquisa_wikipedia_task")
 
     @task
     def escrever_artigo_task(self) -> Task:
-        return Task(
-            config=self.tasks_config["escrever_artigo_task"],
-        )
+        return self._criar_tarefa("escrever_artigo_task")
+
+    @task
+    def escrever_artigo_multifonte_task(self) -> Task:
+        return self._criar_tarefa("escrever_artigo_multifonte_task")
+
+    @task
+    def escrever_artigo_direto_task(self) -> Task:
+        return self._criar_tarefa("escrever_artigo_direto_task")
 
     @crew
     def crew(self) -> Crew:
@@ -116,6 +254,40 @@ class PesquisaCrew:
             verbose=False, 
         )
         
+    def multifonte_crew(self) -> Crew:
+        """
+        Fluxo com as fontes (Wikipedia e DuckDuckGo) coletadas em paralelo antes do
+        kickoff, sem agentes de pesquisa: o redator recebe o conteúdo já mesclado em {fontes}
+        """
+        return Crew(
+            agents=[self.redator_artigo()],
+            tasks=[self.escrever_artigo_multifonte_task()],
+            process=Process.sequential,
+            verbose=False,
+        )
+
+    def wikipedia_direto_crew(self) -> Crew:
+        """
+        Fluxo da Wikipedia sem o agente pesquisador: o extrato é buscado e condensado
+        antes do kickoff e chega ao redator em {extrato}, com uma única chamada ao LLM
+        """
+        return Crew(
+            agents=[self.redator_artigo()],
+            tasks=[self.escrever_artigo_direto_task()],
+            process=Process.sequential,
+            verbose=False,
+        )
+
+    def montar_fluxo(self, fluxo: str = FLUXO_PADRAO) -> Crew:
+        """
+        Monta apenas a crew do fluxo pedido. Diferente de crew(), não instancia
+        os agentes e tarefas dos outros fluxos.
+        """
+        try:
+            return getattr(self, FLUXOS[fluxo])()
+        except KeyError:
+            raise ValueError(f"Fluxo desconhecido: {fluxo}") from None
+
     def format_output(self, result) -> PesquisaOutput:
         """
         Formata o resultado da Crew usando o modelo Pydantic.
@@ -143,3 +315,69 @@ class PesquisaCrew:
                 resultados=[PesquisaResultado(topico="Erro", descricao=error_msg)],
                 resumo=f"Ocorreu um erro ao formatar o resultado: {error_msg}. Resultado original: {result_str[:200]}"
             )
+
+# O CrewBase injeta um load_yaml que relê os arquivos a cada PesquisaCrew();
+# com o cache, os YAML são interpretados uma vez por processo
+PesquisaCrew.load_yaml = staticmethod(carregar_config)
+
+# Fluxos disponíveis e o método que monta cada um
+FLUXOS = {
+    "wikipedia_artigo": "wikipedia_artigo_crew",
+    "pesquisa_ddg": "pesquisa_ddg_crew",
+    "multifonte": "multifonte_crew",
+    "wikipedia_direto": "wikipedia_direto_crew",
+}
+assert set(FLUXOS) == set(FLUXOS_DISPONIVEIS)
+
+def criar_crew(fluxo: str = FLUXO_PADRAO, assincrona: bool = False) -> Tuple[PesquisaCrew, Crew]:
+    """
+    Fábrica usada a cada pesquisa: retorna uma PesquisaCrew (configuração já
+    interpretada, ferramentas e LLM compartilhados) e a crew pronta para kickoff.
+    Cada chamada devolve agentes e tarefas novos, então pode ser usada de várias threads.
+    Com `assincrona`, a crew é preparada para o akickoff (ver usar_executor_assincrono).
+    """
+    instancia = PesquisaCrew()
+    crew_obj = instancia.montar_fluxo(fluxo)
+    if assincrona:
+        usar_executor_assincrono(crew_obj)
+    return instancia, crew_obj
+
+def usar_executor_assincrono(crew_obj: Crew) -> None:
+    """
+    O executor padrão dos agentes (AgentExecutor) roda cada passo síncrono, inclusive
+    as chamadas ao LLM e às ferramentas, em asyncio.to_thread mesmo no akickoff.
+    O CrewAgentExecutor tem um laço assíncrono de verdade (llm.acall e
+    ferramenta.ainvoke), que mantém as pesquisas no event loop. A crewai o marca
+    como obsoleto; o aviso é silenciado aqui.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        for agente in crew_obj.agents:
+            agente.executor_class = CrewAgentExecutor
+
+def montar_entradas(fluxo: str, tema: str) -> Dict[str, Any]:
+    """
+    Entradas do kickoff de cada fluxo. No multifonte e no wikipedia_direto, as
+    fontes são consultadas aqui, antes de a crew começar.
+    """
+    entradas: Dict[str, Any] = {"tema": tema}
+    if fluxo == "multifonte":
+        from tools.multifonte import coletar_fontes_sync, mesclar_fontes
+        entradas["fontes"] = mesclar_fontes(coletar_fontes_sync(tema))
+    elif fluxo == "wikipedia_direto":
+        # Mesmos limites que a tarefa do pesquisador pede ao agente (max_chars=1500)
+        entradas["extrato"] = extrato_condensado(tema, max_chars=1500)
+    return entradas
+
+async def montar_entradas_async(fluxo: str, tema: str) -> Dict[str, Any]:
+    """
+    Versão de montar_entradas para o kickoff assíncrono: as fontes são consultadas
+    no event loop em execução, com o cliente HTTP assíncrono dele.
+    """
+    entradas: Dict[str, Any] = {"tema": tema}
+    if fluxo == "multifonte":
+        from tools.multifonte import coletar_fontes, mesclar_fontes
+        entradas["fontes"] = mesclar_fontes(await coletar_fontes(tema))
+    elif fluxo == "wikipedia_direto":
+        entradas["extrato"] = await extrato_condensado_async(tema, max_chars=1500)
+    return entradas
@@ -0,0 +1,97 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Função que recebe os eventos da execução atual (uma por pesquisa em andamento)
+Observador = Callable[[Dict[str, Any]], None]
+_observador_atual: contextvars.ContextVar[Optional[Observador]] = contextvars.ContextVar(
+    "observador_atual", default=None
+)
+
+_handlers_registrados = False
+_registro_lock = threading.Lock()
+
+
+def emitir(tipo: str, **dados: Any) -> None:
+    """
+    Envia um evento ao observador da execução atual, se houver um.
+    Falhas do observador nunca interrompem a pesquisa.
+    """
+    observador = _observador_atual.get()
+    if observador is None:
+        return
+    try:
+        observador({"tipo": tipo, **dados})
+    except Exception:
+        pass
+
+
+@contextmanager
+def observar(observador: Observador) -> Iterator[None]:
+    """
+    Direciona os eventos emitidos no contexto atual (incluindo os da crewai) para `observador`.
+    """
+    registrar_handlers_crewai()
+    token = _observador_atual.set(observador)
+    try:
+        yield
+    finally:
+        _observador_atual.reset(token)
+
+
+def _papel_agente(evento: Any) -> Optional[str]:
+    papel = getattr(evento, "agent_role", None)
+    if papel is None:
+        agente = getattr(getattr(evento, "task", None), "agent", None)
+        papel = getattr(agente, "role", None)
+    return papel.strip() if papel else None
+
+
+def registrar_handlers_crewai() -> None:
+    """
+    Registra (uma única vez) handlers no event bus da crewai que repassam
+    tarefas, ferramentas e tokens do LLM para o observador da execução atual.
+
+    O event bus executa os handlers com uma cópia do contexto de quem emitiu o
+    evento, então cada handler enxerga o observador da sua própria pesquisa.
+    """
+    global _handlers_registrados
+    with _registro_lock:
+        if _handlers_registrados:
+            return
+        _handlers_registrados = True
+
+    try:
+        from crewai.events import crewai_event_bus
+        from crewai.events.types.llm_events import LLMStreamChunkEvent
+        from crewai.events.types.task_events import TaskCompletedEvent, TaskStartedEvent
+        from crewai.events.types.tool_usage_events import (
+            ToolUsageFinishedEvent,
+            ToolUsageStartedEvent,
+        )
+    except ImportError:
+        # Versões antigas da crewai não possuem event bus: apenas os eventos próprios são emitidos
+        return
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def _tarefa_iniciada(source, event):
+        emitir("tarefa_inicio", tarefa=event.task_name, agente=_papel_agente(event))
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def _tarefa_concluida(source, event):
+        emitir("tarefa_fim", tarefa=event.task_name, agente=_papel_agente(event))
+
+    @crewai_event_bus.on(ToolUsageStartedEvent)
+    def _ferramenta_iniciada(source, event):
+        emitir("ferramenta_inicio", ferramenta=event.tool_name, agente=_papel_agente(event))
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def _ferramenta_concluida(source, event):
+        duracao = (event.finished_at - event.started_at).total_seconds()
+        emitir("ferramenta_fim", ferramenta=event.tool_name, agente=_papel_agente(event),
+               duracao=round(duracao, 3))
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _token(source, event):
+        emitir("token", conteudo=event.chunk, agente=_papel_agente(event))
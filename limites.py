@@ -0,0 +1,554 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Iterator, Optional, Tuple, TypeVar
+
+from tokens import CARACTERES_POR_TOKEN
+
+T = TypeVar("T")
+
+
+class _FilaAsync:
+    """
+    Fila FIFO de corrotinas, com um asyncio.Lock por event loop: só a primeira da
+    fila espera ativamente (dorme até o saldo ou a pausa acabar); as demais não
+    acordam até chegar a sua vez.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._travas: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = \
+            weakref.WeakKeyDictionary()
+
+    def trava(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            trava = self._travas.get(loop)
+            if trava is None:
+                trava = self._travas[loop] = asyncio.Lock()
+            return trava
+
+
+class BaldeTokens:
+    """
+    Limitador token bucket thread-safe: até `capacidade` operações em rajada,
+    reabastecido continuamente a `taxa_por_segundo`. Taxa 0 desativa o limite.
+    """
+
+    def __init__(self, taxa_por_segundo: float, capacidade: Optional[float] = None):
+        self.taxa_por_segundo = taxa_por_segundo
+        self.capacidade = capacidade if capacidade is not None else max(1.0, taxa_por_segundo)
+        self._tokens = self.capacidade
+        self._atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+        self.esperas = 0
+        self.tempo_espera_total = 0.0
+        self._fila_async = _FilaAsync()
+
+    @classmethod
+    def por_minuto(cls, limite: float, capacidade: Optional[float] = None) -> "BaldeTokens":
+        """Bucket de `limite` operações por minuto; por padrão permite a rajada de um minuto inteiro."""
+        return cls(limite / 60.0, capacidade if capacidade is not None else max(1.0, limite))
+
+    @property
+    def ilimitado(self) -> bool:
+        return self.taxa_por_segundo <= 0
+
+    def _reabastecer(self, agora: float) -> None:
+        decorrido = agora - self._atualizado_em
+        self._tokens = min(self.capacidade, self._tokens + decorrido * self.taxa_por_segundo)
+        self._atualizado_em = agora
+
+    def tentar_adquirir(self, quantidade: float = 1) -> float:
+        """
+        Consome `quantidade` tokens se houver saldo e retorna 0.
+        Caso contrário, retorna quantos segundos faltam para o saldo ser suficiente.
+        """
+        if self.ilimitado:
+            return 0.0
+        with self._lock:
+            self._reabastecer(time.monotonic())
+            # Pedidos maiores que a capacidade são limitados a ela para não bloquear para sempre
+            quantidade = min(quantidade, self.capacidade)
+            if self._tokens >= quantidade:
+                self._tokens -= quantidade
+                return 0.0
+            return (quantidade - self._tokens) / self.taxa_por_segundo
+
+    async def _tentar_adquirir_async(self, quantidade: float) -> float:
+        # Saldo em memória: a consulta não bloqueia o event loop
+        return self.tentar_adquirir(quantidade)
+
+    def adquirir(self, quantidade: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Bloqueia até conseguir consumir `quantidade` tokens.
+        Retorna False se o `timeout` (segundos) esgotar antes disso.
+        """
+        inicio = time.monotonic()
+        while True:
+            espera = self.tentar_adquirir(quantidade)
+            if espera == 0:
+                decorrido = time.monotonic() - inicio
+                if decorrido > 0.001:
+                    with self._lock:
+                        self.esperas += 1
+                        self.tempo_espera_total += decorrido
+                return True
+            if timeout is not None and time.monotonic() - inicio + espera > timeout:
+                return False
+            time.sleep(espera)
+
+    async def adquirir_async(self, quantidade: float = 1) -> None:
+        """
+        Versão de `adquirir` para corrotinas: espera com asyncio.sleep, sem ocupar uma
+        thread. As corrotinas são atendidas na ordem de chegada.
+        """
+        if self.ilimitado:
+            return
+        inicio = time.monotonic()
+        async with self._fila_async.trava():
+            while True:
+                espera = await self._tentar_adquirir_async(quantidade)
+                if espera == 0:
+                    break
+                await asyncio.sleep(espera)
+        decorrido = time.monotonic() - inicio
+        if decorrido > 0.001:
+            with self._lock:
+                self.esperas += 1
+                self.tempo_espera_total += decorrido
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            self._reabastecer(time.monotonic())
+            return {
+                "limite_por_minuto": round(self.taxa_por_segundo * 60, 2),
+                "tokens_disponiveis": round(self._tokens, 2),
+                "esperas": self.esperas,
+                "tempo_espera_total_segundos": round(self.tempo_espera_total, 3),
+            }
+
+
+class BaldeTokensSQLite(BaldeTokens):
+    """
+    Token bucket com o saldo guardado em um banco SQLite local, compartilhado
+    por todos os processos que usam o mesmo arquivo (ex.: workers do uvicorn).
+    """
+
+    def __init__(self, caminho: str, nome: str, taxa_por_segundo: float,
+                 capacidade: Optional[float] = None):
+        super().__init__(taxa_por_segundo, capacidade)
+        self.caminho = caminho
+        self.nome = nome
+        self._local = threading.local()
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        conexao = self._conexao()
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS baldes (nome TEXT PRIMARY KEY, tokens REAL NOT NULL, atualizado_em REAL NOT NULL)"
+        )
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def tentar_adquirir(self, quantidade: float = 1) -> float:
+        if self.ilimitado:
+            return 0.0
+        quantidade = min(quantidade, self.capacidade)
+        conexao = self._conexao()
+        # Relógio de parede: precisa ser comparável entre processos
+        agora = time.time()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conexao.execute(
+                "SELECT tokens, atualizado_em FROM baldes WHERE nome = ?", (self.nome,)
+            ).fetchone()
+            tokens = self.capacidade if linha is None else min(
+                self.capacidade, linha[0] + max(0.0, agora - linha[1]) * self.taxa_por_segundo
+            )
+            espera = 0.0
+            if tokens >= quantidade:
+                tokens -= quantidade
+            else:
+                espera = (quantidade - tokens) / self.taxa_por_segundo
+            conexao.execute(
+                "INSERT OR REPLACE INTO baldes (nome, tokens, atualizado_em) VALUES (?, ?, ?)",
+                (self.nome, tokens, agora),
+            )
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._tokens = tokens
+        return espera
+
+    async def _tentar_adquirir_async(self, quantidade: float) -> float:
+        # BEGIN IMMEDIATE pode esperar o lock do arquivo (até 30s): roda em uma thread
+        return await asyncio.to_thread(self.tentar_adquirir, quantidade)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "limite_por_minuto": round(self.taxa_por_segundo * 60, 2),
+                "tokens_disponiveis": round(self._tokens, 2),
+                "esperas": self.esperas,
+                "tempo_espera_total_segundos": round(self.tempo_espera_total, 3),
+                "compartilhado": self.caminho,
+            }
+
+
+def _entregar_vaga(vaga: asyncio.Future) -> None:
+    # Uma espera cancelada devolve a vaga sozinha (ver entrar_async)
+    if not vaga.done():
+        vaga.set_result(None)
+
+
+class ConcorrenciaAdaptativa:
+    """
+    Limite de chamadas simultâneas ajustado por AIMD: cada sucesso aumenta o
+    limite em 1/limite (≈ +1 a cada "janela" de chamadas) e cada throttle o
+    multiplica por `fator_reducao`.
+    """
+
+    def __init__(self, minimo: int = 1, maximo: int = 8, inicial: Optional[float] = None,
+                 fator_reducao: float = 0.5):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.fator_reducao = fator_reducao
+        self.limite = float(inicial if inicial is not None else maximo)
+        self.em_uso = 0
+        self.reducoes = 0
+        self._condicao = threading.Condition()
+        # Corrotinas aguardando vaga, na ordem de chegada (ver entrar_async)
+        self._esperas_async: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def entrar(self) -> None:
+        with self._condicao:
+            while self._esperas_async or self.em_uso >= int(self.limite):
+                self._condicao.wait()
+            self.em_uso += 1
+
+    async def entrar_async(self) -> None:
+        """
+        Versão de `entrar` para corrotinas. Quem libera uma vaga (thread ou corrotina,
+        em sair) a reserva para a primeira corrotina da fila e a acorda no loop dela.
+        """
+        loop = asyncio.get_running_loop()
+        with self._condicao:
+            if not self._esperas_async and self.em_uso < int(self.limite):
+                self.em_uso += 1
+                return
+            vaga = loop.create_future()
+            self._esperas_async.append((loop, vaga))
+        try:
+            await vaga
+        except asyncio.CancelledError:
+            with self._condicao:
+                try:
+                    self._esperas_async.remove((loop, vaga))
+                    reservada = False
+                except ValueError:
+                    reservada = True
+            if reservada:
+                # A vaga já tinha sido reservada para esta espera: devolve
+                self._liberar()
+            raise
+
+    def sair(self, throttled: bool = False) -> None:
+        with self._condicao:
+            self.em_uso -= 1
+            if throttled:
+                self.limite = max(float(self.minimo), self.limite * self.fator_reducao)
+                self.reducoes += 1
+            else:
+                self.limite = min(float(self.maximo), self.limite + 1.0 / self.limite)
+            self._despertar()
+
+    def _liberar(self) -> None:
+        with self._condicao:
+            self.em_uso -= 1
+            self._despertar()
+
+    def _despertar(self) -> None:
+        # Com o lock: primeiro as corrotinas (na ordem de chegada), depois as threads
+        while self._esperas_async and self.em_uso < int(self.limite):
+            loop, vaga = self._esperas_async.popleft()
+            self.em_uso += 1
+            try:
+                loop.call_soon_threadsafe(_entregar_vaga, vaga)
+            except RuntimeError:
+                # O loop da espera já terminou
+                self.em_uso -= 1
+        self._condicao.notify_all()
+
+    def estatisticas(self) -> dict:
+        with self._condicao:
+            return {
+                "limite": round(self.limite, 2),
+                "em_uso": self.em_uso,
+                "reducoes": self.reducoes,
+            }
+
+
+def _cadeia_erros(erro: BaseException) -> Iterator[BaseException]:
+    vistos = set()
+    atual: Optional[BaseException] = erro
+    while atual is not None and id(atual) not in vistos:
+        vistos.add(id(atual))
+        yield atual
+        atual = atual.__cause__ or atual.__context__
+
+
+def erro_de_throttle(erro: BaseException) -> bool:
+    """Indica se o erro é um 429 / rate limit do provedor."""
+    for candidato in _cadeia_erros(erro):
+        status = getattr(candidato, "status_code", None)
+        if status is None:
+            status = getattr(getattr(candidato, "response", None), "status_code", None)
+        if status == 429:
+            return True
+        mensagem = str(candidato).lower()
+        if "rate limit" in mensagem or "ratelimit" in mensagem or "too many requests" in mensagem:
+            return True
+    return False
+
+
+def retry_after_do_erro(erro: BaseException) -> Optional[float]:
+    """Lê o cabeçalho Retry-After da resposta associada ao erro, se houver."""
+    for candidato in _cadeia_erros(erro):
+        headers = getattr(getattr(candidato, "response", None), "headers", None)
+        if headers is None:
+            headers = getattr(candidato, "headers", None)
+        if headers is None:
+            continue
+        try:
+            valor = headers.get("retry-after") or headers.get("Retry-After")
+            if valor is not None:
+                return max(0.0, float(valor))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return None
+
+
+class LimitadorLLM:
+    """
+    Controla as chamadas ao LLM compartilhado por todos os agentes:
+    - buckets de requisições/minuto e tokens/minuto (opcionalmente entre processos)
+    - concorrência adaptativa (AIMD), reduzida a cada 429
+    - novas tentativas com backoff exponencial e jitter em 429; durante o
+      backoff (ou o Retry-After do provedor) nenhuma thread inicia novas chamadas
+    """
+
+    def __init__(self, requisicoes: BaldeTokens, tokens: BaldeTokens,
+                 concorrencia: ConcorrenciaAdaptativa, max_tentativas: int = 4,
+                 espera_base: float = 1.0, espera_maxima: float = 30.0):
+        self.requisicoes = requisicoes
+        self.tokens = tokens
+        self.concorrencia = concorrencia
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._pausado_ate = 0.0
+        self._fila_async = _FilaAsync()
+        self.chamadas = 0
+        self.throttles = 0
+        self.novas_tentativas = 0
+        self.falhas = 0
+        self.tempo_espera_total = 0.0
+
+    @classmethod
+    def from_env(cls) -> "LimitadorLLM":
+        """
+        Configuração: LLM_RPM, LLM_TPM (0 = sem limite), LLM_CONCORRENCIA_MAX,
+        LLM_MAX_TENTATIVAS e LIMITE_LLM_DB (SQLite para compartilhar os buckets entre processos).
+        """
+        rpm = float(os.getenv("LLM_RPM", "30"))
+        tpm = float(os.getenv("LLM_TPM", "0"))
+        caminho = os.getenv("LIMITE_LLM_DB", "")
+        if caminho:
+            requisicoes = BaldeTokensSQLite(caminho, "llm_rpm", rpm / 60.0, max(1.0, rpm))
+            tokens = BaldeTokensSQLite(caminho, "llm_tpm", tpm / 60.0, max(1.0, tpm))
+        else:
+            requisicoes, tokens = BaldeTokens.por_minuto(rpm), BaldeTokens.por_minuto(tpm)
+        return cls(
+            requisicoes,
+            tokens,
+            ConcorrenciaAdaptativa(maximo=int(os.getenv("LLM_CONCORRENCIA_MAX", "4"))),
+            max_tentativas=int(os.getenv("LLM_MAX_TENTATIVAS", "4")),
+        )
+
+    def calcular_espera(self, tentativa: int, erro: BaseException) -> float:
+        """Retry-After do provedor ou backoff exponencial com jitter."""
+        retry_after = retry_after_do_erro(erro)
+        if retry_after is not None:
+            return retry_after
+        espera = min(self.espera_maxima, self.espera_base * (2 ** (tentativa - 1)))
+        return espera / 2 + random.uniform(0, espera / 2)
+
+    def _tempo_pausa(self) -> float:
+        with self._lock:
+            return max(0.0, self._pausado_ate - time.monotonic())
+
+    def _pausar(self, segundos: float) -> None:
+        with self._lock:
+            self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+
+    def _registrar_espera(self, segundos: float) -> None:
+        with self._lock:
+            self.tempo_espera_total += segundos
+
+    def _aguardar_liberacao(self, tokens_estimados: int) -> None:
+        inicio = time.monotonic()
+        while True:
+            pausa = self._tempo_pausa()
+            if pausa <= 0:
+                break
+            time.sleep(pausa)
+        self.requisicoes.adquirir()
+        self.tokens.adquirir(tokens_estimados)
+        self.concorrencia.entrar()
+        self._registrar_espera(time.monotonic() - inicio)
+
+    async def _aguardar_liberacao_async(self, tokens_estimados: int) -> None:
+        # Mesma sequência de _aguardar_liberacao, sem bloquear o event loop nem ocupar
+        # uma thread por chamada: com muitas pesquisas assíncronas, esperas em threads
+        # esgotariam o executor padrão, que a crewai também usa para as ferramentas.
+        # As chamadas passam pela pausa e pelos buckets em fila: só a primeira acorda
+        inicio = time.monotonic()
+        async with self._fila_async.trava():
+            while True:
+                pausa = self._tempo_pausa()
+                if pausa <= 0:
+                    break
+                await asyncio.sleep(pausa)
+            await self.requisicoes.adquirir_async()
+            await self.tokens.adquirir_async(tokens_estimados)
+        await self.concorrencia.entrar_async()
+        self._registrar_espera(time.monotonic() - inicio)
+
+    def _registrar_resultado(self, erro: Optional[BaseException], tentativa: int) -> Optional[float]:
+        """
+        Atualiza as métricas e o controle de concorrência.
+        Retorna quanto esperar antes de tentar novamente, ou None se o erro deve ser propagado.
+        """
+        throttled = erro is not None and erro_de_throttle(erro)
+        self.concorrencia.sair(throttled)
+        with self._lock:
+            self.chamadas += 1
+            if throttled:
+                self.throttles += 1
+        if erro is None:
+            return None
+        if not throttled or tentativa >= self.max_tentativas:
+            with self._lock:
+                self.falhas += 1
+            return None
+        espera = self.calcular_espera(tentativa, erro)
+        self._pausar(espera)
+        with self._lock:
+            self.novas_tentativas += 1
+        return espera
+
+    def executar(self, funcao: Callable[[], T], tokens_estimados: int = 0) -> T:
+        for tentativa in range(1, self.max_tentativas + 1):
+            self._aguardar_liberacao(tokens_estimados)
+            try:
+                resultado = funcao()
+            except Exception as erro:
+                if self._registrar_resultado(erro, tentativa) is None:
+                    raise
+                continue
+            except BaseException:
+                self.concorrencia.sair()
+                raise
+            self._registrar_resultado(None, tentativa)
+            return resultado
+        raise RuntimeError("Número máximo de tentativas do LLM excedido")
+
+    async def executar_async(self, funcao: Callable[[], Awaitable[T]], tokens_estimados: int = 0) -> T:
+        for tentativa in range(1, self.max_tentativas + 1):
+            await self._aguardar_liberacao_async(tokens_estimados)
+            try:
+                resultado = await funcao()
+            except Exception as erro:
+                if self._registrar_resultado(erro, tentativa) is None:
+                    raise
+                continue
+            except BaseException:
+                # Cancelamento: libera a vaga sem contar como sucesso ou throttle
+                self.concorrencia.sair()
+                raise
+            self._registrar_resultado(None, tentativa)
+            return resultado
+        raise RuntimeError("Número máximo de tentativas do LLM excedido")
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            metricas = {
+                "chamadas": self.chamadas,
+                "throttles": self.throttles,
+                "novas_tentativas": self.novas_tentativas,
+                "falhas": self.falhas,
+                "tempo_espera_total_segundos": round(self.tempo_espera_total, 3),
+            }
+        metricas["concorrencia"] = self.concorrencia.estatisticas()
+        metricas["requisicoes_por_minuto"] = self.requisicoes.estatisticas()
+        metricas["tokens_por_minuto"] = self.tokens.estatisticas()
+        return metricas
+
+
+def estimar_tokens(mensagens: Any, max_tokens: Optional[float] = None) -> int:
+    """
+    Estimativa (≈4 caracteres por token) dos tokens de uma chamada,
+    somando o prompt e a resposta máxima esperada.
+    """
+    if isinstance(mensagens, str):
+        caracteres = len(mensagens)
+    else:
+        caracteres = sum(len(str(m.get("content", ""))) for m in mensagens or [] if isinstance(m, dict))
+    return caracteres // CARACTERES_POR_TOKEN + int(max_tokens or 512)
+
+
+_limite_lock = threading.Lock()
+_limitador_llm: Optional[LimitadorLLM] = None
+
+
+def obter_limitador_llm() -> LimitadorLLM:
+    """Limitador compartilhado pelas chamadas ao LLM dos agentes."""
+    global _limitador_llm
+    if _limitador_llm is None:
+        with _limite_lock:
+            if _limitador_llm is None:
+                _limitador_llm = LimitadorLLM.from_env()
+    return _limitador_llm
+
+
+_limite_pesquisas: Optional[BaldeTokens] = None
+
+
+def obter_limite_pesquisas() -> BaldeTokens:
+    """
+    Limite global de pesquisas iniciadas por minuto (LIMITE_PESQUISAS_POR_MINUTO,
+    0 = sem limite), compartilhado pelos lotes da API e por run_pesquisador_batch.
+    """
+    global _limite_pesquisas
+    if _limite_pesquisas is None:
+        with _limite_lock:
+            if _limite_pesquisas is None:
+                limite = float(os.getenv("LIMITE_PESQUISAS_POR_MINUTO", "0"))
+                rajada = os.getenv("LIMITE_PESQUISAS_RAJADA")
+                _limite_pesquisas = BaldeTokens.por_minuto(limite, float(rajada) if rajada else None)
+    return _limite_pesquisas
@@ -1,13 +1,154 @@
-from crew import PesquisaCrew
+import asyncio
 import os
+import queue
+import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 from dotenv import load_dotenv
+from cache import (
+    DIRETORIO_BASE,
+    chave_cache,
+    hash_configuracao,
+    normalizar_tema,
+    obter_cache_artigos,
+    sem_cache_completions,
+)
+from compactacao import tema_da_pesquisa
+from configuracao import FLUXO_PADRAO, MODELO_LLM, memoria_semantica_habilitada
+from eventos import Observador, observar
+from limites import obter_limite_pesquisas
 from models import PesquisaOutput, PesquisaResultado
+from rastreamento import anotar, span
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-def run_pesquisador(tema: str):
+# Prompts da crew: alterar os YAML invalida o cache de artigos
+ARQUIVOS_CONFIG = (
+    DIRETORIO_BASE / "config" / "agents.yaml",
+    DIRETORIO_BASE / "config" / "tasks.yaml",
+)
+
+_hash_config: Optional[Tuple[Tuple[Any, ...], str]] = None
+_hash_config_lock = threading.Lock()
+
+def hash_config_atual() -> str:
+    """
+    Hash dos prompts atuais. A crew relê os YAML quando eles mudam (crew.carregar_config),
+    então o hash acompanha: é recalculado apenas quando o mtime ou o tamanho de um
+    dos arquivos muda.
+    """
+    global _hash_config
+    versoes = []
+    for caminho in ARQUIVOS_CONFIG:
+        try:
+            info = os.stat(caminho)
+            versoes.append((info.st_mtime_ns, info.st_size))
+        except OSError:
+            versoes.append(None)
+    versao = tuple(versoes)
+    with _hash_config_lock:
+        if _hash_config is None or _hash_config[0] != versao:
+            _hash_config = (versao, hash_configuracao(*ARQUIVOS_CONFIG))
+        return _hash_config[1]
+
+def cache_habilitado() -> bool:
+    return os.getenv("CACHE_ARTIGOS_HABILITADO", "1") not in ("0", "false", "False")
+
+def obter_memoria():
+    """Memória semântica (semantico.py), importada apenas quando habilitada."""
+    if not memoria_semantica_habilitada():
+        return None
+    from semantico import obter_memoria_semantica
+    return obter_memoria_semantica()
+
+# A crewai (e o LiteLLM) levam alguns segundos para importar: o módulo crew só é
+# carregado na primeira pesquisa ou por preaquecer(), para que a API e a interface
+# fiquem disponíveis imediatamente
+
+def criar_crew(fluxo: str = FLUXO_PADRAO, assincrona: bool = False):
+    from crew import criar_crew as criar
+    return criar(fluxo, assincrona)
+
+def montar_entradas(fluxo: str, tema: str) -> Dict[str, Any]:
+    from crew import montar_entradas as montar
+    return montar(fluxo, tema)
+
+async def montar_entradas_async(fluxo: str, tema: str) -> Dict[str, Any]:
+    from crew import montar_entradas_async as montar
+    return await montar(fluxo, tema)
+
+def preaquecer():
+    """Importa a crewai, cria o LLM e lê a configuração antes da primeira pesquisa."""
+    from crew import obter_llm
+    obter_llm()
+    criar_crew(FLUXO_PADRAO)
+
+def preaquecer_em_background() -> threading.Thread:
+    thread = threading.Thread(target=preaquecer, name="preaquecer-crew", daemon=True)
+    thread.start()
+    return thread
+
+@contextmanager
+def llm_em_streaming():
+    """Faz o LLM compartilhado gerar tokens incrementalmente dentro do bloco."""
+    try:
+        from crewai.llms.base_llm import call_stream_override
+    except ImportError:
+        # Versões antigas da crewai: o artigo é entregue apenas no final
+        yield
+        return
+    from crew import obter_llm
+    with call_stream_override(obter_llm(), True):
+        yield
+
+def aguardar_eventos_crewai():
+    """Garante que os eventos da crewai foram entregues antes do resultado final."""
+    try:
+        from crewai.events import crewai_event_bus
+        crewai_event_bus.flush(timeout=5)
+    except (ImportError, AttributeError):
+        pass
+
+def apenas_tokens_do_agente(papel: str, ao_evento: Observador) -> Observador:
+    """Repassa todos os eventos, exceto tokens gerados por outros agentes."""
+    def observador(evento: Dict[str, Any]) -> None:
+        if evento["tipo"] != "token" or evento.get("agente") == papel:
+            ao_evento(evento)
+    return observador
+
+def _resultado_sem_crew(
+    tema: str, usar_cache: bool, fluxo: str, ao_evento: Optional[Observador] = None
+) -> Optional[PesquisaOutput]:
+    """
+    Resultado que dispensa a crew: artigo em cache, artigo de um tema semelhante
+    ou o erro de chave do Groq não configurada. None quando a crew precisa rodar.
+    """
+    # Consulta o cache antes de qualquer chamada ao Groq
+    cache = obter_cache_artigos() if usar_cache and cache_habilitado() else None
+    if cache is not None:
+        em_cache = cache.obter(chave_cache(tema, fluxo, MODELO_LLM, hash_config_atual()))
+        if em_cache is not None:
+            anotar(cache="artigo")
+            if ao_evento is not None:
+                ao_evento({"tipo": "cache"})
+            return em_cache
+
+    # Temas quase iguais a um já pesquisado ("a revolução francesa de 1789") reaproveitam o artigo
+    memoria = obter_memoria() if usar_cache else None
+    if memoria is not None:
+        semelhante = memoria.buscar_artigo(tema, fluxo)
+        if semelhante is not None:
+            output, tema_semelhante, similaridade = semelhante
+            anotar(cache="semantico")
+            if ao_evento is not None:
+                ao_evento({"tipo": "cache", "semantico": True, "tema_semelhante": tema_semelhante,
+                           "similaridade": round(similaridade, 3)})
+            return output
+
     # Verifica se a chave API está configurada
     if not os.getenv("GROQ_API_KEY"):
         return PesquisaOutput(
@@ -15,26 +156,176 @@ def run_pesquisador(tema: str):
             resultados=[PesquisaResultado(topico="Erro", descricao="Chave API do Groq não configurada")],
             resumo="Erro: Chave API do Groq não configurada. Por favor, configure no arquivo .env"
         )
-    
+    return None
+
+def _guardar_resultado(tema: str, usar_cache: bool, fluxo: str, output: PesquisaOutput) -> None:
+    # apenas resultados válidos vão para o cache
+    if resultado_com_erro(output):
+        return
+    cache = obter_cache_artigos() if usar_cache and cache_habilitado() else None
+    if cache is not None:
+        cache.salvar(chave_cache(tema, fluxo, MODELO_LLM, hash_config_atual()), tema, output)
+    memoria = obter_memoria()
+    if memoria is not None:
+        memoria.registrar_artigo(tema, fluxo, output)
+
+def _resultado_de_erro(e: Exception) -> PesquisaOutput:
+    # Output mínimo com o traceback completo para debugging (chamar dentro do except)
+    error_detail = f"{str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+    return PesquisaOutput(
+        tema="Erro na execução",
+        resultados=[PesquisaResultado(topico="Erro", descricao=str(e))],
+        resumo=f"Ocorreu um erro ao processar sua solicitação: {error_detail[:300]}..."
+    )
+
+def run_pesquisador(
+    tema: str,
+    usar_cache: bool = True,
+    ao_evento: Optional[Observador] = None,
+    fluxo: str = FLUXO_PADRAO,
+):
+    """
+    Executa a crew para o tema. Se `ao_evento` for informado, recebe o progresso
+    (tarefas, ferramentas, Wikipedia) e os tokens do artigo conforme são gerados.
+    `usar_cache=False` ignora tanto o cache de artigos quanto o de respostas do LLM.
+    `fluxo` escolhe a crew executada (ver configuracao.FLUXOS_DISPONIVEIS).
+    """
+    pronto = _resultado_sem_crew(tema, usar_cache, fluxo, ao_evento)
+    if pronto is not None:
+        return pronto
+
     try:
-        # inicializo a crew
-        crew_instance = PesquisaCrew()
-        
-        # rodo a ia com o processo sequencial - o pesquisador vai executar primeiro, depois o sintetizador
-        crew_obj = crew_instance.crew()
-        result = crew_obj.kickoff(inputs={"tema": tema})
-        
+        # monto a crew a partir da configuração já carregada (agentes e tarefas novos a cada pesquisa)
+        with span("crew.montagem", alvo=fluxo):
+            crew_instance, crew_obj = criar_crew(fluxo)
+
+        # rodo a ia com o processo sequencial - o pesquisador vai executar primeiro, depois o redator
+        with ExitStack() as contexto:
+            # O compactador de contexto prioriza as sentenças sobre o tema
+            contexto.enter_context(tema_da_pesquisa(tema))
+            if not usar_cache:
+                # Sem cache também para as respostas individuais do LLM
+                contexto.enter_context(sem_cache_completions())
+            if ao_evento is not None:
+                papel_redator = crew_instance.redator_artigo().role.strip()
+                contexto.enter_context(observar(apenas_tokens_do_agente(papel_redator, ao_evento)))
+                contexto.enter_context(llm_em_streaming())
+            # Fontes consultadas antes da crew (multifonte e wikipedia_direto)
+            with span("crew.entradas", alvo=fluxo):
+                entradas = montar_entradas(fluxo, tema)
+            with span("crew.kickoff", alvo=fluxo):
+                result = crew_obj.kickoff(inputs=entradas)
+            if ao_evento is not None:
+                aguardar_eventos_crewai()
+
         # formato o resultado usando Pydantic
         output = crew_instance.format_output(result)
-        
+        _guardar_resultado(tema, usar_cache, fluxo, output)
+
         # retorno o objeto Pydantic
         return output
-    
+
     except Exception as e:
         # Em caso de erro, retorna um output mínimo com o traceback completo para debugging
-        error_detail = f"{str(e)}\n\nTraceback:\n{traceback.format_exc()}"
-        return PesquisaOutput(
-            tema="Erro na execução",
-            resultados=[PesquisaResultado(topico="Erro", descricao=str(e))],
-            resumo=f"Ocorreu um erro ao processar sua solicitação: {error_detail[:300]}..."
-        )
\ No newline at end of file
+        return _resultado_de_erro(e)
+
+def run_pesquisador_json(tema: str, usar_cache: bool = True, fluxo: str = FLUXO_PADRAO) -> str:
+    """
+    run_pesquisador com o resultado em JSON, para o modo processo da API: o JSON é
+    gerado uma única vez, no processo que executou a crew, e a API guarda o mesmo texto.
+    """
+    return run_pesquisador(tema, usar_cache, fluxo=fluxo).model_dump_json()
+
+async def run_pesquisador_async(
+    tema: str,
+    usar_cache: bool = True,
+    fluxo: str = FLUXO_PADRAO,
+) -> PesquisaOutput:
+    """
+    Versão assíncrona de run_pesquisador (sem os eventos de progresso). A crew roda
+    com o kickoff assíncrono nativo da crewai: o LLM é chamado com acall e as
+    ferramentas de busca usam o cliente HTTP assíncrono, então muitas pesquisas
+    aguardando I/O compartilham um event loop, sem uma thread por pesquisa.
+    """
+    # Caches em disco e memória semântica são rápidos, mas bloqueiam: rodam em uma thread
+    pronto = await asyncio.to_thread(_resultado_sem_crew, tema, usar_cache, fluxo)
+    if pronto is not None:
+        return pronto
+
+    try:
+        if "crew" not in sys.modules:
+            # A importação da crewai leva segundos: não pode acontecer no event loop
+            await asyncio.to_thread(preaquecer)
+        with span("crew.montagem", alvo=fluxo):
+            crew_instance, crew_obj = criar_crew(fluxo, assincrona=True)
+
+        with ExitStack() as contexto:
+            contexto.enter_context(tema_da_pesquisa(tema))
+            if not usar_cache:
+                contexto.enter_context(sem_cache_completions())
+            with span("crew.entradas", alvo=fluxo):
+                entradas = await montar_entradas_async(fluxo, tema)
+            with span("crew.kickoff", alvo=fluxo):
+                result = await crew_obj.akickoff(inputs=entradas)
+
+        output = crew_instance.format_output(result)
+        await asyncio.to_thread(_guardar_resultado, tema, usar_cache, fluxo, output)
+        return output
+
+    except Exception as e:
+        return _resultado_de_erro(e)
+
+def resultado_com_erro(output: PesquisaOutput) -> bool:
+    """Indica se o output foi gerado por um dos ramos de erro."""
+    return any(res.topico == "Erro" for res in output.resultados)
+
+def run_pesquisador_stream(
+    tema: str, usar_cache: bool = True, fluxo: str = FLUXO_PADRAO
+) -> Iterator[Dict[str, Any]]:
+    """
+    Executa a pesquisa em uma thread e produz os eventos conforme acontecem.
+    O último evento tem tipo "resultado" e traz o PesquisaOutput em "resultado".
+    """
+    eventos: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+    def executar():
+        try:
+            resultado = run_pesquisador(tema, usar_cache, ao_evento=eventos.put, fluxo=fluxo)
+            eventos.put({"tipo": "resultado", "resultado": resultado})
+        finally:
+            eventos.put(None)
+
+    threading.Thread(target=executar, name="pesquisa-stream", daemon=True).start()
+    while True:
+        evento = eventos.get()
+        if evento is None:
+            return
+        yield evento
+
+def run_pesquisador_batch(
+    temas: Iterable[str], concurrency: int = 4, usar_cache: bool = True, fluxo: str = FLUXO_PADRAO
+) -> Iterator[Tuple[str, PesquisaOutput]]:
+    """
+    Pesquisa vários temas em paralelo e produz (tema, resultado) conforme cada um termina.
+
+    Todas as execuções compartilham o cliente HTTP da Wikipedia e o LLM do processo,
+    respeitam o limite global de pesquisas por minuto e temas equivalentes
+    (mesmo tema normalizado) são executados uma única vez.
+    """
+    limite = obter_limite_pesquisas()
+    temas_por_chave: Dict[str, list] = {}
+    for tema in temas:
+        temas_por_chave.setdefault(normalizar_tema(tema), []).append(tema)
+
+    def executar(tema: str) -> PesquisaOutput:
+        limite.adquirir()
+        return run_pesquisador(tema, usar_cache, fluxo=fluxo)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="pesquisa-lote") as executor:
+        futuros = {
+            executor.submit(executar, variantes[0]): variantes
+            for variantes in temas_por_chave.values()
+        }
+        for futuro in as_completed(futuros):
+            for tema in futuros[futuro]:
+                yield tema, futuro.result()
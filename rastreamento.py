@@ -0,0 +1,501 @@
+"""
+Rastreamento das pesquisas: spans por execução (espera na fila, montagem da crew,
+cada tarefa, cada chamada ao LLM com tokens, cada ferramenta e cada requisição
+HTTP) e histogramas de latência agregados no processo.
+
+Os spans seguem o modelo do OpenTelemetry (trace_id, span_id, pai, início, fim e
+atributos) e podem ser exportados em JSON simples ou no formato OTLP/JSON. Fora de
+um trace ativo (iniciar_trace), span() não registra nada e custa quase nada.
+"""
+import contextvars
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Limites (segundos) dos buckets dos histogramas de latência
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Amostras recentes usadas no cálculo de p50/p95 de cada etapa
+AMOSTRAS_QUANTIS = 1024
+
+QUANTIS = (0.5, 0.95, 0.99)
+
+
+@dataclass
+class Span:
+    nome: str
+    span_id: str
+    pai_id: Optional[str]
+    inicio: float
+    fim: Optional[float] = None
+    atributos: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"  # "ok" ou "erro"
+
+    @property
+    def duracao(self) -> Optional[float]:
+        return None if self.fim is None else max(0.0, self.fim - self.inicio)
+
+    def como_dict(self) -> Dict[str, Any]:
+        duracao = self.duracao
+        return {
+            "nome": self.nome,
+            "span_id": self.span_id,
+            "pai_id": self.pai_id,
+            "inicio": self.inicio,
+            "fim": self.fim,
+            "duracao": round(duracao, 6) if duracao is not None else None,
+            "status": self.status,
+            "atributos": self.atributos,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: Dict[str, Any]) -> "Span":
+        return cls(dados["nome"], dados["span_id"], dados.get("pai_id"), dados["inicio"], dados.get("fim"),
+                   dict(dados.get("atributos") or {}), dados.get("status", "ok"))
+
+
+def _novo_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    """
+    Spans de uma execução. `pai_raiz` é o span (de outro processo) ao qual os spans
+    sem pai ficam ligados, quando a crew roda fora do processo da API.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None, pai_raiz: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.pai_raiz = pai_raiz
+        self._spans: List[Span] = []
+        self._tarefas: Dict[str, Span] = {}
+        self._lock = threading.Lock()
+
+    def iniciar_span(self, nome: str, pai_id: Optional[str] = None, inicio: Optional[float] = None,
+                     **atributos: Any) -> Span:
+        span = Span(nome, _novo_span_id(), pai_id or self.pai_raiz,
+                    time.time() if inicio is None else inicio, atributos=atributos)
+        with self._lock:
+            self._spans.append(span)
+        return span
+
+    def registrar(self, nome: str, inicio: float, fim: float, pai_id: Optional[str] = None, **atributos: Any) -> Span:
+        """Registra um span já medido (por exemplo, a espera na fila)."""
+        span = self.iniciar_span(nome, pai_id, inicio, **atributos)
+        span.fim = fim
+        return span
+
+    def span_tarefa(self, chave: str, nome: str, pai_id: Optional[str] = None) -> Span:
+        """
+        Span de uma tarefa da crew, criado no primeiro evento que a menciona: os
+        handlers da crewai rodam em outras threads, e a chamada ao LLM da tarefa
+        pode chegar antes do evento de início.
+        """
+        with self._lock:
+            span = self._tarefas.get(chave)
+        if span is None:
+            novo = self.iniciar_span("tarefa", pai_id, alvo=nome)
+            with self._lock:
+                span = self._tarefas.setdefault(chave, novo)
+                if span is not novo:
+                    self._spans.remove(novo)
+        return span
+
+    def adotar(self, pai: Span, nome: str) -> None:
+        """
+        Passa para `pai` os spans `nome` ocorridos dentro do seu intervalo. As tarefas
+        de uma crew são sequenciais: nesse intervalo só a própria ferramenta executa.
+        """
+        if pai.fim is None:
+            return
+        with self._lock:
+            for span in self._spans:
+                if span.nome == nome and span.fim is not None and pai.inicio <= span.inicio and span.fim <= pai.fim:
+                    span.pai_id = pai.span_id
+
+    def incorporar(self, spans: List[Dict[str, Any]]) -> None:
+        """Acrescenta spans exportados por outro processo."""
+        with self._lock:
+            self._spans.extend(Span.de_dict(dados) for dados in spans)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def exportar(self) -> Dict[str, Any]:
+        spans = sorted(self.spans(), key=lambda span: span.inicio)
+        fins = [span.fim for span in spans if span.fim is not None]
+        return {
+            "trace_id": self.trace_id,
+            "duracao": round(max(fins) - spans[0].inicio, 6) if spans and fins else None,
+            "spans": [span.como_dict() for span in spans],
+        }
+
+
+_trace_atual: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace_atual", default=None)
+_span_atual: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span_atual", default=None)
+
+# Traces em andamento neste processo, para consulta antes do fim da execução
+_ativos: Dict[str, Trace] = {}
+_ativos_lock = threading.Lock()
+
+
+def trace_atual() -> Optional[Trace]:
+    return _trace_atual.get()
+
+
+def span_atual() -> Optional[Span]:
+    return _span_atual.get()
+
+
+def trace_ativo(nome: str) -> Optional[Trace]:
+    with _ativos_lock:
+        return _ativos.get(nome)
+
+
+@contextmanager
+def iniciar_trace(nome: Optional[str] = None, trace_id: Optional[str] = None,
+                  pai_raiz: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Ativa um trace no contexto atual (e nas threads/tarefas que copiam o contexto).
+    Com `nome` (o task_id), o trace fica consultável por trace_ativo() durante a execução.
+    """
+    trace = Trace(trace_id, pai_raiz)
+    token_trace = _trace_atual.set(trace)
+    token_span = _span_atual.set(None)
+    if nome is not None:
+        with _ativos_lock:
+            _ativos[nome] = trace
+    try:
+        yield trace
+    finally:
+        _span_atual.reset(token_span)
+        _trace_atual.reset(token_trace)
+        if nome is not None:
+            with _ativos_lock:
+                _ativos.pop(nome, None)
+
+
+@contextmanager
+def span(nome: str, pai: Optional[Span] = None, **atributos: Any) -> Iterator[Optional[Span]]:
+    """
+    Mede o bloco como um span filho do span atual (ou de `pai`). Exceções marcam
+    o span com status "erro" e são propagadas. Sem trace ativo, produz None.
+    """
+    trace = _trace_atual.get()
+    if trace is None:
+        yield None
+        return
+    pai = pai or _span_atual.get()
+    atual = trace.iniciar_span(nome, pai.span_id if pai else None, **atributos)
+    token = _span_atual.set(atual)
+    try:
+        yield atual
+    except BaseException as e:
+        atual.status = "erro"
+        atual.atributos["erro"] = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        atual.fim = time.time()
+        _span_atual.reset(token)
+
+
+def anotar(**atributos: Any) -> None:
+    """Acrescenta atributos ao span atual, se houver um."""
+    atual = _span_atual.get()
+    if atual is not None:
+        atual.atributos.update(atributos)
+
+
+def registrar_span(nome: str, inicio: float, fim: float, **atributos: Any) -> Optional[Span]:
+    """Registra no trace atual um span já medido, filho do span atual."""
+    trace = _trace_atual.get()
+    if trace is None:
+        return None
+    pai = _span_atual.get()
+    return trace.registrar(nome, inicio, fim, pai.span_id if pai else None, **atributos)
+
+
+def executar_rastreado(trace_id: str, pai_id: Optional[str], funcao: Callable[..., Any], *args: Any,
+                       **kwargs: Any) -> Tuple[Any, Optional[List[Dict[str, Any]]]]:
+    """
+    Executa `funcao` e devolve (resultado, spans). No modo "processo" do agendador
+    roda no processo filho, onde não há trace ativo: os spans são registrados em um
+    trace com o mesmo id e devolvidos ao processo da API. No modo "thread" o trace
+    do chamador já está ativo e os spans vão direto para ele (spans é None).
+    """
+    registrar_handlers_crewai()
+    if _trace_atual.get() is not None:
+        return funcao(*args, **kwargs), None
+    with iniciar_trace(trace_id=trace_id, pai_raiz=pai_id) as trace:
+        try:
+            resultado = funcao(*args, **kwargs)
+        finally:
+            aguardar_handlers()
+    return resultado, [span.como_dict() for span in trace.spans()]
+
+
+# ---------------------------------------------------------------------------
+# Eventos da crewai: tarefas, ferramentas e tokens das chamadas ao LLM
+# ---------------------------------------------------------------------------
+
+_handlers_registrados = False
+_handlers_lock = threading.Lock()
+
+
+def _span_tarefa(chave: Optional[str], nome: Optional[str]) -> Optional[Span]:
+    trace = _trace_atual.get()
+    if trace is None or not chave:
+        return None
+    pai = _span_atual.get()
+    return trace.span_tarefa(chave, nome or "tarefa", pai.span_id if pai else None)
+
+
+def span_da_tarefa(tarefa: Any) -> Optional[Span]:
+    """Span da tarefa da crew (objeto Task) no trace atual."""
+    identificador = getattr(tarefa, "id", None)
+    return _span_tarefa(str(identificador) if identificador is not None else None, getattr(tarefa, "name", None))
+
+
+def registrar_handlers_crewai() -> None:
+    """
+    Registra (uma única vez) handlers no event bus da crewai. Eles rodam com uma
+    cópia do contexto de quem emitiu o evento, então enxergam o trace da pesquisa.
+    """
+    global _handlers_registrados
+    with _handlers_lock:
+        if _handlers_registrados:
+            return
+        _handlers_registrados = True
+
+    try:
+        from crewai.events import crewai_event_bus
+        from crewai.events.types.llm_events import LLMCallCompletedEvent
+        from crewai.events.types.task_events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+        from crewai.events.types.tool_usage_events import ToolUsageErrorEvent, ToolUsageFinishedEvent
+    except ImportError:
+        return
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def _tarefa_iniciada(source, event):
+        tarefa = span_da_tarefa(event.task)
+        if tarefa is not None:
+            tarefa.inicio = min(tarefa.inicio, event.timestamp.timestamp())
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def _tarefa_concluida(source, event):
+        tarefa = span_da_tarefa(event.task)
+        if tarefa is not None:
+            tarefa.fim = event.timestamp.timestamp()
+
+    @crewai_event_bus.on(TaskFailedEvent)
+    def _tarefa_falhou(source, event):
+        tarefa = span_da_tarefa(event.task)
+        if tarefa is not None:
+            tarefa.fim = event.timestamp.timestamp()
+            tarefa.status = "erro"
+            tarefa.atributos["erro"] = str(event.error)[:300]
+
+    def _ferramenta(event, status: str):
+        trace = _trace_atual.get()
+        if trace is None:
+            return
+        # Os eventos de ferramenta nem sempre trazem o objeto Task, mas trazem o id
+        tarefa = span_da_tarefa(event.from_task) or _span_tarefa(event.task_id, event.task_name)
+        inicio = getattr(event, "started_at", None)
+        fim = getattr(event, "finished_at", None) or event.timestamp
+        span_ferramenta = trace.registrar(
+            "ferramenta", (inicio or fim).timestamp(), fim.timestamp(),
+            tarefa.span_id if tarefa is not None else None,
+            alvo=event.tool_name, cache=bool(getattr(event, "from_cache", False)),
+        )
+        span_ferramenta.status = status
+        # As requisições HTTP feitas pela ferramenta ficam sob ela
+        trace.adotar(span_ferramenta, "http")
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def _ferramenta_concluida(source, event):
+        _ferramenta(event, "ok")
+
+    @crewai_event_bus.on(ToolUsageErrorEvent)
+    def _ferramenta_falhou(source, event):
+        _ferramenta(event, "erro")
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def _llm_concluido(source, event):
+        # Emitido dentro de span("llm") de LLMLimitado: o span atual é o da chamada
+        atual = _span_atual.get()
+        uso = event.usage or {}
+        if atual is not None and atual.nome == "llm":
+            atual.atributos["tokens_prompt"] = int(uso.get("prompt_tokens") or 0)
+            atual.atributos["tokens_completion"] = int(uso.get("completion_tokens") or 0)
+
+
+def aguardar_handlers(timeout: float = 5) -> None:
+    """Aguarda os handlers da crewai pendentes (eles completam os spans de tarefas e ferramentas)."""
+    bus = getattr(sys.modules.get("crewai.events"), "crewai_event_bus", None)
+    if bus is not None:
+        try:
+            bus.flush(timeout=timeout)
+        except Exception:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Métricas agregadas (Prometheus)
+# ---------------------------------------------------------------------------
+
+class Histograma:
+    """Histograma cumulativo de latências, com amostras recentes para os quantis."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_PADRAO):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+        self.amostras: Deque[float] = deque(maxlen=AMOSTRAS_QUANTIS)
+
+    def observar(self, valor: float) -> None:
+        self.soma += valor
+        self.total += 1
+        self.amostras.append(valor)
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+
+    def quantil(self, q: float) -> Optional[float]:
+        if not self.amostras:
+            return None
+        ordenadas = sorted(self.amostras)
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+
+class MetricasRastreamento:
+    """
+    Latência por etapa ("fila", "llm", "http"...) e alvo (tarefa, modelo, host),
+    e tokens enviados e gerados pelo LLM, agregados a partir dos traces concluídos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas: Dict[Tuple[str, str], Histograma] = {}
+        self._tokens = {"prompt": 0, "completion": 0}
+        self._traces = 0
+
+    def observar_trace(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces += 1
+            for span in trace.spans():
+                if span.duracao is None:
+                    continue
+                chave = (span.nome, str(span.atributos.get("alvo", "")))
+                self._histogramas.setdefault(chave, Histograma()).observar(span.duracao)
+                self._tokens["prompt"] += int(span.atributos.get("tokens_prompt", 0))
+                self._tokens["completion"] += int(span.atributos.get("tokens_completion", 0))
+
+    def resumo(self) -> Dict[str, Any]:
+        """p50/p95 por etapa, no formato do /health."""
+        with self._lock:
+            return {
+                f"{etapa}:{alvo}" if alvo else etapa: {
+                    "contagem": histograma.total,
+                    "p50": _arredondar(histograma.quantil(0.5)),
+                    "p95": _arredondar(histograma.quantil(0.95)),
+                }
+                for (etapa, alvo), histograma in sorted(self._histogramas.items())
+            }
+
+    def exportar_prometheus(self, extras: Optional[Dict[str, float]] = None) -> str:
+        """Texto no formato de exposição do Prometheus."""
+        linhas = [
+            "# HELP pesquisa_etapa_duracao_segundos Duração das etapas das pesquisas",
+            "# TYPE pesquisa_etapa_duracao_segundos histogram",
+        ]
+        quantis = [
+            "# HELP pesquisa_etapa_duracao_quantil_segundos Quantis das amostras recentes de cada etapa",
+            "# TYPE pesquisa_etapa_duracao_quantil_segundos gauge",
+        ]
+        with self._lock:
+            for (etapa, alvo), histograma in sorted(self._histogramas.items()):
+                rotulos = f'etapa="{_escapar(etapa)}",alvo="{_escapar(alvo)}"'
+                for limite, contagem in zip(histograma.buckets, histograma.contagens):
+                    linhas.append(f'pesquisa_etapa_duracao_segundos_bucket{{{rotulos},le="{limite:g}"}} {contagem}')
+                linhas.append(f'pesquisa_etapa_duracao_segundos_bucket{{{rotulos},le="+Inf"}} {histograma.total}')
+                linhas.append(f"pesquisa_etapa_duracao_segundos_sum{{{rotulos}}} {histograma.soma:.6f}")
+                linhas.append(f"pesquisa_etapa_duracao_segundos_count{{{rotulos}}} {histograma.total}")
+                for q in QUANTIS:
+                    quantis.append(f'pesquisa_etapa_duracao_quantil_segundos{{{rotulos},quantil="{q:g}"}} '
+                                   f"{histograma.quantil(q):.6f}")
+            linhas.extend(quantis)
+            linhas += [
+                "# HELP pesquisa_llm_tokens_total Tokens enviados (prompt) e gerados (completion) pelo LLM",
+                "# TYPE pesquisa_llm_tokens_total counter",
+                *(f'pesquisa_llm_tokens_total{{tipo="{tipo}"}} {total}' for tipo, total in self._tokens.items()),
+                "# HELP pesquisa_traces_total Pesquisas rastreadas",
+                "# TYPE pesquisa_traces_total counter",
+                f"pesquisa_traces_total {self._traces}",
+            ]
+        for nome, valor in (extras or {}).items():
+            linhas += [f"# TYPE {nome} gauge", f"{nome} {valor:g}"]
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _arredondar(valor: Optional[float]) -> Optional[float]:
+    return round(valor, 4) if valor is not None else None
+
+
+_metricas = MetricasRastreamento()
+
+
+def obter_metricas() -> MetricasRastreamento:
+    return _metricas
+
+
+# ---------------------------------------------------------------------------
+# Exportação OTLP/JSON
+# ---------------------------------------------------------------------------
+
+def _valor_otlp(valor: Any) -> Dict[str, Any]:
+    if isinstance(valor, bool):
+        return {"boolValue": valor}
+    if isinstance(valor, int):
+        return {"intValue": str(valor)}
+    if isinstance(valor, float):
+        return {"doubleValue": valor}
+    return {"stringValue": str(valor)}
+
+
+def para_otlp(exportado: Dict[str, Any], servico: str = "crewai-wiki-agent") -> Dict[str, Any]:
+    """
+    Converte um trace exportado (Trace.exportar) para o JSON do OTLP
+    (ExportTraceServiceRequest), aceito por coletores OpenTelemetry em /v1/traces.
+    """
+    spans = []
+    for span in exportado["spans"]:
+        fim = span["fim"] if span["fim"] is not None else span["inicio"]
+        spans.append({
+            "traceId": exportado["trace_id"],
+            "spanId": span["span_id"],
+            **({"parentSpanId": span["pai_id"]} if span["pai_id"] else {}),
+            "name": span["nome"],
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(int(span["inicio"] * 1e9)),
+            "endTimeUnixNano": str(int(fim * 1e9)),
+            "attributes": [{"key": chave, "value": _valor_otlp(valor)} for chave, valor in span["atributos"].items()],
+            "status": {"code": 2 if span["status"] == "erro" else 1},
+        })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": servico}}]},
+            "scopeSpans": [{"scope": {"name": "rastreamento"}, "spans": spans}],
+        }]
+    }
@@ -0,0 +1,420 @@
+"""
+Memória semântica: índice vetorial local sobre temas já pesquisados, extratos da
+Wikipedia e resumos gerados, para reaproveitar resultados de temas quase iguais
+("Revolução Francesa" e "a revolução francesa de 1789").
+
+Os embeddings vêm de um embedder plugável: por padrão um embedder de hashing
+(sem modelo e sem rede) ou, se instalado, um modelo local do sentence-transformers.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import DIRETORIO_BASE, normalizar_tema
+from configuracao import memoria_semantica_habilitada
+from models import PesquisaOutput
+from tokens import termos
+
+
+# Ordinais por extenso, tratados como o número correspondente ("Primeira" = "1ª")
+_ORDINAIS = {
+    raiz + genero: str(numero)
+    for numero, raiz in enumerate(
+        ("primeir", "segund", "terceir", "quart", "quint", "sext", "setim", "oitav", "non", "decim"), start=1
+    )
+    for genero in ("o", "a")
+}
+_RE_ROMANO = re.compile(r"^(x{0,3})(ix|iv|v?i{0,3})$")
+_VALORES_ROMANOS = {"i": 1, "v": 5, "x": 10}
+
+
+def _numero_romano(termo: str) -> Optional[str]:
+    if not termo or not _RE_ROMANO.match(termo):
+        return None
+    total = 0
+    for atual, seguinte in zip(termo, termo[1:] + " "):
+        valor = _VALORES_ROMANOS[atual]
+        total += -valor if _VALORES_ROMANOS.get(seguinte, 0) > valor else valor
+    return str(total)
+
+
+def termos_distintivos(texto: str) -> FrozenSet[str]:
+    """
+    Números do texto (algarismos, ordinais por extenso e algarismos romanos).
+    Temas que diferem só neles ("eleição de 2018" e "eleição de 2022", "Pedro I" e
+    "Pedro II") ficam próximos no embedding, mas são assuntos diferentes.
+    """
+    numeros = set()
+    for termo in termos(texto):
+        digitos = re.match(r"\d+", termo)
+        numero = digitos.group() if digitos else _ORDINAIS.get(termo) or _numero_romano(termo)
+        if numero is not None:
+            numeros.add(numero.lstrip("0") or "0")
+    return frozenset(numeros)
+
+
+def distintivos_compativeis(texto: str, outro: str) -> bool:
+    """False quando os dois textos citam números e eles não são os mesmos."""
+    numeros, outros = termos_distintivos(texto), termos_distintivos(outro)
+    return not numeros or not outros or numeros == outros
+
+
+class EmbedderHashing:
+    """
+    Embedder sem modelo: palavras e trigramas de caracteres (sem acentos) são
+    projetados por hashing em `dimensao` posições com sinal, com peso log(1 + tf).
+    Vetores normalizados, então o produto interno é a similaridade de cosseno.
+    """
+
+    def __init__(self, dimensao: int = 1024, peso_trigramas: float = 0.5):
+        self.dimensao = dimensao
+        self.peso_trigramas = peso_trigramas
+        self.nome = f"hashing-{dimensao}"
+
+    def _vetor(self, texto: str) -> np.ndarray:
+        contagem: Dict[str, float] = {}
+        for termo in termos(texto):
+            contagem[termo] = contagem.get(termo, 0.0) + 1.0
+            marcado = f" {termo} "
+            for i in range(len(marcado) - 2):
+                trigrama = "#" + marcado[i:i + 3]
+                contagem[trigrama] = contagem.get(trigrama, 0.0) + self.peso_trigramas
+        vetor = np.zeros(self.dimensao, dtype=np.float32)
+        if not contagem:
+            return vetor
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in contagem), dtype=np.uint32, count=len(contagem))
+        pesos = np.log1p(np.fromiter(contagem.values(), dtype=np.float32, count=len(contagem)))
+        # O bit mais alto do hash define o sinal e reduz o viés das colisões
+        sinais = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        np.add.at(vetor, (hashes % self.dimensao).astype(np.intp), sinais * pesos)
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma else vetor
+
+    def __call__(self, textos: Sequence[str]) -> np.ndarray:
+        return np.stack([self._vetor(texto) for texto in textos]) if textos else np.zeros((0, self.dimensao), np.float32)
+
+
+class EmbedderSentenceTransformers:
+    """Modelo local (CPU) do sentence-transformers, carregado no primeiro uso."""
+
+    def __init__(self, modelo: str = "paraphrase-multilingual-MiniLM-L12-v2"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "sentence-transformers não está instalado; use SEMANTICO_EMBEDDER=hashing"
+            ) from e
+        self._modelo = SentenceTransformer(modelo, device="cpu")
+        self.dimensao = self._modelo.get_sentence_embedding_dimension()
+        self.nome = f"st-{modelo}"
+
+    def __call__(self, textos: Sequence[str]) -> np.ndarray:
+        return np.asarray(
+            self._modelo.encode(list(textos), normalize_embeddings=True), dtype=np.float32
+        ).reshape(len(textos), self.dimensao)
+
+
+def criar_embedder(especificacao: str = "hashing") -> Callable[[Sequence[str]], np.ndarray]:
+    """
+    "hashing", "hashing:<dimensão>" ou "sentence-transformers[:<modelo>]".
+    """
+    nome, _, parametro = especificacao.partition(":")
+    if nome == "hashing":
+        return EmbedderHashing(int(parametro) if parametro else 1024)
+    if nome == "sentence-transformers":
+        return EmbedderSentenceTransformers(parametro) if parametro else EmbedderSentenceTransformers()
+    raise ValueError(f"Embedder desconhecido: {especificacao}")
+
+
+class IndiceVetorial:
+    """
+    Índice de vetores normalizados em uma matriz NumPy.
+
+    A busca é exata (produto interno com todos os vetores) até `min_ivf` vetores.
+    Acima disso, com `listas_ivf > 0`, os vetores são agrupados por k-means e a
+    busca percorre apenas as `sondas` listas mais próximas da consulta.
+    `quantizar=True` guarda os vetores em int8 (4x menos memória).
+    """
+
+    def __init__(self, dimensao: int, quantizar: bool = False, listas_ivf: int = 0,
+                 sondas: int = 8, min_ivf: int = 20000):
+        self.dimensao = dimensao
+        self.quantizar = quantizar
+        self.listas_ivf = listas_ivf
+        self.sondas = sondas
+        self.min_ivf = min_ivf
+        self._vetores = np.zeros((0, dimensao), dtype=np.int8 if quantizar else np.float32)
+        self._total = 0
+        self._centroides: Optional[np.ndarray] = None
+        self._listas = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _codificar(self, vetores: np.ndarray) -> np.ndarray:
+        if self.quantizar:
+            return np.clip(np.rint(vetores * 127), -127, 127).astype(np.int8)
+        return vetores.astype(np.float32, copy=False)
+
+    def _garantir_capacidade(self, total: int) -> None:
+        if total <= len(self._vetores):
+            return
+        capacidade = max(total, 2 * len(self._vetores), 64)
+        novos = np.zeros((capacidade, self.dimensao), dtype=self._vetores.dtype)
+        novos[:self._total] = self._vetores[:self._total]
+        self._vetores = novos
+        listas = np.zeros(capacidade, dtype=np.int32)
+        listas[:self._total] = self._listas[:self._total]
+        self._listas = listas
+
+    def adicionar(self, vetores: np.ndarray) -> List[int]:
+        """Adiciona vetores (n x dimensão) e retorna as posições atribuídas."""
+        vetores = np.atleast_2d(vetores)
+        inicio = self._total
+        self._garantir_capacidade(inicio + len(vetores))
+        self._vetores[inicio:inicio + len(vetores)] = self._codificar(vetores)
+        self._total += len(vetores)
+        if self._centroides is not None:
+            self._listas[inicio:self._total] = np.argmax(vetores @ self._centroides.T, axis=1)
+        elif self.listas_ivf and self._total >= self.min_ivf:
+            self.treinar_ivf()
+        return list(range(inicio, self._total))
+
+    def substituir(self, posicao: int, vetor: np.ndarray) -> None:
+        self._vetores[posicao] = self._codificar(np.atleast_2d(vetor))[0]
+        if self._centroides is not None:
+            self._listas[posicao] = int(np.argmax(self._centroides @ vetor))
+
+    def _matriz(self, posicoes: Optional[np.ndarray] = None) -> np.ndarray:
+        matriz = self._vetores[:self._total] if posicoes is None else self._vetores[posicoes]
+        return matriz.astype(np.float32) / 127 if self.quantizar else matriz
+
+    def treinar_ivf(self, iteracoes: int = 10, semente: int = 0) -> None:
+        """K-means esférico sobre os vetores atuais (uma amostra, em índices grandes)."""
+        listas = min(self.listas_ivf, self._total)
+        if listas < 2:
+            return
+        gerador = np.random.default_rng(semente)
+        amostra = self._matriz(gerador.choice(self._total, min(self._total, listas * 256), replace=False))
+        centroides = amostra[gerador.choice(len(amostra), listas, replace=False)]
+        for _ in range(iteracoes):
+            grupos = np.argmax(amostra @ centroides.T, axis=1)
+            somas = np.zeros_like(centroides)
+            np.add.at(somas, grupos, amostra)
+            normas = np.linalg.norm(somas, axis=1, keepdims=True)
+            # Listas vazias mantêm o centróide anterior
+            centroides = np.where(normas > 0, somas / np.maximum(normas, 1e-12), centroides)
+        self._centroides = centroides.astype(np.float32)
+        for inicio in range(0, self._total, 65536):
+            bloco = self._matriz(np.arange(inicio, min(self._total, inicio + 65536)))
+            self._listas[inicio:inicio + len(bloco)] = np.argmax(bloco @ self._centroides.T, axis=1)
+
+    def buscar(self, consulta: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        """As `k` posições mais similares à consulta, da maior para a menor similaridade."""
+        if not self._total:
+            return []
+        if self._centroides is not None:
+            sondas = np.argsort(self._centroides @ consulta)[::-1][:self.sondas]
+            posicoes = np.flatnonzero(np.isin(self._listas[:self._total], sondas))
+            scores = self._matriz(posicoes) @ consulta
+        else:
+            posicoes = None
+            scores = self._matriz() @ consulta
+        k = min(k, len(scores))
+        if not k:
+            return []
+        melhores = np.argpartition(-scores, k - 1)[:k]
+        melhores = melhores[np.argsort(-scores[melhores])]
+        if posicoes is not None:
+            return [(int(posicoes[i]), float(scores[i])) for i in melhores]
+        return [(int(i), float(scores[i])) for i in melhores]
+
+
+class MemoriaSemantica:
+    """
+    Três índices vetoriais persistidos em SQLite e carregados em memória:
+    - artigo: temas já pesquisados -> PesquisaOutput (por fluxo)
+    - extrato: títulos da Wikipedia -> extrato
+    - material: conteúdo dos extratos e resumos, para recuperar textos relacionados
+    """
+
+    TIPOS = ("artigo", "extrato", "material")
+
+    def __init__(
+        self,
+        caminho_db: Optional[str] = None,
+        embedder: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+        limiar_artigo: float = 0.85,
+        limiar_extrato: float = 0.85,
+        ttl_artigo: int = 86400,
+        quantizar: bool = False,
+        listas_ivf: int = 0,
+    ):
+        self.embedder = embedder or EmbedderHashing()
+        self.limiar_artigo = limiar_artigo
+        self.limiar_extrato = limiar_extrato
+        self.ttl_artigo = ttl_artigo
+        self._lock = threading.Lock()
+        self._indices = {
+            tipo: IndiceVetorial(self.embedder.dimensao, quantizar=quantizar, listas_ivf=listas_ivf)
+            for tipo in self.TIPOS
+        }
+        self._itens: Dict[str, List[Dict[str, Any]]] = {tipo: [] for tipo in self.TIPOS}
+        self._posicoes: Dict[Tuple[str, str], int] = {}
+        self._contadores: Dict[str, int] = {"reusos_artigo": 0, "reusos_extrato": 0, "consultas": 0}
+        self._conexao: Optional[sqlite3.Connection] = None
+        if caminho_db:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho_db)), exist_ok=True)
+            self._conexao = sqlite3.connect(caminho_db, check_same_thread=False)
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS itens ("
+                "tipo TEXT NOT NULL, chave TEXT NOT NULL, texto TEXT NOT NULL, dados TEXT NOT NULL, "
+                "embedder TEXT NOT NULL, vetor BLOB NOT NULL, criado_em REAL NOT NULL, "
+                "PRIMARY KEY (tipo, chave))"
+            )
+            self._conexao.commit()
+            self._carregar()
+
+    @classmethod
+    def from_env(cls) -> "MemoriaSemantica":
+        caminho_padrao = str(DIRETORIO_BASE / ".cache" / "semantico.sqlite3")
+        return cls(
+            caminho_db=os.getenv("SEMANTICO_DB", caminho_padrao) or None,
+            embedder=criar_embedder(os.getenv("SEMANTICO_EMBEDDER", "hashing")),
+            limiar_artigo=float(os.getenv("SEMANTICO_LIMIAR_ARTIGO", "0.85")),
+            limiar_extrato=float(os.getenv("SEMANTICO_LIMIAR_EXTRATO", "0.85")),
+            ttl_artigo=int(os.getenv("SEMANTICO_TTL_ARTIGO", os.getenv("CACHE_ARTIGOS_TTL", "86400"))),
+            quantizar=os.getenv("SEMANTICO_QUANTIZAR", "0") not in ("0", "false", "False"),
+            listas_ivf=int(os.getenv("SEMANTICO_LISTAS_IVF", "0")),
+        )
+
+    def _carregar(self) -> None:
+        linhas = self._conexao.execute(
+            "SELECT tipo, chave, texto, dados, embedder, vetor, criado_em FROM itens ORDER BY criado_em"
+        ).fetchall()
+        for tipo, chave, texto, dados, embedder, vetor, criado_em in linhas:
+            if tipo not in self._indices:
+                continue
+            if embedder == self.embedder.nome:
+                vetor = np.frombuffer(vetor, dtype=np.float32)
+            else:
+                # Embedder trocado: os vetores antigos não são comparáveis
+                vetor = self.embedder([texto])[0]
+            self._guardar(tipo, chave, texto, json.loads(dados), criado_em, vetor)
+
+    def _guardar(self, tipo: str, chave: str, texto: str, dados: Dict[str, Any],
+                 criado_em: float, vetor: np.ndarray) -> None:
+        # Deve ser chamado com o lock adquirido (ou durante a carga inicial)
+        item = {"chave": chave, "texto": texto, "dados": dados, "criado_em": criado_em}
+        posicao = self._posicoes.get((tipo, chave))
+        if posicao is None:
+            posicao = self._indices[tipo].adicionar(vetor[None, :])[0]
+            self._itens[tipo].append(item)
+            self._posicoes[(tipo, chave)] = posicao
+        else:
+            self._indices[tipo].substituir(posicao, vetor)
+            self._itens[tipo][posicao] = item
+
+    def _registrar(self, itens: List[Tuple[str, str, str, Dict[str, Any]]]) -> None:
+        vetores = self.embedder([texto for _, _, texto, _ in itens])
+        agora = time.time()
+        with self._lock:
+            for (tipo, chave, texto, dados), vetor in zip(itens, vetores):
+                self._guardar(tipo, chave, texto, dados, agora, vetor)
+                if self._conexao is not None:
+                    self._conexao.execute(
+                        "INSERT OR REPLACE INTO itens (tipo, chave, texto, dados, embedder, vetor, criado_em) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (tipo, chave, texto, json.dumps(dados, ensure_ascii=False), self.embedder.nome,
+                         np.asarray(vetor, dtype=np.float32).tobytes(), agora),
+                    )
+            if self._conexao is not None:
+                self._conexao.commit()
+
+    def _buscar(self, tipo: str, texto: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        consulta = self.embedder([texto])[0]
+        with self._lock:
+            self._contadores["consultas"] += 1
+            return [(self._itens[tipo][posicao], similaridade)
+                    for posicao, similaridade in self._indices[tipo].buscar(consulta, k)]
+
+    def registrar_artigo(self, tema: str, fluxo: str, output: PesquisaOutput) -> None:
+        chave = f"{fluxo}:{normalizar_tema(tema)}"
+        self._registrar([
+            ("artigo", chave, tema, {"fluxo": fluxo, "output": output.model_dump(mode="json")}),
+            ("material", f"resumo:{chave}", output.resumo, {"origem": "resumo", "tema": tema}),
+        ])
+
+    def registrar_extrato(self, titulo: str, extrato: str) -> None:
+        if not extrato:
+            return
+        self._registrar([
+            ("extrato", titulo, titulo, {"extrato": extrato}),
+            ("material", f"extrato:{titulo}", extrato, {"origem": "extrato", "tema": titulo}),
+        ])
+
+    def buscar_artigo(self, tema: str, fluxo: str) -> Optional[Tuple[PesquisaOutput, str, float]]:
+        """
+        Artigo já gerado (no mesmo fluxo e dentro da validade) para um tema com
+        similaridade >= limiar_artigo e os mesmos números (ver termos_distintivos):
+        (output, tema original, similaridade).
+        """
+        limite_criacao = time.time() - self.ttl_artigo
+        for item, similaridade in self._buscar("artigo", tema, 5):
+            if similaridade < self.limiar_artigo:
+                break
+            if (item["dados"]["fluxo"] == fluxo and item["criado_em"] > limite_criacao
+                    and distintivos_compativeis(tema, item["texto"])):
+                with self._lock:
+                    self._contadores["reusos_artigo"] += 1
+                return PesquisaOutput.model_validate(item["dados"]["output"]), item["texto"], similaridade
+        return None
+
+    def buscar_extrato(self, titulo: str) -> Optional[str]:
+        """Extrato de um título com similaridade >= limiar_extrato e os mesmos números."""
+        for item, similaridade in self._buscar("extrato", titulo, 5):
+            if similaridade < self.limiar_extrato:
+                break
+            if distintivos_compativeis(titulo, item["texto"]):
+                with self._lock:
+                    self._contadores["reusos_extrato"] += 1
+                return item["dados"]["extrato"]
+        return None
+
+    def buscar_material(self, consulta: str, k: int = 3, limiar: float = 0.3) -> List[Tuple[str, float]]:
+        """Extratos e resumos já vistos mais relacionados à consulta: (texto, similaridade)."""
+        return [(item["texto"], similaridade) for item, similaridade in self._buscar("material", consulta, k)
+                if similaridade >= limiar]
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._contadores)
+            for tipo, indice in self._indices.items():
+                stats[f"itens_{tipo}"] = len(indice)
+            return stats
+
+
+_memoria: Optional[MemoriaSemantica] = None
+_memoria_lock = threading.Lock()
+
+
+def obter_memoria_semantica() -> Optional[MemoriaSemantica]:
+    """
+    Memória semântica compartilhada, criada no primeiro uso, ou None se
+    SEMANTICO_HABILITADO não estiver ativo.
+    """
+    global _memoria
+    if not memoria_semantica_habilitada():
+        return None
+    if _memoria is None:
+        with _memoria_lock:
+            if _memoria is None:
+                _memoria = MemoriaSemantica.from_env()
+    return _memoria
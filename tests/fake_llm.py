@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        servidor = self.server
+        tamanho = int(self.headers.get("Content-Length", 0))
+        corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        with servidor.lock:
+            servidor.requisicoes.append(corpo)
+            throttle = servidor.respostas_429 > 0
+            if throttle:
+                servidor.respostas_429 -= 1
+
+        if throttle:
+            dados = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}})
+            self._responder(429, dados, {"Retry-After": str(servidor.retry_after)})
+            return
+
+        if servidor.atraso:
+            time.sleep(servidor.atraso)
+        conteudo = servidor.resposta(corpo) if callable(servidor.resposta) else servidor.resposta
+        dados = json.dumps({
+            "id": f"chatcmpl-{len(servidor.requisicoes)}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": corpo.get("model", "fake"),
+            "service_tier": "on_demand",
+            "system_fingerprint": "fake",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+        self._responder(200, dados)
+
+    def _responder(self, status, dados, headers=None):
+        corpo = dados.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeLLM(ThreadingHTTPServer):
+    """
+    Endpoint local compatível com /chat/completions (formato OpenAI/Groq).
+    `respostas_429` define quantas requisições seguidas recebem 429 antes das respostas normais.
+    `atraso` simula o tempo de geração (segundos) de cada resposta normal.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, resposta="Resposta do modelo", respostas_429=0, retry_after=0, atraso=0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.resposta = resposta
+        self.respostas_429 = respostas_429
+        self.retry_after = retry_after
+        self.atraso = atraso
+        self.requisicoes = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def fechar(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,239 @@
+import copy
+import fnmatch
+import io
+import socketserver
+import threading
+import time
+
+
+class _Estado:
+    def __init__(self):
+        self.dados = {}
+        self.expiracoes = {}
+        self.assinantes = {}  # canal -> conexões em modo SUBSCRIBE
+        self.derrubar = set()  # comandos executados sem resposta: a conexão cai em seguida (uma vez)
+        self.lock = threading.Lock()
+
+    def limpar_expirados(self):
+        agora = time.time()
+        for chave, expira_em in list(self.expiracoes.items()):
+            if expira_em <= agora:
+                self.dados.pop(chave, None)
+                self.expiracoes.pop(chave, None)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # Comandos de controle da transação: nunca entram na fila do MULTI
+    TRANSACAO = ("MULTI", "EXEC", "DISCARD", "WATCH", "UNWATCH")
+
+    def handle(self):
+        self.fila = None  # comandos enfileirados entre MULTI e EXEC
+        self.observadas = {}  # chave -> valor no WATCH
+        while True:
+            comando = self._ler_comando()
+            if comando is None:
+                return
+            nome, args = comando[0].upper(), comando[1:]
+            metodo = getattr(self, f"cmd_{nome.lower()}", None)
+            if metodo is None:
+                self._erro(f"ERR unknown command '{nome}'")
+                continue
+            if self.fila is not None and nome not in self.TRANSACAO:
+                self.fila.append((metodo, args))
+                self._simples("QUEUED")
+                continue
+            with self.server.estado.lock:
+                self.server.estado.limpar_expirados()
+                derrubar = nome in self.server.estado.derrubar
+                if derrubar:
+                    self.server.estado.derrubar.discard(nome)
+                    self.wfile = io.BytesIO()
+                metodo(self.server.estado, args)
+            if derrubar:
+                return
+
+    def _ler_comando(self):
+        linha = self.rfile.readline()
+        if not linha:
+            return None
+        total = int(linha[1:-2])
+        partes = []
+        for _ in range(total):
+            tamanho = int(self.rfile.readline()[1:-2])
+            partes.append(self.rfile.read(tamanho + 2)[:-2].decode("utf-8"))
+        return partes
+
+    # Serialização das respostas
+    def _simples(self, valor):
+        self.wfile.write(f"+{valor}\r\n".encode())
+
+    def _erro(self, mensagem):
+        self.wfile.write(f"-{mensagem}\r\n".encode())
+
+    def _inteiro(self, valor):
+        self.wfile.write(f":{valor}\r\n".encode())
+
+    def _bulk(self, valor):
+        if valor is None:
+            self.wfile.write(b"$-1\r\n")
+            return
+        dado = valor.encode("utf-8")
+        self.wfile.write(b"$%d\r\n%s\r\n" % (len(dado), dado))
+
+    def _lista(self, itens):
+        self.wfile.write(f"*{len(itens)}\r\n".encode())
+        for item in itens:
+            if isinstance(item, list):
+                self._lista(item)
+            else:
+                self._bulk(item)
+
+    # Comandos suportados
+    def cmd_ping(self, estado, args):
+        self._simples("PONG")
+
+    def cmd_auth(self, estado, args):
+        self._simples("OK")
+
+    def cmd_select(self, estado, args):
+        self._simples("OK")
+
+    def cmd_del(self, estado, args):
+        removidas = 0
+        for chave in args:
+            if estado.dados.pop(chave, None) is not None:
+                removidas += 1
+            estado.expiracoes.pop(chave, None)
+        self._inteiro(removidas)
+
+    def cmd_exists(self, estado, args):
+        self._inteiro(sum(1 for chave in args if chave in estado.dados))
+
+    def cmd_hset(self, estado, args):
+        chave, campos = args[0], args[1:]
+        hash_ = estado.dados.setdefault(chave, {})
+        novos = 0
+        for i in range(0, len(campos), 2):
+            novos += campos[i] not in hash_
+            hash_[campos[i]] = campos[i + 1]
+        self._inteiro(novos)
+
+    def cmd_hgetall(self, estado, args):
+        hash_ = estado.dados.get(args[0], {})
+        itens = []
+        for campo, valor in hash_.items():
+            itens.extend([campo, valor])
+        self._lista(itens)
+
+    def cmd_set(self, estado, args):
+        chave, valor, opcoes = args[0], args[1], [a.upper() for a in args[2:]]
+        if "NX" in opcoes and chave in estado.dados:
+            self._bulk(None)
+            return
+        estado.dados[chave] = valor
+        estado.expiracoes.pop(chave, None)
+        if "EX" in opcoes:
+            estado.expiracoes[chave] = time.time() + int(args[2 + opcoes.index("EX") + 1])
+        self._simples("OK")
+
+    def cmd_get(self, estado, args):
+        self._bulk(estado.dados.get(args[0]))
+
+    def cmd_incr(self, estado, args):
+        valor = int(estado.dados.get(args[0], "0")) + 1
+        estado.dados[args[0]] = str(valor)
+        self._inteiro(valor)
+
+    def cmd_rpush(self, estado, args):
+        lista = estado.dados.setdefault(args[0], [])
+        lista.extend(args[1:])
+        self._inteiro(len(lista))
+
+    def cmd_lrange(self, estado, args):
+        lista = estado.dados.get(args[0], [])
+        inicio, fim = int(args[1]), int(args[2])
+        self._lista(lista[inicio:] if fim == -1 else lista[inicio:fim + 1])
+
+    def cmd_expire(self, estado, args):
+        if args[0] not in estado.dados:
+            self._inteiro(0)
+            return
+        estado.expiracoes[args[0]] = time.time() + int(args[1])
+        self._inteiro(1)
+
+    def cmd_multi(self, estado, args):
+        self.fila = []
+        self._simples("OK")
+
+    def cmd_watch(self, estado, args):
+        for chave in args:
+            self.observadas[chave] = copy.deepcopy(estado.dados.get(chave))
+        self._simples("OK")
+
+    def cmd_unwatch(self, estado, args):
+        self.observadas = {}
+        self._simples("OK")
+
+    def cmd_discard(self, estado, args):
+        self.fila, self.observadas = None, {}
+        self._simples("OK")
+
+    def cmd_exec(self, estado, args):
+        fila, observadas = self.fila or [], self.observadas
+        self.fila, self.observadas = None, {}
+        if any(estado.dados.get(chave) != valor for chave, valor in observadas.items()):
+            self.wfile.write(b"*-1\r\n")
+            return
+        # Cada comando escreve a própria resposta: juntas formam o array do EXEC
+        self.wfile.write(f"*{len(fila)}\r\n".encode())
+        for metodo, argumentos in fila:
+            metodo(estado, argumentos)
+
+    def cmd_subscribe(self, estado, args):
+        for canal in args:
+            estado.assinantes.setdefault(canal, []).append(self.wfile)
+            dado = canal.encode("utf-8")
+            self.wfile.write(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (len(dado), dado))
+
+    def cmd_publish(self, estado, args):
+        canal, mensagem = args
+        entregues = 0
+        for wfile in list(estado.assinantes.get(canal, [])):
+            try:
+                itens = [item.encode("utf-8") for item in ("message", canal, mensagem)]
+                wfile.write(b"*3\r\n" + b"".join(b"$%d\r\n%s\r\n" % (len(i), i) for i in itens))
+                entregues += 1
+            except (OSError, ValueError):
+                estado.assinantes[canal].remove(wfile)
+        self._inteiro(entregues)
+
+    def cmd_scan(self, estado, args):
+        padrao = "*"
+        if "MATCH" in [a.upper() for a in args]:
+            padrao = args[[a.upper() for a in args].index("MATCH") + 1]
+        chaves = [chave for chave in estado.dados if fnmatch.fnmatchcase(chave, padrao)]
+        self._lista(["0", chaves])
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """
+    Servidor local que fala o protocolo Redis (RESP2) com um subconjunto dos comandos.
+    Usado nos testes dos backends que dependem de Redis.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.estado = _Estado()
+        self.porta = self.server_address[1]
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.porta}/0"
+
+    def fechar(self):
+        self.shutdown()
+        self.server_close()
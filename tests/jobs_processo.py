@@ -0,0 +1,39 @@
+"""
+Jobs dos testes do PoolProcessos. Ficam em um módulo leve porque os processos
+worker (spawn) importam o módulo de cada função que recebem.
+"""
+import os
+import time
+
+from models import PesquisaOutput, PesquisaResultado
+
+aquecido = False
+
+
+def aquecer():
+    global aquecido
+    aquecido = True
+
+
+def identificar():
+    return os.getpid(), aquecido
+
+
+def dormir(segundos):
+    time.sleep(segundos)
+    return segundos
+
+
+def falhar(mensagem):
+    raise ValueError(mensagem)
+
+
+def abortar():
+    os._exit(3)
+
+
+def pesquisar_json(tema, usar_cache=True, fluxo=None):
+    """Substitui main.run_pesquisador_json: resultado fixo, sem a crew."""
+    resultado = PesquisaOutput(tema=tema, resultados=[PesquisaResultado(topico="t", descricao="d")],
+                               resumo=f"pid {os.getpid()}")
+    return resultado.model_dump_json()
@@ -1,7 +1,8 @@
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
-from api.api import app
+from api.api import app, job_store
 import json
 from pydantic import BaseModel
 from models import PesquisaOutput, PesquisaResultado
@@ -45,39 +46,36 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("id", response.json())
         self.assertEqual(response.json()["status"], "pendente")
+        
+        # Aguarda o worker concluir a pesquisa enquanto o mock está ativo
+        task_id = response.json()["id"]
+        for _ in range(50):
+            status = client.get(f"/status/{task_id}").json()["status"]
+            if status not in ("pendente", "processando"):
+                break
+            time.sleep(0.1)
+        self.assertEqual(status, "concluído")
     
     def test_pesquisar_sem_tema(self):
         """Teste do endpoint de pesquisa sem fornecer um tema"""
         response = client.post("/pesquisar", json={"tema": ""})
         self.assertEqual(response.status_code, 400)
     
-    @patch('api.api.tarefas_em_andamento')
-    def test_status_tarefa_nao_encontrada(self, mock_tarefas):
+    def test_status_tarefa_nao_encontrada(self):
         """Teste do endpoint de status com ID inexistente"""
-        # Simular dicionário vazio de tarefas
-        mock_tarefas.__contains__.return_value = False
-        
         response = client.get("/status/tarefa_inexistente")
         self.assertEqual(response.status_code, 404)
     
-    @patch('api.api.tarefas_em_andamento')
-    @patch('api.api.resultados_pesquisas')
-    def test_fluxo_completo(self, mock_resultados, mock_tarefas):
+    def test_fluxo_completo(self):
         """Teste do fluxo completo de pesquisa, verificação de status e obtenção do resultado"""
-        # Configurar os mocks para simular tarefas e resultados
+        # Registrar uma tarefa concluída diretamente no armazenamento
         task_id = "task_teste"
-        
-        # Simular tarefa concluída
-        mock_tarefas.__contains__.return_value = True
-        mock_tarefas.__getitem__.return_value = {"status": "concluído", "tema": "Teste"}
-        
-        # Simular resultado disponível
-        mock_resultados.__contains__.return_value = True
-        mock_resultados.__getitem__.return_value = PesquisaOutput(
+        job_store.criar(task_id, {"status": "pendente", "tema": "Teste", "tempo_inicio": time.time()})
+        job_store.finalizar(task_id, "concluído", PesquisaOutput(
             tema="Teste",
             resultados=[PesquisaResultado(topico="Tópico teste", descricao="Descrição teste")],
             resumo="Resumo teste"
-        )
+        ))
         
         # Verificar status
         response_status = client.get(f"/status/{task_id}")
@@ -90,6 +88,11 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response_resultado.json()["tema"], "Teste")
         self.assertEqual(len(response_resultado.json()["resultados"]), 1)
         self.assertEqual(response_resultado.json()["resultados"][0]["topico"], "Tópico teste")
+        
+        # Remover o resultado
+        response_remover = client.delete(f"/resultado/{task_id}")
+        self.assertEqual(response_remover.status_code, 200)
+        self.assertEqual(client.get(f"/status/{task_id}").status_code, 404)
 
 # Permite executar os testes diretamente
 if __name__ == "__main__":
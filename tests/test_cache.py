@@ -0,0 +1,120 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from cache import CacheArtigos, chave_cache, normalizar_tema
+from models import PesquisaOutput, PesquisaResultado
+
+
+def criar_output(tema="Teste"):
+    return PesquisaOutput(
+        tema=tema,
+        resultados=[PesquisaResultado(topico="Artigo", descricao="Artigo de teste")],
+        resumo="Resumo teste"
+    )
+
+
+class TestCacheArtigos(unittest.TestCase):
+    """
+    Testes do cache de artigos (memória + SQLite).
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho_db = os.path.join(self.diretorio.name, "artigos.sqlite3")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_normalizar_tema(self):
+        """Variações triviais do tema geram a mesma chave"""
+        self.assertEqual(normalizar_tema("  Revolução   Francesa. "), "revolução francesa")
+        self.assertEqual(
+            chave_cache("Brasil", "wikipedia_artigo", "modelo", "abc"),
+            chave_cache(" brasil!", "wikipedia_artigo", "modelo", "abc"),
+        )
+        self.assertNotEqual(
+            chave_cache("Brasil", "wikipedia_artigo", "modelo", "abc"),
+            chave_cache("Brasil", "pesquisa_ddg", "modelo", "abc"),
+        )
+
+    def test_hit_memoria_e_disco(self):
+        """Entradas sobrevivem à recriação do cache através do nível em disco"""
+        cache = CacheArtigos(caminho_db=self.caminho_db)
+        self.assertIsNone(cache.obter("chave"))
+        cache.salvar("chave", "Teste", criar_output())
+        self.assertEqual(cache.obter("chave").resumo, "Resumo teste")
+
+        novo_cache = CacheArtigos(caminho_db=self.caminho_db)
+        self.assertEqual(novo_cache.obter("chave").tema, "Teste")
+        self.assertEqual(novo_cache.estatisticas()["hits_disco"], 1)
+        self.assertEqual(novo_cache.obter("chave").tema, "Teste")
+        self.assertEqual(novo_cache.estatisticas()["hits_memoria"], 1)
+
+    def test_ttl_expira_entradas(self):
+        """Entradas expiradas contam como miss"""
+        cache = CacheArtigos(caminho_db=self.caminho_db, ttl_segundos=0)
+        cache.salvar("chave", "Teste", criar_output())
+        time.sleep(0.01)
+        self.assertIsNone(cache.obter("chave"))
+        stats = cache.estatisticas()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entradas_disco"], 0)
+
+    def test_evicao_por_tamanho(self):
+        """Os limites de memória e disco descartam as entradas menos usadas"""
+        cache = CacheArtigos(caminho_db=self.caminho_db, max_memoria=2, max_disco=3)
+        for i in range(5):
+            cache.salvar(f"chave_{i}", f"Tema {i}", criar_output(f"Tema {i}"))
+        stats = cache.estatisticas()
+        self.assertEqual(stats["entradas_memoria"], 2)
+        self.assertEqual(stats["entradas_disco"], 3)
+        self.assertIsNone(cache.obter("chave_0"))
+        self.assertEqual(cache.obter("chave_4").tema, "Tema 4")
+
+    def test_run_pesquisador_usa_cache(self):
+        """Um hit no cache não reconstrói a crew"""
+        import main
+
+        cache = CacheArtigos(caminho_db=None)
+        crew_mock = MagicMock()
+        instancia = MagicMock()
+        instancia.format_output.return_value = criar_output("Artigo")
+        crew_mock.return_value = (instancia, MagicMock())
+
+        with patch("main.obter_cache_artigos", return_value=cache), \
+                patch("main.criar_crew", crew_mock), \
+                patch.dict(os.environ, {"GROQ_API_KEY": "teste", "CACHE_ARTIGOS_HABILITADO": "1"}):
+            primeiro = main.run_pesquisador("Inteligência Artificial")
+            segundo = main.run_pesquisador("inteligência artificial ")
+
+        self.assertEqual(crew_mock.call_count, 1)
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(cache.estatisticas()["hits_memoria"], 1)
+
+    def test_hash_config_acompanha_os_prompts(self):
+        """Alterar um YAML com o processo rodando muda o hash (e invalida o cache)"""
+        import main
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminhos = tuple(os.path.join(diretorio, nome) for nome in ("agents.yaml", "tasks.yaml"))
+            for caminho in caminhos:
+                with open(caminho, "w", encoding="utf-8") as arquivo:
+                    arquivo.write("pesquisador:\n  role: Original\n")
+            with patch("main.ARQUIVOS_CONFIG", caminhos):
+                original = main.hash_config_atual()
+                # Arquivos inalterados: não relê o conteúdo
+                with patch("main.hash_configuracao") as hash_configuracao:
+                    self.assertEqual(main.hash_config_atual(), original)
+                hash_configuracao.assert_not_called()
+
+                with open(caminhos[0], "w", encoding="utf-8") as arquivo:
+                    arquivo.write("pesquisador:\n  role: Novo prompt\n")
+                os.utime(caminhos[0], ns=(0, 10**18))
+                self.assertNotEqual(main.hash_config_atual(), original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from cache import CacheCompletions, chave_completion, obter_cache_completions, sem_cache_completions
+from crew import LLMLimitado
+from eventos import observar
+from limites import BaldeTokens, ConcorrenciaAdaptativa, LimitadorLLM
+from tests.fake_llm import FakeLLM
+
+MENSAGENS = [
+    {"role": "system", "content": "Você é um redator"},
+    {"role": "user", "content": "Escreva sobre o Brasil"},
+]
+
+
+class TestCacheCompletions(unittest.TestCase):
+    """
+    Testes do cache de respostas do LLM.
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.diretorio.name, "completions.sqlite3")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_chave_deterministica(self):
+        chave = chave_completion("groq/modelo", 0.1, MENSAGENS)
+        self.assertEqual(chave, chave_completion("groq/modelo", 0.1, [dict(m) for m in MENSAGENS]))
+        self.assertNotEqual(chave, chave_completion("groq/modelo", 0.2, MENSAGENS))
+        self.assertNotEqual(chave, chave_completion("groq/outro", 0.1, MENSAGENS))
+        self.assertNotEqual(chave, chave_completion("groq/modelo", 0.1, MENSAGENS[:1]))
+
+    def test_salvar_e_obter(self):
+        cache = CacheCompletions(self.caminho)
+        self.assertIsNone(cache.obter("a"))
+        cache.salvar("a", "resposta")
+        # Outra instância (outro processo) enxerga a mesma entrada
+        self.assertEqual(CacheCompletions(self.caminho).obter("a"), "resposta")
+        self.assertEqual(cache.estatisticas()["misses"], 1)
+
+    def test_evicao_por_tamanho(self):
+        """Ao passar do limite de bytes, as respostas menos acessadas saem primeiro"""
+        cache = CacheCompletions(self.caminho, max_bytes=25)
+        cache.salvar("a", "x" * 10)
+        cache.salvar("b", "y" * 10)
+        cache.obter("a")
+        cache.salvar("c", "z" * 10)
+        self.assertIsNone(cache.obter("b"))
+        self.assertEqual(cache.obter("a"), "x" * 10)
+        self.assertEqual(cache.estatisticas()["bytes"], 20)
+
+    def test_desativado_no_contexto(self):
+        with patch.dict(os.environ, {"CACHE_COMPLETIONS_DB": self.caminho}), \
+                patch("cache._cache_completions", None):
+            self.assertIsNotNone(obter_cache_completions())
+            with sem_cache_completions():
+                self.assertIsNone(obter_cache_completions())
+
+
+class TestLLMComCache(unittest.TestCase):
+    """
+    Testes do cache aplicado ao LLM dos agentes.
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.cache = CacheCompletions(os.path.join(self.diretorio.name, "completions.sqlite3"))
+        self.servidor = FakeLLM(resposta="Artigo gerado")
+        self.llm = LLMLimitado(model="groq/fake", api_key="teste", temperature=0.1,
+                               base_url=self.servidor.base_url)
+        limitador = LimitadorLLM(BaldeTokens(0), BaldeTokens(0), ConcorrenciaAdaptativa())
+        self.patches = [
+            patch("crew.obter_limitador_llm", return_value=limitador),
+            patch("cache._cache_completions", self.cache),
+            patch.dict(os.environ, {"CACHE_COMPLETIONS_HABILITADO": "1"}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.servidor.fechar()
+        self.diretorio.cleanup()
+
+    def test_mensagens_repetidas_nao_chamam_o_modelo(self):
+        self.assertEqual(self.llm.call(MENSAGENS), "Artigo gerado")
+        self.assertEqual(self.llm.call(MENSAGENS), "Artigo gerado")
+        self.assertEqual(len(self.servidor.requisicoes), 1)
+        self.assertEqual(self.cache.estatisticas()["hits"], 1)
+
+    def test_desvio_por_requisicao(self):
+        self.llm.call(MENSAGENS)
+        with sem_cache_completions():
+            self.llm.call(MENSAGENS)
+        self.assertEqual(len(self.servidor.requisicoes), 2)
+
+    def test_resposta_em_cache_e_transmitida(self):
+        """Com streaming ativo, a resposta do cache chega como token"""
+        self.llm.call(MENSAGENS)
+        eventos = []
+        with observar(eventos.append):
+            self.llm.call(MENSAGENS)
+        self.assertEqual([ev["conteudo"] for ev in eventos if ev["tipo"] == "token"], ["Artigo gerado"])
+
+    def test_acall_usa_o_cache_fora_do_loop(self):
+        threads = []
+        obter, salvar = self.cache.obter, self.cache.salvar
+
+        def registrar(metodo):
+            def chamar(*args):
+                threads.append(threading.current_thread())
+                return metodo(*args)
+            return chamar
+
+        async def chamar_duas_vezes():
+            return [await self.llm.acall(MENSAGENS), await self.llm.acall(MENSAGENS)]
+
+        with patch.object(self.cache, "obter", registrar(obter)), patch.object(self.cache, "salvar", registrar(salvar)):
+            self.assertEqual(asyncio.run(chamar_duas_vezes()), ["Artigo gerado"] * 2)
+        self.assertEqual(len(self.servidor.requisicoes), 1)
+        # obter, salvar e obter (hit), nenhum na thread do event loop
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from benchmarks.carga_api import comparar, executar_carga, percentis
+
+
+class TestCargaApi(unittest.TestCase):
+    """
+    Execução curta do teste de carga (LLM, Wikipedia e busca locais) e da comparação entre relatórios.
+    """
+
+    def test_carga_sem_erros(self):
+        with patch.dict(os.environ, {"GROQ_API_KEY": "teste"}):
+            relatorio = executar_carga(clientes=2, pesquisas=3, latencia=0.0, intervalo=0.02, timeout=60)
+        self.assertEqual((relatorio["concluidas"], relatorio["erros"], relatorio["taxa_erros"]), (3, {}, 0.0))
+        self.assertEqual(relatorio["chamadas_llm_por_pesquisa"], 3)
+        ponta_a_ponta = relatorio["latencias_ms"]["ponta_a_ponta"]
+        self.assertLessEqual(ponta_a_ponta["p50"], ponta_a_ponta["p99"])
+        self.assertGreater(relatorio["vazao_pesquisas_s"], 0)
+        self.assertIn("crescimento", relatorio["memoria_mb"])
+
+    def test_percentis_e_comparacao(self):
+        self.assertEqual(percentis(list(range(1, 101)))["p95"], 95)
+        anterior = {"vazao_pesquisas_s": 10.0, "latencias_ms": {"ponta_a_ponta": {"p95": 100.0}}}
+        atual = {"vazao_pesquisas_s": 9.5, "latencias_ms": {"ponta_a_ponta": {"p95": 150.0}}}
+        linhas = comparar(atual, anterior, tolerancia=0.2)
+        regressoes = [linha.split(":")[0].strip() for linha in linhas if linha.endswith("REGRESSÃO")]
+        self.assertEqual(regressoes, ["latencias_ms.ponta_a_ponta.p95"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import crew
+from compactacao import (
+    CompactadorContexto,
+    compactar,
+    estatisticas_compactacao,
+    remover_repeticoes,
+    tema_da_pesquisa,
+)
+from crew import LLMLimitado, criar_crew
+from eventos import observar
+from main import run_pesquisador
+from tests.fake_llm import FakeLLM
+from tokens import contar_tokens
+
+SENTENCAS = [
+    "A Revolução Francesa começou em 1789 com a queda da Bastilha.",
+    "O clima de Paris é temperado e chuvoso no inverno.",
+    "A monarquia absolutista foi abolida durante a Revolução Francesa.",
+    "A culinária francesa é conhecida pelos queijos.",
+]
+# Saída longa e repetitiva, como a de um agente que copia o extrato várias vezes
+SAIDA_LONGA = "\n".join(" ".join(SENTENCAS) for _ in range(40)) + "\n" + "\n".join(
+    f"Fato adicional número {i} sobre a economia da região." for i in range(200)
+)
+
+
+class TestCompactacao(unittest.TestCase):
+    """
+    Testes do compactador de contexto entre as tarefas da crew.
+    """
+
+    def test_remover_repeticoes(self):
+        texto = "Primeira frase. Outra frase.\nPRIMEIRA frase! Nova frase."
+        self.assertEqual(remover_repeticoes(texto), "Primeira frase. Outra frase.\n\nNova frase.")
+
+    def test_texto_dentro_do_orcamento_inalterado(self):
+        texto = "Texto curto sobre a Revolução Francesa."
+        self.assertEqual(compactar(texto, "Revolução Francesa", 100), (texto, contar_tokens(texto), contar_tokens(texto)))
+
+    def test_orcamento_rigido(self):
+        for orcamento in (10, 60, 300):
+            compactado, antes, depois = compactar(SAIDA_LONGA, "Revolução Francesa", orcamento)
+            self.assertGreater(antes, 3000)
+            self.assertLessEqual(depois, orcamento)
+            self.assertEqual(depois, contar_tokens(compactado))
+        self.assertEqual(compactado.count("queda da Bastilha"), 1)
+
+    def test_guardrail(self):
+        eventos = []
+        antes = estatisticas_compactacao()["tokens_economizados"]
+        saida = MagicMock(raw=SAIDA_LONGA, description="Pesquise sobre: Revolução Francesa")
+        with observar(eventos.append):
+            valido, texto = CompactadorContexto(80, "pesquisa").validar(saida)
+        self.assertTrue(valido)
+        self.assertIn("Revolução Francesa", texto)
+        self.assertLessEqual(contar_tokens(texto), 80)
+        self.assertEqual(eventos[0]["tipo"], "compactacao")
+        self.assertEqual(eventos[0]["tokens_depois"], contar_tokens(texto))
+        self.assertEqual(estatisticas_compactacao()["tokens_economizados"] - antes, eventos[0]["tokens_economizados"])
+
+    def test_consulta_e_o_tema_da_pesquisa(self):
+        """A instrução da tarefa não entra na consulta: só o tema guia a escolha das sentenças"""
+        saida = MagicMock(raw=SAIDA_LONGA, description="Pesquise o clima e a culinária da região sobre: Revolução Francesa")
+        with patch("compactacao.compactar", wraps=compactar) as compactar_espiao:
+            with tema_da_pesquisa("Revolução Francesa"):
+                _, texto = CompactadorContexto(40, "pesquisa").validar(saida)
+            CompactadorContexto(40, "pesquisa").validar(saida)
+        self.assertEqual([c.args[1] for c in compactar_espiao.call_args_list],
+                         ["Revolução Francesa", saida.description])
+        self.assertIn("Revolução Francesa", texto)
+        self.assertNotIn("clima", texto)
+
+    def test_orcamento_configurado_nas_tarefas(self):
+        _, crew_ddg = criar_crew("pesquisa_ddg")
+        pesquisa, sintese = crew_ddg.tasks
+        self.assertEqual(pesquisa.guardrail.__self__.token_budget, 300)
+        self.assertIsNone(sintese.guardrail)
+
+    def test_contexto_compactado_entre_tarefas(self):
+        """O sintetizador recebe a saída do pesquisador já dentro do orçamento"""
+        def responder(corpo):
+            if len(servidor.requisicoes) == 1:
+                return f"Thought: Tenho a resposta\nFinal Answer: {SAIDA_LONGA}"
+            return "Thought: Pronto\nFinal Answer: Resumo final"
+
+        servidor = FakeLLM(resposta=responder)
+        llm = LLMLimitado(model="groq/fake", api_key="teste", base_url=servidor.base_url)
+        eventos = []
+        try:
+            with patch.object(crew, "_llm", llm), patch("crew.obter_cache_completions", return_value=None), \
+                    patch.dict(os.environ, {"GROQ_API_KEY": "teste"}), observar(eventos.append), \
+                    patch("compactacao.compactar", wraps=compactar) as compactar_espiao:
+                resultado = run_pesquisador("Revolução Francesa", usar_cache=False, fluxo="pesquisa_ddg")
+        finally:
+            servidor.fechar()
+
+        self.assertEqual(resultado.resumo, "Resumo final")
+        compactacao = [e for e in eventos if e["tipo"] == "compactacao"]
+        self.assertEqual(len(compactacao), 1)
+        self.assertLessEqual(compactacao[0]["tokens_depois"], 300)
+        prompt = servidor.requisicoes[1]["messages"][-1]["content"]
+        self.assertLess(contar_tokens(prompt), compactacao[0]["tokens_antes"])
+        self.assertNotIn("Fato adicional número 199", prompt)
+        self.assertEqual(compactar_espiao.call_args.args[1], "Revolução Francesa")
+
+
+if __name__ == "__main__":
+    unittest.main()
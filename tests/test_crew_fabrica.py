@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import crew
+from crew import LLMLimitado, carregar_config, criar_crew
+from main import run_pesquisador
+from tests.fake_llm import FakeLLM
+from tools.wiki_resumo import EntradaExtrato, cache_extratos
+
+
+class TestFabricaCrew(unittest.TestCase):
+    """
+    Testes da montagem da crew a cada pesquisa.
+    """
+
+    def test_configuracao_lida_uma_vez(self):
+        criar_crew()
+        with patch("crew.yaml.safe_load") as safe_load:
+            for _ in range(3):
+                criar_crew()
+        safe_load.assert_not_called()
+
+    def test_config_recarregada_quando_o_arquivo_muda(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, "agents.yaml")
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                arquivo.write("agente:\n  role: Original\n")
+            config = carregar_config(caminho)
+            # A cópia devolvida pode ser alterada sem afetar o cache
+            config["agente"]["role"] = "Alterado"
+            self.assertEqual(carregar_config(caminho)["agente"]["role"], "Original")
+
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                arquivo.write("agente:\n  role: Nova versão do prompt\n")
+            os.utime(caminho, ns=(0, 10**18))
+            self.assertEqual(carregar_config(caminho)["agente"]["role"], "Nova versão do prompt")
+
+    def test_crews_independentes_com_llm_compartilhado(self):
+        instancia_a, crew_a = criar_crew()
+        instancia_b, crew_b = criar_crew()
+        self.assertIsNot(crew_a.agents[0], crew_b.agents[0])
+        self.assertIsNot(crew_a.tasks[0], crew_b.tasks[0])
+        self.assertTrue(all(agente.llm is crew.obter_llm() for agente in crew_a.agents + crew_b.agents))
+        self.assertEqual([t.agent for t in crew_a.tasks], crew_a.agents)
+
+    def test_fluxos(self):
+        _, crew_ddg = criar_crew("pesquisa_ddg")
+        self.assertEqual([t.name for t in crew_ddg.tasks], ["realizar_pesquisa", "sintetizar_informacoes"])
+        with self.assertRaises(ValueError):
+            criar_crew("inexistente")
+
+    def test_fluxo_direto_uma_chamada_ao_llm(self):
+        """No wikipedia_direto o extrato vai no prompt do redator e o LLM é chamado uma vez"""
+        _, crew_direto = criar_crew("wikipedia_direto")
+        self.assertEqual([t.name for t in crew_direto.tasks], ["escrever_artigo_direto_task"])
+
+        cache_extratos.salvar(("pt", "Tema direto"), EntradaExtrato(
+            "Primeiro parágrafo do extrato.\nSegundo parágrafo.", None, None, time.time()))
+        servidor = FakeLLM(resposta="Artigo sobre o tema")
+        llm = LLMLimitado(model="groq/fake", api_key="teste", base_url=servidor.base_url)
+        try:
+            with patch.object(crew, "_llm", llm), patch("crew.obter_cache_completions", return_value=None), \
+                    patch.dict(os.environ, {"GROQ_API_KEY": "teste"}):
+                resultado = run_pesquisador("tema direto", usar_cache=False, fluxo="wikipedia_direto")
+        finally:
+            servidor.fechar()
+
+        self.assertEqual(resultado.resumo, "Artigo sobre o tema")
+        self.assertEqual(len(servidor.requisicoes), 1)
+        prompt = servidor.requisicoes[0]["messages"][-1]["content"]
+        self.assertIn("Primeiro parágrafo do extrato.", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
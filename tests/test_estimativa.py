@@ -0,0 +1,140 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api import api
+from api.estimativa import EstimadorEta, etapa_atual
+from api.scheduler import AgendadorPesquisas
+from configuracao import MODELO_LLM
+from rastreamento import iniciar_trace, span
+
+
+def trace_concluido(duracoes, inicio=1000.0):
+    """Trace de uma execução com fila de 5s e tarefas sequenciais com as durações dadas."""
+    with iniciar_trace() as trace:
+        fim = inicio + 5 + 1 + sum(duracoes.values())
+        raiz = trace.registrar("pesquisa", inicio, fim)
+        trace.registrar("fila", inicio, inicio + 5, raiz.span_id)
+        trace.registrar("crew.montagem", inicio + 5, inicio + 6, raiz.span_id)
+        kickoff = trace.registrar("crew.kickoff", inicio + 6, fim, raiz.span_id)
+        atual = inicio + 6
+        for nome, duracao in duracoes.items():
+            trace.registrar("tarefa", atual, atual + duracao, kickoff.span_id, alvo=nome)
+            atual += duracao
+    return trace
+
+
+class TestEstimadorEta(unittest.TestCase):
+    """
+    Testes da estimativa de tempo restante pelas durações recentes das etapas.
+    """
+
+    def test_restante_pela_etapa(self):
+        estimador = EstimadorEta()
+        self.assertIsNone(estimador.restante("wikipedia_artigo", "m", decorrido=0))
+        for pesquisa, artigo in ((10, 20), (12, 30), (30, 25)):
+            self.assertTrue(estimador.observar("wikipedia_artigo", "m", trace_concluido(
+                {"pesquisa": pesquisa, "artigo": artigo})))
+
+        # Mediana da execução inteira (sem a fila): 1 + 12 + 30
+        self.assertEqual(estimador.duracao_estimada("wikipedia_artigo", "m"), 43)
+        # Na primeira tarefa há 4s: faltam 12 - 4 dela e a mediana da seguinte (25)
+        restante = estimador.restante("wikipedia_artigo", "m", decorrido=5, etapa="tarefa:pesquisa",
+                                      inicio_etapa=time.time() - 4)
+        self.assertAlmostEqual(restante, 33, delta=0.5)
+        # Etapa desconhecida: mediana total menos o tempo decorrido
+        self.assertEqual(estimador.restante("wikipedia_artigo", "m", decorrido=40), 3)
+        # Histórico separado por fluxo e modelo
+        self.assertIsNone(estimador.restante("pesquisa_ddg", "m", decorrido=0))
+        self.assertIsNone(estimador.restante("wikipedia_artigo", "outro", decorrido=0))
+
+    def test_ignora_execucoes_sem_crew(self):
+        """Respostas do cache não rodam a crew e não entram na estimativa"""
+        estimador = EstimadorEta()
+        with iniciar_trace() as trace:
+            with span("pesquisa"):
+                with span("crew.entradas"):
+                    pass
+        self.assertFalse(estimador.observar("wikipedia_artigo", "m", trace))
+        self.assertIsNone(estimador.duracao_estimada("wikipedia_artigo", "m"))
+
+    def test_etapa_atual(self):
+        with iniciar_trace() as trace:
+            with span("pesquisa"):
+                with span("crew.montagem"):
+                    self.assertEqual(etapa_atual(trace)[0], "crew.montagem")
+                with span("crew.kickoff") as kickoff:
+                    tarefa = trace.span_tarefa("1", "escrever_artigo_task", kickoff.span_id)
+                    self.assertEqual(etapa_atual(trace)[0], "tarefa:escrever_artigo_task")
+                    tarefa.fim = time.time()
+            self.assertIsNone(etapa_atual(trace))
+
+
+class TestPosicaoNaFila(unittest.TestCase):
+    """
+    Testes da posição dos jobs na fila do agendador e do ETA no /status.
+    """
+
+    def test_posicao_e_espera(self):
+        agendador = AgendadorPesquisas(num_workers=1, max_fila=10)
+        liberar = threading.Event()
+        iniciou = threading.Event()
+        agendador.submeter(lambda: (iniciou.set(), liberar.wait()), identificador="a")
+        iniciou.wait(5)
+        agendador.submeter(liberar.wait, identificador="b")
+        agendador.submeter(liberar.wait, prioridade=5, identificador="c")
+
+        self.assertIsNone(agendador.posicao("a"))
+        self.assertEqual((agendador.posicao("c"), agendador.posicao("b")), (0, 1))
+        # O único worker está ocupado: o próximo espera meia execução, o seguinte uma e meia
+        self.assertEqual(agendador.estimar_espera(0), 15)
+        self.assertEqual(agendador.estimar_espera(1), 45)
+        liberar.set()
+        agendador.encerrar()
+        self.assertIsNone(agendador.posicao("b"))
+
+    def test_status_com_etapa_e_fila(self):
+        liberar = threading.Event()
+        iniciou = threading.Event()
+
+        def executar(task_id, tema, chave, usar_cache, fluxo):
+            api.job_store.atualizar(task_id, status="processando", tempo_inicio=time.time())
+            with iniciar_trace(task_id):
+                with span("pesquisa"), span("crew.kickoff"), span("tarefa", alvo="escrever_artigo_task"):
+                    iniciou.set()
+                    liberar.wait(10)
+            api.job_store.liberar_execucao(chave, task_id)
+            api.job_store.finalizar(task_id, "concluído")
+
+        estimador = EstimadorEta()
+        estimador.observar("wikipedia_artigo", MODELO_LLM, trace_concluido({"escrever_artigo_task": 20}))
+        agendador = AgendadorPesquisas(num_workers=1, max_fila=10)
+        cliente = TestClient(api.app)
+        try:
+            with patch.object(api, "agendador", agendador), patch.object(api, "executar_pesquisa_background", executar), \
+                    patch("api.api.obter_estimador", return_value=estimador):
+                primeira = cliente.post("/pesquisar", json={"tema": "ETA um", "fluxo": "wikipedia_artigo"}).json()
+                iniciou.wait(5)
+                segunda = cliente.post("/pesquisar", json={"tema": "ETA dois", "fluxo": "wikipedia_artigo"}).json()
+
+                executando = cliente.get(f"/status/{primeira['id']}").json()
+                self.assertEqual(executando["status"], "processando")
+                self.assertEqual(executando["etapa"], "tarefa:escrever_artigo_task")
+                self.assertTrue(1 <= executando["eta"] <= 20)
+
+                self.assertEqual((segunda["etapa"], segunda["posicao_fila"]), ("fila", 0))
+                # Meia execução do job em andamento (média padrão de 30s) mais a sua própria (21s)
+                self.assertEqual(segunda["eta"], 36)
+                self.assertEqual(cliente.get(f"/status/{segunda['id']}").json()["eta"], 36)
+        finally:
+            liberar.set()
+            agendador.encerrar()
+        concluida = cliente.get(f"/status/{primeira['id']}").json()
+        self.assertEqual((concluida["status"], concluida["eta"], concluida["etapa"]), ("concluído", None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from api.job_store import criar_job_store, MemoriaJobStore, RedisJobStore, SQLiteJobStore
+from models import PesquisaOutput, PesquisaResultado
+from tests.fake_redis import FakeRedis
+
+RESULTADO = PesquisaOutput(
+    tema="Teste",
+    resultados=[PesquisaResultado(topico="Artigo", descricao="Artigo de teste")],
+    resumo="Resumo teste"
+)
+
+
+class ContratoJobStore:
+    """
+    Comportamento comum a todos os backends de JobStore.
+    As subclasses implementam `criar_store(ttl_segundos, ttl_pendente_segundos=None)`.
+    """
+
+    def test_ciclo_de_vida(self):
+        store = self.criar_store(3600)
+        store.criar("t1", {"status": "pendente", "tema": "Teste", "tempo_inicio": 1.5})
+        store.atualizar("t1", status="processando")
+        self.assertEqual(store.obter("t1"), {"status": "processando", "tema": "Teste", "tempo_inicio": 1.5})
+        self.assertIsNone(store.obter_resultado("t1"))
+        self.assertIsNone(store.obter_trace("t1"))
+
+        store.finalizar("t1", "concluído", RESULTADO)
+        store.guardar_trace("t1", {"trace_id": "abc", "spans": [{"nome": "pesquisa"}]})
+        self.assertEqual(store.obter("t1")["status"], "concluído")
+        self.assertEqual(store.obter_resultado("t1"), RESULTADO)
+        # O trace fica fora dos dados da tarefa
+        self.assertNotIn("trace", store.obter("t1"))
+        self.assertEqual(store.obter_trace("t1"), {"trace_id": "abc", "spans": [{"nome": "pesquisa"}]})
+        self.assertEqual(store.contar(), {"tarefas": 1, "resultados": 1})
+
+        self.assertTrue(store.remover("t1"))
+        self.assertFalse(store.remover("t1"))
+        self.assertIsNone(store.obter("t1"))
+        self.assertIsNone(store.obter_trace("t1"))
+
+    def test_tarefas_finalizadas_expiram(self):
+        store = self.criar_store(1, ttl_pendente_segundos=60)
+        store.criar("t1", {"status": "pendente", "tema": "Teste"})
+        store.criar("t2", {"status": "pendente", "tema": "Outro"})
+        store.finalizar("t1", "erro: falha")
+        time.sleep(1.1)
+        self.assertIsNone(store.obter("t1"))
+        # Tarefas ainda em andamento não expiram
+        self.assertEqual(store.obter("t2")["status"], "pendente")
+        self.assertEqual(store.contar()["tarefas"], 1)
+
+    def test_tarefas_nunca_finalizadas_expiram(self):
+        store = self.criar_store(60, ttl_pendente_segundos=1)
+        store.criar("t1", {"status": "processando", "tema": "Órfã"})
+        store.criar("t2", {"status": "pendente", "tema": "Finalizada"})
+        # A finalização renova o prazo com o TTL dos resultados
+        store.finalizar("t2", "concluído", RESULTADO)
+        time.sleep(1.1)
+        self.assertIsNone(store.obter("t1"))
+        self.assertEqual(store.obter("t2")["status"], "concluído")
+        self.assertEqual(store.contar(), {"tarefas": 1, "resultados": 1})
+
+    def test_criar_e_obter_varios(self):
+        store = self.criar_store(3600)
+        tarefas = {f"t{i}": {"status": "pendente", "tema": f"Tema {i}"} for i in range(3)}
+        store.criar_varios(tarefas)
+        store.finalizar("t1", "concluído", RESULTADO)
+        self.assertEqual(store.obter("t2"), tarefas["t2"])
+        obtidas = store.obter_varios(["t2", "fantasma", "t0", "t1"])
+        self.assertEqual(list(obtidas), ["t2", "fantasma", "t0", "t1"])
+        self.assertEqual(obtidas["t0"], tarefas["t0"])
+        self.assertIsNone(obtidas["fantasma"])
+        self.assertEqual(obtidas["t1"]["status"], "concluído")
+        self.assertEqual(store.obter_varios([]), {})
+        self.assertEqual(store.contar()["tarefas"], 3)
+
+    def test_atualizar_tarefa_inexistente(self):
+        store = self.criar_store(3600)
+        store.atualizar("fantasma", status="processando")
+        store.finalizar("fantasma", "concluído", RESULTADO)
+        self.assertIsNone(store.obter("fantasma"))
+
+    def test_reivindicar_execucao(self):
+        store = self.criar_store(3600)
+        self.assertIsNone(store.reivindicar_execucao("fluxo:tema", "t1", 60))
+        self.assertEqual(store.reivindicar_execucao("fluxo:tema", "t2", 60), "t1")
+        # Apenas o dono pode liberar a chave
+        store.liberar_execucao("fluxo:tema", "t2")
+        self.assertEqual(store.reivindicar_execucao("fluxo:tema", "t3", 60), "t1")
+        store.liberar_execucao("fluxo:tema", "t1")
+        self.assertIsNone(store.reivindicar_execucao("fluxo:tema", "t3", 60))
+
+    def test_seguidores_e_contadores(self):
+        store = self.criar_store(3600)
+        store.adicionar_seguidor("t1", "t2")
+        store.adicionar_seguidor("t1", "t3")
+        self.assertEqual(store.retirar_seguidores("t1"), ["t2", "t3"])
+        self.assertEqual(store.retirar_seguidores("t1"), [])
+        self.assertEqual(store.obter_contador("agrupadas"), 0)
+        store.incrementar_contador("agrupadas")
+        self.assertEqual(store.incrementar_contador("agrupadas"), 2)
+
+    def test_retirar_seguidores_concorrente(self):
+        """Seguidores adicionados enquanto outra thread os retira não se perdem"""
+        store = self.criar_store(3600)
+        adicionados = [f"t{i}_{j}" for i in range(4) for j in range(50)]
+        retirados = []
+        terminou = threading.Event()
+
+        def adicionar(i):
+            for j in range(50):
+                store.adicionar_seguidor("lider", f"t{i}_{j}")
+
+        def retirar():
+            while not terminou.is_set():
+                retirados.extend(store.retirar_seguidores("lider"))
+            retirados.extend(store.retirar_seguidores("lider"))
+
+        retirador = threading.Thread(target=retirar)
+        retirador.start()
+        threads = [threading.Thread(target=adicionar, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        terminou.set()
+        retirador.join()
+        self.assertEqual(sorted(retirados), sorted(adicionados))
+
+
+class TestMemoriaJobStore(ContratoJobStore, unittest.TestCase):
+    def criar_store(self, ttl_segundos, ttl_pendente_segundos=None):
+        return MemoriaJobStore(ttl_segundos, ttl_pendente_segundos)
+
+
+class TestSQLiteJobStore(ContratoJobStore, unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def criar_store(self, ttl_segundos, ttl_pendente_segundos=None):
+        return SQLiteJobStore(os.path.join(self.diretorio.name, "jobs.sqlite3"), ttl_segundos, ttl_pendente_segundos)
+
+    def test_compartilhado_entre_instancias(self):
+        """Duas instâncias (como dois workers) enxergam as mesmas tarefas"""
+        caminho = os.path.join(self.diretorio.name, "jobs.sqlite3")
+        worker_a = criar_job_store(f"sqlite:///{caminho}")
+        worker_b = criar_job_store(f"sqlite:///{caminho}")
+        self.assertIsInstance(worker_a, SQLiteJobStore)
+        worker_a.criar("t1", {"status": "pendente", "tema": "Teste"})
+        worker_a.finalizar("t1", "concluído", RESULTADO)
+        self.assertEqual(worker_b.obter_resultado("t1"), RESULTADO)
+
+    def test_banco_sem_coluna_do_trace(self):
+        caminho = os.path.join(self.diretorio.name, "antigo.sqlite3")
+        conexao = sqlite3.connect(caminho)
+        conexao.execute("CREATE TABLE jobs (task_id TEXT PRIMARY KEY, dados TEXT NOT NULL, resultado TEXT, expira_em REAL)")
+        conexao.close()
+        store = SQLiteJobStore(caminho)
+        store.criar("t1", {"status": "pendente", "tema": "Teste"})
+        store.guardar_trace("t1", {"spans": []})
+        self.assertEqual(store.obter_trace("t1"), {"spans": []})
+
+
+class TestRedisJobStore(ContratoJobStore, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = FakeRedis()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.fechar()
+
+    def setUp(self):
+        self.servidor.estado.dados.clear()
+        self.servidor.estado.derrubar.clear()
+
+    def criar_store(self, ttl_segundos, ttl_pendente_segundos=None):
+        store = criar_job_store(self.servidor.url, ttl_segundos, ttl_pendente_segundos)
+        self.assertIsInstance(store, RedisJobStore)
+        return store
+
+    def test_transacao_observada(self):
+        cliente = self.criar_store(60).cliente
+        cliente.executar("SET", "dono", "t1")
+        # Outro dono: nada é executado
+        self.assertIsNone(cliente.transacao(("DEL", "dono"), observar=("dono", "t2")))
+        self.assertEqual(cliente.executar("GET", "dono"), "t1")
+        self.assertEqual(cliente.transacao(("DEL", "dono"), ("INCR", "liberacoes"), observar=("dono", "t1")), [1, 1])
+        self.assertIsNone(cliente.executar("GET", "dono"))
+
+    def test_reenvio_apenas_de_comandos_idempotentes(self):
+        """A conexão cai depois de o Redis executar o comando, antes da resposta"""
+        store = self.criar_store(60)
+        store.incrementar_contador("reenvio")
+        self.servidor.estado.derrubar.add("INCR")
+        with self.assertRaises(OSError):
+            store.incrementar_contador("reenvio")
+        # A leitura é reenviada em uma conexão nova; o INCR não foi aplicado duas vezes
+        self.servidor.estado.derrubar.add("GET")
+        self.assertEqual(store.obter_contador("reenvio"), 2)
+
+    def test_reivindicacao_sem_resposta(self):
+        """O SET NX não é reenviado: a leitura da chave mostra se a execução ficou com a tarefa"""
+        store = self.criar_store(60)
+        self.servidor.estado.derrubar.add("SET")
+        self.assertIsNone(store.reivindicar_execucao("tema", "t1", 60))
+        self.assertEqual(store.reivindicar_execucao("tema", "t2", 60), "t1")
+        # Sem a leitura, o resultado fica incerto: o erro segue para quem chamou
+        store.liberar_execucao("tema", "t1")
+        executar = store.cliente.executar
+
+        def sem_leitura(*args):
+            if args[0] == "GET":
+                raise ConnectionResetError("conexão perdida")
+            return executar(*args)
+
+        self.servidor.estado.derrubar.add("SET")
+        with patch.object(store.cliente, "executar", sem_leitura), self.assertRaises(OSError):
+            store.reivindicar_execucao("tema", "t3", 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from crew import LLMLimitado
+from limites import (
+    BaldeTokens,
+    BaldeTokensSQLite,
+    ConcorrenciaAdaptativa,
+    LimitadorLLM,
+    erro_de_throttle,
+)
+from tests.fake_llm import FakeLLM
+
+MENSAGENS = [{"role": "user", "content": "Olá"}]
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def criar_limitador(max_tentativas=4, concorrencia=4):
+    return LimitadorLLM(
+        BaldeTokens(0), BaldeTokens(0), ConcorrenciaAdaptativa(maximo=concorrencia),
+        max_tentativas=max_tentativas, espera_base=0.01, espera_maxima=0.05
+    )
+
+
+class TestLimitadorLLM(unittest.TestCase):
+    """
+    Testes do limitador das chamadas ao LLM.
+    """
+
+    def test_novas_tentativas_em_throttle(self):
+        limitador = criar_limitador()
+        respostas = [ErroHTTP(429), ErroHTTP(429), "ok"]
+
+        def chamada():
+            resposta = respostas.pop(0)
+            if isinstance(resposta, Exception):
+                raise resposta
+            return resposta
+
+        self.assertEqual(limitador.executar(chamada), "ok")
+        metricas = limitador.estatisticas()
+        self.assertEqual((metricas["throttles"], metricas["novas_tentativas"]), (2, 2))
+        self.assertEqual(metricas["concorrencia"]["reducoes"], 2)
+
+    def test_outros_erros_nao_sao_repetidos(self):
+        limitador = criar_limitador()
+        chamadas = []
+
+        def chamada():
+            chamadas.append(1)
+            raise ErroHTTP(500)
+
+        with self.assertRaises(ErroHTTP):
+            limitador.executar(chamada)
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(limitador.estatisticas()["falhas"], 1)
+
+    def test_limite_de_tentativas(self):
+        limitador = criar_limitador(max_tentativas=2)
+
+        def chamada():
+            raise ErroHTTP(429)
+
+        with self.assertRaises(ErroHTTP):
+            limitador.executar(chamada)
+        self.assertEqual(limitador.estatisticas()["chamadas"], 2)
+
+    def test_concorrencia_adaptativa(self):
+        """Throttles reduzem o limite pela metade; sucessos o aumentam aos poucos"""
+        controle = ConcorrenciaAdaptativa(minimo=1, maximo=8)
+        controle.entrar()
+        controle.sair(throttled=True)
+        self.assertEqual(controle.limite, 4)
+        for _ in range(4):
+            controle.entrar()
+            controle.sair()
+        self.assertAlmostEqual(controle.limite, 5, delta=0.3)
+
+    def test_concorrencia_limita_chamadas_simultaneas(self):
+        limitador = criar_limitador(concorrencia=2)
+        ativas, maximo = [0], [0]
+        lock = threading.Lock()
+
+        def chamada():
+            with lock:
+                ativas[0] += 1
+                maximo[0] = max(maximo[0], ativas[0])
+            time.sleep(0.05)
+            with lock:
+                ativas[0] -= 1
+
+        threads = [threading.Thread(target=limitador.executar, args=(chamada,)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(maximo[0], 2)
+
+    def test_executar_async_sem_threads(self):
+        """A espera assíncrona por vaga não ocupa threads do executor"""
+        limitador = criar_limitador(concorrencia=2)
+        ativas, maximo = [0], [0]
+
+        async def chamada():
+            ativas[0] += 1
+            maximo[0] = max(maximo[0], ativas[0])
+            await asyncio.sleep(0.05)
+            ativas[0] -= 1
+            return "ok"
+
+        async def executar():
+            return await asyncio.gather(*(limitador.executar_async(chamada) for _ in range(6)))
+
+        threads_antes = threading.active_count()
+        self.assertEqual(asyncio.run(executar()), ["ok"] * 6)
+        self.assertEqual(maximo[0], 2)
+        self.assertEqual(threading.active_count(), threads_antes)
+
+    def test_concorrencia_async_em_fila(self):
+        """Vagas liberadas acordam as corrotinas na ordem de chegada, inclusive se liberadas por threads"""
+        controle = ConcorrenciaAdaptativa(minimo=1, maximo=1)
+        ordem = []
+
+        async def esperar(nome):
+            await controle.entrar_async()
+            ordem.append(nome)
+
+        async def executar():
+            controle.entrar()
+            tarefas = [asyncio.create_task(esperar(nome)) for nome in ("a", "b", "c", "d")]
+            await asyncio.sleep(0.01)
+            self.assertEqual(ordem, [])
+            # Espera cancelada sai da fila sem consumir a vaga
+            tarefas[1].cancel()
+            await asyncio.sleep(0.01)
+            threading.Thread(target=controle.sair).start()
+            for _ in range(2):
+                await asyncio.sleep(0.02)
+                controle.sair()
+            await asyncio.gather(tarefas[0], tarefas[2], tarefas[3])
+
+        asyncio.run(executar())
+        self.assertEqual(ordem, ["a", "c", "d"])
+        self.assertEqual(controle.em_uso, 1)
+
+    def test_balde_compartilhado_entre_processos(self):
+        """Duas instâncias sobre o mesmo arquivo dividem o mesmo saldo"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, "limites.sqlite3")
+            balde_a = BaldeTokensSQLite(caminho, "rpm", taxa_por_segundo=0.01, capacidade=2)
+            balde_b = BaldeTokensSQLite(caminho, "rpm", taxa_por_segundo=0.01, capacidade=2)
+            self.assertEqual(balde_a.tentar_adquirir(), 0)
+            self.assertEqual(balde_b.tentar_adquirir(), 0)
+            self.assertGreater(balde_a.tentar_adquirir(), 0)
+
+    def test_balde_compartilhado_fora_do_loop(self):
+        """A transação do SQLite (que pode esperar o lock do arquivo) não bloqueia o event loop"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            balde = BaldeTokensSQLite(os.path.join(diretorio, "limites.sqlite3"), "rpm",
+                                      taxa_por_segundo=100, capacidade=1)
+            no_loop = []
+            original = balde.tentar_adquirir
+
+            def tentar_adquirir(quantidade=1):
+                try:
+                    asyncio.get_running_loop()
+                    no_loop.append(quantidade)
+                except RuntimeError:
+                    pass
+                return original(quantidade)
+
+            async def adquirir():
+                for _ in range(3):
+                    await balde.adquirir_async()
+
+            with patch.object(balde, "tentar_adquirir", tentar_adquirir):
+                asyncio.run(adquirir())
+            self.assertEqual(no_loop, [])
+
+    def test_classificacao_de_throttle(self):
+        self.assertTrue(erro_de_throttle(ErroHTTP(429)))
+        self.assertTrue(erro_de_throttle(RuntimeError("Rate limit reached for model")))
+        self.assertFalse(erro_de_throttle(ErroHTTP(503)))
+
+
+class TestLLMLimitado(unittest.TestCase):
+    """
+    Testes do LLM dos agentes contra um endpoint local compatível com o Groq.
+    """
+
+    def setUp(self):
+        self.servidor = FakeLLM(resposta="Artigo gerado", respostas_429=1)
+        self.limitador = criar_limitador()
+        self.llm = LLMLimitado(model="groq/fake", api_key="teste", base_url=self.servidor.base_url)
+
+    def tearDown(self):
+        self.servidor.fechar()
+
+    def test_429_e_repetido_pelo_limitador(self):
+        with patch("crew.obter_limitador_llm", return_value=self.limitador), \
+                patch("crew.obter_cache_completions", return_value=None):
+            self.assertEqual(self.llm.call(MENSAGENS), "Artigo gerado")
+
+        self.assertEqual(len(self.servidor.requisicoes), 2)
+        metricas = self.limitador.estatisticas()
+        self.assertEqual((metricas["chamadas"], metricas["throttles"]), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
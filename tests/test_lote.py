@@ -0,0 +1,161 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api import api
+from api.api import app
+from limites import BaldeTokens
+from main import run_pesquisador_batch
+from models import PesquisaOutput, PesquisaResultado
+
+client = TestClient(app)
+
+
+def pesquisa_falsa(tema, usar_cache=True, fluxo=None):
+    return PesquisaOutput(
+        tema=tema,
+        resultados=[PesquisaResultado(topico="Artigo", descricao=f"Artigo sobre {tema}")],
+        resumo=f"Resumo {tema}"
+    )
+
+
+def aguardar_lote(lote_id, tentativas=50):
+    for _ in range(tentativas):
+        resumo = client.get(f"/lote/{lote_id}").json()
+        if resumo["status"] == "concluído":
+            return resumo
+        time.sleep(0.1)
+    return resumo
+
+
+class TestBaldeTokens(unittest.TestCase):
+    """
+    Testes do limitador token bucket.
+    """
+
+    def test_rajada_e_reabastecimento(self):
+        balde = BaldeTokens(taxa_por_segundo=20, capacidade=2)
+        self.assertEqual(balde.tentar_adquirir(), 0)
+        self.assertEqual(balde.tentar_adquirir(), 0)
+        # Sem saldo: informa quanto tempo falta para o próximo token
+        self.assertGreater(balde.tentar_adquirir(), 0)
+        inicio = time.monotonic()
+        self.assertTrue(balde.adquirir())
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.03)
+        self.assertEqual(balde.estatisticas()["esperas"], 1)
+
+    def test_timeout(self):
+        balde = BaldeTokens.por_minuto(1)
+        self.assertTrue(balde.adquirir())
+        self.assertFalse(balde.adquirir(timeout=0.1))
+
+    def test_ilimitado(self):
+        balde = BaldeTokens(0)
+        for _ in range(100):
+            self.assertEqual(balde.tentar_adquirir(), 0)
+
+
+class TestRunPesquisadorBatch(unittest.TestCase):
+    """
+    Testes de run_pesquisador_batch.
+    """
+
+    @patch("main.run_pesquisador", side_effect=pesquisa_falsa)
+    def test_temas_equivalentes_executam_uma_vez(self, mock_run):
+        temas = ["Brasil", "Argentina", " brasil ", "Chile"]
+        resultados = dict(run_pesquisador_batch(temas, concurrency=3))
+
+        self.assertEqual(set(resultados), set(temas))
+        self.assertEqual(resultados[" brasil "].resumo, "Resumo Brasil")
+        self.assertEqual(mock_run.call_count, 3)
+
+
+class TestPesquisarLote(unittest.TestCase):
+    """
+    Testes dos endpoints de lote da API.
+    """
+
+    def test_lote_vazio(self):
+        response = client.post("/pesquisar/lote", json={"temas": ["", "  "]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_lote_inexistente(self):
+        self.assertEqual(client.get("/lote/lote_inexistente").status_code, 404)
+        self.assertEqual(client.get("/lote/lote_inexistente/resultados").status_code, 404)
+
+    @patch("api.api.run_pesquisador", side_effect=pesquisa_falsa)
+    def test_fluxo_lote(self, mock_run):
+        temas = ["Lote A", "Lote B", "Lote C"]
+        response = client.post("/pesquisar/lote", json={"temas": temas})
+        self.assertEqual(response.status_code, 200)
+        lote = response.json()
+        self.assertEqual(lote["total"], 3)
+
+        resumo = aguardar_lote(lote["id"])
+        self.assertEqual((resumo["concluidos"], resumo["erros"], resumo["pendentes"]), (3, 0, 0))
+
+        response = client.get(f"/lote/{lote['id']}/resultados")
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        linhas = [json.loads(linha) for linha in response.text.splitlines()]
+        self.assertEqual(sorted(linha["tema"] for linha in linhas), temas)
+        for linha in linhas:
+            self.assertEqual(linha["status"], "concluído")
+            self.assertEqual(linha["resultado"]["resumo"], f"Resumo {linha['tema']}")
+            # Cada item também é uma tarefa comum
+            self.assertEqual(client.get(f"/resultado/{linha['task_id']}").json()["tema"], linha["tema"])
+
+    @patch("api.api.run_pesquisador", side_effect=pesquisa_falsa)
+    def test_item_que_falha_ao_enfileirar(self, mock_run):
+        original = api.iniciar_execucao
+
+        def iniciar(task_id, tema, *args):
+            if tema == "Lote com falha":
+                raise RuntimeError("armazenamento indisponível")
+            return original(task_id, tema, *args)
+
+        with patch.object(api, "iniciar_execucao", iniciar):
+            lote = client.post("/pesquisar/lote", json={"temas": ["Lote com falha", "Lote sem falha"]}).json()
+            resumo = aguardar_lote(lote["id"])
+        # O erro fica no item e o alimentador segue para os demais
+        self.assertEqual((resumo["concluidos"], resumo["erros"], resumo["pendentes"]), (1, 1, 0))
+        resposta = client.get(f"/lote/{lote['id']}/resultados")
+        linhas = {linha["tema"]: linha for linha in map(json.loads, resposta.text.splitlines())}
+        self.assertEqual(linhas["Lote com falha"]["status"], "erro: armazenamento indisponível")
+        self.assertEqual(linhas["Lote sem falha"]["status"], "concluído")
+
+    @patch("api.api.run_pesquisador", side_effect=pesquisa_falsa)
+    def test_armazenamento_em_lote_fora_do_loop(self, mock_run):
+        """Os itens são gravados e lidos de uma vez, e nunca no event loop"""
+        chamadas = []
+
+        def registrar(metodo):
+            original = getattr(api.job_store, metodo)
+
+            def chamar(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    no_loop = True
+                except RuntimeError:
+                    no_loop = False
+                chamadas.append((metodo, no_loop, args))
+                return original(*args, **kwargs)
+            return patch.object(api.job_store, metodo, chamar)
+
+        # Temas repetidos: as agrupadas refletem a execução que aguardam
+        temas = [f"Lote em bloco {i % 10}" for i in range(20)]
+        with registrar("criar"), registrar("criar_varios"), registrar("obter"), registrar("obter_varios"):
+            lote = client.post("/pesquisar/lote", json={"temas": temas}).json()
+            self.assertEqual(lote["total"], 20)
+            resumo = aguardar_lote(lote["id"])
+        self.assertEqual((resumo["concluidos"], resumo["erros"], resumo["pendentes"]), (20, 0, 0))
+        self.assertEqual([metodo for metodo, no_loop, _ in chamadas if no_loop], [])
+        # Uma escrita para os itens e outra para o lote
+        self.assertEqual(sorted(len(args[0]) for metodo, _, args in chamadas if metodo == "criar_varios"), [1, 20])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api.api import app, chave_execucao
+from eventos import observar
+from tools import multifonte
+from tools.http_client import obter_cliente_async
+from tools.multifonte import ResultadoFonte, coletar_fontes_sync, mesclar_fontes
+from tools.web_search_ddg import cache_buscas
+
+client = TestClient(app)
+
+
+def fonte_lenta(texto, atraso):
+    async def buscar(tema):
+        await asyncio.sleep(atraso)
+        return texto
+    return buscar
+
+
+class TestColetaMultifonte(unittest.TestCase):
+    """
+    Testes da coleta paralela de fontes do fluxo multifonte.
+    """
+
+    def test_fontes_consultadas_em_paralelo(self):
+        """O tempo total é o da fonte mais lenta, não a soma"""
+        buscadores = {
+            "wikipedia": fonte_lenta("Texto da Wikipedia.", 0.3),
+            "web": fonte_lenta("Texto da web.", 0.3),
+        }
+        with patch.dict(multifonte.BUSCADORES, buscadores):
+            inicio = time.monotonic()
+            resultados = coletar_fontes_sync("Tema")
+            duracao = time.monotonic() - inicio
+
+        self.assertLess(duracao, 0.55)
+        self.assertEqual([r.status for r in resultados], ["ok", "ok"])
+
+    def test_fonte_lenta_nao_bloqueia(self):
+        """Uma fonte que passa do timeout é descartada e as outras seguem"""
+        buscadores = {
+            "wikipedia": fonte_lenta("Texto da Wikipedia.", 0.01),
+            "web": fonte_lenta("Nunca chega.", 5),
+        }
+        eventos = []
+        with patch.dict(multifonte.BUSCADORES, buscadores), observar(eventos.append):
+            inicio = time.monotonic()
+            resultados = coletar_fontes_sync("Tema", timeouts={"web": 0.2})
+            duracao = time.monotonic() - inicio
+
+        self.assertLess(duracao, 1)
+        self.assertEqual({r.fonte: r.status for r in resultados}, {"wikipedia": "ok", "web": "timeout"})
+        self.assertIn("Texto da Wikipedia.", mesclar_fontes(resultados))
+        self.assertEqual({ev["fonte"]: ev["status"] for ev in eventos}, {"wikipedia": "ok", "web": "timeout"})
+
+    def test_web_sincrona_respeita_timeout(self):
+        """A busca no DuckDuckGo (síncrona) também é interrompida pelo timeout"""
+        with patch("tools.web_search_ddg._buscar_ddg", side_effect=lambda consulta, maximo, timeout: time.sleep(2) or []), \
+                patch("tools.web_search_ddg.BUSCA_WEB_URL", ""), \
+                patch.dict(multifonte.BUSCADORES, {"wikipedia": fonte_lenta("Wiki.", 0)}):
+            cache_buscas.limpar()
+            inicio = time.monotonic()
+            resultados = coletar_fontes_sync("Tema", timeouts={"web": 0.2})
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(resultados[1].status, "timeout")
+
+    def test_busca_sincrona_usa_o_timeout_da_fonte(self):
+        """Buscas no DuckDuckGo abandonadas não seguem ocupando o executor além do timeout da fonte"""
+        timeouts = []
+        with patch("tools.web_search_ddg._buscar_ddg",
+                   side_effect=lambda consulta, maximo, timeout: timeouts.append(timeout) or []), \
+                patch("tools.web_search_ddg.BUSCA_WEB_URL", ""), \
+                patch.dict(multifonte.BUSCADORES, {"wikipedia": fonte_lenta("Wiki.", 0)}):
+            cache_buscas.limpar()
+            coletar_fontes_sync("Tema", timeouts={"web": 3})
+        self.assertTrue(timeouts)
+        self.assertEqual(set(timeouts), {3})
+
+    def test_coletas_sincronas_reaproveitam_o_cliente(self):
+        """As coletas feitas pelas threads worker compartilham loop e conexões HTTP"""
+        clientes = []
+
+        async def buscar(tema):
+            clientes.append(obter_cliente_async())
+            return "Texto."
+
+        with patch.dict(multifonte.BUSCADORES, {"wikipedia": buscar, "web": buscar}):
+            coletar_fontes_sync("Tema")
+            coletar_fontes_sync("Outro tema")
+        self.assertEqual(len(clientes), 4)
+        for cliente in clientes[1:]:
+            self.assertIs(cliente, clientes[0])
+        self.assertFalse(clientes[0].is_closed)
+
+    def test_mesclar_remove_frases_repetidas(self):
+        resultados = [
+            ResultadoFonte("wikipedia", "O Brasil é um país. Sua capital é Brasília.", "ok", 0.1),
+            ResultadoFonte("web", "Sua capital é  Brasília! O país tem 27 estados.", "ok", 0.1),
+        ]
+        texto = mesclar_fontes(resultados)
+        self.assertEqual(texto.count("Brasília"), 1)
+        self.assertIn("### Web (DuckDuckGo)\nO país tem 27 estados.", texto)
+        self.assertTrue(texto.startswith("### Wikipedia\n"))
+
+    def test_sem_conteudo(self):
+        texto = mesclar_fontes([ResultadoFonte("web", "", "erro", 0.1)])
+        self.assertEqual(texto, "Nenhuma fonte retornou informações sobre o tema.")
+
+
+class TestFluxoNaAPI(unittest.TestCase):
+    """
+    Testes da escolha do fluxo por requisição.
+    """
+
+    def test_fluxo_invalido(self):
+        response = client.post("/pesquisar", json={"tema": "Teste", "fluxo": "inexistente"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fluxo_repassado_para_a_crew(self):
+        chamadas = []
+
+        def pesquisa_falsa(tema, usar_cache=True, fluxo=None):
+            chamadas.append(fluxo)
+            from tests.test_lote import pesquisa_falsa as resultado
+            return resultado(tema)
+
+        with patch("api.api.run_pesquisador", side_effect=pesquisa_falsa):
+            task_id = client.post("/pesquisar", json={"tema": "Multifonte", "fluxo": "multifonte"}).json()["id"]
+            for _ in range(50):
+                if client.get(f"/status/{task_id}").json()["status"] == "concluído":
+                    break
+                time.sleep(0.1)
+
+        self.assertEqual(chamadas, ["multifonte"])
+
+    def test_fluxos_nao_sao_agrupados(self):
+        self.assertNotEqual(chave_execucao("Tema", "multifonte"), chave_execucao("Tema", "wikipedia_artigo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
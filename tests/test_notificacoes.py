@@ -0,0 +1,217 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api import api
+from api.job_store import criar_job_store
+from api.notificacoes import EntregadorWebhooks
+from api.scheduler import AgendadorPesquisas
+from models import PesquisaOutput, PesquisaResultado
+from tests.fake_redis import FakeRedis
+
+RESULTADO = PesquisaOutput(tema="Webhook", resultados=[PesquisaResultado(topico="t", descricao="d")], resumo="r")
+
+
+class StubWebhook(BaseHTTPRequestHandler):
+    """Recebe os webhooks; responde com os códigos de `respostas`, na ordem (depois 200)."""
+
+    respostas = []
+    recebidos = []
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers["Content-Length"]))
+        StubWebhook.recebidos.append((self.headers["X-Pesquisa-Id"], json.loads(corpo)))
+        codigo = StubWebhook.respostas.pop(0) if StubWebhook.respostas else 200
+        self.send_response(codigo)
+        if codigo == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestWebhooks(unittest.TestCase):
+    """
+    Testes da entrega dos resultados por webhook.
+    """
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), StubWebhook)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}/webhook"
+        StubWebhook.respostas = []
+        StubWebhook.recebidos = []
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def test_novas_tentativas_em_erros_temporarios(self):
+        entregador = EntregadorWebhooks(tentativas=4, espera_inicial=0.01)
+        StubWebhook.respostas = [500, 429]
+        self.assertEqual(entregador.entregar(self.url, {"id": "t1"}),
+                         {"entregue": True, "tentativas": 3, "erro": None})
+        self.assertEqual(StubWebhook.recebidos[-1], ("t1", {"id": "t1"}))
+
+        # Erros do cliente (4xx) não são repetidos
+        StubWebhook.respostas = [404]
+        self.assertEqual(entregador.entregar(self.url, {"id": "t2"}),
+                         {"entregue": False, "tentativas": 1, "erro": "HTTP 404"})
+        # Sem servidor: desiste após as tentativas
+        resultado = EntregadorWebhooks(tentativas=2, espera_inicial=0.01).entregar("http://127.0.0.1:9/x", {})
+        self.assertEqual((resultado["entregue"], resultado["tentativas"]), (False, 2))
+        self.assertEqual(entregador.estatisticas(), {"entregues": 1, "falhas": 1, "tentativas": 4})
+
+    def test_pesquisa_com_callback_url(self):
+        def executar(task_id, tema, chave, usar_cache, fluxo):
+            api.job_store.liberar_execucao(chave, task_id)
+            api.finalizar_tarefa(task_id, "concluído", RESULTADO)
+
+        agendador = AgendadorPesquisas(num_workers=1, max_fila=10)
+        cliente = TestClient(api.app)
+        try:
+            with patch.object(api, "agendador", agendador), patch.object(api, "executar_pesquisa_background", executar):
+                invalida = cliente.post("/pesquisar", json={"tema": "Webhook", "callback_url": "ftp://x"})
+                self.assertEqual(invalida.status_code, 400)
+                task_id = cliente.post("/pesquisar", json={"tema": "Webhook", "callback_url": self.url}).json()["id"]
+                prazo = time.monotonic() + 5
+                while "webhook" not in api.job_store.obter(task_id) and time.monotonic() < prazo:
+                    time.sleep(0.01)
+        finally:
+            agendador.encerrar()
+
+        self.assertEqual(api.job_store.obter(task_id)["webhook"]["entregue"], True)
+        pesquisa_id, payload = StubWebhook.recebidos[-1]
+        self.assertEqual((pesquisa_id, payload["id"], payload["status"]), (task_id, task_id, "concluído"))
+        self.assertEqual(payload["resultado"], RESULTADO.model_dump())
+
+    def test_falha_na_entrega_fica_registrada(self):
+        task_id = api.criar_tarefa("Webhook com falha", callback_url=self.url)
+        with patch.object(api.entregador_webhooks, "entregar", side_effect=RuntimeError("sessão fechada")):
+            api.finalizar_tarefa(task_id, "concluído", RESULTADO)
+            prazo = time.monotonic() + 5
+            while "webhook" not in api.job_store.obter(task_id) and time.monotonic() < prazo:
+                time.sleep(0.01)
+        tarefa = api.job_store.obter(task_id)
+        self.assertEqual(tarefa["status"], "concluído")
+        self.assertEqual(tarefa["webhook"], {"entregue": False, "tentativas": None, "erro": "RuntimeError: sessão fechada"})
+
+
+class TestLongPolling(unittest.TestCase):
+    """
+    Testes do /status com `wait`: a resposta sai na conclusão, sem consultas repetidas.
+    """
+
+    def setUp(self):
+        self.liberar = threading.Event()
+        self.agendador = AgendadorPesquisas(num_workers=1, max_fila=10)
+
+        def pesquisar(tema, usar_cache=True, fluxo=None):
+            self.liberar.wait(10)
+            self.fim = time.monotonic()
+            return RESULTADO
+
+        self.patches = [patch.object(api, "agendador", self.agendador),
+                        patch.object(api, "run_pesquisador", pesquisar)]
+        for p in self.patches:
+            p.start()
+        self.cliente = TestClient(api.app)
+
+    def tearDown(self):
+        self.liberar.set()
+        self.agendador.encerrar()
+        for p in self.patches:
+            p.stop()
+
+    def test_responde_na_conclusao(self):
+        task_id = self.cliente.post("/pesquisar", json={"tema": "Long poll"}).json()["id"]
+        # Conferências do armazenamento bem espaçadas: só o aviso acorda a espera
+        with patch.object(api, "LONG_POLL_INTERVALO", 30):
+            threading.Timer(0.3, self.liberar.set).start()
+            status = self.cliente.get(f"/status/{task_id}", params={"wait": 20}).json()
+        self.assertEqual(status["status"], "concluído")
+        self.assertLess(time.monotonic() - self.fim, 2)
+        self.assertEqual(api.notificador.aguardando(), 0)
+
+    def test_tempo_esgotado_e_agrupadas(self):
+        lider = self.cliente.post("/pesquisar", json={"tema": "Long poll agrupado"}).json()["id"]
+        seguidor = self.cliente.post("/pesquisar", json={"tema": "long poll AGRUPADO"}).json()["id"]
+        inicio = time.monotonic()
+        status = self.cliente.get(f"/status/{seguidor}", params={"wait": 0.3}).json()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.3)
+        self.assertIn(status["status"], ("pendente", "processando"))
+
+        with patch.object(api, "LONG_POLL_INTERVALO", 30):
+            threading.Timer(0.2, self.liberar.set).start()
+            status = self.cliente.get(f"/status/{seguidor}", params={"wait": 20}).json()
+        self.assertEqual(status["status"], "concluído")
+        self.assertEqual(self.cliente.get(f"/status/{lider}").json()["status"], "concluído")
+        self.assertEqual(self.cliente.get("/status/inexistente", params={"wait": 1}).status_code, 404)
+
+    def test_armazenamento_fora_do_loop(self):
+        """
+        O JobStore da criação da pesquisa, do long-polling, do trace e do resultado
+        não é chamado no event loop
+        """
+        no_loop = []
+
+        def registrar(metodo):
+            original = getattr(api.job_store, metodo)
+
+            def chamar(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    no_loop.append((metodo, args))
+                except RuntimeError:
+                    pass
+                return original(*args, **kwargs)
+            return patch.object(api.job_store, metodo, chamar)
+
+        with registrar("obter"), registrar("criar"), registrar("reivindicar_execucao"), \
+                patch.object(api, "LONG_POLL_INTERVALO", 0.05):
+            task_id = self.cliente.post("/pesquisar", json={"tema": "Fora do loop"}).json()["id"]
+            threading.Timer(0.3, self.liberar.set).start()
+            self.assertEqual(self.cliente.get(f"/status/{task_id}", params={"wait": 5}).json()["status"], "concluído")
+            self.assertEqual(self.cliente.get(f"/status/{task_id}").status_code, 200)
+            self.assertEqual(self.cliente.get(f"/resultado/{task_id}").status_code, 200)
+            self.cliente.get(f"/status/{task_id}/trace")
+            self.assertEqual(self.cliente.get("/health").status_code, 200)
+        self.assertEqual(no_loop, [])
+
+
+class TestConclusoesEntreWorkers(unittest.TestCase):
+    """
+    Testes do pub/sub do RedisJobStore, que acorda o long-polling dos outros workers.
+    """
+
+    def test_conclusao_publicada_chega_ao_assinante(self):
+        servidor = FakeRedis()
+        worker_a = criar_job_store(servidor.url)
+        worker_b = criar_job_store(servidor.url)
+        recebidas = []
+        chegou = threading.Event()
+        try:
+            self.assertTrue(worker_a.assinar_conclusoes(lambda task_id: (recebidas.append(task_id), chegou.set())))
+            # A assinatura é feita em outra thread: publica até ela estar ativa
+            prazo = time.monotonic() + 5
+            while not chegou.is_set() and time.monotonic() < prazo:
+                worker_b.publicar_conclusao("task_1")
+                chegou.wait(0.05)
+            self.assertEqual(recebidas[0], "task_1")
+        finally:
+            worker_a.encerrar_assinatura()
+            servidor.fechar()
+        # Backends sem pub/sub não assinam
+        self.assertFalse(criar_job_store("memoria://").assinar_conclusoes(print))
+
+
+if __name__ == "__main__":
+    unittest.main()
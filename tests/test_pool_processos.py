@@ -0,0 +1,145 @@
+import os
+import signal
+import time
+import unittest
+from unittest.mock import patch
+
+from api import api, pool_processos
+from api.pool_processos import PoolProcessos, ProcessoEncerrado, TempoEsgotado
+from api.scheduler import AgendadorPesquisas
+from tests import jobs_processo
+
+
+def aguardar_livres(pool, quantidade, prazo=30):
+    limite = time.monotonic() + prazo
+    while pool.estatisticas()["livres"] < quantidade and time.monotonic() < limite:
+        time.sleep(0.05)
+
+
+class TestPoolProcessos(unittest.TestCase):
+    """
+    Testes dos processos worker pré-aquecidos (tempo limite, reciclagem e falhas).
+    """
+
+    def test_aquecimento_e_erros_dos_jobs(self):
+        pool = PoolProcessos(2, inicializador=jobs_processo.aquecer)
+        try:
+            pid, aquecido = pool.executar(jobs_processo.identificar)
+            self.assertTrue(aquecido)
+            self.assertNotEqual(pid, os.getpid())
+            self.assertIn(pid, pool.pids())
+            with self.assertRaisesRegex(ValueError, "falhou"):
+                pool.executar(jobs_processo.falhar, "falhou")
+            # Exceções do job não derrubam o processo
+            self.assertEqual(pool.estatisticas()["processos_perdidos"], 0)
+            self.assertEqual(pool.executar(jobs_processo.dormir, 0), 0)
+        finally:
+            pool.encerrar()
+        self.assertEqual(pool.pids(), set())
+
+    def test_tempo_esgotado_mata_e_substitui(self):
+        pool = PoolProcessos(1, timeout=0.5)
+        try:
+            pid, _ = pool.executar(jobs_processo.identificar)
+            inicio = time.monotonic()
+            with self.assertRaises(TempoEsgotado):
+                pool.executar(jobs_processo.dormir, 30)
+            self.assertLess(time.monotonic() - inicio, 5)
+            novo_pid, _ = pool.executar(jobs_processo.identificar)
+            self.assertNotEqual(novo_pid, pid)
+            with self.assertRaises(ProcessoEncerrado):
+                pool.executar(jobs_processo.abortar)
+            self.assertEqual(pool.executar(jobs_processo.dormir, 0), 0)
+            estatisticas = pool.estatisticas()
+            self.assertEqual((estatisticas["tempo_esgotado"], estatisticas["processos_perdidos"]), (1, 1))
+            self.assertEqual(estatisticas["processos"], 1)
+        finally:
+            pool.encerrar(aguardar=False)
+
+    def test_reciclagem_apos_max_jobs(self):
+        pool = PoolProcessos(1, max_jobs=2)
+        try:
+            pids = [pool.executar(jobs_processo.identificar)[0] for _ in range(3)]
+            self.assertEqual(pids[0], pids[1])
+            self.assertNotEqual(pids[1], pids[2])
+            self.assertEqual(pool.estatisticas()["reciclados"], 1)
+            aguardar_livres(pool, 1)
+            self.assertEqual(pool.estatisticas()["processos"], 1)
+        finally:
+            pool.encerrar()
+
+    def test_reciclagem_nao_atrasa_o_resultado(self):
+        pool = PoolProcessos(1, max_jobs=1)
+        finalizar = pool._finalizar_processo
+
+        def finalizar_devagar(worker, forcar):
+            time.sleep(1)
+            finalizar(worker, forcar)
+
+        try:
+            aguardar_livres(pool, 1)
+            with patch.object(pool, "_finalizar_processo", finalizar_devagar):
+                inicio = time.monotonic()
+                self.assertEqual(pool.executar(jobs_processo.dormir, 0), 0)
+                self.assertLess(time.monotonic() - inicio, 0.5)
+                aguardar_livres(pool, 1)
+            self.assertEqual(pool.estatisticas()["reciclados"], 1)
+        finally:
+            pool.encerrar()
+
+    def test_processo_livre_que_morreu(self):
+        """O job vai para outro processo quando o livre morreu antes de recebê-lo"""
+        pool = PoolProcessos(1)
+        try:
+            pid, _ = pool.executar(jobs_processo.identificar)
+            os.kill(pid, signal.SIGKILL)
+            limite = time.monotonic() + 10
+            while next(iter(pool._workers)).processo.is_alive() and time.monotonic() < limite:
+                time.sleep(0.05)
+            novo_pid, _ = pool.executar(jobs_processo.identificar)
+            self.assertNotEqual(novo_pid, pid)
+            self.assertEqual(pool.estatisticas()["processos_perdidos"], 1)
+        finally:
+            pool.encerrar()
+
+    def test_espera_para_recriar_apos_falha_no_aquecimento(self):
+        with patch.object(pool_processos, "ESPERA_REINICIO", 5.0):
+            pool = PoolProcessos(1, inicializador=jobs_processo.abortar)
+            try:
+                time.sleep(2)
+                # Sem a espera, o processo seria recriado (e morreria) continuamente
+                self.assertEqual(pool.estatisticas()["processos_perdidos"], 1)
+            finally:
+                pool.encerrar()
+        self.assertEqual(pool.pids(), set())
+
+
+class TestModoProcesso(unittest.TestCase):
+    """
+    Pesquisa da API no modo processo: o resultado chega em JSON e é guardado como veio.
+    """
+
+    def test_pesquisa_em_processo(self):
+        agendador = AgendadorPesquisas(num_workers=1, max_fila=10, modo="processo")
+        agendador.iniciar()
+        try:
+            with patch.object(api, "agendador", agendador), \
+                    patch.object(api, "run_pesquisador_json", jobs_processo.pesquisar_json), \
+                    patch.object(api.job_store, "finalizar", wraps=api.job_store.finalizar) as finalizar:
+                task_id = api.criar_tarefa("Processo", fluxo="wikipedia_artigo")
+                api.executar_pesquisa_background(task_id, "Processo", "chave-processo", False)
+        finally:
+            agendador.encerrar()
+
+        tarefa = api.obter_tarefa(task_id)
+        self.assertEqual(tarefa["status"], "concluído")
+        resultado = api.job_store.obter_resultado(task_id)
+        self.assertEqual(resultado.tema, "Processo")
+        self.assertNotEqual(resultado.resumo, f"pid {os.getpid()}")
+        # O JSON gerado no processo worker é repassado ao armazenamento
+        self.assertEqual(finalizar.call_args.args[3], resultado.model_dump_json())
+        self.assertIn("pesquisa", {s["nome"] for s in api.job_store.obter_trace(task_id)["spans"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+import os
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import crew
+from api import api
+from crew import LLMLimitado
+from rastreamento import (
+    MetricasRastreamento,
+    executar_rastreado,
+    iniciar_trace,
+    para_otlp,
+    registrar_span,
+    span,
+)
+from tests.fake_llm import FakeLLM
+from tests.test_wiki_resumo import StubWikipedia
+from tools import wiki_resumo
+from tools.wiki_resumo import cache_extratos, cache_resolucoes
+
+
+def pesquisar(tema: str) -> str:
+    with span("crew.kickoff"):
+        registrar_span("http", 1.0, 1.5, alvo="exemplo.org")
+    return f"artigo sobre {tema}"
+
+
+class TestRastreamento(unittest.TestCase):
+    """
+    Testes dos spans, da exportação e das métricas agregadas.
+    """
+
+    def test_spans_aninhados(self):
+        with span("fora do trace") as nada:
+            self.assertIsNone(nada)
+
+        with iniciar_trace() as trace:
+            with span("pesquisa", alvo="wikipedia_artigo") as raiz:
+                with span("llm"):
+                    pass
+                with self.assertRaises(ValueError):
+                    with span("ferramenta"):
+                        raise ValueError("falhou")
+
+        exportado = trace.exportar()
+        por_nome = {s["nome"]: s for s in exportado["spans"]}
+        self.assertIsNone(por_nome["pesquisa"]["pai_id"])
+        self.assertEqual(por_nome["llm"]["pai_id"], raiz.span_id)
+        self.assertEqual(por_nome["ferramenta"]["status"], "erro")
+        self.assertIn("ValueError: falhou", por_nome["ferramenta"]["atributos"]["erro"])
+        self.assertGreaterEqual(exportado["duracao"], por_nome["llm"]["duracao"])
+
+    def test_spans_de_outro_processo(self):
+        """No modo processo o filho não tem trace ativo: os spans voltam com o resultado"""
+        resultado, spans = contextvars.Context().run(executar_rastreado, "abc123", "pai42", pesquisar, "tema")
+        self.assertEqual(resultado, "artigo sobre tema")
+        kickoff, http = sorted(spans, key=lambda s: s["nome"])
+        self.assertEqual((kickoff["nome"], kickoff["pai_id"]), ("crew.kickoff", "pai42"))
+        self.assertEqual(http["pai_id"], kickoff["span_id"])
+
+        # Com trace ativo (modo thread), os spans vão direto para ele
+        with iniciar_trace() as trace:
+            self.assertEqual(executar_rastreado(trace.trace_id, None, pesquisar, "tema"), ("artigo sobre tema", None))
+        self.assertEqual(len(trace.spans()), 2)
+
+    def test_otlp_e_prometheus(self):
+        with iniciar_trace(trace_id="0af7651916cd43dd8448eb211c80319c") as trace:
+            with span("llm", alvo="groq/llama") as chamada:
+                chamada.atributos.update(tokens_prompt=100, tokens_completion=20, cache=False)
+
+        otlp = para_otlp(trace.exportar())
+        enviado = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        self.assertEqual(enviado["traceId"], "0af7651916cd43dd8448eb211c80319c")
+        self.assertEqual(len(enviado["spanId"]), 16)
+        self.assertIn({"key": "tokens_prompt", "value": {"intValue": "100"}}, enviado["attributes"])
+
+        metricas = MetricasRastreamento()
+        metricas.observar_trace(trace)
+        texto = metricas.exportar_prometheus({"pesquisa_fila_tamanho": 3})
+        self.assertIn('pesquisa_etapa_duracao_segundos_bucket{etapa="llm",alvo="groq/llama",le="+Inf"} 1', texto)
+        self.assertIn('pesquisa_etapa_duracao_quantil_segundos{etapa="llm",alvo="groq/llama",quantil="0.95"}', texto)
+        self.assertIn('pesquisa_llm_tokens_total{tipo="prompt"} 100', texto)
+        self.assertIn("pesquisa_fila_tamanho 3", texto)
+        self.assertEqual(metricas.resumo()["llm:groq/llama"]["contagem"], 1)
+
+
+class TestTraceDaPesquisa(unittest.TestCase):
+    """
+    Trace completo de uma pesquisa da API (LLM e Wikipedia locais).
+    """
+
+    def setUp(self):
+        self.wikipedia = ThreadingHTTPServer(("127.0.0.1", 0), StubWikipedia)
+        threading.Thread(target=self.wikipedia.serve_forever, daemon=True).start()
+        cache_extratos.limpar()
+        cache_resolucoes.limpar()
+
+    def tearDown(self):
+        self.wikipedia.shutdown()
+        self.wikipedia.server_close()
+
+    def executar_pesquisa(self, executar) -> str:
+        """Roda uma pesquisa wikipedia_artigo com `executar` (função de job da API) e retorna o id."""
+        def responder(corpo):
+            if len(servidor.requisicoes) % 3 == 1:
+                return ('Thought: Vou consultar a Wikipedia\nAction: wikipedia_resumo_tool\n'
+                        'Action Input: {"term": "Revolução Francesa"}')
+            return "Thought: Pronto\nFinal Answer: Texto sobre a Revolução Francesa"
+
+        servidor = FakeLLM(resposta=responder)
+        llm = LLMLimitado(model="groq/fake", api_key="teste", base_url=servidor.base_url)
+        url = f"http://127.0.0.1:{self.wikipedia.server_port}/w/api.php"
+        try:
+            with patch.object(crew, "_llm", llm), patch("crew.obter_cache_completions", return_value=None), \
+                    patch.object(wiki_resumo, "WIKIPEDIA_API_URL", url), \
+                    patch.dict(os.environ, {"GROQ_API_KEY": "teste"}):
+                task_id = api.criar_tarefa("Revolução Francesa", fluxo="wikipedia_artigo")
+                executar(task_id, "Revolução Francesa", f"chave-{task_id}", False)
+        finally:
+            servidor.fechar()
+        return task_id
+
+    def test_trace_e_metricas(self):
+        task_id = self.executar_pesquisa(api.executar_pesquisa_background)
+
+        cliente = TestClient(api.app)
+        resposta = cliente.get(f"/status/{task_id}/trace")
+        self.assertEqual(resposta.status_code, 200)
+        trace = resposta.json()
+        self.assertEqual(trace["status"], "concluído")
+        spans = trace["spans"]
+        nomes = {s["nome"] for s in spans}
+        self.assertTrue({"pesquisa", "fila", "crew.montagem", "crew.kickoff", "tarefa", "llm",
+                         "ferramenta", "http"} <= nomes)
+
+        por_id = {s["span_id"]: s for s in spans}
+        tarefas = sorted(s["atributos"]["alvo"] for s in spans if s["nome"] == "tarefa")
+        self.assertEqual(tarefas, ["escrever_artigo_task", "pesquisa_wikipedia_task"])
+        chamadas = [s for s in spans if s["nome"] == "llm"]
+        self.assertEqual(len(chamadas), 3)
+        self.assertTrue(all(por_id[s["pai_id"]]["nome"] == "tarefa" for s in chamadas))
+        self.assertEqual(chamadas[0]["atributos"]["tokens_prompt"], 10)
+        ferramenta = next(s for s in spans if s["nome"] == "ferramenta")
+        self.assertEqual(por_id[ferramenta["pai_id"]]["atributos"]["alvo"], "pesquisa_wikipedia_task")
+        http = [s for s in spans if s["nome"] == "http"]
+        self.assertTrue(http and all(s["pai_id"] == ferramenta["span_id"] for s in http))
+        self.assertEqual(http[0]["atributos"]["alvo"], "127.0.0.1")
+
+        otlp = cliente.get(f"/status/{task_id}/trace", params={"formato": "otlp"}).json()
+        self.assertEqual(len(otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]), len(spans))
+        self.assertEqual(cliente.get("/status/inexistente/trace").status_code, 404)
+
+        metricas = cliente.get("/metrics")
+        self.assertEqual(metricas.status_code, 200)
+        self.assertIn('etapa="tarefa",alvo="pesquisa_wikipedia_task"', metricas.text)
+        self.assertIn('etapa="http",alvo="127.0.0.1"', metricas.text)
+
+    def test_caminho_async(self):
+        """Com a crew assíncrona, a ferramenta roda no loop e o trace mantém a mesma estrutura"""
+        threads = []
+        original = wiki_resumo.buscar_extrato_async
+
+        async def extrato(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return await original(*args, **kwargs)
+
+        # O armazenamento das tarefas nunca roda na thread do event loop
+        threads_armazenamento = set()
+        metodos = {nome: getattr(api.job_store, nome) for nome in ("obter", "atualizar", "finalizar")}
+
+        def registrar(metodo):
+            def chamar(*args, **kwargs):
+                threads_armazenamento.add(threading.current_thread())
+                return metodo(*args, **kwargs)
+            return chamar
+
+        with patch.object(wiki_resumo, "buscar_extrato_async", extrato), \
+                patch.multiple(api.job_store, **{nome: registrar(m) for nome, m in metodos.items()}):
+            task_id = self.executar_pesquisa(
+                lambda *args: asyncio.run(api.executar_pesquisa_async(*args)))
+
+        self.assertEqual(threads, [threading.current_thread()])
+        self.assertTrue(threads_armazenamento)
+        self.assertNotIn(threading.current_thread(), threads_armazenamento)
+        tarefa = api.obter_tarefa(task_id)
+        self.assertEqual(tarefa["status"], "concluído")
+        spans = TestClient(api.app).get(f"/status/{task_id}/trace").json()["spans"]
+        por_id = {s["span_id"]: s for s in spans}
+        self.assertEqual(len([s for s in spans if s["nome"] == "llm"]), 3)
+        ferramenta = next(s for s in spans if s["nome"] == "ferramenta")
+        self.assertEqual(por_id[ferramenta["pai_id"]]["atributos"]["alvo"], "pesquisa_wikipedia_task")
+        http = [s for s in spans if s["nome"] == "http"]
+        self.assertTrue(http and all(s["pai_id"] == ferramenta["span_id"] for s in http))
+
+
+if __name__ == "__main__":
+    unittest.main()
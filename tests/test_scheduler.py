@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api.api import app
+from api.scheduler import AgendadorPesquisas, FilaCheia
+
+client = TestClient(app)
+
+
+class TestAgendadorPesquisas(unittest.TestCase):
+    """
+    Testes do agendador de pesquisas (workers, fila limitada e prioridade).
+    """
+
+    def test_prioridade_define_ordem(self):
+        """Com um worker ocupado, jobs de maior prioridade saem primeiro da fila"""
+        agendador = AgendadorPesquisas(num_workers=1, max_fila=10)
+        liberar = threading.Event()
+        ordem = []
+
+        agendador.submeter(liberar.wait)
+        agendador.submeter(ordem.append, "baixa", prioridade=0)
+        agendador.submeter(ordem.append, "alta", prioridade=5)
+        agendador.submeter(ordem.append, "media", prioridade=1)
+        liberar.set()
+        agendador.encerrar()
+
+        self.assertEqual(ordem, ["alta", "media", "baixa"])
+        self.assertEqual(agendador.metricas()["concluidas"], 4)
+
+    def test_fila_cheia(self):
+        """Submissões além do limite da fila são rejeitadas"""
+        agendador = AgendadorPesquisas(num_workers=1, max_fila=1)
+        liberar = threading.Event()
+        iniciou = threading.Event()
+
+        agendador.submeter(lambda: (iniciou.set(), liberar.wait()))
+        iniciou.wait(5)
+        agendador.submeter(liberar.wait)
+        with self.assertRaises(FilaCheia) as contexto:
+            agendador.submeter(liberar.wait)
+        self.assertGreaterEqual(contexto.exception.retry_after, 1)
+
+        metricas = agendador.metricas()
+        self.assertEqual(metricas["fila"], 1)
+        self.assertEqual(metricas["em_execucao"], 1)
+        self.assertEqual(metricas["rejeitadas"], 1)
+        liberar.set()
+        agendador.encerrar()
+
+    def test_encerrar_sem_aguardar_com_fila_cheia(self):
+        """O encerramento não bloqueia com a fila cheia: os jobs que não começaram são descartados"""
+        agendador = AgendadorPesquisas(num_workers=2, max_fila=2)
+        liberar = threading.Event()
+        iniciados = threading.Semaphore(0)
+        executados = []
+
+        for _ in range(2):
+            agendador.submeter(lambda: (iniciados.release(), liberar.wait()))
+        for _ in range(2):
+            iniciados.acquire(timeout=5)
+        agendador.submeter(executados.append, "a", identificador="a")
+        agendador.submeter(executados.append, "b")
+
+        encerrou = threading.Event()
+        threading.Thread(target=lambda: (agendador.encerrar(aguardar=False), encerrou.set()), daemon=True).start()
+        self.assertTrue(encerrou.wait(5))
+        self.assertIsNone(agendador.posicao("a"))
+        liberar.set()
+        for thread in threading.enumerate():
+            if thread.name.startswith("pesquisa-worker"):
+                thread.join(5)
+        self.assertEqual(executados, [])
+
+    def test_modo_async_executa_corrotinas_no_loop(self):
+        """No modo async, corrotinas rodam concorrentes no mesmo loop até `num_workers`"""
+        agendador = AgendadorPesquisas(num_workers=3, max_fila=20, modo="async")
+        ativas, maximo, threads = [0], [0], set()
+
+        async def job():
+            threads.add(threading.get_ident())
+            ativas[0] += 1
+            maximo[0] = max(maximo[0], ativas[0])
+            await asyncio.sleep(0.05)
+            ativas[0] -= 1
+
+        for _ in range(9):
+            agendador.submeter(job)
+        # Funções síncronas continuam aceitas (rodam no executor do loop)
+        sincronos = []
+        agendador.submeter(sincronos.append, "ok")
+        agendador.encerrar()
+
+        self.assertEqual(maximo[0], 3)
+        self.assertEqual(len(threads), 1)
+        self.assertEqual(sincronos, ["ok"])
+        self.assertEqual(agendador.metricas()["concluidas"], 10)
+
+    def test_api_retorna_503_com_fila_cheia(self):
+        """A API responde 503 com Retry-After quando o agendador recusa o job"""
+        with patch("api.api.agendador.submeter", side_effect=FilaCheia(42)):
+            response = client.post("/pesquisar", json={"tema": "Teste"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "42")
+
+    def test_health_expoe_metricas(self):
+        """O endpoint de saúde inclui as métricas da fila"""
+        response = client.get("/health")
+        self.assertIn("fila", response.json()["agendador"])
+        self.assertIn("em_execucao", response.json()["agendador"])
+
+
+if __name__ == "__main__":
+    unittest.main()
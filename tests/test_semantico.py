@@ -0,0 +1,150 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from cache import CacheArtigos
+from models import PesquisaOutput, PesquisaResultado
+from semantico import EmbedderHashing, IndiceVetorial, MemoriaSemantica, termos_distintivos
+
+
+def criar_output(resumo="Resumo sobre a Revolução Francesa"):
+    return PesquisaOutput(
+        tema="Artigo",
+        resultados=[PesquisaResultado(topico="Artigo", descricao="Artigo de teste")],
+        resumo=resumo,
+    )
+
+
+class TestIndiceVetorial(unittest.TestCase):
+    """
+    Testes do índice vetorial (busca exata, int8 e IVF).
+    """
+
+    def setUp(self):
+        gerador = np.random.default_rng(1)
+        vetores = gerador.normal(size=(3000, 64)).astype(np.float32)
+        self.vetores = vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+        ruido = self.vetores[:200] + gerador.normal(scale=0.05, size=(200, 64)).astype(np.float32)
+        self.consultas = ruido / np.linalg.norm(ruido, axis=1, keepdims=True)
+
+    def acertos(self, indice):
+        return np.mean([indice.buscar(consulta, 1)[0][0] == i for i, consulta in enumerate(self.consultas)])
+
+    def test_busca_exata(self):
+        indice = IndiceVetorial(64)
+        self.assertEqual(indice.buscar(self.consultas[0]), [])
+        for inicio in range(0, 3000, 700):
+            indice.adicionar(self.vetores[inicio:inicio + 700])
+        resultado = indice.buscar(self.vetores[42], 3)
+        self.assertEqual(resultado[0][0], 42)
+        self.assertAlmostEqual(resultado[0][1], 1.0, places=5)
+        self.assertGreaterEqual(resultado[1][1], resultado[2][1])
+        self.assertEqual(self.acertos(indice), 1.0)
+
+    def test_quantizado_e_ivf(self):
+        """int8 e IVF trocam um pouco de precisão por memória e velocidade"""
+        indice = IndiceVetorial(64, quantizar=True, listas_ivf=16, sondas=6, min_ivf=1000)
+        indice.adicionar(self.vetores)
+        self.assertEqual(indice._vetores.dtype, np.int8)
+        self.assertIsNotNone(indice._centroides)
+        self.assertGreaterEqual(self.acertos(indice), 0.9)
+
+
+class TestMemoriaSemantica(unittest.TestCase):
+    """
+    Testes do reaproveitamento de temas quase iguais.
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho_db = os.path.join(self.diretorio.name, "semantico.sqlite3")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_embedder_hashing(self):
+        embedder = EmbedderHashing()
+        vetores = embedder(["Revolução Francesa", "a revolução francesa de 1789", "Revolução Russa"])
+        self.assertGreater(float(vetores[0] @ vetores[1]), 0.85)
+        self.assertLess(float(vetores[0] @ vetores[2]), 0.7)
+
+    def test_artigo_de_tema_semelhante(self):
+        memoria = MemoriaSemantica(self.caminho_db)
+        memoria.registrar_artigo("Revolução Francesa", "wikipedia_artigo", criar_output())
+
+        output, tema, similaridade = memoria.buscar_artigo("a revolução francesa de 1789", "wikipedia_artigo")
+        self.assertEqual((output.resumo, tema), ("Resumo sobre a Revolução Francesa", "Revolução Francesa"))
+        self.assertGreater(similaridade, 0.85)
+        self.assertIsNone(memoria.buscar_artigo("Revolução Russa", "wikipedia_artigo"))
+        self.assertIsNone(memoria.buscar_artigo("Revolução Francesa", "pesquisa_ddg"))
+
+        # Persistido em SQLite: outra instância (outro processo) encontra o artigo
+        outra = MemoriaSemantica(self.caminho_db)
+        self.assertIsNotNone(outra.buscar_artigo("revolucao francesa", "wikipedia_artigo"))
+        self.assertEqual(outra.estatisticas()["itens_artigo"], 1)
+
+    def test_temas_que_diferem_no_ano(self):
+        """Anos e ordinais diferentes não são o mesmo tema, mesmo com similaridade alta"""
+        memoria = MemoriaSemantica()
+        memoria.registrar_artigo("Eleição presidencial no Brasil em 2018", "wikipedia_artigo", criar_output("2018"))
+        memoria.registrar_extrato("Eleição presidencial no Brasil em 2018", "Extrato de 2018.")
+        embedder = memoria.embedder
+        vetores = embedder(["Eleição presidencial no Brasil em 2018", "Eleição presidencial no Brasil em 2022"])
+        self.assertGreater(float(vetores[0] @ vetores[1]), memoria.limiar_artigo)
+
+        self.assertIsNone(memoria.buscar_artigo("Eleição presidencial no Brasil em 2022", "wikipedia_artigo"))
+        self.assertIsNone(memoria.buscar_extrato("Eleição presidencial no Brasil em 2022"))
+        output, _, _ = memoria.buscar_artigo("eleição presidencial no brasil em 2018", "wikipedia_artigo")
+        self.assertEqual(output.resumo, "2018")
+        self.assertEqual(memoria.buscar_extrato("eleição presidencial Brasil 2018"), "Extrato de 2018.")
+
+        self.assertEqual(termos_distintivos("Segunda Guerra Mundial"), termos_distintivos("2ª Guerra Mundial"))
+        self.assertEqual(termos_distintivos("Dom Pedro II"), {"2"})
+        self.assertEqual(termos_distintivos("Revolução Francesa"), frozenset())
+
+    def test_artigo_expirado(self):
+        memoria = MemoriaSemantica(ttl_artigo=0)
+        memoria.registrar_artigo("Revolução Francesa", "wikipedia_artigo", criar_output())
+        time.sleep(0.01)
+        self.assertIsNone(memoria.buscar_artigo("Revolução Francesa", "wikipedia_artigo"))
+
+    def test_extratos_e_material(self):
+        memoria = MemoriaSemantica()
+        memoria.registrar_extrato("Guerra Fria", "A Guerra Fria foi um período de tensão entre EUA e URSS.")
+        memoria.registrar_extrato("Guerra Fria", "Versão atualizada do extrato da Guerra Fria.")
+        self.assertEqual(memoria.buscar_extrato("guerra fria"), "Versão atualizada do extrato da Guerra Fria.")
+        self.assertIsNone(memoria.buscar_extrato("Guerra do Paraguai"))
+        self.assertEqual(memoria.estatisticas()["itens_extrato"], 1)
+
+        material = memoria.buscar_material("tensão da guerra fria")
+        self.assertEqual(material[0][0], "Versão atualizada do extrato da Guerra Fria.")
+
+    def test_run_pesquisador_reaproveita_tema_semelhante(self):
+        import main
+
+        memoria = MemoriaSemantica()
+        crew_mock = MagicMock()
+        instancia = MagicMock()
+        instancia.format_output.return_value = criar_output()
+        crew_mock.return_value = (instancia, MagicMock())
+        eventos = []
+
+        with patch("main.obter_cache_artigos", return_value=CacheArtigos(caminho_db=None)), \
+                patch("main.criar_crew", crew_mock), patch("semantico._memoria", memoria), \
+                patch.dict(os.environ, {"GROQ_API_KEY": "teste", "SEMANTICO_HABILITADO": "1"}):
+            primeiro = main.run_pesquisador("Revolução Francesa")
+            segundo = main.run_pesquisador("a revolução francesa de 1789", ao_evento=eventos.append)
+            # usar_cache=False ignora também a memória semântica
+            main.run_pesquisador("a revolução francesa de 1789", usar_cache=False)
+
+        self.assertEqual(crew_mock.call_count, 2)
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(eventos[0]["tema_semelhante"], "Revolução Francesa")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api import api
+from api.api import app, job_store
+from models import PesquisaOutput, PesquisaResultado
+
+client = TestClient(app)
+
+
+def aguardar_conclusao(task_id, tentativas=50):
+    for _ in range(tentativas):
+        status = client.get(f"/status/{task_id}").json()["status"]
+        if status not in ("pendente", "processando"):
+            return status
+        time.sleep(0.1)
+    return status
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Testes do agrupamento de pesquisas simultâneas sobre o mesmo tema.
+    """
+
+    def test_pesquisas_identicas_compartilham_execucao(self):
+        """Pesquisas simultâneas com o mesmo tema executam a crew uma única vez"""
+        liberar = threading.Event()
+        chamadas = []
+
+        def pesquisador_lento(tema, usar_cache=True, fluxo=None):
+            chamadas.append(tema)
+            liberar.wait(5)
+            return PesquisaOutput(
+                tema=tema,
+                resultados=[PesquisaResultado(topico="Artigo", descricao="Artigo compartilhado")],
+                resumo="Resumo compartilhado"
+            )
+
+        agrupadas_antes = job_store.obter_contador("requisicoes_agrupadas")
+        with patch("api.api.run_pesquisador", side_effect=pesquisador_lento):
+            ids = [
+                client.post("/pesquisar", json={"tema": tema}).json()["id"]
+                for tema in ("Single Flight", "single flight", "  SINGLE FLIGHT ")
+            ]
+            outro_id = client.post("/pesquisar", json={"tema": "Outro tema"}).json()["id"]
+            liberar.set()
+            for task_id in ids + [outro_id]:
+                self.assertEqual(aguardar_conclusao(task_id), "concluído")
+
+        self.assertEqual(sorted(chamadas), ["Outro tema", "Single Flight"])
+        resumos = {client.get(f"/resultado/{task_id}").json()["resumo"] for task_id in ids}
+        self.assertEqual(resumos, {"Resumo compartilhado"})
+        self.assertEqual(job_store.obter_contador("requisicoes_agrupadas") - agrupadas_antes, 2)
+        self.assertIn("requisicoes_agrupadas", client.get("/health").json())
+
+    def test_execucao_original_removida(self):
+        """Uma tarefa agrupada cuja execução original sumiu termina com erro"""
+        job_store.criar("task_seguidor", {"status": "pendente", "tema": "X", "tempo_inicio": time.time(),
+                                          "lider": "task_removida"})
+        status = client.get("/status/task_seguidor").json()["status"]
+        self.assertTrue(status.startswith("erro"))
+
+    def test_lider_conclui_durante_o_agrupamento(self):
+        """Um seguidor inscrito depois de o líder entregar os resultados não fica órfão"""
+        resultado = PesquisaOutput(tema="Corrida", resultados=[], resumo="Resumo da corrida")
+        lider_id = api.criar_tarefa("Corrida")
+        chave = api.chave_execucao("Corrida", api.FLUXO_PADRAO)
+        self.assertIsNone(job_store.reivindicar_execucao(chave, lider_id, 60))
+        seguidor_id = api.criar_tarefa("Corrida")
+
+        finalizadas = []
+        finalizar = api.finalizar_tarefa
+        adicionar = job_store.adicionar_seguidor
+
+        def contar(task_id, *args, **kwargs):
+            finalizadas.append(task_id)
+            return finalizar(task_id, *args, **kwargs)
+
+        def adicionar_atrasado(lider, task_id):
+            # O líder termina entre a reivindicação e a inscrição do seguidor
+            api.concluir_execucao(lider_id, chave, "concluído", resultado)
+            adicionar(lider, task_id)
+
+        with patch.object(api, "finalizar_tarefa", contar), \
+                patch.object(job_store, "adicionar_seguidor", adicionar_atrasado), \
+                patch.object(job_store, "reivindicar_execucao", return_value=lider_id):
+            api.iniciar_execucao(seguidor_id, "Corrida")
+
+        self.assertEqual(job_store.obter(seguidor_id)["status"], "concluído")
+        self.assertEqual(job_store.obter_resultado(seguidor_id).resumo, "Resumo da corrida")
+        self.assertEqual(finalizadas.count(seguidor_id), 1)
+
+    def test_reivindicacao_com_resultado_incerto(self):
+        """A resposta da reivindicação se perde: a chave é liberada e a tarefa finalizada com erro"""
+        task_id = api.criar_tarefa("Incerta")
+        chave = api.chave_execucao("Incerta", api.FLUXO_PADRAO)
+        reivindicar = job_store.reivindicar_execucao
+
+        def aplicada_sem_resposta(*args):
+            reivindicar(*args)
+            raise ConnectionResetError("conexão perdida")
+
+        with patch.object(job_store, "reivindicar_execucao", aplicada_sem_resposta):
+            with self.assertRaises(ConnectionResetError):
+                api.iniciar_execucao(task_id, "Incerta")
+
+        self.assertEqual(job_store.obter(task_id)["status"], "erro: conexão perdida")
+        # Uma pesquisa idêntica executa em vez de aguardar a tarefa que nunca rodaria
+        outra_id = api.criar_tarefa("Incerta")
+        self.assertIsNone(job_store.reivindicar_execucao(chave, outra_id, 60))
+        job_store.liberar_execucao(chave, outra_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
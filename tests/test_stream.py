@@ -0,0 +1,108 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api.api import app
+from eventos import emitir, observar
+from main import apenas_tokens_do_agente, run_pesquisador_stream
+from models import PesquisaOutput, PesquisaResultado
+
+client = TestClient(app)
+
+RESULTADO = PesquisaOutput(
+    tema="Teste",
+    resultados=[PesquisaResultado(topico="Artigo", descricao="Artigo de teste")],
+    resumo="Resumo teste"
+)
+
+
+def pesquisa_falsa(tema, usar_cache=True, ao_evento=None, fluxo=None):
+    """Simula a crew emitindo progresso e tokens do redator"""
+    with observar(ao_evento):
+        emitir("wikipedia_inicio", termo=tema)
+        emitir("wikipedia_fim", termo=tema, encontrado=True, cache=False)
+        for trecho in ["# Tes", "te\n", "Artigo"]:
+            emitir("token", conteudo=trecho, agente="Redator de Artigos")
+    return RESULTADO
+
+
+def ler_sse(texto):
+    eventos = []
+    for bloco in texto.strip().split("\n\n"):
+        linhas = dict(linha.split(": ", 1) for linha in bloco.split("\n"))
+        eventos.append((linhas["event"], json.loads(linhas["data"])))
+    return eventos
+
+
+class TestEventos(unittest.TestCase):
+    """
+    Testes da propagação de eventos de progresso.
+    """
+
+    def test_emitir_sem_observador(self):
+        """Sem observador registrado, emitir não faz nada"""
+        emitir("token", conteudo="x")
+
+    def test_falha_do_observador_nao_interrompe(self):
+        """Erros do observador são ignorados"""
+        def observador(evento):
+            raise ValueError("falha")
+
+        with observar(observador):
+            emitir("token", conteudo="x")
+
+    def test_apenas_tokens_do_redator(self):
+        """Tokens de outros agentes são descartados, os demais eventos passam"""
+        recebidos = []
+        filtro = apenas_tokens_do_agente("Redator de Artigos", recebidos.append)
+        filtro({"tipo": "token", "conteudo": "a", "agente": "Pesquisador"})
+        filtro({"tipo": "token", "conteudo": "b", "agente": "Redator de Artigos"})
+        filtro({"tipo": "tarefa_inicio", "tarefa": "pesquisa", "agente": "Pesquisador"})
+        self.assertEqual([ev["tipo"] for ev in recebidos], ["token", "tarefa_inicio"])
+
+    @patch("main.run_pesquisador", side_effect=pesquisa_falsa)
+    def test_run_pesquisador_stream(self, mock_run):
+        """O gerador entrega os eventos na ordem e termina com o resultado"""
+        eventos = list(run_pesquisador_stream("Teste"))
+        self.assertEqual(
+            [ev["tipo"] for ev in eventos],
+            ["wikipedia_inicio", "wikipedia_fim", "token", "token", "token", "resultado"]
+        )
+        self.assertEqual(eventos[-1]["resultado"], RESULTADO)
+
+
+class TestPesquisarStream(unittest.TestCase):
+    """
+    Testes do endpoint /pesquisar/stream.
+    """
+
+    def test_tema_vazio(self):
+        response = client.post("/pesquisar/stream", json={"tema": ""})
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.api.run_pesquisador", side_effect=pesquisa_falsa)
+    def test_stream_sse(self, mock_run):
+        """Eventos de progresso e tokens chegam antes do resultado final"""
+        response = client.post("/pesquisar/stream", json={"tema": "Teste"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+
+        eventos = ler_sse(response.text)
+        tipos = [tipo for tipo, _ in eventos]
+        self.assertEqual(tipos[0], "wikipedia_inicio")
+        self.assertEqual(tipos[-1], "resultado")
+        artigo = "".join(dados["conteudo"] for tipo, dados in eventos if tipo == "token")
+        self.assertEqual(artigo, "# Teste\nArtigo")
+        self.assertEqual(eventos[-1][1]["resultado"], RESULTADO.model_dump())
+
+    @patch("api.api.run_pesquisador", side_effect=RuntimeError("falhou"))
+    def test_stream_erro(self, mock_run):
+        """Falhas na execução viram um evento de erro e encerram o stream"""
+        response = client.post("/pesquisar/stream", json={"tema": "Teste"})
+        self.assertEqual(ler_sse(response.text), [("erro", {"tipo": "erro", "mensagem": "falhou"})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import unittest
+
+from benchmarks.tempo_importacao import medir_importacao, pacotes_pesados
+
+# Orçamento (segundos) para importar a API a frio; a crewai sozinha leva vários segundos
+ORCAMENTO_API = float(os.getenv("ORCAMENTO_IMPORTACAO_API", "3"))
+
+
+class TestTempoImportacao(unittest.TestCase):
+    """
+    Regressão do tempo de inicialização: a API, o main e a interface não podem
+    carregar a pilha de agentes (crewai, LiteLLM, langchain) na importação.
+    """
+
+    def test_api_nao_importa_a_crewai(self):
+        tempos = medir_importacao("api.api")
+        self.assertEqual(pacotes_pesados(tempos), [])
+        self.assertLess(tempos["api.api"] / 1e6, ORCAMENTO_API)
+
+    def test_main_nao_importa_a_crewai(self):
+        self.assertEqual(pacotes_pesados(medir_importacao("main")), [])
+
+    def test_crew_nao_cria_o_llm_na_importacao(self):
+        """O LiteLLM só é carregado quando o LLM é criado"""
+        self.assertNotIn("litellm", pacotes_pesados(medir_importacao("crew")))
+
+    def test_interface_nao_preaquece_na_importacao(self):
+        """O pré-aquecimento só começa quando o Streamlit executa o script"""
+        self.assertEqual(pacotes_pesados(medir_importacao("app")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
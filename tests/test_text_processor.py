@@ -0,0 +1,56 @@
+import random
+import unittest
+
+from tokens import estimar_tokens_texto, termos
+from tools.text_processor import dividir_sentencas, extract_key_points, resumo_extrativo
+
+TEXTO = """A Revolução Francesa foi um período de agitação política e social na França. Ela começou em 1789.
+O clima da região é temperado. As chuvas são frequentes no inverno.
+A Revolução Francesa aboliu a monarquia absolutista e proclamou a república. A revolução influenciou movimentos liberais na Europa.
+A culinária francesa é famosa pelos queijos e vinhos.
+A Revolução Francesa aboliu a monarquia absolutista e proclamou a república francesa."""
+
+
+class TestResumoExtrativo(unittest.TestCase):
+    """
+    Testes do resumo extrativo usado pela ferramenta e pelo fluxo direto.
+    """
+
+    def test_termos_e_sentencas(self):
+        self.assertEqual(termos("A Revolução de 1789 e o Brasil"), ["revolucao", "1789", "brasil"])
+        self.assertEqual(
+            dividir_sentencas("Primeira frase. Segunda frase, com vírgula.\n\nSr. X chegou em 1789. Fim"),
+            [(0, "Primeira frase."), (0, "Segunda frase, com vírgula."), (1, "Sr. X chegou em 1789."), (1, "Fim")],
+        )
+
+    def test_texto_curto_inalterado(self):
+        texto = "Primeiro parágrafo. Com duas frases.\nSegundo parágrafo."
+        self.assertEqual(resumo_extrativo(texto, "tema", 400), "Primeiro parágrafo. Com duas frases.\n\nSegundo parágrafo.")
+        self.assertEqual(resumo_extrativo("", "tema"), "")
+
+    def test_prioriza_tema_sem_repeticoes(self):
+        resumo = resumo_extrativo(TEXTO, "Revolução Francesa", token_budget=60)
+        self.assertLessEqual(estimar_tokens_texto(resumo), 60 + 3)
+        self.assertNotIn("clima", resumo)
+        self.assertNotIn("culinária", resumo)
+        # As duas sentenças quase iguais sobre a monarquia não entram juntas
+        self.assertEqual(resumo.count("aboliu a monarquia"), 1)
+        # Ordem original preservada
+        self.assertTrue(resumo.startswith("A Revolução Francesa foi um período"))
+
+    def test_texto_longo(self):
+        aleatorio = random.Random(7)
+        palavras = "comércio porto rio clima agricultura música teatro ciência igreja mercado".split()
+        paragrafos = [" ".join(aleatorio.choice(palavras) for _ in range(12)).capitalize() + "." for _ in range(5000)]
+        paragrafos[3210] = "A Revolução Francesa começou com a queda da Bastilha."
+        resumo = resumo_extrativo("\n".join(paragrafos), "Revolução Francesa", token_budget=100)
+        self.assertIn("queda da Bastilha", resumo)
+        self.assertLessEqual(estimar_tokens_texto(resumo), 100 + 20)
+
+    def test_ferramenta(self):
+        resumo = extract_key_points.run(text=TEXTO, topic="culinária", token_budget=15)
+        self.assertEqual(resumo, "A culinária francesa é famosa pelos queijos e vinhos.")
+
+
+if __name__ == "__main__":
+    unittest.main()
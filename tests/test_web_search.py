@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from tools import web_search_ddg
+from tools.http_client import fechar_cliente_async
+from tools.web_search_ddg import (
+    ResultadoBusca,
+    buscar_resultados,
+    buscar_variantes_async,
+    buscar_web_async,
+    cache_buscas,
+    formatar_resultados,
+    mesclar_resultados,
+    search_web,
+)
+
+# Resultados do stub por consulta; a mesma página aparece com URLs equivalentes
+RESULTADOS = {
+    "guerra fria": [
+        {"title": "Guerra Fria", "url": "https://pt.wikipedia.org/wiki/Guerra_Fria",
+         "content": "A Guerra Fria foi um período de tensão."},
+        {"title": "História", "url": "https://historia.exemplo.org/guerra-fria",
+         "content": "Disputa entre EUA e URSS."},
+    ],
+    "o que é guerra fria": [
+        {"title": "Guerra Fria - Wikipédia", "url": "http://www.pt.wikipedia.org/wiki/Guerra_Fria/#inicio",
+         "content": "A Guerra Fria foi um período de tensão."},
+        {"title": "Resumo", "url": "https://resumo.exemplo.org/gf", "content": "Conflito   indireto."},
+    ],
+}
+
+
+class StubBusca(BaseHTTPRequestHandler):
+    """Servidor local que imita a busca JSON do SearxNG (`?q=...&format=json`)."""
+
+    consultas = []
+    atraso = 0.0
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        consulta = params["q"][0]
+        StubBusca.consultas.append(consulta)
+        time.sleep(StubBusca.atraso)
+        if consulta == "erro":
+            self.send_response(500)
+            self.end_headers()
+            return
+        corpo = json.dumps({"query": consulta, "results": RESULTADOS.get(consulta.casefold(), [])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBuscaWeb(unittest.TestCase):
+    """
+    Testes da busca na web contra um backend local no formato do SearxNG.
+    """
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), StubBusca)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = patch.object(web_search_ddg, "BUSCA_WEB_URL", f"http://127.0.0.1:{self.servidor.server_port}/search")
+        self.url.start()
+        StubBusca.consultas = []
+        StubBusca.atraso = 0.0
+        cache_buscas.limpar()
+
+    def tearDown(self):
+        self.url.stop()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def test_resultados_estruturados_e_cache(self):
+        resultados = buscar_resultados("Guerra Fria")
+        self.assertEqual(resultados[0], ResultadoBusca(
+            "Guerra Fria", "https://pt.wikipedia.org/wiki/Guerra_Fria", "A Guerra Fria foi um período de tensão."))
+        # Mesma consulta (ignorando caixa e espaços) vem do cache
+        self.assertEqual(buscar_resultados("  guerra   FRIA"), resultados)
+        self.assertEqual(StubBusca.consultas, ["Guerra Fria"])
+        with self.assertRaises(Exception):
+            buscar_resultados("erro")
+        # Falhas não ficam em cache
+        self.assertIsNone(cache_buscas.obter(web_search_ddg._chave_busca("erro", web_search_ddg.MAX_RESULTADOS)))
+
+    def test_variantes_em_paralelo_sem_urls_repetidas(self):
+        StubBusca.atraso = 0.3
+
+        async def buscar():
+            try:
+                return await buscar_variantes_async(["Guerra Fria", "o que é Guerra Fria", "erro"])
+            finally:
+                await fechar_cliente_async()
+
+        inicio = time.monotonic()
+        resultados = asyncio.run(buscar())
+        self.assertLess(time.monotonic() - inicio, 0.6)
+        # A página presente nas duas variantes aparece uma vez, no topo
+        self.assertEqual([r.titulo for r in resultados], ["Guerra Fria", "História", "Resumo"])
+        self.assertEqual(resultados[2].trecho, "Conflito indireto.")
+
+    def test_texto_da_ferramenta_e_do_multifonte(self):
+        texto = search_web.run(query="Guerra Fria")
+        self.assertEqual(texto.splitlines()[0],
+                         "1. Guerra Fria: A Guerra Fria foi um período de tensão. "
+                         "(https://pt.wikipedia.org/wiki/Guerra_Fria)")
+        self.assertEqual(search_web.run(query="nada"), "Nenhum resultado encontrado para 'nada'.")
+
+        async def buscar():
+            try:
+                return await buscar_web_async("Guerra Fria")
+            finally:
+                await fechar_cliente_async()
+
+        trechos = asyncio.run(buscar())
+        self.assertEqual(trechos.count("período de tensão"), 1)
+        self.assertIn("Conflito indireto.", trechos)
+
+    def test_formatar_e_mesclar(self):
+        a = ResultadoBusca("A", "https://a.org/x", "trecho " * 50)
+        b = ResultadoBusca("B", "https://b.org", "curto")
+        self.assertEqual(mesclar_resultados([[a, b], [b]], limite=1), [b])
+        texto = formatar_resultados([a, b], max_chars=120)
+        self.assertEqual(len(texto), 120)
+        self.assertNotIn("B:", texto)
+
+
+if __name__ == "__main__":
+    unittest.main()
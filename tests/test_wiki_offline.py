@@ -0,0 +1,133 @@
+import bz2
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from tools import wiki_offline
+from tools.wiki_offline import IndiceOffline, construir_indice, extrair_introducao, obter_indice_offline
+from tools.wiki_resumo import buscar_extrato, cache_extratos
+
+DUMP_XML = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <siteinfo><sitename>Wikipédia</sitename></siteinfo>
+  <page>
+    <title>Revolução Francesa</title>
+    <ns>0</ns>
+    <revision><text>{{Info/Evento|nome={{PAGENAME}}}}
+[[Ficheiro:Bastilha.jpg|thumb|A [[Bastilha]] em 1789]]
+A '''Revolução Francesa''' foi um período de agitação na [[França]]&lt;ref name="a"&gt;Fonte&lt;/ref&gt;.
+Começou com a [[Queda da Bastilha|tomada da Bastilha]].&lt;!-- comentário --&gt;
+== História ==
+Texto da seção que não faz parte da introdução.</text></revision>
+  </page>
+  <page>
+    <title>Revolucao francesa</title>
+    <ns>0</ns>
+    <redirect title="Revolução Francesa" />
+    <revision><text>#REDIRECIONAMENTO [[Revolução Francesa]]</text></revision>
+  </page>
+  <page>
+    <title>Predefinição:Info</title>
+    <ns>10</ns>
+    <revision><text>Não é um artigo.</text></revision>
+  </page>
+</mediawiki>
+"""
+
+
+class TestIndiceOffline(unittest.TestCase):
+    """
+    Testes do índice local de extratos da Wikipedia.
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.destino = os.path.join(self.diretorio.name, "indice")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def escrever(self, nome, conteudo, abrir=open):
+        caminho = os.path.join(self.diretorio.name, nome)
+        with abrir(caminho, "wt", encoding="utf-8") as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_introducao_sem_marcacao(self):
+        texto = extrair_introducao(
+            "{{Info|a={{b}}}}\nO '''[[Brasil|país]]''' tem [https://ibge.gov.br dados]<ref>x</ref>.\n== Seção ==\nFora"
+        )
+        self.assertEqual(texto, "O país tem dados.")
+
+    def test_dump_xml_compactado(self):
+        dump = self.escrever("ptwiki.xml.bz2", DUMP_XML, bz2.open)
+        contagem = construir_indice(dump, self.destino)
+        self.assertEqual((contagem["artigos"], contagem["redirecionamentos"]), (1, 1))
+
+        indice = IndiceOffline(self.destino)
+        self.assertEqual(
+            indice.obter("revolução_francesa"),
+            "A Revolução Francesa foi um período de agitação na França.\nComeçou com a tomada da Bastilha.",
+        )
+        # Redirecionamentos são seguidos e páginas fora do namespace principal não entram
+        self.assertEqual(indice.obter("Revolucao francesa"), indice.obter("Revolução Francesa"))
+        self.assertIsNone(indice.obter("Predefinição:Info"))
+        self.assertIsNone(indice.obter("Inexistente"))
+        indice.fechar()
+
+    def test_dump_jsonl(self):
+        linhas = [{"title": f"Artigo {i}", "extract": f"Conteúdo do artigo {i}."} for i in range(500)]
+        linhas.append({"title": "Atalho", "redirect": "Artigo 7"})
+        dump = self.escrever("dump.jsonl", "\n".join(json.dumps(linha) for linha in linhas))
+        construir_indice(dump, self.destino)
+
+        indice = IndiceOffline(self.destino)
+        self.assertEqual(len(indice), 501)
+        for i in (0, 250, 499):
+            self.assertEqual(indice.obter(f"artigo {i}"), f"Conteúdo do artigo {i}.")
+        self.assertEqual(indice.obter("Atalho"), "Conteúdo do artigo 7.")
+        indice.fechar()
+
+    def test_titulos_que_diferem_na_caixa(self):
+        linhas = [
+            {"title": "APPLE", "extract": "Sigla de um protocolo."},
+            {"title": "Apple", "extract": "Empresa de tecnologia."},
+            {"title": "Apple Inc.", "redirect": "Apple"},
+        ]
+        dump = self.escrever("dump.jsonl", "\n".join(json.dumps(linha) for linha in linhas))
+        construir_indice(dump, self.destino)
+
+        indice = IndiceOffline(self.destino)
+        self.assertEqual(indice.obter("APPLE"), "Sigla de um protocolo.")
+        self.assertEqual(indice.obter("Apple"), "Empresa de tecnologia.")
+        # Como no MediaWiki, a primeira letra não diferencia maiúsculas
+        self.assertEqual(indice.obter("apple"), "Empresa de tecnologia.")
+        self.assertEqual(indice.obter("Apple Inc."), "Empresa de tecnologia.")
+        # Sem o título exato, vale um que difere apenas na caixa
+        self.assertEqual(indice.obter("apple inc."), "Empresa de tecnologia.")
+        indice.fechar()
+
+    def test_wikipedia_resumo_usa_o_indice(self):
+        dump = self.escrever("dump.jsonl", json.dumps({"title": "Offline", "extract": "Texto local."}))
+        construir_indice(dump, self.destino)
+        cache_extratos.limpar()
+
+        with patch.dict(os.environ, {"WIKIPEDIA_OFFLINE_INDICE": self.destino}), \
+                patch("tools.wiki_resumo.resolver_titulos", return_value=["Online"]) as resolver, \
+                patch("tools.wiki_resumo.buscar_extratos", return_value={"Online": "Texto da API."}):
+            self.assertEqual(buscar_extrato("offline"), "Texto local.")
+            resolver.assert_not_called()
+            # Títulos fora do índice são buscados na API
+            self.assertEqual(buscar_extrato("online"), "Texto da API.")
+        wiki_offline._indices.pop(self.destino).fechar()
+
+    def test_sem_indice_configurado(self):
+        with patch.dict(os.environ, {"WIKIPEDIA_OFFLINE_INDICE": ""}):
+            self.assertIsNone(obter_indice_offline())
+        with patch.dict(os.environ, {"WIKIPEDIA_OFFLINE_INDICE": self.destino}):
+            self.assertIsNone(obter_indice_offline())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from tools import wiki_resumo
+from tools.wiki_resumo import (
+    buscar_extrato,
+    buscar_extrato_async,
+    buscar_extratos,
+    cache_extratos,
+    cache_resolucoes,
+    extrato_condensado,
+    resolver_titulos,
+    wikipedia_resumo,
+)
+
+EXTRATO = "A Revolução Francesa foi um período de intensa agitação política e social na França. " * 10
+
+
+# Títulos devolvidos pela busca (opensearch) do stub; outros termos resolvem para si mesmos
+BUSCAS = {
+    "Guerra fria": ["Guerra Fria", "Corrida espacial", "Cortina de Ferro"],
+    "Tema sem artigo": ["Inexistente", "Brasil"],
+    "Nada": [],
+}
+EXTRATOS = {"Guerra Fria": "A Guerra Fria foi um período de tensão geopolítica."}
+
+
+class StubWikipedia(BaseHTTPRequestHandler):
+    """Servidor local que imita a API de extratos e a busca da Wikipedia."""
+
+    requisicoes = []
+    buscas = []
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        if params["action"][0] == "opensearch":
+            termo = params["search"][0]
+            StubWikipedia.buscas.append(termo)
+            titulos = BUSCAS.get(termo, [termo])[:int(params["limit"][0])]
+            self._responder(json.dumps([termo, titulos, [""] * len(titulos), [""] * len(titulos)]))
+            return
+
+        titulo = params["titles"][0]
+        StubWikipedia.requisicoes.append((titulo, self.headers.get("If-None-Match")))
+
+        etag = f'"{len(titulo)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        paginas = {}
+        for i, nome in enumerate(titulo.split("|"), start=1):
+            if nome == "Inexistente":
+                paginas[str(-i)] = {"title": nome, "missing": ""}
+            else:
+                paginas[str(i)] = {"title": nome, "extract": EXTRATOS.get(nome, EXTRATO)}
+        self._responder(json.dumps({"query": {"pages": paginas}}), {"ETag": etag})
+
+    def _responder(self, corpo, headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestWikiResumo(unittest.TestCase):
+    """
+    Testes do cliente da Wikipedia contra um servidor local.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = ThreadingHTTPServer(("127.0.0.1", 0), StubWikipedia)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.servidor.server_port}/w/api.php"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        StubWikipedia.requisicoes = []
+        StubWikipedia.buscas = []
+        cache_extratos.limpar()
+        cache_resolucoes.limpar()
+        self.patch_url = patch.object(wiki_resumo, "WIKIPEDIA_API_URL", self.url)
+        self.patch_url.start()
+
+    def tearDown(self):
+        self.patch_url.stop()
+
+    def test_max_chars_reutiliza_cache(self):
+        """Valores diferentes de max_chars usam a mesma entrada do cache"""
+        curto = wikipedia_resumo.run(term="Revolução Francesa", max_chars=100)
+        longo = wikipedia_resumo.run(term="revolução_Francesa", max_chars=500)
+        self.assertEqual(len(curto), 103)
+        self.assertEqual(len(longo), 503)
+        self.assertEqual(len(StubWikipedia.requisicoes), 1)
+
+    def test_termo_escapado(self):
+        """Caracteres especiais chegam intactos ao servidor"""
+        wikipedia_resumo.run(term="C++ & Java #1")
+        self.assertEqual(StubWikipedia.requisicoes[0][0], "C++ & Java #1")
+
+    def test_get_condicional(self):
+        """Entradas vencidas são revalidadas com If-None-Match"""
+        with patch.object(cache_extratos, "ttl_segundos", 0):
+            wikipedia_resumo.run(term="Brasil")
+            resultado = wikipedia_resumo.run(term="Brasil")
+        self.assertTrue(resultado.startswith("A Revolução Francesa"))
+        self.assertEqual(StubWikipedia.requisicoes, [("Brasil", None), ("Brasil", '"6"')])
+
+    def test_artigo_inexistente(self):
+        """Artigos sem extrato retornam a mensagem padrão"""
+        resultado = wikipedia_resumo.run(term="Inexistente")
+        self.assertEqual(resultado, "Nenhum conteúdo encontrado na Wikipedia para este termo.")
+
+    def test_extrato_condensado(self):
+        """O fluxo direto recebe o extrato já condensado, sem passar pelo agente"""
+        # O extrato do stub repete a mesma sentença: as cópias são descartadas
+        self.assertEqual(
+            extrato_condensado("Revolução Francesa", max_chars=200),
+            "A Revolução Francesa foi um período de intensa agitação política e social na França.",
+        )
+        self.assertEqual(extrato_condensado("Inexistente"), "Nenhum conteúdo encontrado na Wikipedia para este termo.")
+        self.assertEqual(len(StubWikipedia.requisicoes), 2)
+
+    def test_cliente_async(self):
+        """A variante assíncrona compartilha o cache com a síncrona"""
+        async def buscar():
+            return await asyncio.gather(
+                buscar_extrato_async("Portugal"),
+                buscar_extrato_async("Espanha"),
+            )
+
+        extratos = asyncio.run(buscar())
+        self.assertEqual(extratos, [EXTRATO, EXTRATO])
+        wikipedia_resumo.run(term="Portugal")
+        self.assertEqual(len(StubWikipedia.requisicoes), 2)
+
+    def test_resolucao_com_extratos_em_lote(self):
+        """O tema livre é resolvido pela busca e os candidatos vêm em uma única requisição"""
+        extrato = buscar_extrato("guerra fria")
+        self.assertEqual(extrato, EXTRATOS["Guerra Fria"])
+        self.assertEqual(StubWikipedia.buscas, ["Guerra fria"])
+        self.assertEqual(StubWikipedia.requisicoes, [("Guerra Fria|Corrida espacial|Cortina de Ferro", None)])
+
+        # Resolução e extratos ficam em cache, inclusive os dos outros candidatos
+        self.assertEqual(buscar_extrato("GUERRA FRIA"), EXTRATOS["Guerra Fria"])
+        self.assertEqual(buscar_extrato("Corrida espacial"), EXTRATO)
+        self.assertEqual(len(StubWikipedia.buscas), 1)
+        self.assertEqual(len(StubWikipedia.requisicoes), 1)
+
+    def test_candidato_seguinte_quando_o_primeiro_nao_existe(self):
+        self.assertEqual(buscar_extrato("tema sem artigo"), EXTRATO)
+        self.assertEqual(StubWikipedia.requisicoes, [("Inexistente|Brasil", None)])
+
+    def test_candidatos_sem_extrato_nao_ficam_em_cache(self):
+        """Páginas inexistentes são pedidas de novo; as encontradas vêm do cache"""
+        buscar_extrato("tema sem artigo")
+        self.assertIsNone(cache_extratos.obter((wiki_resumo.IDIOMA_PADRAO, "Inexistente")))
+        self.assertEqual(buscar_extratos(["Inexistente", "Brasil"]), {"Inexistente": "", "Brasil": EXTRATO})
+        self.assertEqual(StubWikipedia.requisicoes, [("Inexistente|Brasil", None), ("Inexistente", None)])
+        # Também com um único título (resposta com ETag)
+        self.assertEqual(buscar_extratos(["Inexistente"]), {"Inexistente": ""})
+        self.assertEqual(len(StubWikipedia.requisicoes), 3)
+
+    def test_busca_sem_resultados_usa_o_proprio_termo(self):
+        self.assertEqual(resolver_titulos("nada"), ["Nada"])
+        self.assertEqual(resolver_titulos("nada", limite=2), ["Nada"])
+        self.assertEqual(StubWikipedia.buscas, ["Nada", "Nada"])
+        resolver_titulos("nada")
+        self.assertEqual(len(StubWikipedia.buscas), 2)
+
+    def test_lote_assincrono(self):
+        extrato = asyncio.run(buscar_extrato_async("guerra fria"))
+        self.assertEqual(extrato, EXTRATOS["Guerra Fria"])
+        self.assertEqual(StubWikipedia.requisicoes, [("Guerra Fria|Corrida espacial|Cortina de Ferro", None)])
+
+    def test_etapas_locais_fora_do_loop(self):
+        """Índice offline, memória semântica e seleção de sentenças não rodam no event loop"""
+        no_loop = []
+
+        def registrar(nome):
+            original = getattr(wiki_resumo, nome)
+
+            def chamar(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    no_loop.append(nome)
+                except RuntimeError:
+                    pass
+                return original(*args, **kwargs)
+            return patch.object(wiki_resumo, nome, chamar)
+
+        with registrar("_buscar_sem_rede"), registrar("_registrar_semelhante"), registrar("resumo_extrativo"):
+            texto = asyncio.run(wiki_resumo.extrato_condensado_async("Revolução Francesa", max_chars=200))
+        self.assertTrue(texto.startswith("A Revolução Francesa"))
+        self.assertEqual(no_loop, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Estimativa de tokens e normalização de termos compartilhadas pelo limitador,
+pelos resumos extrativos e pela memória semântica. Sem dependências pesadas:
+o tokenizador BPE só é carregado por contar_tokens, no primeiro uso.
+"""
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional
+
+# Aproximação usada em todo o projeto (texto em português nos modelos Llama)
+CARACTERES_POR_TOKEN = 4
+
+# Palavras que não distinguem temas nem sentenças
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de da do das dos e em no na nos nas ao aos para por pelo pela "
+    "com sem sobre que se seu sua seus suas foi ser era como mais the of and in on to for".split()
+)
+
+_RE_PALAVRA = re.compile(r"\w+")
+
+_codificador = None
+_codificador_carregado = False
+_codificador_lock = threading.Lock()
+
+
+def estimar_tokens_texto(texto: str) -> int:
+    """Tokens aproximados de um texto (≈4 caracteres por token)."""
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+def obter_codificador():
+    """
+    Tokenizador BPE (cl100k) distribuído com o LiteLLM, que funciona sem rede.
+    O vocabulário não é o do Llama, mas as contagens ficam próximas. None se indisponível.
+    """
+    global _codificador, _codificador_carregado
+    if not _codificador_carregado:
+        with _codificador_lock:
+            if not _codificador_carregado:
+                try:
+                    from litellm.litellm_core_utils.default_encoding import encoding
+                    _codificador = encoding
+                except Exception:
+                    _codificador = None
+                _codificador_carregado = True
+    return _codificador
+
+
+def contar_tokens(texto: str) -> int:
+    """Tokens do texto pelo tokenizador BPE, ou a estimativa por caracteres sem ele."""
+    codificador = obter_codificador()
+    if codificador is None:
+        return estimar_tokens_texto(texto)
+    return len(codificador.encode(texto, disallowed_special=()))
+
+
+def truncar_tokens(texto: str, limite: int) -> str:
+    """Os primeiros `limite` tokens do texto (corte por caracteres sem o tokenizador)."""
+    codificador = obter_codificador()
+    if codificador is None:
+        return texto[:limite * CARACTERES_POR_TOKEN]
+    tokens = codificador.encode(texto, disallowed_special=())
+    return texto if len(tokens) <= limite else codificador.decode(tokens[:limite])
+
+
+def sem_acentos(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=65536)
+def _termo(palavra: str) -> Optional[str]:
+    termo = palavra if palavra.isascii() else sem_acentos(palavra)
+    return None if termo in STOPWORDS else termo
+
+
+def termos(texto: str) -> List[str]:
+    """Palavras em minúsculas, sem acentos e sem stopwords."""
+    # Normalização memoizada por palavra: textos longos repetem o mesmo vocabulário
+    return [termo for termo in map(_termo, _RE_PALAVRA.findall(texto.casefold())) if termo is not None]
@@ -0,0 +1,57 @@
+"""
+Ferramentas dos agentes com uma versão assíncrona.
+
+No kickoff assíncrono da crewai (akickoff), ferramentas criadas com `@tool` a
+partir de funções síncronas rodam no executor padrão do event loop: uma thread
+ocupada durante cada requisição HTTP. `ferramenta_async` cria a mesma ferramenta
+(mesmo nome, descrição e argumentos) com uma corrotina para o caminho assíncrono,
+aguardada no próprio loop. A crew síncrona continua usando a função original.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from crewai.tools import tool
+from crewai.tools.base_tool import Tool
+from crewai.tools.structured_tool import CrewStructuredTool, ToolUsageLimitExceededError
+from pydantic import Field
+
+VersaoAsync = Callable[..., Awaitable[Any]]
+
+
+class EstruturadaAsync(CrewStructuredTool):
+    """Ferramenta estruturada (formato usado pelos agentes) cujo `ainvoke` aguarda a versão assíncrona."""
+
+    versao_async: Any = Field(default=None, exclude=True)
+
+    async def ainvoke(self, input: Union[str, Dict[str, Any]], config: Optional[Dict[str, Any]] = None,
+                      **kwargs: Any) -> Any:
+        argumentos = self._parse_args(input)
+        if self.has_reached_max_usage_count():
+            raise ToolUsageLimitExceededError(
+                f"Tool '{self.name}' has reached its maximum usage limit of {self.max_usage_count}."
+            )
+        self._increment_usage_count()
+        return await self.versao_async(**argumentos, **kwargs)
+
+
+class FerramentaAsync(Tool):
+    versao_async: Any = Field(default=None, exclude=True)
+
+    async def _arun(self, *args: Any, **kwargs: Any) -> Any:
+        return await self.versao_async(*args, **kwargs)
+
+    def to_structured_tool(self) -> CrewStructuredTool:
+        estruturada = super().to_structured_tool()
+        assincrona = EstruturadaAsync(**dict(estruturada), versao_async=self.versao_async)
+        assincrona._original_tool = self
+        return assincrona
+
+
+def ferramenta_async(nome: str, versao_async: VersaoAsync) -> Callable[[Callable[..., Any]], FerramentaAsync]:
+    """
+    Como `@tool(nome)` da crewai, com `versao_async` (mesmos argumentos da função
+    decorada) usada pelo caminho assíncrono.
+    """
+    def decorar(funcao: Callable[..., Any]) -> FerramentaAsync:
+        base = tool(nome)(funcao)
+        return FerramentaAsync(**dict(base), versao_async=versao_async)
+    return decorar
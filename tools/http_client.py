@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+import weakref
+import asyncio
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rastreamento import registrar_span, trace_atual
+
+# Timeout padrão (segundos) para todas as chamadas HTTP das ferramentas
+TIMEOUT_PADRAO = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+# A Wikipedia exige um User-Agent identificável
+USER_AGENT = os.getenv("HTTP_USER_AGENT", "crewai-wiki-agent/1.0 (+https://github.com/DeividiJaeger/crewai-wiki-agent)")
+
+# Tamanho do pool de conexões keep-alive por host
+TAMANHO_POOL = int(os.getenv("HTTP_TAMANHO_POOL", "32"))
+
+_sessao: Optional[requests.Session] = None
+_sessao_lock = threading.Lock()
+_clientes_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+# Início das requisições assíncronas em andamento dentro de um trace
+_inicios_async: "weakref.WeakKeyDictionary[httpx.Request, float]" = weakref.WeakKeyDictionary()
+
+
+def _registrar_requisicao(metodo: str, url: str, status: int, inicio: float, fim: float) -> None:
+    # Duração até a chegada dos cabeçalhos da resposta, como em requests.Response.elapsed
+    requisicao = registrar_span("http", inicio, fim, alvo=urlsplit(url).hostname or "", metodo=metodo,
+                                status_http=status)
+    if requisicao is not None and status >= 400:
+        requisicao.status = "erro"
+
+
+def _rastrear_resposta(resposta: requests.Response, *args, **kwargs) -> None:
+    if trace_atual() is not None:
+        fim = time.time()
+        _registrar_requisicao(resposta.request.method, resposta.url, resposta.status_code,
+                              fim - resposta.elapsed.total_seconds(), fim)
+
+
+async def _marcar_inicio_async(requisicao: httpx.Request) -> None:
+    if trace_atual() is not None:
+        _inicios_async[requisicao] = time.time()
+
+
+async def _rastrear_resposta_async(resposta: httpx.Response) -> None:
+    inicio = _inicios_async.pop(resposta.request, None)
+    if inicio is not None:
+        _registrar_requisicao(resposta.request.method, str(resposta.request.url), resposta.status_code,
+                              inicio, time.time())
+
+
+def obter_sessao() -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada (pool de conexões keep-alive com retry).
+    """
+    global _sessao
+    if _sessao is None:
+        with _sessao_lock:
+            if _sessao is None:
+                sessao = requests.Session()
+                retry = Retry(
+                    total=2,
+                    backoff_factor=0.3,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=["GET"],
+                )
+                adaptador = HTTPAdapter(
+                    pool_connections=TAMANHO_POOL,
+                    pool_maxsize=TAMANHO_POOL,
+                    max_retries=retry,
+                )
+                sessao.mount("http://", adaptador)
+                sessao.mount("https://", adaptador)
+                sessao.headers["User-Agent"] = USER_AGENT
+                sessao.hooks["response"].append(_rastrear_resposta)
+                _sessao = sessao
+    return _sessao
+
+
+def obter_cliente_async() -> httpx.AsyncClient:
+    """
+    Retorna o cliente assíncrono compartilhado do event loop atual.
+    Clientes httpx não podem ser reutilizados entre loops, por isso há um por loop.
+    """
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None or cliente.is_closed:
+        cliente = httpx.AsyncClient(
+            timeout=TIMEOUT_PADRAO,
+            headers={"User-Agent": USER_AGENT},
+            event_hooks={"request": [_marcar_inicio_async], "response": [_rastrear_resposta_async]},
+            limits=httpx.Limits(
+                max_connections=TAMANHO_POOL,
+                max_keepalive_connections=TAMANHO_POOL,
+            ),
+        )
+        _clientes_async[loop] = cliente
+    return cliente
+
+
+async def fechar_cliente_async() -> None:
+    """
+    Fecha o cliente assíncrono do event loop atual (usar no shutdown da aplicação).
+    """
+    cliente = _clientes_async.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from eventos import emitir
+from rastreamento import span
+from tools.web_search_ddg import buscar_web_async
+from tools.wiki_resumo import buscar_extrato_async
+
+# Tempo máximo (segundos) de cada fonte: uma fonte lenta não atrasa o artigo
+TIMEOUTS_PADRAO = {
+    "wikipedia": float(os.getenv("MULTIFONTE_TIMEOUT_WIKIPEDIA", "8")),
+    "web": float(os.getenv("MULTIFONTE_TIMEOUT_WEB", "8")),
+}
+
+# Limite de caracteres de cada fonte no texto entregue ao redator
+MAX_CHARS_FONTE = int(os.getenv("MULTIFONTE_MAX_CHARS", "3000"))
+
+# Timeout da fonte em coleta (cada fonte roda em uma task própria, com o seu valor)
+_timeout_fonte: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("timeout_fonte", default=None)
+
+# Event loop das coletas feitas a partir de threads (coletar_fontes_sync)
+_loop_coleta: Optional[asyncio.AbstractEventLoop] = None
+_loop_coleta_lock = threading.Lock()
+
+TITULOS_FONTES = {
+    "wikipedia": "Wikipedia",
+    "web": "Web (DuckDuckGo)",
+}
+
+
+@dataclass
+class ResultadoFonte:
+    fonte: str
+    texto: str
+    status: str  # "ok", "vazio", "timeout" ou "erro"
+    duracao: float
+
+
+async def buscar_wikipedia(tema: str) -> str:
+    return await buscar_extrato_async(tema) or ""
+
+
+async def buscar_na_web(tema: str) -> str:
+    # As variantes do tema são consultadas em paralelo, sem URLs repetidas. As buscas
+    # síncronas (DuckDuckGo) usam o timeout da fonte: não seguem ocupando threads depois dele
+    return await buscar_web_async(tema, timeout=_timeout_fonte.get())
+
+
+BUSCADORES = {
+    "wikipedia": buscar_wikipedia,
+    "web": buscar_na_web,
+}
+
+
+async def _coletar(fonte: str, tema: str, timeout: float) -> ResultadoFonte:
+    inicio = time.monotonic()
+    _timeout_fonte.set(timeout)
+    with span("fonte", alvo=fonte) as atual:
+        try:
+            texto = await asyncio.wait_for(BUSCADORES[fonte](tema), timeout)
+            status = "ok" if texto.strip() else "vazio"
+        except asyncio.TimeoutError:
+            texto, status = "", "timeout"
+        except Exception:
+            texto, status = "", "erro"
+        if atual is not None:
+            atual.atributos["status_fonte"] = status
+    duracao = round(time.monotonic() - inicio, 3)
+    emitir("fonte_fim", fonte=fonte, status=status, duracao=duracao)
+    return ResultadoFonte(fonte, texto, status, duracao)
+
+
+async def coletar_fontes(tema: str, timeouts: Optional[Dict[str, float]] = None) -> List[ResultadoFonte]:
+    """
+    Consulta todas as fontes ao mesmo tempo: o tempo total é o da fonte mais lenta
+    (limitado pelo timeout de cada uma), não a soma.
+    """
+    timeouts = {**TIMEOUTS_PADRAO, **(timeouts or {})}
+    return list(await asyncio.gather(
+        *(_coletar(fonte, tema, timeouts[fonte]) for fonte in BUSCADORES)
+    ))
+
+
+def _obter_loop_coleta() -> asyncio.AbstractEventLoop:
+    """
+    Event loop de longa duração, em uma thread própria, das coletas síncronas. O
+    cliente HTTP assíncrono é um por loop: assim as conexões são reaproveitadas
+    entre as pesquisas em vez de abertas e fechadas a cada coleta.
+    """
+    global _loop_coleta
+    with _loop_coleta_lock:
+        if _loop_coleta is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="multifonte-loop", daemon=True).start()
+            _loop_coleta = loop
+    return _loop_coleta
+
+
+def coletar_fontes_sync(tema: str, timeouts: Optional[Dict[str, float]] = None) -> List[ResultadoFonte]:
+    """
+    Versão para as threads worker (sem event loop em execução). A coleta roda no
+    loop compartilhado das coletas síncronas, com o contexto de quem chamou
+    (trace e observador da pesquisa).
+    """
+    contexto = contextvars.copy_context()
+
+    async def coletar():
+        return await contexto.run(asyncio.create_task, coletar_fontes(tema, timeouts))
+
+    return asyncio.run_coroutine_threadsafe(coletar(), _obter_loop_coleta()).result()
+
+
+def _chave_frase(frase: str) -> str:
+    texto = unicodedata.normalize("NFKD", frase).encode("ascii", "ignore").decode().casefold()
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+
+def mesclar_fontes(resultados: List[ResultadoFonte], max_chars: int = MAX_CHARS_FONTE) -> str:
+    """
+    Junta o conteúdo das fontes na ordem recebida (Wikipedia primeiro), removendo
+    frases repetidas entre elas - os trechos da web frequentemente copiam a Wikipedia.
+    """
+    vistas = set()
+    secoes = []
+    for resultado in resultados:
+        frases = []
+        tamanho = 0
+        for frase in re.split(r"(?<=[.!?])\s+|\n+", resultado.texto):
+            frase = frase.strip()
+            chave = _chave_frase(frase)
+            if not chave or chave in vistas:
+                continue
+            if tamanho + len(frase) > max_chars:
+                break
+            vistas.add(chave)
+            frases.append(frase)
+            tamanho += len(frase) + 1
+        if frases:
+            secoes.append(f"### {TITULOS_FONTES.get(resultado.fonte, resultado.fonte)}\n" + " ".join(frases))
+
+    if not secoes:
+        return "Nenhuma fonte retornou informações sobre o tema."
+    return "\n\n".join(secoes)
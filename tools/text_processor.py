@@ -1,34 +1,167 @@
+import re
+from itertools import chain
+from typing import Dict, List, Tuple
+
+import numpy as np
 from crewai.tools import tool
 
+from tokens import estimar_tokens_texto, termos
+
+# Parâmetros do BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Apenas as sentenças mais relevantes disputam a seleção por MMR
+MAX_CANDIDATOS_MMR = 300
+
+# Sentenças com similaridade acima disso a uma já escolhida são descartadas
+LIMIAR_DUPLICATA = 0.95
+
+# Fim de sentença: pontuação seguida de espaço e de maiúscula, número ou aspas
+_RE_SENTENCA = re.compile(r"(?<=[.!?…])\s+(?=[\"'“(\[]?[A-ZÀ-ÖØ-Þ0-9])")
+
+# Abreviações que terminam em ponto sem encerrar a sentença
+ABREVIATURAS = frozenset("sr sra srs dr dra prof profa st sto sta séc pág cap art nº vol ed etc mr mrs ms jr vs".split())
+
+
+def dividir_sentencas(texto: str) -> List[Tuple[int, str]]:
+    """(índice do parágrafo, sentença) de cada sentença do texto."""
+    sentencas = []
+    paragrafos = [p.strip() for p in texto.split("\n") if p.strip()]
+    for indice, paragrafo in enumerate(paragrafos):
+        partes: List[str] = []
+        for parte in _RE_SENTENCA.split(paragrafo):
+            if partes and partes[-1].rsplit(None, 1)[-1].rstrip(".").casefold() in ABREVIATURAS:
+                partes[-1] = f"{partes[-1]} {parte}"
+            elif parte.strip():
+                partes.append(parte.strip())
+        sentencas.extend((indice, parte) for parte in partes)
+    return sentencas
+
+
+def _matriz_termos(sentencas: List[str]):
+    """
+    Matriz esparsa sentença x termo em formato de coordenadas, com as
+    frequências já agregadas: (linhas, colunas, tf, comprimentos, vocabulário).
+    """
+    por_sentenca = [termos(sentenca) for sentenca in sentencas]
+    comprimentos = np.fromiter(map(len, por_sentenca), dtype=np.int64, count=len(sentencas))
+    todos = list(chain.from_iterable(por_sentenca))
+    vocabulario: Dict[str, int] = {termo: i for i, termo in enumerate(dict.fromkeys(todos))}
+    linhas_arr = np.repeat(np.arange(len(sentencas), dtype=np.int64), comprimentos)
+    colunas_arr = np.fromiter(map(vocabulario.__getitem__, todos), dtype=np.int64, count=len(todos))
+    # Agrega repetições do mesmo termo na mesma sentença
+    pares, tf = np.unique(linhas_arr * max(1, len(vocabulario)) + colunas_arr, return_counts=True)
+    return (pares // max(1, len(vocabulario)), pares % max(1, len(vocabulario)),
+            tf.astype(np.float64), comprimentos.astype(np.float64), vocabulario)
+
+
+def _relevancia(linhas, colunas, tf, comprimentos, vocabulario, tema: str, n: int):
+    """
+    Relevância de cada sentença: BM25 contra os termos do tema somado à
+    centralidade (cosseno TF-IDF com o centróide do texto), e os pesos TF-IDF
+    normalizados usados depois na redundância do MMR.
+    """
+    df = np.bincount(colunas, minlength=len(vocabulario)).astype(np.float64)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+    pesos = (1 + np.log(tf)) * idf[colunas]
+    normas = np.sqrt(np.bincount(linhas, weights=pesos ** 2, minlength=n))
+    pesos = pesos / np.maximum(normas[linhas], 1e-12)
+    centroide = np.bincount(colunas, weights=pesos, minlength=len(vocabulario))
+    centroide /= max(np.linalg.norm(centroide), 1e-12)
+    centralidade = np.bincount(linhas, weights=pesos * centroide[colunas], minlength=n)
+
+    consulta = np.zeros(len(vocabulario))
+    for termo in termos(tema):
+        if termo in vocabulario:
+            consulta[vocabulario[termo]] = 1.0
+    relevancia = centralidade / max(centralidade.max(), 1e-12)
+    if consulta.any():
+        media = max(comprimentos.mean(), 1e-12)
+        bm25 = idf[colunas] * tf * (BM25_K1 + 1) / (
+            tf + BM25_K1 * (1 - BM25_B + BM25_B * comprimentos[linhas] / media)
+        )
+        bm25 = np.bincount(linhas, weights=bm25 * consulta[colunas], minlength=n)
+        relevancia = 0.7 * bm25 / max(bm25.max(), 1e-12) + 0.3 * relevancia
+    return relevancia, pesos
+
+
+def resumo_extrativo(texto: str, tema: str = "", token_budget: int = 400, diversidade: float = 0.3) -> str:
+    """
+    Seleciona as sentenças mais relevantes para `tema` até `token_budget` tokens
+    (estimados), evitando sentenças redundantes entre si (MMR com peso `diversidade`).
+    As sentenças escolhidas voltam na ordem original, agrupadas por parágrafo.
+    """
+    sentencas = dividir_sentencas(texto)
+    if not sentencas:
+        return ""
+    custos = np.fromiter((estimar_tokens_texto(s) for _, s in sentencas), dtype=np.int64, count=len(sentencas))
+    if custos.sum() <= token_budget:
+        escolhidas = list(range(len(sentencas)))
+    else:
+        escolhidas = _selecionar_mmr([s for _, s in sentencas], custos, tema, token_budget, diversidade)
+    return _montar_texto(sentencas, escolhidas)
+
+
+def _selecionar_mmr(sentencas: List[str], custos: np.ndarray, tema: str, token_budget: int,
+                    diversidade: float) -> List[int]:
+    n = len(sentencas)
+    linhas, colunas, tf, comprimentos, vocabulario = _matriz_termos(sentencas)
+    relevancia, pesos = _relevancia(linhas, colunas, tf, comprimentos, vocabulario, tema, n)
+    # A primeira sentença costuma definir o tema (introdução da Wikipedia)
+    relevancia[0] += 0.1
+
+    candidatos = np.argsort(-relevancia, kind="stable")[:MAX_CANDIDATOS_MMR]
+    posicao = np.full(n, -1, dtype=np.int64)
+    posicao[candidatos] = np.arange(len(candidatos))
+    # Submatriz esparsa apenas com as sentenças candidatas
+    mascara = posicao[linhas] >= 0
+    linhas_c, colunas_c, pesos_c = posicao[linhas[mascara]], colunas[mascara], pesos[mascara]
+
+    redundancia = np.zeros(len(candidatos))
+    disponivel = custos[candidatos] <= token_budget
+    restante = token_budget
+    escolhidas: List[int] = []
+    while disponivel.any():
+        mmr = np.where(disponivel, (1 - diversidade) * relevancia[candidatos] - diversidade * redundancia, -np.inf)
+        melhor = int(np.argmax(mmr))
+        indice = int(candidatos[melhor])
+        escolhidas.append(indice)
+        restante -= int(custos[indice])
+        disponivel[melhor] = False
+        disponivel &= custos[candidatos] <= restante
+        # Similaridade (cosseno TF-IDF) de todas as candidatas com a escolhida
+        vetor = np.zeros(len(vocabulario))
+        vetor[colunas_c[linhas_c == melhor]] = pesos_c[linhas_c == melhor]
+        similaridade = np.bincount(linhas_c, weights=pesos_c * vetor[colunas_c], minlength=len(candidatos))
+        redundancia = np.maximum(redundancia, similaridade)
+        disponivel &= similaridade < LIMIAR_DUPLICATA
+    return sorted(escolhidas)
+
+
+def _montar_texto(sentencas: List[Tuple[int, str]], escolhidas: List[int]) -> str:
+    paragrafos: List[List[str]] = []
+    anterior = None
+    for i in escolhidas:
+        paragrafo, sentenca = sentencas[i]
+        if paragrafo != anterior:
+            paragrafos.append([])
+            anterior = paragrafo
+        paragrafos[-1].append(sentenca)
+    return "\n\n".join(" ".join(partes) for partes in paragrafos)
+
+
 @tool("Text Processor")
-def extract_key_points(text: str, num_points: int = 5) -> str:
-    """Extrai os pontos principais de um texto longo.
-    
+def extract_key_points(text: str, topic: str = "", token_budget: int = 400) -> str:
+    """Extrai os trechos mais relevantes de um texto longo.
+
     Args:
         text: Texto a ser processado
-        num_points: Número de pontos principais a extrair
-        
+        topic: Tema da pesquisa, usado para priorizar as sentenças relevantes
+        token_budget: Tamanho máximo aproximado do resultado, em tokens
+
     Returns:
-        Lista dos pontos principais extraídos do texto
+        Sentenças mais relevantes e não redundantes, na ordem original
     """
-    # Divide o texto em parágrafos
-    paragraphs = [p for p in text.split('\n') if p.strip()]
-    
-    # Se houver poucos parágrafos, retorna os primeiros
-    if len(paragraphs) <= num_points:
-        return '\n\n'.join(paragraphs)
-    
-    # Caso contrário, seleciona o primeiro parágrafo (introdução) e alguns do meio
-    important_paragraphs = [paragraphs[0]]
-    
-    # Seleciona parágrafos distribuídos pelo texto
-    step = max(1, (len(paragraphs) - 2) // (num_points - 2))
-    for i in range(1, len(paragraphs) - 1, step):
-        if len(important_paragraphs) < num_points - 1:
-            important_paragraphs.append(paragraphs[i])
-    
-    # Adiciona o último parágrafo (conclusão)
-    if paragraphs[-1] not in important_paragraphs:
-        important_paragraphs.append(paragraphs[-1])
-    
-    return '\n\n'.join(important_paragraphs)
+    return resumo_extrativo(text, topic, token_budget)
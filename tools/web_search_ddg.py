@@ -1,17 +1,267 @@
-import requests
-from crewai.tools import tool
-from langchain_community.tools.ddg_search.tool import DuckDuckGoSearchRun
+"""
+Busca na web usada pela ferramenta dos agentes e pela coleta do fluxo multifonte.
+
+Por padrão consulta o DuckDuckGo (pacote duckduckgo_search). Com BUSCA_WEB_URL
+definido, consulta um endpoint JSON no formato do SearxNG (`?q=...&format=json`),
+por exemplo uma instância própria do SearxNG. As respostas ficam em cache com
+validade, e as variantes de uma consulta podem ser feitas em paralelo, com os
+resultados mesclados por URL.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from rastreamento import span
+from tools.ferramenta_async import ferramenta_async
+from tools.http_client import TIMEOUT_PADRAO, obter_cliente_async, obter_sessao
+
+# Endpoint JSON no formato do SearxNG; vazio usa o DuckDuckGo
+BUSCA_WEB_URL = os.getenv("BUSCA_WEB_URL", "")
+MAX_RESULTADOS = int(os.getenv("BUSCA_WEB_MAX_RESULTADOS", "5"))
+# Tamanho máximo do texto com os resultados entregue ao agente
+MAX_CHARS_RESULTADOS = int(os.getenv("BUSCA_WEB_MAX_CHARS", "2000"))
+# Variantes consultadas em paralelo pelo fluxo multifonte, separadas por "|"
+VARIANTES_PADRAO = os.getenv("BUSCA_WEB_VARIANTES", "{tema}|o que é {tema}")
+# Constante da fusão por posição (reciprocal rank fusion) ao mesclar as variantes
+K_FUSAO = 60
+
+
+@dataclass(frozen=True)
+class ResultadoBusca:
+    titulo: str
+    url: str
+    trecho: str
+
+
+class CacheBuscas:
+    """
+    Cache LRU com validade dos resultados de cada consulta.
+    """
+
+    def __init__(self, ttl_segundos: int = 900, max_entradas: int = 1024):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Tuple[str, str, int], Tuple[float, List[ResultadoBusca]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {"hits": 0, "buscas": 0}
+
+    def obter(self, chave: Tuple[str, str, int]) -> Optional[List[ResultadoBusca]]:
+        with self._lock:
+            item = self._entradas.get(chave)
+            if item is None or time.time() - item[0] >= self.ttl_segundos:
+                self.contadores["buscas"] += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.contadores["hits"] += 1
+            return list(item[1])
+
+    def salvar(self, chave: Tuple[str, str, int], resultados: List[ResultadoBusca]) -> None:
+        with self._lock:
+            self._entradas[chave] = (time.time(), list(resultados))
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_buscas = CacheBuscas(
+    ttl_segundos=int(os.getenv("BUSCA_WEB_CACHE_TTL", "900")),
+    max_entradas=int(os.getenv("BUSCA_WEB_CACHE_MAX", "1024")),
+)
+
+
+def _chave_busca(consulta: str, max_resultados: int) -> Tuple[str, str, int]:
+    return BUSCA_WEB_URL or "ddg", " ".join(consulta.casefold().split()), max_resultados
+
+
+def normalizar_url(url: str) -> str:
+    """Forma canônica da URL para detectar repetidos (sem www., âncora e barra final)."""
+    partes = urlsplit(url.strip())
+    host = partes.netloc.lower().removeprefix("www.")
+    return urlunsplit(("https" if partes.scheme in ("http", "https") else partes.scheme,
+                       host, partes.path.rstrip("/"), partes.query, ""))
+
+
+def mesclar_resultados(listas: List[List[ResultadoBusca]], limite: Optional[int] = None) -> List[ResultadoBusca]:
+    """
+    Mescla os resultados de várias consultas sem URLs repetidas. A ordem é a da
+    fusão por posição: uma URL bem colocada em várias variantes sobe na lista.
+    """
+    pontuacoes: Dict[str, float] = {}
+    primeiros: Dict[str, ResultadoBusca] = {}
+    for resultados in listas:
+        for posicao, resultado in enumerate(resultados):
+            chave = normalizar_url(resultado.url)
+            pontuacoes[chave] = pontuacoes.get(chave, 0.0) + 1.0 / (K_FUSAO + posicao + 1)
+            primeiros.setdefault(chave, resultado)
+    ordenadas = sorted(pontuacoes, key=pontuacoes.get, reverse=True)
+    return [primeiros[chave] for chave in ordenadas[:limite]]
+
+
+def _montar_busca(consulta: str) -> Tuple[str, Dict[str, str]]:
+    return BUSCA_WEB_URL, {"q": consulta, "format": "json"}
+
+
+def _processar_json(dados: dict, max_resultados: int) -> List[ResultadoBusca]:
+    resultados = []
+    for item in dados.get("results", []):
+        if item.get("url"):
+            resultados.append(ResultadoBusca(item.get("title", "").strip(), item["url"],
+                                             " ".join(item.get("content", "").split())))
+    return resultados[:max_resultados]
+
+
+_ddgs_local = threading.local()
+
+
+def _buscar_ddg(consulta: str, max_resultados: int, timeout: float = TIMEOUT_PADRAO) -> List[ResultadoBusca]:
+    """
+    Consulta o DuckDuckGo. Os clientes (e suas conexões) são reaproveitados entre as
+    buscas, um por thread e por timeout, já que não há garantia de que sejam thread-safe.
+    """
+    clientes = getattr(_ddgs_local, "clientes", None)
+    if clientes is None:
+        clientes = _ddgs_local.clientes = {}
+    segundos = max(1, math.ceil(timeout))
+    ddgs = clientes.get(segundos)
+    if ddgs is None:
+        # Importado aqui: só as buscas na web usam o pacote
+        from duckduckgo_search import DDGS
+        ddgs = clientes[segundos] = DDGS(timeout=segundos)
+    with span("http", alvo="duckduckgo.com", metodo="GET"):
+        itens = ddgs.text(consulta, max_results=max_resultados) or []
+    return [ResultadoBusca(item.get("title", "").strip(), item.get("href", ""), " ".join(item.get("body", "").split()))
+            for item in itens if item.get("href")][:max_resultados]
+
+
+def buscar_resultados(consulta: str, max_resultados: int = MAX_RESULTADOS) -> List[ResultadoBusca]:
+    """
+    Busca `consulta` e retorna os resultados estruturados. Falhas da busca são
+    propagadas e não entram no cache.
+    """
+    chave = _chave_busca(consulta, max_resultados)
+    resultados = cache_buscas.obter(chave)
+    if resultados is None:
+        if BUSCA_WEB_URL:
+            url, params = _montar_busca(consulta)
+            response = obter_sessao().get(url, params=params, timeout=TIMEOUT_PADRAO)
+            response.raise_for_status()
+            resultados = _processar_json(response.json(), max_resultados)
+        else:
+            resultados = _buscar_ddg(consulta, max_resultados)
+        cache_buscas.salvar(chave, resultados)
+    return resultados
+
+
+# O cliente do DuckDuckGo é síncrono: roda em threads próprias. Não usa o executor
+# padrão do loop porque asyncio.run() aguarda as threads dele ao terminar, o que
+# anularia o timeout de uma busca lenta no fluxo multifonte
+_executor_ddg = ThreadPoolExecutor(max_workers=4, thread_name_prefix="busca-web")
+
+
+async def buscar_resultados_async(consulta: str, max_resultados: int = MAX_RESULTADOS,
+                                  timeout: Optional[float] = None) -> List[ResultadoBusca]:
+    """
+    Versão assíncrona de `buscar_resultados`, compartilhando o mesmo cache.
+    `timeout` (padrão TIMEOUT_PADRAO) limita a busca no DuckDuckGo.
+    """
+    chave = _chave_busca(consulta, max_resultados)
+    resultados = cache_buscas.obter(chave)
+    if resultados is None:
+        if BUSCA_WEB_URL:
+            url, params = _montar_busca(consulta)
+            response = await obter_cliente_async().get(url, params=params)
+            response.raise_for_status()
+            resultados = _processar_json(response.json(), max_resultados)
+        else:
+            # Copia o contexto para a thread: spans da busca ficam na pesquisa atual.
+            # A thread não pode ser interrompida: com o timeout de quem pediu, uma busca
+            # abandonada não segura a vaga do executor além desse prazo (e uma que ainda
+            # estava na fila é cancelada junto com a espera, sem começar)
+            contexto = contextvars.copy_context()
+            resultados = await asyncio.get_running_loop().run_in_executor(
+                _executor_ddg, contexto.run, _buscar_ddg, consulta, max_resultados, timeout or TIMEOUT_PADRAO
+            )
+        cache_buscas.salvar(chave, resultados)
+    return resultados
+
+
+def variantes_consulta(tema: str) -> List[str]:
+    """Consultas feitas para um tema (BUSCA_WEB_VARIANTES), sem repetições."""
+    variantes = (modelo.strip().format(tema=tema) for modelo in VARIANTES_PADRAO.split("|") if modelo.strip())
+    return list(dict.fromkeys(variantes)) or [tema]
+
+
+async def buscar_variantes_async(consultas: List[str], max_resultados: int = MAX_RESULTADOS,
+                                 timeout: Optional[float] = None) -> List[ResultadoBusca]:
+    """
+    Faz as consultas em paralelo e mescla os resultados sem URLs repetidas.
+    Variantes com falha são ignoradas; se todas falharem, a primeira falha é propagada.
+    """
+    respostas = await asyncio.gather(
+        *(buscar_resultados_async(consulta, max_resultados, timeout) for consulta in consultas),
+        return_exceptions=True
+    )
+    listas = [resposta for resposta in respostas if not isinstance(resposta, BaseException)]
+    if not listas and respostas:
+        raise respostas[0]
+    return mesclar_resultados(listas, max_resultados)
+
+
+def formatar_resultados(resultados: List[ResultadoBusca], max_chars: int = MAX_CHARS_RESULTADOS) -> str:
+    """Texto compacto para o agente: um resultado por linha, com título, trecho e URL."""
+    linhas = []
+    tamanho = 0
+    for i, resultado in enumerate(resultados, start=1):
+        linha = f"{i}. {resultado.titulo}: {resultado.trecho} ({resultado.url})"
+        if linhas and tamanho + len(linha) > max_chars:
+            break
+        linhas.append(linha[:max_chars])
+        tamanho += len(linha) + 1
+    return "\n".join(linhas)
+
+
+def buscar_web(query: str) -> str:
+    """
+    Busca na web e retorna os resultados formatados como texto.
+    Usada pela ferramenta dos agentes.
+    """
+    return formatar_resultados(buscar_resultados(query)) or f"Nenhum resultado encontrado para '{query}'."
+
+
+async def buscar_web_ferramenta_async(query: str) -> str:
+    """Versão assíncrona de `buscar_web`, usada pela ferramenta no kickoff assíncrono."""
+    return formatar_resultados(await buscar_resultados_async(query)) or f"Nenhum resultado encontrado para '{query}'."
+
+
+async def buscar_web_async(tema: str, timeout: Optional[float] = None) -> str:
+    """
+    Trechos dos resultados das variantes do tema, mesclados e sem URLs repetidas.
+    Usada pela coleta do fluxo multifonte, que mescla o texto com a Wikipedia.
+    """
+    resultados = await buscar_variantes_async(variantes_consulta(tema), timeout=timeout)
+    return "\n".join(resultado.trecho for resultado in resultados if resultado.trecho)
 
 # Criando uma ferramenta compatível com CrewAI
-@tool("web_search")
+@ferramenta_async("web_search", buscar_web_ferramenta_async)
 def search_web(query: str) -> str:
     """Busca informações na web usando DuckDuckGo.
-    
+
     Args:
         query: O termo de busca que você deseja pesquisar.
-        
+
     Returns:
-        Resultados da pesquisa como uma string.
+        Resultados da pesquisa (título, trecho e URL), um por linha.
     """
-    search = DuckDuckGoSearchRun()
-    return search.run(query)
+    return buscar_web(query)
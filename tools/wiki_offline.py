@@ -0,0 +1,323 @@
+"""
+Índice local de extratos da Wikipedia, construído a partir de um dump.
+
+    python -m tools.wiki_offline construir ptwiki-latest-pages-articles.xml.bz2 .cache/wiki_offline
+    python -m tools.wiki_offline consultar .cache/wiki_offline "Revolução Francesa"
+
+O dump é lido em streaming (XML do MediaWiki ou JSON Lines, opcionalmente .bz2/.gz)
+e gera dois arquivos no diretório de destino:
+
+- extratos.bin: as entradas (tipo, título e introdução ou destino do redirecionamento)
+- indice.bin: registros de tamanho fixo (hash do título, offset, tamanho) ordenados
+  pelo hash, consultados por busca binária sobre o arquivo mapeado em memória
+
+Com WIKIPEDIA_OFFLINE_INDICE apontando para o diretório, `wikipedia_resumo` consulta
+o índice antes da API e só acessa a rede quando o título não está nele.
+"""
+import argparse
+import bz2
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from pathlib import Path
+from typing import Dict, IO, Iterator, Optional, Tuple
+
+ARQUIVO_EXTRATOS = "extratos.bin"
+ARQUIVO_INDICE = "indice.bin"
+
+MAGICO = b"WIKIIDX1"
+CABECALHO = struct.Struct("<8sQ")  # mágico, número de registros
+REGISTRO = struct.Struct("<QQI")  # hash do título, offset, tamanho
+
+ARTIGO = b"A"
+REDIRECIONAMENTO = b"R"
+
+# Tamanho máximo da introdução guardada por artigo
+MAX_CHARS_PADRAO = int(os.getenv("WIKIPEDIA_OFFLINE_MAX_CHARS", "6000"))
+
+# Namespaces de arquivos e categorias (pt e en) removidos do wikitexto
+_PREFIXOS_IGNORADOS = "Ficheiro|Arquivo|Imagem|File|Image|Categoria|Category"
+_RE_COMENTARIO = re.compile(r"<!--.*?-->", re.DOTALL)
+_RE_REF = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+_RE_PREDEFINICAO = re.compile(r"\{\{[^{}]*\}\}")
+_RE_TABELA = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+_RE_ARQUIVO = re.compile(rf"\[\[(?:{_PREFIXOS_IGNORADOS}):(?:[^\[\]]|\[\[[^\[\]]*\]\])*\]\]", re.IGNORECASE)
+_RE_LINK = re.compile(r"\[\[(?:[^|\[\]]*\|)?([^\[\]]+)\]\]")
+_RE_LINK_EXTERNO = re.compile(r"\[https?://[^\s\]]+(?: ([^\]]*))?\]")
+_RE_TAG = re.compile(r"<[^>]+>")
+_RE_ENFASE = re.compile(r"'{2,}")
+
+
+def normalizar_titulo(titulo: str) -> str:
+    """Forma canônica do MediaWiki: '_' vira espaço, sem espaços repetidos e primeira letra maiúscula."""
+    titulo = " ".join(titulo.replace("_", " ").split())
+    return titulo[:1].upper() + titulo[1:]
+
+
+def chave_titulo(titulo: str) -> str:
+    """
+    Chave do hash no índice, sem diferenciar maiúsculas: títulos que diferem só na
+    caixa ("Apple" e "APPLE") ficam juntos e são desempatados pelo título exato.
+    """
+    return normalizar_titulo(titulo).casefold()
+
+
+def hash_titulo(titulo: str) -> int:
+    return int.from_bytes(hashlib.blake2b(chave_titulo(titulo).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def extrair_introducao(wikitexto: str, max_chars: int = MAX_CHARS_PADRAO) -> str:
+    """
+    Converte a introdução (texto antes da primeira seção) de um artigo em texto
+    simples, removendo predefinições, referências, tabelas e marcação de links.
+    """
+    texto = re.split(r"^==", wikitexto, maxsplit=1, flags=re.MULTILINE)[0]
+    texto = _RE_COMENTARIO.sub("", texto)
+    texto = _RE_REF.sub("", texto)
+    # Predefinições podem estar aninhadas: remove das mais internas para fora
+    anterior = None
+    while anterior != texto:
+        anterior, texto = texto, _RE_PREDEFINICAO.sub("", texto)
+    texto = _RE_TABELA.sub("", texto)
+    texto = _RE_ARQUIVO.sub("", texto)
+    texto = _RE_LINK.sub(r"\1", texto)
+    texto = _RE_LINK_EXTERNO.sub(lambda m: m.group(1) or "", texto)
+    texto = _RE_TAG.sub("", texto)
+    texto = _RE_ENFASE.sub("", texto)
+    linhas = (" ".join(linha.split()) for linha in texto.splitlines())
+    return "\n".join(linha for linha in linhas if linha)[:max_chars]
+
+
+def _abrir(caminho: str) -> IO[bytes]:
+    if caminho.endswith(".bz2"):
+        return bz2.open(caminho, "rb")
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rb")
+    return open(caminho, "rb")
+
+
+def _nome_tag(elemento: ET.Element) -> str:
+    return elemento.tag.rsplit("}", 1)[-1]
+
+
+def ler_dump_xml(arquivo: IO[bytes], max_chars: int) -> Iterator[Tuple[bytes, str, str]]:
+    """
+    Produz (tipo, título, conteúdo) para cada página do namespace principal de um
+    dump XML do MediaWiki, liberando cada página depois de lida.
+    """
+    contexto = ET.iterparse(arquivo, events=("start", "end"))
+    _, raiz = next(contexto)
+    for evento, elemento in contexto:
+        if evento != "end" or _nome_tag(elemento) != "page":
+            continue
+        campos = {_nome_tag(filho): filho for filho in elemento.iter()}
+        namespace = campos.get("ns")
+        titulo = campos.get("title")
+        if titulo is not None and titulo.text and (namespace is None or namespace.text == "0"):
+            redirecionamento = campos.get("redirect")
+            if redirecionamento is not None and redirecionamento.get("title"):
+                yield REDIRECIONAMENTO, titulo.text, redirecionamento.get("title")
+            else:
+                texto = campos.get("text")
+                introducao = extrair_introducao((texto.text or "") if texto is not None else "", max_chars)
+                if introducao:
+                    yield ARTIGO, titulo.text, introducao
+        raiz.clear()
+
+
+def ler_dump_jsonl(arquivo: IO[bytes], max_chars: int) -> Iterator[Tuple[bytes, str, str]]:
+    """
+    Produz (tipo, título, conteúdo) de um dump em JSON Lines. Cada linha tem "title"
+    e o texto em "extract", "abstract", "opening_text" ou "text" (wikitexto),
+    ou "redirect" com o título de destino.
+    """
+    for linha in arquivo:
+        if not linha.strip():
+            continue
+        dados = json.loads(linha)
+        titulo = dados.get("title")
+        if not titulo:
+            continue
+        if dados.get("redirect"):
+            yield REDIRECIONAMENTO, titulo, dados["redirect"]
+            continue
+        texto = dados.get("extract") or dados.get("abstract") or dados.get("opening_text")
+        if texto is None:
+            texto = extrair_introducao(dados.get("text") or "", max_chars)
+        texto = texto.strip()[:max_chars]
+        if texto:
+            yield ARTIGO, titulo, texto
+
+
+def construir_indice(dump: str, destino: str, formato: Optional[str] = None,
+                     max_chars: int = MAX_CHARS_PADRAO) -> Dict[str, int]:
+    """
+    Lê o dump em streaming e grava o índice em `destino`. Apenas os registros de
+    tamanho fixo (20 bytes por página) ficam em memória até a ordenação.
+    """
+    if formato is None:
+        formato = "jsonl" if ".json" in Path(dump).name else "xml"
+    leitor = ler_dump_jsonl if formato == "jsonl" else ler_dump_xml
+    Path(destino).mkdir(parents=True, exist_ok=True)
+    hashes, offsets, tamanhos = array("Q"), array("Q"), array("I")
+    contagem = {"artigos": 0, "redirecionamentos": 0}
+
+    caminho_extratos = os.path.join(destino, ARQUIVO_EXTRATOS)
+    with _abrir(dump) as entrada, open(caminho_extratos + ".tmp", "wb") as saida:
+        offset = 0
+        for tipo, titulo, conteudo in leitor(entrada, max_chars):
+            registro = tipo + titulo.encode("utf-8") + b"\x00" + conteudo.encode("utf-8")
+            saida.write(registro)
+            hashes.append(hash_titulo(titulo))
+            offsets.append(offset)
+            tamanhos.append(len(registro))
+            offset += len(registro)
+            contagem["artigos" if tipo == ARTIGO else "redirecionamentos"] += 1
+
+    ordem = sorted(range(len(hashes)), key=hashes.__getitem__)
+    caminho_indice = os.path.join(destino, ARQUIVO_INDICE)
+    with open(caminho_indice + ".tmp", "wb") as saida:
+        saida.write(CABECALHO.pack(MAGICO, len(ordem)))
+        for i in ordem:
+            saida.write(REGISTRO.pack(hashes[i], offsets[i], tamanhos[i]))
+
+    # Os arquivos só substituem um índice existente depois de completos
+    os.replace(caminho_extratos + ".tmp", caminho_extratos)
+    os.replace(caminho_indice + ".tmp", caminho_indice)
+    contagem["bytes"] = os.path.getsize(caminho_extratos) + os.path.getsize(caminho_indice)
+    return contagem
+
+
+class IndiceOffline:
+    """
+    Consulta ao índice gerado por `construir_indice`. Os dois arquivos são mapeados
+    em memória: cada consulta lê ~log2(n) registros e uma entrada, sem rede.
+    Seguro para uso por várias threads (apenas leitura).
+    """
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self._arquivos = [
+            open(os.path.join(diretorio, nome), "rb") for nome in (ARQUIVO_INDICE, ARQUIVO_EXTRATOS)
+        ]
+        self._indice, self._extratos = (
+            mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(arquivo.fileno()).st_size
+            else b"" for arquivo in self._arquivos
+        )
+        magico, self.total = CABECALHO.unpack_from(self._indice, 0)
+        if magico != MAGICO:
+            raise ValueError(f"Índice offline inválido: {diretorio}")
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _hash_no(self, posicao: int) -> int:
+        return struct.unpack_from("<Q", self._indice, CABECALHO.size + posicao * REGISTRO.size)[0]
+
+    def _entrada(self, titulo: str) -> Optional[Tuple[bytes, str]]:
+        alvo, exato, chave = hash_titulo(titulo), normalizar_titulo(titulo), chave_titulo(titulo)
+        inicio, fim = 0, self.total
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if self._hash_no(meio) < alvo:
+                inicio = meio + 1
+            else:
+                fim = meio
+        # Colisões de hash são resolvidas comparando o título guardado na entrada: o
+        # título exato tem prioridade e, sem ele, vale o primeiro que difere só na caixa
+        posicao, semelhante = inicio, None
+        while posicao < self.total and self._hash_no(posicao) == alvo:
+            _, offset, tamanho = REGISTRO.unpack_from(self._indice, CABECALHO.size + posicao * REGISTRO.size)
+            dados = self._extratos[offset:offset + tamanho]
+            nome, _, conteudo = dados[1:].partition(b"\x00")
+            nome = nome.decode("utf-8")
+            if normalizar_titulo(nome) == exato:
+                return dados[:1], conteudo.decode("utf-8")
+            if semelhante is None and chave_titulo(nome) == chave:
+                semelhante = dados[:1], conteudo.decode("utf-8")
+            posicao += 1
+        return semelhante
+
+    def obter(self, titulo: str, max_redirecionamentos: int = 3) -> Optional[str]:
+        """Extrato da introdução do artigo, seguindo redirecionamentos; None se ausente."""
+        for _ in range(max_redirecionamentos + 1):
+            entrada = self._entrada(titulo)
+            if entrada is None:
+                return None
+            tipo, conteudo = entrada
+            if tipo == ARTIGO:
+                return conteudo
+            titulo = conteudo
+        return None
+
+    def fechar(self) -> None:
+        for mapa in (self._indice, self._extratos):
+            if isinstance(mapa, mmap.mmap):
+                mapa.close()
+        for arquivo in self._arquivos:
+            arquivo.close()
+
+
+_indices: Dict[str, IndiceOffline] = {}
+_indices_lock = threading.Lock()
+
+
+def obter_indice_offline() -> Optional[IndiceOffline]:
+    """
+    Índice configurado em WIKIPEDIA_OFFLINE_INDICE, aberto no primeiro uso.
+    Retorna None quando não há índice configurado (ou construído) no caminho.
+    """
+    diretorio = os.getenv("WIKIPEDIA_OFFLINE_INDICE", "")
+    if not diretorio:
+        return None
+    indice = _indices.get(diretorio)
+    if indice is None:
+        with _indices_lock:
+            indice = _indices.get(diretorio)
+            if indice is None:
+                if not os.path.exists(os.path.join(diretorio, ARQUIVO_INDICE)):
+                    return None
+                indice = _indices[diretorio] = IndiceOffline(diretorio)
+    return indice
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    construir = comandos.add_parser("construir", help="gera o índice a partir de um dump")
+    construir.add_argument("dump", help="dump XML do MediaWiki ou JSON Lines (.bz2/.gz aceitos)")
+    construir.add_argument("destino", help="diretório do índice")
+    construir.add_argument("--formato", choices=("xml", "jsonl"), help="padrão: deduzido do nome do arquivo")
+    construir.add_argument("--max-chars", type=int, default=MAX_CHARS_PADRAO)
+
+    consultar = comandos.add_parser("consultar", help="mostra o extrato de um título")
+    consultar.add_argument("destino")
+    consultar.add_argument("titulo")
+
+    args = parser.parse_args(argv)
+    if args.comando == "construir":
+        inicio = time.perf_counter()
+        contagem = construir_indice(args.dump, args.destino, args.formato, args.max_chars)
+        print(f"{contagem['artigos']} artigos e {contagem['redirecionamentos']} redirecionamentos "
+              f"({contagem['bytes'] / 1024 / 1024:.1f} MB) em {time.perf_counter() - inicio:.1f} s")
+        return
+
+    extrato = IndiceOffline(args.destino).obter(args.titulo)
+    if extrato is None:
+        print("Título não encontrado no índice.", file=sys.stderr)
+        sys.exit(1)
+    print(extrato)
+
+
+if __name__ == "__main__":
+    main()
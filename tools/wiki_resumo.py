@@ -1,33 +1,550 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Generator, List, Optional, Tuple, TypeVar
+
+import httpx
 import requests
-from crewai.tools import tool
 
-@tool("Wikipedia Resumo Tool")
+from configuracao import memoria_semantica_habilitada
+from eventos import emitir
+from tokens import CARACTERES_POR_TOKEN
+from tools.ferramenta_async import ferramenta_async
+from tools.http_client import TIMEOUT_PADRAO, obter_cliente_async, obter_sessao
+from tools.text_processor import resumo_extrativo
+from tools.wiki_offline import obter_indice_offline
+
+# Endpoint da API da Wikipedia ({idioma} é substituído pelo idioma da busca)
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://{idioma}.wikipedia.org/w/api.php")
+IDIOMA_PADRAO = os.getenv("WIKIPEDIA_IDIOMA", "pt")
+
+# Temas em texto livre são resolvidos em títulos pela busca da Wikipedia e os
+# extratos dos primeiros CANDIDATOS_PADRAO títulos são baixados em uma requisição
+RESOLVER_TITULOS = os.getenv("WIKIPEDIA_RESOLVER_TITULOS", "1") not in ("0", "false", "False")
+CANDIDATOS_PADRAO = int(os.getenv("WIKIPEDIA_CANDIDATOS", "3"))
+
+# As consultas à API são geradores que produzem as requisições (url, params, headers)
+# e recebem as respostas (None em falha de rede): a mesma lógica serve ao cliente
+# síncrono (requests) e ao assíncrono (httpx), que fazem apenas o transporte
+Requisicao = Tuple[str, Dict[str, Any], Dict[str, str]]
+T = TypeVar("T")
+Passos = Generator[Requisicao, Any, T]
+
+
+@dataclass
+class EntradaExtrato:
+    extrato: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    validado_em: float
+
+
+class CacheExtratos:
+    """
+    Cache LRU dos extratos completos da Wikipedia, indexado por (idioma, título).
+
+    Depois de `ttl_segundos` a entrada é revalidada com um GET condicional
+    (If-None-Match / If-Modified-Since) em vez de baixar o extrato novamente.
+    """
+
+    def __init__(self, ttl_segundos: int = 3600, max_entradas: int = 1024):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Tuple[str, str], EntradaExtrato]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {"hits": 0, "revalidacoes": 0, "downloads": 0, "offline": 0}
+
+    def obter(self, chave: Tuple[str, str]) -> Optional[EntradaExtrato]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+            return entrada
+
+    def salvar(self, chave: Tuple[str, str], entrada: EntradaExtrato) -> None:
+        with self._lock:
+            self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def contar(self, nome: str) -> None:
+        with self._lock:
+            self.contadores[nome] += 1
+
+    def fresca(self, entrada: EntradaExtrato) -> bool:
+        return time.time() - entrada.validado_em < self.ttl_segundos
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_extratos = CacheExtratos(
+    ttl_segundos=int(os.getenv("WIKIPEDIA_CACHE_TTL", "3600")),
+    max_entradas=int(os.getenv("WIKIPEDIA_CACHE_MAX", "1024")),
+)
+
+
+class CacheResolucoes:
+    """
+    Cache LRU com validade das resoluções tema -> títulos candidatos.
+    """
+
+    def __init__(self, ttl_segundos: int = 86400, max_entradas: int = 4096):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Tuple[str, str, int], Tuple[float, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {"hits": 0, "buscas": 0}
+
+    def obter(self, chave: Tuple[str, str, int]) -> Optional[List[str]]:
+        with self._lock:
+            item = self._entradas.get(chave)
+            if item is None or time.time() - item[0] >= self.ttl_segundos:
+                self.contadores["buscas"] += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.contadores["hits"] += 1
+            return list(item[1])
+
+    def salvar(self, chave: Tuple[str, str, int], titulos: List[str]) -> None:
+        with self._lock:
+            self._entradas[chave] = (time.time(), list(titulos))
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_resolucoes = CacheResolucoes(
+    ttl_segundos=int(os.getenv("WIKIPEDIA_RESOLUCAO_TTL", "86400")),
+    max_entradas=int(os.getenv("WIKIPEDIA_RESOLUCAO_MAX", "4096")),
+)
+
+
+def normalizar_titulo(term: str) -> str:
+    """
+    Normaliza o título como o MediaWiki faz: espaços no lugar de '_' e primeira letra maiúscula.
+    """
+    titulo = " ".join(term.replace("_", " ").split())
+    return titulo[:1].upper() + titulo[1:]
+
+
+def _montar_requisicao(titulo: str, idioma: str, entrada: Optional[EntradaExtrato]):
+    url, params, _ = _montar_requisicao_lote([titulo], idioma)
+    headers = {}
+    if entrada is not None:
+        if entrada.etag:
+            headers["If-None-Match"] = entrada.etag
+        if entrada.last_modified:
+            headers["If-Modified-Since"] = entrada.last_modified
+    return url, params, headers
+
+
+def _montar_requisicao_lote(titulos: List[str], idioma: str):
+    url = WIKIPEDIA_API_URL.format(idioma=idioma)
+    # Os parâmetros são passados separadamente para que os títulos sejam escapados corretamente
+    params = {
+        "action": "query",
+        "prop": "extracts",
+        "exlimit": len(titulos),
+        "explaintext": 1,
+        "titles": "|".join(titulos),
+        "format": "json",
+        "utf8": 1,
+        "redirects": 1,
+        "exintro": 1,
+    }
+    return url, params, {}
+
+
+def _extrair_texto(data: dict) -> str:
+    pages = data.get("query", {}).get("pages", {})
+    if pages:
+        # Obtém o primeiro ID de página (ignorando o número específico)
+        page_id = next(iter(pages))
+        return pages[page_id].get("extract", "") or ""
+    return ""
+
+
+def _extrair_textos(data: dict, titulos: List[str]) -> Dict[str, str]:
+    """
+    Associa cada título pedido ao seu extrato, seguindo as normalizações e
+    redirecionamentos informados pela API ("" para páginas inexistentes).
+    """
+    query = data.get("query", {})
+    destinos = {}
+    for item in query.get("normalized", []) + query.get("redirects", []):
+        destinos[item.get("from")] = item.get("to")
+    por_titulo = {
+        pagina.get("title"): pagina.get("extract", "") or ""
+        for pagina in query.get("pages", {}).values()
+    }
+    textos = {}
+    for titulo in titulos:
+        final = titulo
+        # normalização seguida de redirecionamento
+        for _ in range(2):
+            final = destinos.get(final, final)
+        textos[titulo] = por_titulo.get(final, "")
+    return textos
+
+
+def _salvar_extrato(chave, extrato: str, headers) -> None:
+    cache_extratos.salvar(chave, EntradaExtrato(
+        extrato=extrato,
+        etag=headers.get("ETag"),
+        last_modified=headers.get("Last-Modified"),
+        validado_em=time.time(),
+    ))
+    cache_extratos.contar("downloads")
+
+
+def _processar_resposta(chave, entrada, response) -> Optional[str]:
+    status_code = response.status_code if response is not None else None
+    if status_code == 304 and entrada is not None:
+        entrada.validado_em = time.time()
+        cache_extratos.salvar(chave, entrada)
+        cache_extratos.contar("revalidacoes")
+        return entrada.extrato
+
+    if status_code == 200:
+        try:
+            extrato = _extrair_texto(response.json())
+        except ValueError:
+            return entrada.extrato if entrada is not None else None
+        # Página inexistente: não fica em cache (pode ser criada ou a resposta estar incompleta)
+        if extrato:
+            _salvar_extrato(chave, extrato, response.headers)
+        return extrato
+
+    # Em caso de falha, um extrato antigo é melhor do que nenhum
+    return entrada.extrato if entrada is not None else None
+
+
+def _processar_lote(idioma, titulos, entradas, response) -> Dict[str, Optional[str]]:
+    textos = None
+    if response is not None and response.status_code == 200:
+        try:
+            textos = _extrair_textos(response.json(), titulos)
+        except ValueError:
+            pass
+    resultado = {}
+    for titulo in titulos:
+        if textos is not None:
+            # Um ETag da resposta em lote não vale para cada página: o lote não é revalidado.
+            # Candidatos inexistentes ou ausentes da resposta não ficam em cache
+            if textos[titulo]:
+                _salvar_extrato((idioma, titulo), textos[titulo], {})
+            resultado[titulo] = textos[titulo]
+        else:
+            entrada = entradas.get(titulo)
+            resultado[titulo] = entrada.extrato if entrada is not None else None
+    return resultado
+
+
+def _montar_busca(term: str, idioma: str, limite: int):
+    url = WIKIPEDIA_API_URL.format(idioma=idioma)
+    params = {
+        "action": "opensearch",
+        "search": term,
+        "limit": limite,
+        "namespace": 0,
+        "redirects": "resolve",
+        "format": "json",
+    }
+    return url, params
+
+
+def _processar_busca(chave, response) -> Optional[List[str]]:
+    if response is None or response.status_code != 200:
+        return None
+    try:
+        dados = response.json()
+        # Formato do opensearch: [termo, [títulos], [descrições], [urls]]
+        titulos = [titulo for titulo in dados[1] if isinstance(titulo, str)]
+    except (ValueError, IndexError, TypeError, KeyError):
+        return None
+    cache_resolucoes.salvar(chave, titulos)
+    return titulos
+
+
+def _chave_resolucao(term: str, idioma: str, limite: int) -> Tuple[str, str, int]:
+    return idioma, normalizar_titulo(term).casefold(), limite
+
+
+def _candidatos(titulo: str, encontrados: Optional[List[str]], limite: int) -> List[str]:
+    # Sem resultados da busca (ou com falha), o próprio termo é consultado como título
+    candidatos = list(encontrados or [titulo])
+    return list(dict.fromkeys(candidatos))[:max(1, limite)]
+
+
+def _executar(passos: Passos[T]) -> T:
+    """Conduz uma consulta com a sessão síncrona compartilhada."""
+    try:
+        url, params, headers = next(passos)
+        while True:
+            try:
+                response = obter_sessao().get(url, params=params, headers=headers, timeout=TIMEOUT_PADRAO)
+            except requests.RequestException:
+                response = None
+            url, params, headers = passos.send(response)
+    except StopIteration as fim:
+        return fim.value
+
+
+async def _executar_async(passos: Passos[T]) -> T:
+    """Conduz uma consulta com o cliente httpx assíncrono compartilhado."""
+    try:
+        url, params, headers = next(passos)
+        while True:
+            try:
+                response = await obter_cliente_async().get(url, params=params, headers=headers)
+            except httpx.HTTPError:
+                response = None
+            url, params, headers = passos.send(response)
+    except StopIteration as fim:
+        return fim.value
+
+
+def _passos_resolver(term: str, idioma: str, limite: Optional[int]) -> Passos[List[str]]:
+    limite = limite or CANDIDATOS_PADRAO
+    titulo = normalizar_titulo(term)
+    if not RESOLVER_TITULOS:
+        return [titulo]
+    chave = _chave_resolucao(term, idioma, limite)
+    encontrados = cache_resolucoes.obter(chave)
+    if encontrados is None:
+        url, params = _montar_busca(titulo, idioma, limite)
+        encontrados = _processar_busca(chave, (yield url, params, {}))
+    return _candidatos(titulo, encontrados, limite)
+
+
+def resolver_titulos(term: str, idioma: str = IDIOMA_PADRAO, limite: Optional[int] = None) -> List[str]:
+    """
+    Converte um tema em texto livre nos títulos de artigo mais prováveis, em ordem
+    de relevância, usando a busca (opensearch) da Wikipedia. O resultado fica em cache.
+    """
+    return _executar(_passos_resolver(term, idioma, limite))
+
+
+async def resolver_titulos_async(term: str, idioma: str = IDIOMA_PADRAO, limite: Optional[int] = None) -> List[str]:
+    """
+    Versão assíncrona de `resolver_titulos`, compartilhando o mesmo cache.
+    """
+    return await _executar_async(_passos_resolver(term, idioma, limite))
+
+
+def _separar_pendentes(titulos: List[str], idioma: str):
+    """Separa os títulos já em cache (frescos) dos que precisam ser baixados."""
+    prontos: Dict[str, Optional[str]] = {}
+    entradas: Dict[str, EntradaExtrato] = {}
+    for titulo in titulos:
+        entrada = cache_extratos.obter((idioma, titulo))
+        if entrada is not None and cache_extratos.fresca(entrada):
+            cache_extratos.contar("hits")
+            prontos[titulo] = entrada.extrato
+        elif entrada is not None:
+            entradas[titulo] = entrada
+    pendentes = [titulo for titulo in titulos if titulo not in prontos]
+    return prontos, pendentes, entradas
+
+
+def _escolher(titulos: List[str], extratos: Dict[str, Optional[str]]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (título, extrato) do primeiro candidato com conteúdo; extrato "" se nenhum
+    existe e None se todos falharam.
+    """
+    for titulo in titulos:
+        if extratos.get(titulo):
+            return titulo, extratos[titulo]
+    if any(extratos.get(titulo) is not None for titulo in titulos):
+        return None, ""
+    return None, None
+
+
+def _memoria():
+    if not memoria_semantica_habilitada():
+        return None
+    from semantico import obter_memoria_semantica
+    return obter_memoria_semantica()
+
+
+def _buscar_semelhante(titulo: str) -> Optional[str]:
+    # Extrato de um título quase igual já baixado ("revolução francesa de 1789")
+    memoria = _memoria()
+    return memoria.buscar_extrato(titulo) if memoria is not None else None
+
+
+def _registrar_semelhante(titulo: Optional[str], extrato: Optional[str]) -> None:
+    memoria = _memoria()
+    if memoria is not None and titulo and extrato:
+        memoria.registrar_extrato(titulo, extrato)
+
+
+def _passos_extratos(titulos: List[str], idioma: str) -> Passos[Dict[str, Optional[str]]]:
+    extratos, pendentes, entradas = _separar_pendentes(titulos, idioma)
+    if len(pendentes) == 1:
+        titulo = pendentes[0]
+        chave, entrada = (idioma, titulo), entradas.get(titulo)
+        response = yield _montar_requisicao(titulo, idioma, entrada)
+        extratos[titulo] = _processar_resposta(chave, entrada, response)
+    elif pendentes:
+        response = yield _montar_requisicao_lote(pendentes, idioma)
+        extratos.update(_processar_lote(idioma, pendentes, entradas, response))
+    return extratos
+
+
+def buscar_extratos(titulos: List[str], idioma: str = IDIOMA_PADRAO) -> Dict[str, Optional[str]]:
+    """
+    Extratos de vários títulos exatos com uma única requisição (titles=A|B|C).
+    Títulos já em cache não são pedidos novamente; um único título vencido é
+    revalidado com GET condicional.
+    """
+    return _executar(_passos_extratos(titulos, idioma))
+
+
+async def buscar_extratos_async(titulos: List[str], idioma: str = IDIOMA_PADRAO) -> Dict[str, Optional[str]]:
+    """
+    Versão assíncrona de `buscar_extratos`, compartilhando o mesmo cache.
+    """
+    return await _executar_async(_passos_extratos(titulos, idioma))
+
+
+def _buscar_offline(titulo: str) -> Optional[str]:
+    # Com o índice local configurado, a rede só é usada para títulos fora dele
+    indice = obter_indice_offline()
+    if indice is None:
+        return None
+    extrato = indice.obter(titulo)
+    if extrato:
+        cache_extratos.contar("offline")
+    return extrato or None
+
+
+def _buscar_em_cache(titulo: str, idioma: str) -> Optional[str]:
+    # Título exato já baixado: nem a busca nem a API de extratos são consultadas
+    entrada = cache_extratos.obter((idioma, titulo))
+    if entrada is not None and entrada.extrato and cache_extratos.fresca(entrada):
+        cache_extratos.contar("hits")
+        return entrada.extrato
+    return None
+
+
+def _buscar_sem_rede(titulo: str, idioma: str) -> Optional[str]:
+    # Índice offline, cache de extratos e, por fim, um título semelhante já baixado
+    extrato = _buscar_offline(titulo)
+    if extrato is None:
+        extrato = _buscar_em_cache(titulo, idioma)
+    if extrato is None:
+        extrato = _buscar_semelhante(titulo)
+    return extrato
+
+
+def buscar_extrato(term: str, idioma: str = IDIOMA_PADRAO) -> Optional[str]:
+    """
+    Retorna o extrato completo (sem truncar) da introdução do artigo.
+
+    O tema é resolvido nos títulos mais prováveis (`resolver_titulos`) e os extratos
+    dos candidatos são baixados em uma única requisição; vale o primeiro com conteúdo.
+    Retorna "" quando nenhum artigo existe e None quando a requisição falha.
+    """
+    titulo = normalizar_titulo(term)
+    emitir("wikipedia_inicio", termo=titulo)
+    extrato = _buscar_sem_rede(titulo, idioma)
+    if extrato is not None:
+        emitir("wikipedia_fim", termo=titulo, encontrado=True, cache=True)
+        return extrato
+
+    titulos = resolver_titulos(term, idioma)
+    encontrado, extrato = _escolher(titulos, buscar_extratos(titulos, idioma))
+    _registrar_semelhante(encontrado, extrato)
+    emitir("wikipedia_fim", termo=titulo, encontrado=bool(extrato), cache=False)
+    return extrato
+
+
+async def buscar_extrato_async(term: str, idioma: str = IDIOMA_PADRAO) -> Optional[str]:
+    """
+    Versão assíncrona de `buscar_extrato`, compartilhando o mesmo cache. As etapas
+    sem rede (índice offline, memória semântica em SQLite) rodam em threads: o loop
+    é compartilhado por todas as pesquisas do modo async.
+    """
+    titulo = normalizar_titulo(term)
+    emitir("wikipedia_inicio", termo=titulo)
+    extrato = await asyncio.to_thread(_buscar_sem_rede, titulo, idioma)
+    if extrato is not None:
+        emitir("wikipedia_fim", termo=titulo, encontrado=True, cache=True)
+        return extrato
+
+    titulos = await resolver_titulos_async(term, idioma)
+    encontrado, extrato = _escolher(titulos, await buscar_extratos_async(titulos, idioma))
+    await asyncio.to_thread(_registrar_semelhante, encontrado, extrato)
+    emitir("wikipedia_fim", termo=titulo, encontrado=bool(extrato), cache=False)
+    return extrato
+
+
+def formatar_extrato(term: str, extrato: Optional[str], max_chars: int) -> str:
+    """
+    Converte o extrato na resposta da ferramenta, truncando após a consulta ao cache.
+    """
+    if extrato is None:
+        return f"Erro ao buscar o termo '{term}' na Wikipedia."
+    if not extrato:
+        return "Nenhum conteúdo encontrado na Wikipedia para este termo."
+    # Limita o tamanho do extrato para economizar tokens
+    if len(extrato) > max_chars:
+        extrato = extrato[:max_chars] + "..."
+    return extrato
+
+
+def extrato_condensado(term: str, max_chars: int = 1500) -> str:
+    """
+    Faz em Python o que o agente pesquisador faria com as ferramentas: busca o
+    extrato, seleciona as sentenças mais relevantes e limita o tamanho. Usado pelo
+    fluxo wikipedia_direto, que assim dispensa a chamada ao LLM para acionar as ferramentas.
+    """
+    return _condensar(term, buscar_extrato(term), max_chars)
+
+
+async def extrato_condensado_async(term: str, max_chars: int = 1500) -> str:
+    """Versão assíncrona de `extrato_condensado`; a seleção das sentenças (CPU) roda em uma thread."""
+    extrato = await buscar_extrato_async(term)
+    return await asyncio.to_thread(_condensar, term, extrato, max_chars)
+
+
+def _condensar(term: str, extrato: Optional[str], max_chars: int) -> str:
+    if not extrato:
+        # Sem artigo na Wikipedia: usa extratos e resumos já vistos sobre temas relacionados
+        memoria = _memoria()
+        material = memoria.buscar_material(term) if memoria is not None else []
+        if material:
+            extrato = "\n".join(texto for texto, _ in material)
+    if extrato:
+        # Sentenças mais relevantes para o tema dentro do limite de tamanho
+        extrato = resumo_extrativo(extrato, term, token_budget=max_chars // CARACTERES_POR_TOKEN)
+    return formatar_extrato(term, extrato, max_chars)
+
+
+async def wikipedia_resumo_async(term: str, max_chars: int = 2000) -> str:
+    return formatar_extrato(term, await buscar_extrato_async(term), max_chars)
+
+
+@ferramenta_async("Wikipedia Resumo Tool", wikipedia_resumo_async)
 def wikipedia_resumo(term: str, max_chars: int = 2000) -> str:
     """Busca um resumo da Wikipédia para o termo fornecido.
-    
+
     Args:
         term: O termo a ser pesquisado na Wikipedia
         max_chars: Número máximo de caracteres a retornar (padrão: 2000)
-    
+
     Returns:
         Resumo do artigo limitado ao tamanho especificado
     """
-    url = f"https://pt.wikipedia.org/w/api.php?action=query&prop=extracts&exlimit=1&explaintext=1&titles={term}&format=json&utf8=1&redirects=1&exintro=1"
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        pages = data.get("query", {}).get("pages", {})
-        
-        if pages:
-            # Obtém o primeiro ID de página (ignorando o número específico)
-            page_id = next(iter(pages))
-            extract = pages[page_id].get("extract", "")
-            
-            if extract:
-                # Limita o tamanho do extrato para economizar tokens
-                if len(extract) > max_chars:
-                    extract = extract[:max_chars] + "..."
-                return extract
-            return "Nenhum conteúdo encontrado na Wikipedia para este termo."
-    return f"Erro ao buscar o termo '{term}' na Wikipedia."
+    return formatar_extrato(term, buscar_extrato(term), max_chars)